@@ -0,0 +1,57 @@
+"""
+Benchmark of PGCComponent._parse_raw_view, trusted construction versus validated one
+
+the episodes of the large PGC view fixtures are repeated
+to simulate a season with thousands of episodes
+"""
+import copy
+import json
+import timeit
+from unittest.mock import patch
+
+from bili_jean.schemes import GetPGCViewResponse, Page
+from bili_jean.streaming.components import PGCComponent
+
+
+FIXTURES = (
+    'tests/mock_data/proxy/pgc_view/pgc_view_ep284310.json',
+    'tests/mock_data/proxy/pgc_view/pgc_view_ep249469.json'
+)
+EPISODE_COUNT = 3000
+REPEAT = 20
+
+
+def load_view_response(file: str, episode_count: int = EPISODE_COUNT) -> GetPGCViewResponse:
+    with open(file, 'r') as fp:
+        data = json.load(fp)
+    episodes = data['result']['episodes']
+    data['result']['episodes'] = [
+        copy.deepcopy(episodes[idx % len(episodes)]) for idx in range(episode_count)
+    ]
+    return GetPGCViewResponse.model_validate(data)
+
+
+def measure(view_response: GetPGCViewResponse, is_trusted_validated: bool) -> float:
+    with patch.object(Page, 'is_trusted_validated', is_trusted_validated):
+        return min(timeit.repeat(
+            lambda: PGCComponent._parse_raw_view(view_response),
+            number=1,
+            repeat=REPEAT
+        ))
+
+
+def main() -> None:
+    for file in FIXTURES:
+        view_response = load_view_response(file)
+        validated_cost = measure(view_response, is_trusted_validated=True)
+        trusted_cost = measure(view_response, is_trusted_validated=False)
+        print(
+            f'{file} ({EPISODE_COUNT} episodes): '
+            f'validated {validated_cost * 1000:.2f} ms, '
+            f'trusted {trusted_cost * 1000:.2f} ms, '
+            f'speedup x{validated_cost / trusted_cost:.2f}'
+        )
+
+
+if __name__ == '__main__':
+    main()
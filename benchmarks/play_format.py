@@ -0,0 +1,80 @@
+"""
+Benchmark of play response with the minimal fnval versus the full format one
+
+no request is sent, the response of the minimal fnval is simulated
+by pruning the variants, which the flags of fnval exclude, from the full format fixture
+"""
+import copy
+import json
+import timeit
+from typing import Any, Dict, Tuple
+
+from bili_jean.constants import AudioBitRateID, FormatNumberValue, QualityNumber, VideoCodecID
+from bili_jean.schemes import GetUGCPlayResponse
+from bili_jean.streaming.components import UGCComponent
+
+
+FIXTURE = 'tests/mock_data/proxy/ugc_play/ugc_play_BV13L4y1K7th.json'
+REPEAT = 200
+
+VIDEO_QN_FLAGS = {
+    QualityNumber.FOUR_K.value: FormatNumberValue.FOUR_K,
+    QualityNumber.HDR.value: FormatNumberValue.HDR,
+    QualityNumber.DOLBY.value: FormatNumberValue.DOLBY_VISION,
+    QualityNumber.EIGHT_K.value: FormatNumberValue.EIGHT_K
+}
+SCENARIOS: Tuple[Tuple[str, Dict[str, int]], ...] = (
+    ('highest quality', {}),
+    ('1080P HEVC', {'video_qn': QualityNumber.P1080.value, 'video_codec_number': VideoCodecID.HEVC.value}),
+    (
+        '720P AVC with 192K audio',
+        {
+            'video_qn': QualityNumber.P720.value,
+            'video_codec_number': VideoCodecID.AVC.value,
+            'audio_qn': AudioBitRateID.BPS_192K.value.bit_rate_id
+        }
+    )
+)
+
+
+def prune(data: Dict[str, Any], fnval: int) -> Dict[str, Any]:
+    data = copy.deepcopy(data)
+    dash = data['data']['dash']
+    dash['video'] = [
+        item for item in dash['video']
+        if fnval & VIDEO_QN_FLAGS.get(item['id'], fnval) and (
+            item['codecid'] != VideoCodecID.AV1.value or fnval & FormatNumberValue.AV1_ENCODE
+        )
+    ]
+    if not fnval & FormatNumberValue.DOLBY_AUDIO:
+        dash['dolby']['audio'] = None
+    return data
+
+
+def measure(content: bytes) -> float:
+    def parse() -> Any:
+        play_dm = GetUGCPlayResponse.model_validate(json.loads(content.decode('utf-8')))
+        return UGCComponent._build_stream_catalog(play_dm)
+
+    return min(timeit.repeat(parse, number=1, repeat=REPEAT))
+
+
+def main() -> None:
+    with open(FIXTURE, 'r') as fp:
+        data = json.load(fp)
+    full_content = json.dumps(data).encode('utf-8')
+    full_cost = measure(full_content)
+
+    for name, kwargs in SCENARIOS:
+        fnval = UGCComponent._get_format_params(**kwargs)['fnval']
+        content = json.dumps(prune(data, fnval)).encode('utf-8')
+        cost = measure(content)
+        print(
+            f'{name} (fnval={fnval}): '
+            f'payload {len(content)} / {len(full_content)} bytes, '
+            f'parse {cost * 1000:.3f} / {full_cost * 1000:.3f} ms'
+        )
+
+
+if __name__ == '__main__':
+    main()
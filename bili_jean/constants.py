@@ -4,7 +4,7 @@ Constants components
 from enum import Enum, IntEnum
 from functools import reduce
 import re
-from typing import NamedTuple
+from typing import NamedTuple, Optional
 
 
 class QualityNumber(IntEnum):
@@ -112,6 +112,48 @@ class FormatNumberValue(IntEnum):
             result = result | cls.EIGHT_K
         return result
 
+    @classmethod
+    def get_minimal_format_number_value(
+        cls,
+        qn: Optional[int] = None,
+        is_hq_preferred: bool = True,
+        codec_id: Optional[int] = None,
+        is_codec_eff_preferred: bool = True,
+        is_dolby_audio: bool = True
+    ) -> int:
+        """
+        get the minimal format number value which still covers the streams selection may pick,
+        unlike full_format, variants beyond the preference are not requested
+        :param qn: upper bound of format quality number, None if no bound
+        :type qn: Optional[int]
+        :param is_hq_preferred: prefer high quality or not, effective if qn is None
+        :type is_hq_preferred: bool
+        :param codec_id: upper bound of video codec ID, None if no bound
+        :type codec_id: Optional[int]
+        :param is_codec_eff_preferred: prefer higher efficiency codec or not, effective if codec_id is None
+        :type is_codec_eff_preferred: bool
+        :param is_dolby_audio: request Dolby Audio or not
+        :type is_dolby_audio: bool
+        :return: int
+        """
+        if qn is None and is_hq_preferred:
+            qn = max(QualityNumber)
+        # flags of each quality within the bound, the lowest one only asks for DASH
+        qualities = [item for item in QualityNumber if qn is not None and item <= qn] or [min(QualityNumber)]
+        result = 0
+        for item in qualities:
+            result = result | cls.get_format_number_value(item, is_dolby_audio=is_dolby_audio)
+        if (codec_id is None and is_codec_eff_preferred) or (codec_id is not None and codec_id >= VideoCodecID.AV1):
+            result = result | cls.AV1_ENCODE
+        return result
+
+    @classmethod
+    def get_fourk(cls, fnval: int) -> int:
+        """
+        'fourk' parameter along with the format number value
+        """
+        return 1 if fnval & cls.FOUR_K else 0
+
 
 BVID_LENGTH = 9
 WEB_VIEW_URL_UGC_BVID_PATTERN = re.compile(fr'/video/(BV1[a-zA-Z0-9]{{{BVID_LENGTH}}})')
@@ -156,6 +198,19 @@ class StreamingCategory(Enum):
         raise ValueError(f'Invalid given streaming category: {category}')
 
 
+class DownloadStatus(Enum):
+    """
+    result of downloading to a locked target
+
+    DOWNLOADED, the resource is downloaded by the current process,
+    REUSED, the file is downloaded already, e.g. by another process which held the lock,
+    SKIPPED, another process is downloading it, and the current one doesn't wait
+    """
+    DOWNLOADED = 'downloaded'
+    REUSED = 'reused'
+    SKIPPED = 'skipped'
+
+
 class StreamingIDType(Enum):
     """
     the value of each enum is,
@@ -244,9 +299,27 @@ HEADERS = {
     'Sec-Fetch-Site': 'same-site'
 }
 TIMEOUT = 5
+PROBE_SIZE = 16384  # bytes of the leading range request to read boxes of DASH stream
+JOURNAL_INTERVAL = 4 * 1024 * 1024  # bytes downloaded of a segment between updates of the download journal
+CONCURRENCY = 4
+WRITE_BUFFER_SIZE = 16 * 1024 * 1024  # bytes buffered ahead of the disk writer thread
+SYNC_INTERVAL_BYTES = 8 * 1024 * 1024  # bytes written between fsync of the downloading file
+SYNC_INTERVAL_SECONDS = 5  # seconds between fsync of the downloading file
+MULTIPART_PART_SIZE = 8 * 1024 * 1024  # bytes of each part uploaded to object storage
+LOCK_POLL_INTERVAL = 1  # seconds between attempts to acquire the lock of a downloading file
+LOCK_TIMEOUT = 3600  # seconds to wait for another process downloading the same file
+RATE_LIMIT = 5  # maximum of play requests per second
+ENTITLEMENT_PROFILE_TTL = 600  # seconds
+ENTITLEMENT_ERROR_TTL = 30  # seconds to reuse the failure of myinfo request before requesting again
+NOT_LOGIN_CODE = -101  # 'code' of the response when SESSDATA is not login
+THROTTLED_CODES = (-412, -352)  # 'code' of the response when risk control is triggered
+PREVIEW_DURATION_RATIO = 0.9  # streams shorter than the ratio of the episode duration are trial
+WBI_KEYS_REFRESH_INTERVAL = 43200  # seconds, keys of WBI signature are rotated daily
+WBI_KEYS_RETRY_INTERVAL = 60  # seconds to wait before fetching keys again once it fails
 
 
 URL_WEB_MY_INFO = 'https://api.bilibili.com/x/space/myinfo'
+URL_WEB_NAV = 'https://api.bilibili.com/x/web-interface/nav'
 URL_WEB_PGC_PLAY = 'https://api.bilibili.com/pgc/player/web/playurl'
 URL_WEB_PGC_VIEW = 'https://api.bilibili.com/pgc/view/web/season'
 URL_WEB_PUGV_PLAY = 'https://api.bilibili.com/pugv/player/web/playurl'
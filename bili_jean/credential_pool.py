@@ -0,0 +1,186 @@
+"""
+Pool of SESSDATA cookies of multiple accounts
+"""
+from enum import Enum
+import hashlib
+from threading import Lock
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Union
+
+
+__all__ = [
+    'CredentialPool',
+    'CredentialPoolError',
+    'CredentialPoolStrategy',
+    'get_sess_data_identity',
+    'SessData'
+]
+
+
+class CredentialPoolError(Exception):
+
+    def __init__(self, message):
+        self.message = message
+        super().__init__(self.message)
+
+
+class CredentialPoolStrategy(Enum):
+    """
+    ROUND_ROBIN picks healthy credentials in turn,
+    REMAINING_BUDGET picks the one with the most remaining budget in current window
+    """
+    ROUND_ROBIN = 'round_robin'
+    REMAINING_BUDGET = 'remaining_budget'
+
+
+class CredentialState:
+
+    def __init__(self, sess_data: str, budget: Optional[int]):
+        self.sess_data = sess_data
+        self.remaining_budget = budget
+        self.unavailable_until = 0.0
+        self.is_invalid = False
+
+
+class CredentialPool:
+    """
+    Spread requests across SESSDATA cookies of several accounts,
+    so risk control on one account doesn't throttle the whole job
+
+    * throttled credential is out of rotation for cooldown seconds
+    * invalid credential, e.g. failed validation, is out of rotation permanently
+    * budget limits requests of each credential in a window, no limit if None
+    """
+
+    def __init__(
+        self,
+        sess_datas: Iterable[str],
+        strategy: CredentialPoolStrategy = CredentialPoolStrategy.ROUND_ROBIN,
+        budget: Optional[int] = None,
+        window: float = 60,
+        cooldown: float = 300,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        :param sess_datas: cookies of Bilibili users, SESSDATA
+        :type sess_datas: Iterable[str]
+        :param strategy: strategy to pick credential
+        :type strategy: CredentialPoolStrategy
+        :param budget: maximum of requests of each credential in a window
+        :type budget: Optional[int]
+        :param window: seconds of the budget window
+        :type window: float
+        :param cooldown: seconds that throttled credential is out of rotation
+        :type cooldown: float
+        :param clock: source of monotonic time
+        :type clock: Callable[[], float]
+        """
+        self._states: Dict[str, CredentialState] = {}
+        for sess_data in sess_datas:
+            self._states.setdefault(sess_data, CredentialState(sess_data, budget))
+        if not self._states:
+            raise ValueError('At least one SESSDATA is necessary')
+        self._strategy = strategy
+        self._budget = budget
+        self._window = window
+        self._cooldown = cooldown
+        self._clock = clock
+        self._window_start = clock()
+        self._cursor = 0
+        self._lock = Lock()
+        self.identity = hashlib.sha256('\n'.join(sorted(self._states)).encode('utf-8')).hexdigest()
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+    @property
+    def sess_datas(self) -> List[str]:
+        return list(self._states)
+
+    @property
+    def healthy_sess_datas(self) -> List[str]:
+        with self._lock:
+            now = self._clock()
+            return [state.sess_data for state in self._states.values() if self._is_healthy(state, now)]
+
+    def acquire(self, predicate: Optional[Callable[[str], bool]] = None) -> Optional[str]:
+        """
+        pick a credential for the next request
+        :param predicate: only credentials meet it are acceptable, e.g. VIP accounts for VIP qualities
+        :type predicate: Optional[Callable[[str], bool]]
+        :return: SESSDATA, None if no credential is available
+        """
+        # predicate could request, e.g. entitlement of the account, so it is evaluated ahead of locking,
+        # and only on the credentials in rotation
+        accepted = set(
+            sess_data for sess_data in self.healthy_sess_datas
+            if predicate is None or predicate(sess_data)
+        )
+
+        with self._lock:
+            self._refresh_budget()
+            now = self._clock()
+            # cursor goes round the whole pool, so it is not skewed by credentials in and out of rotation
+            states = list(self._states.values())
+            count = len(states)
+            ordered_states = [states[(self._cursor + index) % count] for index in range(count)]
+            candidates = [
+                state for state in ordered_states
+                if state.sess_data in accepted and self._is_healthy(state, now) and state.remaining_budget != 0
+            ]
+            if not candidates:
+                return None
+            if self._strategy == CredentialPoolStrategy.REMAINING_BUDGET and self._budget is not None:
+                state = max(candidates, key=lambda item: item.remaining_budget or 0)
+            else:
+                state = candidates[0]
+                self._cursor = (states.index(state) + 1) % count
+            if state.remaining_budget is not None:
+                state.remaining_budget -= 1
+            return state.sess_data
+
+    def report_throttled(self, sess_data: str) -> None:
+        """
+        take the credential out of rotation for cooldown, e.g. when risk control responds
+        """
+        with self._lock:
+            state = self._states.get(sess_data)
+            if state is not None:
+                state.unavailable_until = self._clock() + self._cooldown
+
+    def report_invalid(self, sess_data: str) -> None:
+        """
+        take the credential out of rotation permanently, e.g. when it fails validation
+        """
+        with self._lock:
+            state = self._states.get(sess_data)
+            if state is not None:
+                state.is_invalid = True
+
+    def _is_healthy(self, state: CredentialState, now: float) -> bool:
+        return not state.is_invalid and state.unavailable_until <= now
+
+    def _refresh_budget(self) -> None:
+        if self._budget is None:
+            return
+        now = self._clock()
+        if now - self._window_start < self._window:
+            return
+        self._window_start = now
+        for state in self._states.values():
+            state.remaining_budget = self._budget
+
+
+SessData = Union[str, CredentialPool]
+
+
+def get_sess_data_identity(sess_data: Optional[SessData]) -> str:
+    """
+    identity of the credential to key caches, rather than the secret itself
+    :return: hash of the SESSDATA, identity of the pool, or empty string if anonymous
+    """
+    if not sess_data:
+        return ''
+    if isinstance(sess_data, CredentialPool):
+        return sess_data.identity
+    return hashlib.sha256(sess_data.encode('utf-8')).hexdigest()
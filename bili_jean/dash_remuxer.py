@@ -0,0 +1,420 @@
+"""
+Remux DASH video and audio streams into one fragmented MP4 as the bytes arrive,
+only headers and track IDs of boxes are rewritten, media payloads are passed through as is
+"""
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import struct
+from threading import Lock
+from typing import BinaryIO, Iterable, Iterator, List, Optional, TYPE_CHECKING
+
+from .isobmff import Box, find_box, iter_boxes, parse_box_header
+
+if TYPE_CHECKING:
+    from .page_download_service import PageDownloadService
+
+
+__all__ = ['DashRemuxer', 'remux_downloads', 'remux_files', 'remux_streams', 'RemuxError']
+
+
+VIDEO_TRACK_ID = 1
+AUDIO_TRACK_ID = 2
+
+TFHD_BASE_DATA_OFFSET_PRESENT = 0x000001
+
+
+class RemuxError(Exception):
+
+    def __init__(self, message):
+        self.message = message
+        super().__init__(self.message)
+
+
+def _build_box(box_type: str, payload: bytes) -> bytes:
+    return struct.pack('>I4s', len(payload) + 8, box_type.encode('latin-1')) + payload
+
+
+class _Input:
+    """
+    state of one input stream
+    """
+
+    def __init__(self, name: str, track_id: int):
+        self.name = name
+        self.track_id = track_id          # track ID in the output
+        self.buffer = bytearray()
+        self.offset = 0                   # offset of the buffer's first byte in the input stream
+        self.ftyp: Optional[bytes] = None
+        self.moov: Optional[bytes] = None
+        self.source_track_id: Optional[int] = None
+        self.remaining_skip = 0           # bytes of a dropped box which are not arrived yet
+        self.remaining_payload = 0        # bytes of the current 'mdat' which are not passed through yet
+
+    def consume(self, size: int) -> bytes:
+        data = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        self.offset += size
+        return data
+
+
+class DashRemuxer:
+    """
+    Merge a video and an audio DASH stream (fragmented MP4) into one fragmented MP4
+
+    * output starts with 'ftyp' of video, and 'moov' made of both tracks, once both 'moov' arrive
+    * each fragment ('moof' and the following 'mdat') is written once its 'moof' arrives,
+      then payload of 'mdat' is passed through, the other stream is buffered meanwhile
+    * sequence numbers in 'mfhd', track IDs, and base data offsets in 'tfhd' are rewritten,
+      no box changes its size
+    * other top-level boxes are dropped, e.g. 'sidx' whose offsets don't fit the merged file
+
+    Both streams could be fed from different threads
+    """
+
+    def __init__(self, output: BinaryIO):
+        """
+        :param output: writable file object of the merged file, which is written sequentially
+        :type output: BinaryIO
+        """
+        self._output = output
+        self._output_size = 0
+        self._video = _Input('video', VIDEO_TRACK_ID)
+        self._audio = _Input('audio', AUDIO_TRACK_ID)
+        self._is_header_written = False
+        self._owner: Optional[_Input] = None  # input whose 'mdat' is being passed through
+        self._sequence_number = 0
+        self._error: Optional[Exception] = None
+        self._lock = Lock()
+
+    @property
+    def output_size(self) -> int:
+        return self._output_size
+
+    def feed_video(self, chunk: bytes) -> None:
+        self._feed(self._video, chunk)
+
+    def feed_audio(self, chunk: bytes) -> None:
+        self._feed(self._audio, chunk)
+
+    def close(self) -> None:
+        """
+        check that both streams are complete, then the output is a playable file
+        """
+        with self._lock:
+            if self._error is not None:
+                raise RemuxError(f'Remux failed: {self._error}')
+            if not self._is_header_written:
+                raise RemuxError('Initialization segment of video or audio is incomplete')
+            for stream in (self._video, self._audio):
+                if stream.buffer or stream.remaining_payload or stream.remaining_skip:
+                    raise RemuxError(f'Stream of {stream.name} ends with an incomplete box')
+
+    def _feed(self, stream: _Input, chunk: bytes) -> None:
+        with self._lock:
+            if self._error is not None:
+                raise RemuxError(f'Remux failed: {self._error}')
+            stream.buffer += chunk
+            try:
+                while self._step(self._owner or stream) or self._step(self._other(stream)):
+                    pass
+            except Exception as e:
+                self._error = e
+                raise
+
+    def _other(self, stream: _Input) -> _Input:
+        return self._audio if stream is self._video else self._video
+
+    def _write(self, data: bytes) -> None:
+        self._output.write(data)
+        self._output_size += len(data)
+
+    def _step(self, stream: _Input) -> bool:
+        """
+        process the leading bytes of the stream's buffer
+        :return: whether any byte is processed
+        """
+        if self._owner is not None and self._owner is not stream:
+            return False
+        if not stream.buffer:
+            return False
+
+        if stream.remaining_payload:
+            size = min(stream.remaining_payload, len(stream.buffer))
+            self._write(stream.consume(size))
+            stream.remaining_payload -= size
+            if not stream.remaining_payload:
+                self._owner = None
+            return True
+        if stream.remaining_skip:
+            size = min(stream.remaining_skip, len(stream.buffer))
+            stream.consume(size)
+            stream.remaining_skip -= size
+            return True
+
+        box = self._parse_box_header(stream, 0)
+        if box is None:
+            return False
+
+        if box.box_type in ('ftyp', 'moov'):
+            if stream.moov is not None:
+                raise RemuxError(f'Unexpected {box.box_type} in fragments of {stream.name}')
+            if len(stream.buffer) < box.size:
+                return False
+            data = stream.consume(box.size)
+            if box.box_type == 'ftyp':
+                stream.ftyp = data
+            else:
+                stream.moov = data
+                stream.source_track_id = self._get_source_track_id(stream)
+                self._write_header()
+            return True
+        if box.box_type == 'moof':
+            if stream.moov is None:
+                raise RemuxError(f'Fragment ahead of moov in {stream.name}')
+            if not self._is_header_written:
+                return False
+            mdat = self._parse_box_header(stream, box.size)
+            if mdat is None:
+                return False
+            if mdat.box_type != 'mdat':
+                raise RemuxError(f'Expect mdat following moof in {stream.name}, but {mdat.box_type}')
+            moof = self._rewrite_moof(stream, stream.consume(box.size))
+            self._write(moof + stream.consume(mdat.header_size))
+            stream.remaining_payload = mdat.size - mdat.header_size
+            if stream.remaining_payload:
+                self._owner = stream
+            return True
+        if box.box_type == 'mdat':
+            raise RemuxError(f'mdat without moof in {stream.name}')
+        # e.g. 'sidx', its offsets don't fit the merged file
+        stream.remaining_skip = box.size
+        return True
+
+    @staticmethod
+    def _parse_box_header(stream: _Input, offset: int) -> Optional[Box]:
+        box = parse_box_header(bytes(stream.buffer[offset:offset + 16]), 0, stream.offset + offset)
+        if box is not None and struct.unpack_from('>I', stream.buffer, offset)[0] == 0:
+            raise RemuxError(f'Box {box.box_type} of unknown size in {stream.name} is not supported')
+        return box
+
+    @staticmethod
+    def _get_source_track_id(stream: _Input) -> int:
+        moov = stream.moov or b''
+        traks = [box for box in iter_boxes(moov, 8) if box.box_type == 'trak']
+        if len(traks) != 1:
+            raise RemuxError(f'Expect 1 track in {stream.name}, but {len(traks)}')
+        tkhd = find_box(moov, 'tkhd', traks[0].payload_offset, traks[0].end)
+        if tkhd is None:
+            raise RemuxError(f'No tkhd in {stream.name}')
+        return _get_tkhd_track_id(moov, tkhd)
+
+    def _write_header(self) -> None:
+        if self._video.moov is None or self._audio.moov is None:
+            return
+        ftyp = self._video.ftyp or self._audio.ftyp or _build_box('ftyp', b'iso5\x00\x00\x02\x00iso5iso6mp41')
+        self._write(ftyp + self._merge_moov())
+        self._is_header_written = True
+
+    def _merge_moov(self) -> bytes:
+        """
+        'moov' of video, in which 'trak' and 'trex' of audio are appended,
+        durations of audio track in movie timescale are scaled to the one of video
+        """
+        video_moov = self._video.moov or b''
+        audio_moov = self._audio.moov or b''
+        video_mvhd = find_box(video_moov, 'mvhd', 8)
+        audio_mvhd = find_box(audio_moov, 'mvhd', 8)
+        if video_mvhd is None or audio_mvhd is None:
+            raise RemuxError('No mvhd in moov')
+        video_timescale = _get_mvhd_timescale(video_moov, video_mvhd)
+        audio_timescale = _get_mvhd_timescale(audio_moov, audio_mvhd)
+
+        mvhd = bytearray(video_moov[video_mvhd.offset:video_mvhd.end])
+        struct.pack_into('>I', mvhd, len(mvhd) - 4, AUDIO_TRACK_ID + 1)  # next_track_ID
+        children: List[bytes] = [bytes(mvhd)]
+        mvex_children: List[bytes] = []
+        for stream, moov, timescale in (
+            (self._video, video_moov, video_timescale),
+            (self._audio, audio_moov, audio_timescale)
+        ):
+            for box in iter_boxes(moov, 8):
+                if box.box_type == 'trak':
+                    trak = bytearray(moov[box.offset:box.end])
+                    _rewrite_trak(trak, stream.track_id, timescale, video_timescale)
+                    children.append(bytes(trak))
+                elif box.box_type == 'mvex':
+                    for mvex_child in iter_boxes(moov, box.payload_offset, box.end):
+                        data = bytearray(moov[mvex_child.offset:mvex_child.end])
+                        if mvex_child.box_type == 'trex':
+                            struct.pack_into('>I', data, mvex_child.header_size + 4, stream.track_id)
+                            mvex_children.append(bytes(data))
+                        elif mvex_child.box_type == 'mehd' and stream is self._video:
+                            mvex_children.insert(0, bytes(data))
+                elif box.box_type != 'mvhd' and stream is self._video:
+                    children.append(moov[box.offset:box.end])
+        children.append(_build_box('mvex', b''.join(mvex_children)))
+        return _build_box('moov', b''.join(children))
+
+    def _rewrite_moof(self, stream: _Input, moof: bytes) -> bytes:
+        moof_offset = stream.offset - len(moof)
+        data = bytearray(moof)
+        self._sequence_number += 1
+        for box in iter_boxes(moof, 8):
+            if box.box_type == 'mfhd':
+                struct.pack_into('>I', data, box.payload_offset + 4, self._sequence_number)
+            elif box.box_type == 'traf':
+                tfhd = find_box(moof, 'tfhd', box.payload_offset, box.end)
+                if tfhd is None:
+                    raise RemuxError(f'No tfhd in fragment of {stream.name}')
+                pos = tfhd.payload_offset
+                flags = struct.unpack_from('>I', moof, pos)[0] & 0xffffff
+                track_id, = struct.unpack_from('>I', moof, pos + 4)
+                if track_id != stream.source_track_id:
+                    raise RemuxError(f'Unknown track {track_id} in fragment of {stream.name}')
+                struct.pack_into('>I', data, pos + 4, stream.track_id)
+                if flags & TFHD_BASE_DATA_OFFSET_PRESENT:
+                    # base data offset is absolute in file, move it along with 'moof'
+                    base_data_offset, = struct.unpack_from('>Q', moof, pos + 8)
+                    base_data_offset += self._output_size - moof_offset
+                    struct.pack_into('>Q', data, pos + 8, base_data_offset)
+        return bytes(data)
+
+
+def _get_tkhd_track_id(data: bytes, tkhd: Box) -> int:
+    pos = tkhd.payload_offset
+    track_id: int = struct.unpack_from('>I', data, pos + (12 if data[pos] == 0 else 20))[0]
+    return track_id
+
+
+def _get_mvhd_timescale(data: bytes, mvhd: Box) -> int:
+    pos = mvhd.payload_offset
+    timescale: int = struct.unpack_from('>I', data, pos + (12 if data[pos] == 0 else 20))[0]
+    return timescale
+
+
+def _rewrite_trak(trak: bytearray, track_id: int, from_timescale: int, to_timescale: int) -> None:
+    """
+    rewrite track ID in 'tkhd', and scale durations in movie timescale, which are in 'tkhd' and 'elst'
+    """
+    data = bytes(trak)
+
+    def scale(value: int) -> int:
+        if from_timescale == to_timescale or not from_timescale:
+            return value
+        return value * to_timescale // from_timescale
+
+    tkhd = find_box(data, 'tkhd', 8)
+    if tkhd is None:
+        raise RemuxError('No tkhd in trak')
+    pos = tkhd.payload_offset
+    if data[pos] == 0:
+        struct.pack_into('>I', trak, pos + 12, track_id)
+        duration, = struct.unpack_from('>I', data, pos + 20)
+        if duration != 0xffffffff:
+            struct.pack_into('>I', trak, pos + 20, min(scale(duration), 0xfffffffe))
+    else:
+        struct.pack_into('>I', trak, pos + 20, track_id)
+        duration, = struct.unpack_from('>Q', data, pos + 28)
+        if duration != 0xffffffffffffffff:
+            struct.pack_into('>Q', trak, pos + 28, scale(duration))
+
+    elst = find_box(data, 'edts/elst', 8)
+    if elst is None:
+        return
+    pos = elst.payload_offset
+    version = data[pos]
+    entry_count, = struct.unpack_from('>I', data, pos + 4)
+    pos += 8
+    for _ in range(entry_count):
+        if version == 0:
+            segment_duration, = struct.unpack_from('>I', data, pos)
+            struct.pack_into('>I', trak, pos, min(scale(segment_duration), 0xffffffff))
+            pos += 12
+        else:
+            segment_duration, = struct.unpack_from('>Q', data, pos)
+            struct.pack_into('>Q', trak, pos, scale(segment_duration))
+            pos += 20
+
+
+def remux_streams(video_chunks: Iterable[bytes], audio_chunks: Iterable[bytes], output: BinaryIO) -> None:
+    """
+    consume both streams concurrently and remux them into output
+    :param video_chunks: bytes of video DASH stream in order
+    :type video_chunks: Iterable[bytes]
+    :param audio_chunks: bytes of audio DASH stream in order
+    :type audio_chunks: Iterable[bytes]
+    :param output: writable file object of the merged file
+    :type output: BinaryIO
+    """
+    remuxer = DashRemuxer(output)
+
+    def feed_video() -> None:
+        for chunk in video_chunks:
+            remuxer.feed_video(chunk)
+
+    def feed_audio() -> None:
+        for chunk in audio_chunks:
+            remuxer.feed_audio(chunk)
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        futures = [executor.submit(feed_video), executor.submit(feed_audio)]
+        for future in futures:
+            future.result()
+    remuxer.close()
+
+
+def remux_downloads(video: 'PageDownloadService', audio: 'PageDownloadService', file: str) -> None:
+    """
+    download both streams and remux them into one file, without writing the separate streams to disk,
+    the merged file is written as temporary one, and renamed once both streams are complete
+    :param video: download of video DASH stream
+    :type video: PageDownloadService
+    :param audio: download of audio DASH stream
+    :type audio: PageDownloadService
+    :param file: path of the merged file
+    :type file: str
+    """
+    path = Path(file)
+    if path.is_dir():
+        raise ValueError('The value of \'file\' should be a file path')
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = Path(f'{path}.part')
+    with open(str(tmp_path.resolve()), 'wb') as f:
+        remux_streams(video.iter_content(), audio.iter_content(), f)
+    tmp_path.rename(path)
+
+
+def _iter_file(file: str, chunk_size: int) -> Iterator[bytes]:
+    with open(file, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+
+def remux_files(video_file: str, audio_file: str, file: str, chunk_size: int = 1024 * 1024) -> None:
+    """
+    remux downloaded streams into one file, which is written as temporary one and renamed once complete
+    :param video_file: path of video DASH stream
+    :type video_file: str
+    :param audio_file: path of audio DASH stream
+    :type audio_file: str
+    :param file: path of the merged file
+    :type file: str
+    :param chunk_size: bytes read from the streams each time
+    :type chunk_size: int
+    """
+    path = Path(file)
+    tmp_path = Path(f'{path}.part')
+    with open(str(tmp_path.resolve()), 'wb') as f:
+        remuxer = DashRemuxer(f)
+        video_chunks = _iter_file(video_file, chunk_size)
+        audio_chunks = _iter_file(audio_file, chunk_size)
+        for video_chunk in video_chunks:
+            remuxer.feed_video(video_chunk)
+            remuxer.feed_audio(next(audio_chunks, b''))
+        for audio_chunk in audio_chunks:
+            remuxer.feed_audio(audio_chunk)
+        remuxer.close()
+    tmp_path.rename(path)
@@ -0,0 +1,230 @@
+"""
+Background writer which decouples network reads from disk writes
+"""
+import logging
+from queue import Queue
+from threading import Event, Lock, Thread
+import time
+from types import TracebackType
+from typing import Any, NamedTuple, Optional, Protocol, Type
+
+from .constants import WRITE_BUFFER_SIZE
+from .pipeline import ByteBudget
+
+
+__all__ = ['DiskWriter', 'DiskWriterMetrics', 'Writable', 'WriteTarget']
+
+
+logger = logging.getLogger(__name__)
+
+
+class DiskWriterMetrics(NamedTuple):
+    written_bytes: int
+    write_count: int
+    buffered_bytes: int          # bytes submitted but not written yet
+    max_buffered_bytes: int
+    write_seconds: float         # seconds spent by the writer thread on disk
+    blocked_seconds: float       # seconds spent by readers on full buffer, i.e. disk is the bottleneck
+
+
+class Writable(Protocol):
+    """
+    target of chunks, e.g. file opened in binary mode
+    """
+
+    def write(self, chunk: bytes) -> int:
+        ...
+
+    def close(self) -> None:
+        ...
+
+
+_END = object()
+_CLOSE = object()
+
+
+class WriteTarget:
+    """
+    a file opened by DiskWriter, whose writes are buffered and done by the writer thread
+    """
+
+    def __init__(self, writer: 'DiskWriter', fp: Writable):
+        self._writer = writer
+        self._fp = fp
+        self._error: Optional[Exception] = None
+        self._closed = Event()
+        self._is_closing = False
+
+    @property
+    def error(self) -> Optional[Exception]:
+        return self._error
+
+    def write(self, chunk: bytes) -> int:
+        """
+        buffer the chunk, which blocks only if the buffer of writer is full
+        :return: size of the chunk
+        """
+        if self._is_closing:
+            raise ValueError('Write to closed target')
+        if self._error is not None:
+            raise self._error
+        self._writer._submit(self, chunk)
+        return len(chunk)
+
+    def close(self) -> None:
+        """
+        wait for the buffered chunks to be written, then close the file,
+        error of any write is raised here
+        """
+        if not self._is_closing:
+            self._is_closing = True
+            self._writer._submit(self, _CLOSE)
+        self._closed.wait()
+        if self._error is not None:
+            raise self._error
+
+    def __enter__(self) -> 'WriteTarget':
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType]
+    ) -> None:
+        self.close()
+
+    def _write(self, chunk: Any) -> bool:
+        """
+        called by the writer thread only
+        :return: chunk is written or not, chunks following a failed one are dropped
+        """
+        if chunk is _CLOSE:
+            try:
+                self._fp.close()
+            except Exception as e:
+                self._error = self._error or e
+            self._closed.set()
+            return False
+        if self._error is not None:
+            return False
+        try:
+            self._fp.write(chunk)
+        except Exception as e:
+            logger.warning(f'Write to {getattr(self._fp, "name", self._fp)} failed: {e}')
+            self._error = e
+            return False
+        return True
+
+
+class DiskWriter:
+    """
+    Write chunks to files by a dedicated thread,
+    so the thread reading the socket goes on while a stalled disk catches up
+
+    * one writer could be dedicated to one target, or shared across targets, e.g. concurrent downloads
+    * bytes buffered are bounded, readers are blocked once the buffer is full,
+      the blocked seconds tell how long the disk holds back the network
+    * chunks of one target are written in order
+    """
+
+    def __init__(self, max_buffer_bytes: int = WRITE_BUFFER_SIZE):
+        """
+        :param max_buffer_bytes: maximum of bytes submitted but not written yet
+        :type max_buffer_bytes: int
+        """
+        self._budget = ByteBudget(max_buffer_bytes)
+        self._queue: 'Queue[Any]' = Queue()
+        self._thread: Optional[Thread] = None
+        self._lock = Lock()
+        self._written_bytes = 0
+        self._write_count = 0
+        self._write_seconds = 0.0
+        self._blocked_seconds = 0.0
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = Thread(target=self._work, name='disk-writer', daemon=True)
+                self._thread.start()
+
+    def open(self, file: str, mode: str = 'ab') -> WriteTarget:
+        """
+        open the file to be written by the writer thread, which is started if not yet
+        :param file: path of the file
+        :type file: str
+        :param mode: binary mode to open the file, e.g. 'ab' or 'wb'
+        :type mode: str
+        :return: WriteTarget
+        """
+        return self.attach(open(file, mode))
+
+    def attach(self, fp: Writable) -> WriteTarget:
+        """
+        write to the opened file by the writer thread, which is started if not yet,
+        the file is closed by the writer thread once the target is closed
+        :param fp: opened file, or anything writable like it, e.g. DurableFile
+        :type fp: Writable
+        :return: WriteTarget
+        """
+        self.start()
+        return WriteTarget(self, fp)
+
+    def close(self) -> None:
+        """
+        stop the writer thread once the buffered chunks are written
+        """
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(_END)
+            thread.join()
+
+    def get_metrics(self) -> DiskWriterMetrics:
+        with self._lock:
+            return DiskWriterMetrics(
+                written_bytes=self._written_bytes,
+                write_count=self._write_count,
+                buffered_bytes=self._budget.used,
+                max_buffered_bytes=self._budget.max_used,
+                write_seconds=self._write_seconds,
+                blocked_seconds=self._blocked_seconds
+            )
+
+    def __enter__(self) -> 'DiskWriter':
+        self.start()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType]
+    ) -> None:
+        self.close()
+
+    def _submit(self, target: WriteTarget, chunk: Any) -> None:
+        if self._thread is None:
+            raise ValueError('Disk writer is closed')
+        size = 0 if chunk is _CLOSE else len(chunk)
+        blocked_seconds = self._budget.acquire(size)
+        with self._lock:
+            self._blocked_seconds += blocked_seconds
+        self._queue.put((target, chunk))
+
+    def _work(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is _END:
+                break
+            target, chunk = item
+            size = 0 if chunk is _CLOSE else len(chunk)
+            start_time = time.monotonic()
+            is_written = target._write(chunk)
+            write_seconds = time.monotonic() - start_time
+            with self._lock:
+                self._write_seconds += write_seconds
+                if is_written:
+                    self._written_bytes += size
+                    self._write_count += 1
+            self._budget.release(size)
@@ -0,0 +1,157 @@
+"""
+File whose downloaded bytes are fsynced in batch, along with the journal of the offset reached disk
+"""
+import errno
+import json
+import logging
+import os
+import time
+from typing import Any, Callable, Dict, IO, Optional
+
+from .schemes import DurabilityPolicy
+
+
+__all__ = ['DurableFile', 'load_journal', 'preallocate']
+
+
+logger = logging.getLogger(__name__)
+
+
+def preallocate(fp: IO[bytes], size: int) -> None:
+    """
+    allocate blocks of the file up to size,
+    falls back to extending the file sparsely if the platform or file system doesn't support it,
+    OSError with errno ENOSPC is raised if there is not enough space
+    """
+    fp.flush()
+    if hasattr(os, 'posix_fallocate'):
+        try:
+            os.posix_fallocate(fp.fileno(), 0, size)
+            return
+        except OSError as e:
+            if e.errno not in (errno.EINVAL, errno.EOPNOTSUPP):
+                raise
+    fp.truncate(size)
+
+
+def load_journal(journal_path: str) -> Optional[Dict[str, Any]]:
+    """
+    :return: content of the journal, None if it is missing or broken
+    """
+    try:
+        with open(journal_path, 'r') as fp:
+            journal: Dict[str, Any] = json.load(fp)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning(f'Load download journal {journal_path} failed: {e}')
+        return None
+    if not isinstance(journal, dict):
+        return None
+    return journal
+
+
+class DurableFile:
+    """
+    Wrap the file being downloaded, and fsync it by DurabilityPolicy
+
+    * the offset recorded in the journal is the one reached disk by the last fsync,
+      so the download continues from bytes which are really there after a crash,
+      even if the file looks longer, e.g. preallocated
+    * the time interval is checked when a chunk is written, rather than by a timer
+    """
+
+    def __init__(
+        self,
+        fp: IO[bytes],
+        policy: DurabilityPolicy,
+        offset: int = 0,
+        journal_path: Optional[str] = None,
+        journal: Optional[Dict[str, Any]] = None,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        :param fp: file opened in binary mode, whose position is the offset
+        :type fp: IO[bytes]
+        :param policy: when to fsync
+        :type policy: DurabilityPolicy
+        :param offset: bytes of the file which have reached disk already
+        :type offset: int
+        :param journal_path: path of the journal, which is written after each fsync, no journal if None
+        :type journal_path: Optional[str]
+        :param journal: other fields recorded in the journal along with 'progress', e.g. size of the resource
+        :type journal: Optional[Dict[str, Any]]
+        :param clock: source of monotonic seconds
+        :type clock: Callable[[], float]
+        """
+        self._fp = fp
+        self._policy = policy
+        self._offset = offset
+        self._synced_offset = offset
+        self._journal_path = journal_path
+        self._journal = dict(journal or {})
+        self._clock = clock
+        self._synced_at = clock()
+        self._sync_count = 0
+
+    @property
+    def name(self) -> Any:
+        return self._fp.name
+
+    @property
+    def offset(self) -> int:
+        return self._offset
+
+    @property
+    def synced_offset(self) -> int:
+        return self._synced_offset
+
+    @property
+    def sync_count(self) -> int:
+        return self._sync_count
+
+    def write(self, chunk: bytes) -> int:
+        size = self._fp.write(chunk)
+        self._offset += len(chunk)
+        sync_bytes, sync_seconds = self._policy.sync_bytes, self._policy.sync_seconds
+        if (
+            (sync_bytes is not None and self._offset - self._synced_offset >= sync_bytes)
+            or (sync_seconds is not None and self._clock() - self._synced_at >= sync_seconds)
+        ):
+            self.sync()
+        return size
+
+    def sync(self) -> None:
+        """
+        fsync the file, then record the offset in the journal
+        """
+        self._fp.flush()
+        os.fsync(self._fp.fileno())
+        self._synced_offset = self._offset
+        self._synced_at = self._clock()
+        self._sync_count += 1
+        self._dump_journal()
+
+    def close(self) -> None:
+        """
+        fsync the rest and close the file
+        """
+        try:
+            if self._offset != self._synced_offset or self._sync_count == 0:
+                self.sync()
+        finally:
+            self._fp.close()
+
+    def __enter__(self) -> 'DurableFile':
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def _dump_journal(self) -> None:
+        if self._journal_path is None:
+            return
+        tmp_journal_path = f'{self._journal_path}.tmp'
+        with open(tmp_journal_path, 'w') as fp:
+            json.dump({**self._journal, 'progress': self._synced_offset}, fp)
+        os.replace(tmp_journal_path, self._journal_path)
@@ -0,0 +1,212 @@
+"""
+Service component to download segments of video-audio combined resource into one local file
+"""
+from concurrent.futures import ThreadPoolExecutor
+import copy
+from http import HTTPStatus
+import json
+import logging
+import os
+from pathlib import Path
+from threading import Lock
+from typing import BinaryIO, List, Optional
+
+from .constants import CONCURRENCY, HEADERS, JOURNAL_INTERVAL
+from .page_download_service import DownloadError
+from .proxy_service import ProxyService
+from .schemes import DUrlSegmentMeta
+
+
+__all__ = ['DUrlDownloadService']
+
+
+logger = logging.getLogger(__name__)
+
+
+class DUrlDownloadService:
+    """
+    Download segments of durl in parallel, into one file in order
+
+    * the temporary file is preallocated by the known size of segments,
+      and each segment is written at its own offset, so completion order doesn't matter
+    * bytes downloaded of each segment are recorded in a journal along with the temporary file,
+      the next download continues from them, unless the segments changed
+    * backup URLs of a segment are tried once its URL fails
+    """
+
+    def __init__(
+        self,
+        segments: List[DUrlSegmentMeta],
+        file: str,
+        concurrency: int = CONCURRENCY,
+        journal_interval: int = JOURNAL_INTERVAL
+    ):
+        """
+        :param segments: segments of the resource, e.g. from StreamingService.get_page_durl_segments
+        :type segments: List[DUrlSegmentMeta]
+        :param file: path of the local file
+        :type file: str
+        :param concurrency: maximum of segments downloaded concurrently
+        :type concurrency: int
+        :param journal_interval: bytes downloaded of a segment between updates of the journal
+        :type journal_interval: int
+        """
+        if not segments:
+            raise ValueError('No segment to download')
+        self._segments = sorted(segments, key=lambda segment: segment.order)
+        self._path = Path(file)
+        if self._path.is_dir():
+            raise ValueError('The value of \'file\' should be a file path')
+        self._tmp_path = Path(''.join([str(self._path), '.part']))
+        self._journal_path = Path(''.join([str(self._tmp_path), '.journal']))
+        self._concurrency = concurrency
+        self._journal_interval = journal_interval
+
+        self._offsets: List[int] = []
+        offset = 0
+        for segment in self._segments:
+            self._offsets.append(offset)
+            offset += segment.size
+        self._size = offset
+        self._progress: List[int] = [0] * len(self._segments)
+        # bytes of each segment flushed by its own file handle, which are the only ones journaled,
+        # since segments are written by handles of different threads, each buffering on its own
+        self._flushed_progress: List[int] = [0] * len(self._segments)
+        self._lock = Lock()
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    @property
+    def progress(self) -> List[int]:
+        """
+        bytes downloaded of each segment, in order
+        """
+        return list(self._progress)
+
+    def download(self) -> None:
+        """
+        1. create directory if not exists
+        2. continue from the journal if it matches the segments, or preallocate a new temporary file
+        3. download the rest of segments concurrently
+        4. change temporary file to normal, and remove the journal
+        """
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+
+        progress = self._load_journal()
+        if progress is None:
+            with open(str(self._tmp_path.resolve()), 'wb') as f:
+                f.truncate(self._size)
+            progress = [0] * len(self._segments)
+        self._progress = progress
+        self._flushed_progress = list(progress)
+        self._dump_journal()
+
+        with ThreadPoolExecutor(max_workers=self._concurrency) as executor:
+            futures = [
+                executor.submit(self._download_segment, idx)
+                for idx, segment in enumerate(self._segments)
+                if self._progress[idx] < segment.size
+            ]
+            errors = []
+            for future in futures:
+                try:
+                    future.result()
+                except DownloadError as e:
+                    errors.append(e)
+        if errors:
+            raise DownloadError(f'{len(errors)} segments failed, the first one is: {errors[0].message}')
+
+        self._tmp_path.rename(self._path)
+        self._journal_path.unlink()
+
+    def _download_segment(self, idx: int) -> None:
+        segment = self._segments[idx]
+        messages: List[str] = []
+        try:
+            with open(str(self._tmp_path.resolve()), 'r+b') as f:
+                for url in [segment.url, *segment.backup_urls]:
+                    try:
+                        self._write_segment(f, idx, url)
+                    except Exception as e:
+                        # continue from the bytes written by the failed URL
+                        messages.append(str(e))
+                        logger.warning(f'Failed to download segment {segment.order} from {url}: {e}')
+                        continue
+                    return
+        finally:
+            with self._lock:
+                self._dump_journal()
+        raise DownloadError(f'Segment {segment.order} failed with all of URLs: {messages[-1]}')
+
+    def _write_segment(self, f: BinaryIO, idx: int, url: str) -> None:
+        segment = self._segments[idx]
+        start = self._progress[idx]
+        headers = copy.deepcopy(HEADERS)
+        headers.update({'Range': f'bytes={start}-{segment.size - 1}'})
+        response = ProxyService.get(url=url, headers=headers, stream=True)
+        if not (
+            response.status_code == HTTPStatus.PARTIAL_CONTENT
+            or (response.status_code == HTTPStatus.OK and start == 0)
+        ):
+            raise DownloadError(f'Error {response.status_code} when download segment {segment.order}')
+
+        f.seek(self._offsets[idx] + start)
+        unsaved_size = 0
+        try:
+            for chunk in response.iter_content(chunk_size=1024):
+                if self._progress[idx] + len(chunk) > segment.size:
+                    raise DownloadError(f'Segment {segment.order} is larger than {segment.size} bytes')
+                f.write(chunk)
+                self._progress[idx] += len(chunk)
+                unsaved_size += len(chunk)
+                if unsaved_size >= self._journal_interval:
+                    self._flush_segment(f, idx)
+                    unsaved_size = 0
+                    with self._lock:
+                        self._dump_journal()
+        finally:
+            self._flush_segment(f, idx)
+        if self._progress[idx] != segment.size:
+            raise DownloadError(
+                f'Segment {segment.order} ends at {self._progress[idx]} bytes, but its size is {segment.size}'
+            )
+
+    def _flush_segment(self, f: BinaryIO, idx: int) -> None:
+        """
+        flush the handle of the segment, then the bytes written by it could be journaled
+        """
+        f.flush()
+        self._flushed_progress[idx] = self._progress[idx]
+
+    def _load_journal(self) -> Optional[List[int]]:
+        """
+        :return: bytes downloaded of each segment, None if the journal is missing or mismatched
+        """
+        if not self._tmp_path.exists() or self._tmp_path.stat().st_size != self._size:
+            return None
+        try:
+            with open(str(self._journal_path.resolve()), 'r') as fp:
+                journal = json.load(fp)
+            sizes = [segment.size for segment in self._segments]
+            progress = [int(item) for item in journal['progress']]
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f'Load download journal {self._journal_path} failed: {e}')
+            return None
+        if journal.get('sizes') != sizes or len(progress) != len(sizes) or any(
+            not 0 <= item <= size for item, size in zip(progress, sizes)
+        ):
+            return None
+        return progress
+
+    def _dump_journal(self) -> None:
+        tmp_journal_path = f'{self._journal_path}.tmp'
+        with open(tmp_journal_path, 'w') as fp:
+            json.dump({
+                'sizes': [segment.size for segment in self._segments],
+                'progress': self._flushed_progress
+            }, fp)
+        os.replace(tmp_journal_path, str(self._journal_path))
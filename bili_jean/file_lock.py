@@ -0,0 +1,185 @@
+"""
+Advisory lock across processes by a lock file, e.g. workers downloading to shared storage
+"""
+import json
+import logging
+import os
+import socket
+import time
+from typing import NamedTuple, Optional
+
+from .constants import LOCK_POLL_INTERVAL
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None  # type: ignore
+
+
+__all__ = ['FileLock', 'LockHolder']
+
+
+logger = logging.getLogger(__name__)
+
+
+class LockHolder(NamedTuple):
+    """
+    process which holds the lock, recorded in the lock file
+    """
+    pid: int
+    hostname: str
+    acquired_at: float  # unix timestamp
+
+    @property
+    def is_alive(self) -> bool:
+        """
+        only processes of the current host are checked, the others are considered alive
+        """
+        if self.hostname != socket.gethostname() or os.name == 'nt':
+            return True
+        try:
+            os.kill(self.pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            # exists but owned by another user
+            return True
+        return True
+
+
+class FileLock:
+    """
+    Exclusive lock of the lock file
+
+    * flock is taken on the file if available, which is released by the kernel once the holder dies,
+      so a held flock proves the holder is alive, and it is never broken
+    * otherwise the file is created exclusively, and exists as long as the lock is held,
+      the holder recorded in it is broken if it is a dead process of the same host, e.g. killed before
+      it removes the file, or it is older than max_age, since processes of other hosts or Windows are not checked
+    * the file is removed on release, and the lock acquired on a removed file is retried
+    """
+
+    def __init__(self, file: str, poll_interval: float = LOCK_POLL_INTERVAL, max_age: Optional[float] = None):
+        """
+        :param file: path of the lock file
+        :type file: str
+        :param poll_interval: seconds between attempts while waiting for the holder
+        :type poll_interval: float
+        :param max_age: seconds since the holder acquired, beyond which the lock file is broken without flock,
+                        e.g. the longest time to download, no limit if None
+        :type max_age: Optional[float]
+        """
+        self._file = file
+        self._poll_interval = poll_interval
+        self._max_age = max_age
+        self._fd: Optional[int] = None
+
+    @property
+    def file(self) -> str:
+        return self._file
+
+    @property
+    def is_locked(self) -> bool:
+        return self._fd is not None
+
+    @property
+    def holder(self) -> Optional[LockHolder]:
+        """
+        :return: holder recorded in the lock file, None if there is no lock or it is not recorded yet
+        """
+        try:
+            with open(self._file, 'r') as fp:
+                data = json.load(fp)
+            return LockHolder(pid=int(data['pid']), hostname=str(data['hostname']), acquired_at=data['acquired_at'])
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def acquire(self, is_blocking: bool = True, timeout: Optional[float] = None) -> bool:
+        """
+        :param is_blocking: wait for the holder to release, or return at once
+        :type is_blocking: bool
+        :param timeout: maximum of seconds to wait, no limit if None
+        :type timeout: Optional[float]
+        :return: acquired or not
+        """
+        if self._fd is not None:
+            raise ValueError(f'Lock {self._file} is acquired already')
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            if self._try_acquire():
+                return True
+            holder = self.holder if fcntl is None else None
+            if holder is not None and self._is_stale(holder):
+                logger.warning(f'Break stale lock {self._file} of process {holder.pid} of {holder.hostname}')
+                self._remove(holder)
+                continue
+            if not is_blocking or (deadline is not None and time.monotonic() >= deadline):
+                return False
+            time.sleep(self._poll_interval)
+
+    def release(self) -> None:
+        if self._fd is None:
+            return
+        fd, self._fd = self._fd, None
+        try:
+            # removed ahead of unlocking, so the waiters never lock a file which is going to be removed
+            os.unlink(self._file)
+        except FileNotFoundError:
+            pass
+        finally:
+            os.close(fd)
+
+    def __enter__(self) -> 'FileLock':
+        self.acquire()
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.release()
+
+    def _try_acquire(self) -> bool:
+        if fcntl is None:
+            try:
+                fd = os.open(self._file, os.O_RDWR | os.O_CREAT | os.O_EXCL, 0o644)
+            except FileExistsError:
+                return False
+        else:
+            while True:
+                fd = os.open(self._file, os.O_RDWR | os.O_CREAT, 0o644)
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    os.close(fd)
+                    return False
+                # the former holder could remove the file in between opening and locking,
+                # then the lock is on a removed file, and the current one is opened again
+                try:
+                    is_current = os.fstat(fd).st_ino == os.stat(self._file).st_ino
+                except FileNotFoundError:
+                    is_current = False
+                if is_current:
+                    break
+                os.close(fd)
+
+        holder = LockHolder(pid=os.getpid(), hostname=socket.gethostname(), acquired_at=time.time())
+        os.ftruncate(fd, 0)
+        os.write(fd, json.dumps(holder._asdict()).encode('utf-8'))
+        self._fd = fd
+        return True
+
+    def _is_stale(self, holder: LockHolder) -> bool:
+        if not holder.is_alive:
+            return True
+        return self._max_age is not None and time.time() - holder.acquired_at > self._max_age
+
+    def _remove(self, holder: LockHolder) -> None:
+        """
+        remove the lock file if it is still recorded with the holder
+        """
+        if self.holder != holder:
+            return
+        try:
+            os.unlink(self._file)
+        except FileNotFoundError:
+            pass
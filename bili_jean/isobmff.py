@@ -0,0 +1,310 @@
+"""
+Parse boxes of ISO base media file format (ISO-BMFF),
+DASH streams are fragmented MP4 which is made of them
+"""
+import struct
+from typing import Iterator, List, NamedTuple, Optional, Tuple
+
+
+__all__ = [
+    'Box',
+    'find_box',
+    'iter_boxes',
+    'MovieInfo',
+    'parse_box_header',
+    'parse_moov',
+    'parse_sidx',
+    'SegmentIndex',
+    'SegmentReference',
+    'TrackInfo'
+]
+
+
+BOX_HEADER_SIZE = 8
+LARGE_BOX_HEADER_SIZE = 16  # 'size' is 1, and the real size is 64-bit following the type
+
+
+class Box(NamedTuple):
+    """
+    header of a box, offsets are absolute ones in the file
+    """
+    box_type: str
+    offset: int
+    size: int         # size of the whole box, including header
+    header_size: int
+
+    @property
+    def end(self) -> int:
+        return self.offset + self.size
+
+    @property
+    def payload_offset(self) -> int:
+        return self.offset + self.header_size
+
+
+def parse_box_header(data: bytes, offset: int = 0, base_offset: int = 0) -> Optional[Box]:
+    """
+    parse header of the box starts at offset of data
+    :param data: bytes of the file
+    :type data: bytes
+    :param offset: offset of the box in data
+    :type offset: int
+    :param base_offset: absolute offset of data in the file
+    :type base_offset: int
+    :return: Box, None if data is not enough for the header
+    """
+    if len(data) - offset < BOX_HEADER_SIZE:
+        return None
+    size, raw_type = struct.unpack_from('>I4s', data, offset)
+    header_size = BOX_HEADER_SIZE
+    if size == 1:
+        if len(data) - offset < LARGE_BOX_HEADER_SIZE:
+            return None
+        size, = struct.unpack_from('>Q', data, offset + BOX_HEADER_SIZE)
+        header_size = LARGE_BOX_HEADER_SIZE
+    elif size == 0:
+        # the box extends to the end of file
+        size = len(data) - offset
+    if size < header_size:
+        raise ValueError(f'Invalid size {size} of box at {base_offset + offset}')
+    return Box(
+        box_type=raw_type.decode('latin-1'),
+        offset=base_offset + offset,
+        size=size,
+        header_size=header_size
+    )
+
+
+def iter_boxes(data: bytes, offset: int = 0, end: Optional[int] = None, base_offset: int = 0) -> Iterator[Box]:
+    """
+    iterate sibling boxes in data[offset:end], the last one could be incomplete in data
+    """
+    end = len(data) if end is None else end
+    while offset < end:
+        box = parse_box_header(data, offset, base_offset)
+        if box is None:
+            return
+        yield box
+        offset += box.size
+
+
+def find_box(data: bytes, path: str, offset: int = 0, end: Optional[int] = None, base_offset: int = 0) -> Optional[Box]:
+    """
+    find the first box by path of box types, e.g. 'trak/mdia/mdhd'
+    """
+    box_type, _, rest = path.partition('/')
+    for box in iter_boxes(data, offset, end, base_offset):
+        if box.box_type != box_type:
+            continue
+        if box.end - base_offset > len(data):
+            return None
+        if not rest:
+            return box
+        return find_box(data, rest, box.payload_offset - base_offset, box.end - base_offset, base_offset)
+    return None
+
+
+class TrackInfo(NamedTuple):
+    """
+    necessary info of a track in 'moov' box
+    """
+    track_id: int
+    handler_type: str      # 'vide' is video, 'soun' is audio
+    timescale: int         # units per second of the track
+    duration: int          # unit is 1 / timescale second, commonly 0 for fragmented MP4
+    width: float           # 0 for audio
+    height: float          # 0 for audio
+    codec: Optional[str]   # type of sample entry, e.g. 'avc1', 'hev1' or 'mp4a'
+
+
+class MovieInfo(NamedTuple):
+    """
+    necessary info of 'moov' box
+    """
+    timescale: int
+    duration: int          # unit is 1 / timescale second
+    tracks: List[TrackInfo]
+
+
+def parse_moov(data: bytes, box: Box, base_offset: int = 0) -> MovieInfo:
+    """
+    parse 'moov' box, including 'mvhd' and each track's 'tkhd', 'mdhd', 'hdlr' and 'stsd'
+    :param data: bytes of the file, which contain the whole box
+    :type data: bytes
+    :param box: header of the box
+    :type box: Box
+    :param base_offset: absolute offset of data in the file
+    :type base_offset: int
+    :return: MovieInfo
+    """
+    if box.box_type != 'moov':
+        raise ValueError(f'Box {box.box_type} is not moov')
+    if box.end - base_offset > len(data):
+        raise ValueError('Data is not enough for moov')
+    payload_start = box.payload_offset - base_offset
+    payload_end = box.end - base_offset
+
+    mvhd = find_box(data, 'mvhd', payload_start, payload_end, base_offset)
+    if mvhd is None:
+        raise ValueError('No mvhd in moov')
+    timescale, duration = _parse_media_header(data, mvhd.payload_offset - base_offset)
+
+    tracks: List[TrackInfo] = []
+    for trak in iter_boxes(data, payload_start, payload_end, base_offset):
+        if trak.box_type != 'trak':
+            continue
+        tracks.append(_parse_trak(data, trak, base_offset))
+    return MovieInfo(timescale=timescale, duration=duration, tracks=tracks)
+
+
+def _parse_media_header(data: bytes, pos: int) -> Tuple[int, int]:
+    """
+    parse timescale and duration of 'mvhd' or 'mdhd', which share the same layout ahead
+    """
+    version = data[pos]
+    if version == 0:
+        timescale, duration = struct.unpack_from('>II', data, pos + 12)
+    else:
+        timescale, duration = struct.unpack_from('>IQ', data, pos + 20)
+    return timescale, duration
+
+
+def _parse_trak(data: bytes, trak: Box, base_offset: int) -> TrackInfo:
+    start = trak.payload_offset - base_offset
+    end = trak.end - base_offset
+
+    tkhd = find_box(data, 'tkhd', start, end, base_offset)
+    if tkhd is None:
+        raise ValueError('No tkhd in trak')
+    pos = tkhd.payload_offset - base_offset
+    version = data[pos]
+    if version == 0:
+        track_id, = struct.unpack_from('>I', data, pos + 12)
+        pos += 84
+    else:
+        track_id, = struct.unpack_from('>I', data, pos + 20)
+        pos += 96
+    width, height = struct.unpack_from('>II', data, pos - 8)
+
+    mdhd = find_box(data, 'mdia/mdhd', start, end, base_offset)
+    if mdhd is None:
+        raise ValueError('No mdhd in trak')
+    timescale, duration = _parse_media_header(data, mdhd.payload_offset - base_offset)
+
+    hdlr = find_box(data, 'mdia/hdlr', start, end, base_offset)
+    handler_type = ''
+    if hdlr is not None:
+        # version, flags and pre-defined are ahead of handler type
+        handler_pos = hdlr.payload_offset - base_offset + 8
+        handler_type = data[handler_pos:handler_pos + 4].decode('latin-1')
+
+    stsd = find_box(data, 'mdia/minf/stbl/stsd', start, end, base_offset)
+    codec = None
+    if stsd is not None:
+        # version, flags and entry count are ahead of sample entries
+        sample_entry = parse_box_header(data, stsd.payload_offset - base_offset + 8, base_offset)
+        if sample_entry is not None:
+            codec = sample_entry.box_type
+
+    return TrackInfo(
+        track_id=track_id,
+        handler_type=handler_type,
+        timescale=timescale,
+        duration=duration,
+        width=width / 65536,   # fixed-point 16.16
+        height=height / 65536,
+        codec=codec
+    )
+
+
+class SegmentReference(NamedTuple):
+    """
+    reference of segment index to a fragment, offset is the absolute one in the file
+    """
+    offset: int
+    size: int
+    start_time: float  # second
+    duration: float    # second
+    is_index: bool     # refer to another segment index rather than media
+
+
+class SegmentIndex(NamedTuple):
+    """
+    content of 'sidx' box, which locates each fragment by byte range and time
+    """
+    reference_id: int
+    timescale: int
+    earliest_presentation_time: int
+    references: List[SegmentReference]
+
+    @property
+    def duration(self) -> float:
+        return sum(reference.duration for reference in self.references)
+
+    def get_references(self, start: float, end: float) -> List[SegmentReference]:
+        """
+        get references of fragments which cover the time range
+        :param start: start time which unit is second
+        :type start: float
+        :param end: end time which unit is second
+        :type end: float
+        :return: contiguous references, in order
+        """
+        return [
+            reference for reference in self.references
+            if reference.start_time < end and reference.start_time + reference.duration > start
+        ]
+
+
+def parse_sidx(data: bytes, box: Box, base_offset: int = 0) -> SegmentIndex:
+    """
+    parse 'sidx' box
+    :param data: bytes of the file, which contain the whole box
+    :type data: bytes
+    :param box: header of the box
+    :type box: Box
+    :param base_offset: absolute offset of data in the file
+    :type base_offset: int
+    :return: SegmentIndex
+    """
+    if box.box_type != 'sidx':
+        raise ValueError(f'Box {box.box_type} is not sidx')
+    if box.end - base_offset > len(data):
+        raise ValueError('Data is not enough for sidx')
+    pos = box.payload_offset - base_offset
+    version = data[pos]
+    pos += 4  # version and flags
+    reference_id, timescale = struct.unpack_from('>II', data, pos)
+    pos += 8
+    if version == 0:
+        earliest_presentation_time, first_offset = struct.unpack_from('>II', data, pos)
+        pos += 8
+    else:
+        earliest_presentation_time, first_offset = struct.unpack_from('>QQ', data, pos)
+        pos += 16
+    _, reference_count = struct.unpack_from('>HH', data, pos)
+    pos += 4
+
+    # offsets of references are relative to the first byte following the box
+    offset = box.end + first_offset
+    time = earliest_presentation_time
+    references: List[SegmentReference] = []
+    for _ in range(reference_count):
+        reference_word, subsegment_duration, _ = struct.unpack_from('>III', data, pos)
+        pos += 12
+        size = reference_word & 0x7fffffff
+        references.append(SegmentReference(
+            offset=offset,
+            size=size,
+            start_time=time / timescale,
+            duration=subsegment_duration / timescale,
+            is_index=bool(reference_word >> 31)
+        ))
+        offset += size
+        time += subsegment_duration
+    return SegmentIndex(
+        reference_id=reference_id,
+        timescale=timescale,
+        earliest_presentation_time=earliest_presentation_time,
+        references=references
+    )
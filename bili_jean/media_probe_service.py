@@ -0,0 +1,125 @@
+"""
+Service component to probe remote DASH stream by its leading bytes
+"""
+from concurrent.futures import as_completed, ThreadPoolExecutor
+import copy
+from http import HTTPStatus
+import logging
+from typing import Dict, Iterable, NamedTuple, Optional
+
+from .constants import CONCURRENCY, HEADERS
+from .isobmff import find_box, parse_moov, parse_sidx
+from .page_download_service import DownloadError, read_leading_boxes
+from .proxy_service import ProxyService
+
+
+__all__ = ['MediaProbe', 'MediaProbes', 'MediaProbeService']
+
+
+logger = logging.getLogger(__name__)
+
+
+class MediaProbe(NamedTuple):
+    """
+    exact info of the stream, parsed from 'moov' and 'sidx' boxes
+    """
+    duration: float         # second
+    timescale: int          # units per second of the track
+    width: int              # 0 for audio
+    height: int             # 0 for audio
+    codec: Optional[str]    # type of sample entry, e.g. 'avc1', 'hev1' or 'mp4a'
+    fragment_count: int
+    size: int               # bytes of the whole resource
+    bitrate: float          # average bits per second of media fragments
+    probed_size: int        # bytes requested to probe
+
+
+class MediaProbes(NamedTuple):
+    """
+    probes and errors keyed by URL
+    """
+    probes: Dict[str, MediaProbe]
+    errors: Dict[str, Exception]
+
+
+class MediaProbeService:
+    """
+    Probe DASH stream by range requests of the initialization segment and segment index,
+    which are a few KB, rather than downloading the whole resource
+    """
+
+    @classmethod
+    def probe(cls, url: str, index_range: Optional[str] = None) -> MediaProbe:
+        """
+        :param url: URL of the DASH stream, e.g. url of VideoStreamingSourceMeta
+        :type url: str
+        :param index_range: byte range of the segment index, e.g. '1000-1451',
+                            which is index_range of the source meta, probed from leading bytes if None
+        :type index_range: Optional[str]
+        :return: MediaProbe
+        """
+        data, sidx_box = read_leading_boxes(lambda start, end: cls._get_range(url, start, end), index_range)
+        moov_box = find_box(data, 'moov', 0, sidx_box.offset)
+        if moov_box is None:
+            raise DownloadError('No moov ahead of segment index')
+        movie = parse_moov(data, moov_box)
+        if not movie.tracks:
+            raise DownloadError('No track in moov')
+        track = movie.tracks[0]
+        segment_index = parse_sidx(data, sidx_box)
+
+        references = segment_index.references
+        if references:
+            duration = segment_index.duration
+            media_size = sum(reference.size for reference in references)
+            size = references[-1].offset + references[-1].size
+        else:
+            duration = movie.duration / movie.timescale if movie.timescale else 0
+            media_size = 0
+            size = sidx_box.end
+        return MediaProbe(
+            duration=duration,
+            timescale=track.timescale,
+            width=int(track.width),
+            height=int(track.height),
+            codec=track.codec,
+            fragment_count=len(references),
+            size=size,
+            bitrate=media_size * 8 / duration if duration else 0,
+            probed_size=len(data)
+        )
+
+    @classmethod
+    def probe_many(cls, urls: Iterable[str], concurrency: int = CONCURRENCY) -> MediaProbes:
+        """
+        probe streams concurrently, e.g. to audit streams in bulk
+        :param urls: URLs of the DASH streams, duplicated one is probed once
+        :type urls: Iterable[str]
+        :param concurrency: maximum of concurrent probes
+        :type concurrency: int
+        :return: MediaProbes, error of a stream doesn't interrupt the others
+        """
+        result = MediaProbes(probes={}, errors={})
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = {executor.submit(cls.probe, url): url for url in dict.fromkeys(urls)}
+            for future in as_completed(futures):
+                url = futures[future]
+                try:
+                    result.probes[url] = future.result()
+                except Exception as e:
+                    logger.warning(f'Failed to probe stream {url}: {e}')
+                    result.errors[url] = e
+        return result
+
+    @classmethod
+    def _get_range(cls, url: str, start: int, end: int) -> bytes:
+        headers = copy.deepcopy(HEADERS)
+        headers.update({'Range': f'bytes={start}-{end}'})
+        response = ProxyService.get(url=url, headers=headers)
+        if response.status_code != HTTPStatus.PARTIAL_CONTENT:
+            raise DownloadError(
+                f'Error {response.status_code} when request byte range {start}-{end}: '
+                f"{response.content.decode('utf-8')}"
+            )
+        content: bytes = response.content
+        return content
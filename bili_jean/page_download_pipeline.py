@@ -0,0 +1,203 @@
+"""
+Pipeline to resolve, download and remux pages of Bilibili streaming resources in batch
+"""
+import os
+import sys
+from typing import Any, Callable, Iterable, List, NamedTuple, Optional
+
+from pydantic import BaseModel
+
+from .constants import DownloadStatus, RATE_LIMIT
+from .credential_pool import SessData
+from .dash_remuxer import remux_files
+from .disk_writer import DiskWriter
+from .page_download_service import DownloadError, PageDownloadService
+from .pipeline import Pipeline, Stage
+from .rate_limiter import RateLimiter
+from .schemes import (
+    AudioStreamingSourceMeta,
+    DurabilityPolicy,
+    Page,
+    StreamingSourcePolicy,
+    VideoStreamingSourceMeta
+)
+from .streaming.streaming_service import StreamingService
+
+
+__all__ = ['build_page_download_pipeline', 'get_memory_cost', 'PageDownloadTask']
+
+
+class PageDownloadTask(NamedTuple):
+    page: Page
+    video_src: VideoStreamingSourceMeta
+    audio_src: AudioStreamingSourceMeta
+    video_file: str
+    audio_file: str
+    file: str                    # merged file, which exists only if remuxed
+
+    @property
+    def estimated_size(self) -> int:
+        """
+        bytes of both streams estimated by bandwidth × duration, 0 if unknown
+        """
+        result = 0
+        for src in (self.video_src, self.audio_src):
+            if src.bandwidth is not None and src.duration is not None:
+                result += src.bandwidth * src.duration // 8
+        return result
+
+
+def get_memory_cost(item: Any) -> int:
+    """
+    rough bytes of the item queued in the pipeline, by the size of its serialized form
+    """
+    if isinstance(item, PageDownloadTask):
+        return sum(get_memory_cost(value) for value in item)
+    if isinstance(item, BaseModel):
+        return len(item.model_dump_json())
+    return sys.getsizeof(item)
+
+
+def build_page_download_pipeline(
+    directory: str,
+    policy: Optional[StreamingSourcePolicy] = None,
+    sess_data: Optional[SessData] = None,
+    is_selected_only: bool = False,
+    is_remuxed: bool = True,
+    resolve_workers: int = 2,
+    download_workers: int = 2,
+    remux_workers: int = 1,
+    queue_size: int = 2,
+    max_in_flight_bytes: Optional[int] = None,
+    max_memory_bytes: Optional[int] = None,
+    memory_cost: Callable[[Any], int] = get_memory_cost,
+    rate_limit: Optional[float] = RATE_LIMIT,
+    writer: Optional[DiskWriter] = None,
+    durability: Optional[DurabilityPolicy] = None
+) -> Pipeline:
+    """
+    build the pipeline of stages 'views' -> 'resolve' -> 'download' -> 'remux',
+    whose inputs are web URLs and outputs are PageDownloadTask,
+    the bounded queue between 'resolve' and 'download' keeps signed URLs from being resolved far ahead,
+    and a page which is downloading by another process is failed rather than remuxed
+
+    files of page are named by its cid in the directory,
+    e.g. '{cid}.video.m4s', '{cid}.audio.m4s', and '{cid}.mp4' which is remuxed from them
+    :param directory: directory of the downloaded files
+    :type directory: str
+    :param policy: preference on selecting sources, default one if None
+    :type policy: Optional[StreamingSourcePolicy]
+    :param sess_data: cookie of Bilibili user, SESSDATA
+    :type sess_data: str or CredentialPool
+    :param is_selected_only: only download the requested pages, rather than pages of their collections
+    :type is_selected_only: bool
+    :param is_remuxed: remux streams into one file and remove them, or keep them separated
+    :type is_remuxed: bool
+    :param resolve_workers: workers of stage 'resolve', which request play data
+    :type resolve_workers: int
+    :param download_workers: workers of stage 'download'
+    :type download_workers: int
+    :param remux_workers: workers of stage 'remux'
+    :type remux_workers: int
+    :param queue_size: capacity of the queue ahead of each stage
+    :type queue_size: int
+    :param max_in_flight_bytes: maximum of estimated bytes of pages being downloaded and remuxed
+    :type max_in_flight_bytes: Optional[int]
+    :param max_memory_bytes: maximum of bytes of pages and tasks waiting in the queues, no limit if None
+    :type max_memory_bytes: Optional[int]
+    :param memory_cost: bytes of a page or task waiting in the queue, only measured if max_memory_bytes is given
+    :type memory_cost: Callable[[Any], int]
+    :param rate_limit: maximum of play requests per second, no limit if None
+    :type rate_limit: Optional[float]
+    :param writer: background writer shared by the downloads, chunks are written inline if None
+    :type writer: Optional[DiskWriter]
+    :param durability: policy to fsync the downloading files, refer to PageDownloadService
+    :type durability: Optional[DurabilityPolicy]
+    :return: Pipeline
+    """
+    if policy is None:
+        policy = StreamingSourcePolicy()
+    rate_limiter = RateLimiter(rate_limit)
+
+    def get_views(url: str) -> Iterable[Page]:
+        return StreamingService.iter_views(url, sess_data=sess_data, is_selected_only=is_selected_only)
+
+    def resolve(page: Page) -> PageDownloadTask:
+        rate_limiter.acquire()
+        video_src, audio_src = StreamingService.get_page_streaming_src(
+            category=page.page_category,
+            cid=page.page_cid,
+            ep_id=page.view_ep_id,
+            bvid=page.view_bvid,
+            aid=page.view_aid,
+            sess_data=sess_data,
+            page_duration=page.page_duration,
+            **policy.model_dump()
+        )
+        return PageDownloadTask(
+            page=page,
+            video_src=video_src,
+            audio_src=audio_src,
+            video_file=os.path.join(directory, f'{page.page_cid}.video.m4s'),
+            audio_file=os.path.join(directory, f'{page.page_cid}.audio.m4s'),
+            file=os.path.join(directory, f'{page.page_cid}.mp4')
+        )
+
+    def download(task: PageDownloadTask) -> PageDownloadTask:
+        page = task.page
+        for src, file, is_audio in (
+            (task.video_src, task.video_file, False),
+            (task.audio_src, task.audio_file, True)
+        ):
+            resolver = StreamingService.get_stream_url_resolver(
+                category=page.page_category,
+                qn=src.qn,
+                cid=page.page_cid,
+                ep_id=page.view_ep_id,
+                bvid=page.view_bvid,
+                aid=page.view_aid,
+                codec_id=None if isinstance(src, AudioStreamingSourceMeta) else src.codec_id,
+                is_audio=is_audio,
+                sess_data=sess_data
+            )
+            status = PageDownloadService(
+                src.url, file, resolver=resolver, writer=writer, durability=durability
+            ).download()
+            if status == DownloadStatus.SKIPPED:
+                raise DownloadError(f'{file} is being downloaded by another process')
+        return task
+
+    def remux(task: PageDownloadTask) -> PageDownloadTask:
+        remux_files(task.video_file, task.audio_file, task.file)
+        os.remove(task.video_file)
+        os.remove(task.audio_file)
+        return task
+
+    stage_memory_cost = None if max_memory_bytes is None else memory_cost
+    stages: List[Stage] = [
+        Stage(
+            name='views',
+            func=get_views,
+            is_expanded=True,
+            queue_size=queue_size,
+            memory_cost=stage_memory_cost
+        ),
+        Stage(
+            name='resolve',
+            func=resolve,
+            workers=resolve_workers,
+            queue_size=queue_size,
+            memory_cost=stage_memory_cost
+        ),
+        Stage(
+            name='download',
+            func=download,
+            workers=download_workers,
+            queue_size=queue_size,
+            in_flight_cost=lambda task: task.estimated_size,
+            memory_cost=stage_memory_cost
+        )
+    ]
+    if is_remuxed:
+        stages.append(Stage(name='remux', func=remux, workers=remux_workers, queue_size=queue_size))
+    return Pipeline(stages, max_in_flight_bytes=max_in_flight_bytes, max_memory_bytes=max_memory_bytes)
@@ -1,13 +1,28 @@
 """
 Service component for download remote resource to local
 """
+from contextlib import closing
 import copy
+import errno
 from http import HTTPStatus
+import logging
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Iterator, Optional, Tuple
 
-from .constants import HEADERS
+from requests import Response
+
+from .constants import DownloadStatus, HEADERS, LOCK_TIMEOUT, PROBE_SIZE
+from .disk_writer import DiskWriter, Writable
+from .durable_file import DurableFile, load_journal, preallocate
+from .file_lock import FileLock
+from .isobmff import Box, parse_box_header, parse_sidx, SegmentIndex
 from .proxy_service import ProxyService
+from .schemes import DurabilityPolicy
+from .sinks import AbstractSink
+from .streaming.play_url_cache import play_url_cache
+
+
+logger = logging.getLogger(__name__)
 
 
 class DownloadError(Exception):
@@ -17,54 +32,432 @@ class DownloadError(Exception):
         super().__init__(self.message)
 
 
+def parse_byte_range(byte_range: str) -> Tuple[int, int]:
+    """
+    parse byte range like '1000-1451', both ends are inclusive
+    """
+    start, _, end = byte_range.partition('-')
+    try:
+        return int(start), int(end)
+    except ValueError:
+        raise ValueError(f'Invalid byte range {byte_range}')
+
+
+def read_leading_boxes(
+    read_range: Callable[[int, int], bytes],
+    index_range: Optional[str] = None
+) -> Tuple[bytes, Box]:
+    """
+    read the leading bytes of DASH stream until the end of segment index,
+    which are initialization segment ('ftyp' and 'moov') and the index ('sidx')
+    :param read_range: function to request bytes in the range, both ends are inclusive
+    :type read_range: Callable[[int, int], bytes]
+    :param index_range: byte range of the segment index, e.g. '1000-1451', probed from leading bytes if None,
+                        more bytes are requested only if the boxes ahead of the index are larger than the probe
+    :type index_range: Optional[str]
+    :return: leading bytes, and header of the segment index
+    """
+    if index_range is not None:
+        index_start, index_end = parse_byte_range(index_range)
+        # initialization segment is ahead of the index, both are small
+        data = read_range(0, index_end)
+        box = parse_box_header(data, index_start)
+        if box is None or box.box_type != 'sidx':
+            raise DownloadError(f'No segment index in byte range {index_range}')
+    else:
+        data = read_range(0, PROBE_SIZE - 1)
+        offset = 0
+        while True:
+            header = parse_box_header(data, offset)
+            if header is None:
+                more_data = read_range(len(data), len(data) + PROBE_SIZE - 1)
+                if not more_data:
+                    raise DownloadError('No segment index in the resource')
+                data += more_data
+                continue
+            if header.box_type == 'sidx':
+                box = header
+                break
+            if header.box_type in ('moof', 'mdat'):
+                raise DownloadError('No segment index ahead of media fragments')
+            if header.end > len(data):
+                data += read_range(len(data), header.end - 1)
+            offset = header.end
+    if box.end > len(data):
+        data += read_range(len(data), box.end - 1)
+    return data, box
+
+
 class PageDownloadService:
 
-    def __init__(self, url: str, file: str):
+    def __init__(
+        self,
+        url: str,
+        file: str,
+        resolver: Optional[Callable[[], str]] = None,
+        max_resolve_times: int = 3,
+        writer: Optional[DiskWriter] = None,
+        durability: Optional[DurabilityPolicy] = None,
+        is_locked: bool = True,
+        lock_max_age: Optional[float] = None
+    ):
+        """
+        :param url: URL of the remote resource
+        :type url: str
+        :param file: path of the local file
+        :type file: str
+        :param resolver: fetch a fresh URL of the same resource when the signed one expires,
+                         e.g. StreamingService.get_stream_url_resolver
+        :type resolver: Optional[Callable[[], str]]
+        :param max_resolve_times: maximum times of resolving URL again for one download
+        :type max_resolve_times: int
+        :param writer: write chunks to the local file by its background thread rather than inline,
+                       so reading from network goes on while the disk stalls,
+                       which could be dedicated to this download or shared by several ones
+        :type writer: Optional[DiskWriter]
+        :param durability: fsync the temporary file in batch, and continue from the offset which reached disk,
+                           rather than the size of the file, the file is neither fsynced nor journaled if None
+        :type durability: Optional[DurabilityPolicy]
+        :param is_locked: lock the temporary file across processes while downloading,
+                          so workers on the same target never write it together
+        :type is_locked: bool
+        :param lock_max_age: seconds beyond which the lock of another process is broken as stale,
+                             where flock is unavailable and the holder can't be checked, e.g. Windows,
+                             no limit if None, refer to FileLock
+        :type lock_max_age: Optional[float]
+        """
         self._url = url
         self._path = Path(file)
         if self._path.is_dir():
             raise ValueError('The value of \'file\' should be a file path')
         self._tmp_ext_suffix = '.part'
         self._tmp_path = Path(''.join([str(self._path), self._tmp_ext_suffix]))
+        self._journal_path = Path(''.join([str(self._tmp_path), '.journal']))
+        self._lock_path = Path(''.join([str(self._tmp_path), '.lock']))
         self._remote_file_size: Optional[int] = None
+        self._remote_etag: Optional[str] = None
+        self._resolver = resolver
+        self._max_resolve_times = max_resolve_times
+        self._resolve_times = 0
+        self._writer = writer
+        self._durability = durability
+        self._is_locked = is_locked
+        self._lock_max_age = lock_max_age
+
+    @property
+    def url(self) -> str:
+        return self._url
 
     @property
     def remote_file_size(self) -> int:
         if self._remote_file_size is None:
             response = ProxyService.head(url=self._url)
+            if response.status_code == HTTPStatus.FORBIDDEN and self._resolve():
+                response = ProxyService.head(url=self._url)
             if response.status_code not in (HTTPStatus.OK, HTTPStatus.PARTIAL_CONTENT):
+                self._invalidate_expired_url(response.status_code)
                 raise DownloadError(
                     f'Error {response.status_code} when get content length: '
                     f"{response.content.decode('utf-8')}"
                 )
             self._remote_file_size = int(response.headers.get('Content-Length', 0))
+            self._remote_etag = response.headers.get('ETag')
         return self._remote_file_size
 
-    def download(self) -> None:
+    def download(self, is_waited: bool = True, timeout: Optional[float] = LOCK_TIMEOUT) -> DownloadStatus:
         """
-        1. create directory if not exists
-        2. compared local temporary file's size with remote one,
-           and continue to download the rest of it
-        3. change temporary file to normal
+        download the resource while holding the lock of the temporary file, if is_locked
+
+        another process holding the lock is waited, and its file is reused once it is finished,
+        or the download is skipped if not is_waited, or the holder is not done in timeout,
+        the lock of a dead or expired holder is released, and its temporary file is continued
+        :param is_waited: wait for another process which is downloading the same file
+        :type is_waited: bool
+        :param timeout: maximum of seconds to wait, no limit if None,
+                        which is finite by default, so a holder crashed without being detected doesn't block forever
+        :type timeout: Optional[float]
+        :return: DownloadStatus
+        """
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        if not self._is_locked:
+            self._download()
+            return DownloadStatus.DOWNLOADED
+
+        lock = FileLock(str(self._lock_path), max_age=self._lock_max_age)
+        if not lock.acquire(is_blocking=is_waited, timeout=timeout):
+            holder = lock.holder
+            logger.info(
+                f'Skip downloading {self._path}, which is locked by '
+                f"{f'process {holder.pid} of {holder.hostname}' if holder is not None else 'another process'}"
+            )
+            return DownloadStatus.SKIPPED
+        try:
+            if self._is_downloaded():
+                return DownloadStatus.REUSED
+            self._download()
+            return DownloadStatus.DOWNLOADED
+        finally:
+            lock.release()
+
+    def iter_content(self, chunk_size: int = 1024) -> Iterator[bytes]:
         """
+        stream the whole remote resource in chunks rather than writing it to the local file,
+        e.g. to remux video and audio as the bytes arrive, refer to dash_remuxer.remux_downloads
+        :param chunk_size: size of each chunk
+        :type chunk_size: int
+        :return: chunks in order
+        """
+        response = ProxyService.get(url=self._url, headers=HEADERS, stream=True)
+        while response.status_code == HTTPStatus.FORBIDDEN and self._resolve():
+            response = ProxyService.get(url=self._url, headers=HEADERS, stream=True)
+        if response.status_code != HTTPStatus.OK:
+            self._invalidate_expired_url(response.status_code)
+            raise DownloadError(
+                f"Error {response.status_code} when download resource: "
+                f"{response.content.decode('utf-8')}"
+            )
+        yield from response.iter_content(chunk_size=chunk_size)
+
+    def download_to(self, sink: AbstractSink, chunk_size: int = 1024) -> int:
+        """
+        stream the whole remote resource into the sink, e.g. BufferSink or MultipartUploadSink,
+        without any local temporary file, chunks are passed to the sink as they are read from socket
+        :param sink: destination of the bytes, which is closed once completed, or aborted once failed
+        :type sink: AbstractSink
+        :param chunk_size: size of each chunk
+        :type chunk_size: int
+        :return: bytes written to the sink
+        """
+        size = 0
+        try:
+            for chunk in self.iter_content(chunk_size=chunk_size):
+                sink.write(chunk)
+                size += len(chunk)
+            # failed close is aborted as well, e.g. multipart upload is not completed
+            sink.close()
+        except BaseException:
+            sink.abort()
+            raise
+        return size
+
+    def download_clip(self, start: float, end: float, index_range: Optional[str] = None) -> None:
+        """
+        download the fragments which cover the time range only, following the initialization segment,
+        they are located by the segment index (sidx) of the DASH stream, which costs a few small range requests
+        :param start: start time which unit is second
+        :type start: float
+        :param end: end time which unit is second
+        :type end: float
+        :param index_range: byte range of the segment index, e.g. '1000-1451',
+                            which is index_range of the source meta, probed from leading bytes if None
+        :type index_range: Optional[str]
+        """
+        if start < 0 or start >= end:
+            raise ValueError(f'Invalid time range from {start} to {end}')
         self._path.parent.mkdir(parents=True, exist_ok=True)
 
-        file_size = 0
-        if self._tmp_path.exists():
-            file_size = self._tmp_path.stat().st_size
+        init_data, segment_index = self.get_segment_index(index_range=index_range)
+        references = segment_index.get_references(start, end)
+        if not references:
+            raise DownloadError(f'No fragment covers time range from {start} to {end}')
+        if any(reference.is_index for reference in references):
+            raise DownloadError('Hierarchical segment index is not supported')
+
+        with closing(self._open_tmp('wb')) as f:
+            f.write(init_data)
+            first_reference, last_reference = references[0], references[-1]
+            self._write_range(f, first_reference.offset, last_reference.offset + last_reference.size - 1)
+
+        self._tmp_path.rename(self._path)
+
+    def get_segment_index(self, index_range: Optional[str] = None) -> Tuple[bytes, SegmentIndex]:
+        """
+        get the initialization segment and the segment index by range requests
+        :param index_range: byte range of the segment index, e.g. '1000-1451', probed from leading bytes if None
+        :type index_range: Optional[str]
+        :return: bytes of initialization segment, and SegmentIndex
+        """
+        data, box = read_leading_boxes(self._get_range, index_range=index_range)
+        return data[:box.offset], parse_sidx(data, box)
+
+    def _get_range(self, start: int, end: int) -> bytes:
+        content: bytes = self._request_range(start, end).content
+        return content
+
+    def _request_range(self, start: int, end: int, stream: bool = False) -> Response:
+        headers = copy.deepcopy(HEADERS)
+        headers.update({'Range': f'bytes={start}-{end}'})
+        response = ProxyService.get(url=self._url, headers=headers, stream=stream)
+        while response.status_code == HTTPStatus.FORBIDDEN and self._resolve():
+            response = ProxyService.get(url=self._url, headers=headers, stream=stream)
+        if response.status_code != HTTPStatus.PARTIAL_CONTENT:
+            self._invalidate_expired_url(response.status_code)
+            raise DownloadError(
+                f'Error {response.status_code} when request byte range {start}-{end}: '
+                f"{response.content.decode('utf-8')}"
+            )
+        return response
+
+    def _is_downloaded(self) -> bool:
+        return self._path.is_file() and self._path.stat().st_size == self.remote_file_size
+
+    def _download(self) -> None:
+        """
+        1. compared local temporary file's size with remote one,
+           and continue to download the rest of it
+        2. change temporary file to normal
+
+        once the signed URL expires and CDN responds 403,
+        resolve a fresh one by resolver and continue from the current offset
+
+        with durability policy, the offset to continue from is the one recorded in the journal,
+        which only contains bytes fsynced, and the temporary file is fsynced before it is renamed
+
+        with durability policy, DownloadError is raised if the response ends before the remote size,
+        and the temporary file is kept along with the journal
+        """
+        file_size = self._get_offset()
+        if self._durability is not None and file_size == 0:
+            self._create_tmp()
 
         if file_size < self.remote_file_size:
             headers = copy.deepcopy(HEADERS)
             headers.update({"Range": f"bytes={file_size}-"})
 
             response = ProxyService.get(url=self._url, headers=headers, stream=True)
+            while response.status_code == HTTPStatus.FORBIDDEN and self._resolve():
+                response = ProxyService.get(url=self._url, headers=headers, stream=True)
             if response.status_code not in (HTTPStatus.OK, HTTPStatus.PARTIAL_CONTENT):
+                self._invalidate_expired_url(response.status_code)
                 raise DownloadError(
                     f"Error {response.status_code} when download resource: "
                     f"{response.content.decode('utf-8')}"
                 )
-            with open(str(self._tmp_path.resolve()), 'ab') as f:
+            offset = file_size
+            with closing(self._open_tmp('ab' if self._durability is None else 'r+b', file_size)) as f:
                 for chunk in response.iter_content(chunk_size=1024):
                     f.write(chunk)
+                    offset += len(chunk)
+            # the preallocated file is as large as the remote one even if the response ends early,
+            # so it is renamed only once the written bytes reach the end, the journal is kept to continue
+            if self._durability is not None and offset != self.remote_file_size:
+                raise DownloadError(
+                    f'Download of {self._path} ends at {offset} bytes, but its size is {self.remote_file_size}'
+                )
 
         self._tmp_path.rename(self._path)
+        if self._durability is not None:
+            self._journal_path.unlink(missing_ok=True)
+
+    def _get_offset(self) -> int:
+        """
+        :return: bytes of the temporary file to continue from
+        """
+        if not self._tmp_path.exists():
+            return 0
+        file_size = self._tmp_path.stat().st_size
+        if self._durability is None:
+            return file_size
+
+        journal = load_journal(str(self._journal_path))
+        if journal is None:
+            return 0
+        progress = journal.get('progress')
+        if (
+            journal.get('size') != self.remote_file_size
+            or journal.get('etag') != self._remote_etag
+            or not isinstance(progress, int)
+            or not 0 <= progress <= min(file_size, self.remote_file_size)
+        ):
+            return 0
+        return progress
+
+    def _create_tmp(self) -> None:
+        """
+        create the temporary file from scratch, which is allocated up to remote size if preallocated
+        """
+        self._journal_path.unlink(missing_ok=True)
+        with open(str(self._tmp_path.resolve()), 'wb') as fp:
+            if self._durability is None or not self._durability.is_preallocated or not self.remote_file_size:
+                return
+            try:
+                preallocate(fp, self.remote_file_size)
+            except OSError as e:
+                if e.errno == errno.ENOSPC:
+                    raise DownloadError(f'No space left for {self.remote_file_size} bytes of {self._tmp_path}')
+                raise
+
+    def _open_tmp(self, mode: str, offset: int = 0) -> Writable:
+        """
+        open the temporary file, whose writes are done by the writer if any,
+        and fsynced by durability policy if any
+        :param mode: binary mode to open the file, 'r+b' continues from offset
+        :type mode: str
+        :param offset: bytes of the file to continue from
+        :type offset: int
+        :return: writable file
+        """
+        fp = open(str(self._tmp_path.resolve()), mode)
+        result: Writable = fp
+        if self._durability is not None:
+            journal_path = None
+            if mode == 'r+b':
+                # bytes beyond the offset might never reach disk
+                if not self._durability.is_preallocated:
+                    fp.truncate(offset)
+                fp.seek(offset)
+                journal_path = str(self._journal_path)
+            result = DurableFile(
+                fp,
+                self._durability,
+                offset=offset,
+                journal_path=journal_path,
+                journal={'size': self._remote_file_size, 'etag': self._remote_etag}
+            )
+        if self._writer is not None:
+            result = self._writer.attach(result)
+        return result
+
+    def _write_range(self, f: Writable, start: int, end: int) -> None:
+        response = self._request_range(start, end, stream=True)
+        for chunk in response.iter_content(chunk_size=1024):
+            f.write(chunk)
+
+    def _invalidate_expired_url(self, status_code: int) -> None:
+        """
+        signed URL is rejected by CDN once it expires,
+        drop the cached play data which contains it, then the next resolution requests a fresh one
+        """
+        if status_code == HTTPStatus.FORBIDDEN:
+            play_url_cache.invalidate_url(self._url)
+
+    def _resolve(self) -> bool:
+        """
+        resolve a fresh URL of the same resource by resolver,
+        which is accepted only if both size and ETag of the resource are unchanged
+        :return: resolved or not
+        """
+        if self._resolver is None or self._resolve_times >= self._max_resolve_times:
+            return False
+        self._resolve_times += 1
+        play_url_cache.invalidate_url(self._url)
+        url = self._resolver()
+
+        if self._remote_file_size is not None:
+            response = ProxyService.head(url=url)
+            if response.status_code not in (HTTPStatus.OK, HTTPStatus.PARTIAL_CONTENT):
+                raise DownloadError(
+                    f'Error {response.status_code} when get content length of resolved URL: '
+                    f"{response.content.decode('utf-8')}"
+                )
+            remote_file_size = int(response.headers.get('Content-Length', 0))
+            remote_etag = response.headers.get('ETag')
+            if remote_file_size != self._remote_file_size or (
+                self._remote_etag is not None and remote_etag is not None and remote_etag != self._remote_etag
+            ):
+                raise DownloadError(
+                    f'Resource of resolved URL changed, size {self._remote_file_size} to {remote_file_size}, '
+                    f'ETag {self._remote_etag} to {remote_etag}'
+                )
+        self._url = url
+        return True
@@ -0,0 +1,309 @@
+"""
+Staged pipeline with bounded queues in between, e.g. resolve -> download -> remux of pages
+"""
+import logging
+from queue import Queue
+from threading import Condition, Lock, Thread
+import time
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence
+
+
+__all__ = [
+    'ByteBudget',
+    'Pipeline',
+    'PipelineError',
+    'PipelineResult',
+    'Stage',
+    'StageMetrics'
+]
+
+
+logger = logging.getLogger(__name__)
+
+
+class ByteBudget:
+    """
+    Block acquisitions until the bytes held by others fit the limit,
+    one acquisition larger than the limit is still allowed when nothing else is held,
+    otherwise it would never proceed
+    """
+
+    def __init__(self, limit: Optional[int] = None):
+        """
+        :param limit: maximum of bytes held, no limit if None
+        :type limit: Optional[int]
+        """
+        if limit is not None and limit <= 0:
+            raise ValueError('The value of \'limit\' should be positive')
+        self._limit = limit
+        self._used = 0
+        self._max_used = 0
+        self._condition = Condition()
+
+    @property
+    def used(self) -> int:
+        return self._used
+
+    @property
+    def max_used(self) -> int:
+        return self._max_used
+
+    def acquire(self, size: int) -> float:
+        """
+        :return: seconds blocked
+        """
+        start_time = time.monotonic()
+        limit = self._limit
+        with self._condition:
+            if limit is not None:
+                self._condition.wait_for(lambda: self._used == 0 or self._used + size <= limit)
+            self._used += size
+            self._max_used = max(self._max_used, self._used)
+        return time.monotonic() - start_time
+
+    def release(self, size: int) -> None:
+        with self._condition:
+            self._used -= size
+            self._condition.notify_all()
+
+
+class Stage(NamedTuple):
+    """
+    a stage processes items from its input queue by its own workers,
+    and puts the outputs into the input queue of the next stage
+    """
+    name: str
+    func: Callable[[Any], Any]
+    workers: int = 1
+    queue_size: int = 1                                   # capacity of the input queue
+    is_expanded: bool = False                             # output is an iterable of items for the next stage
+    in_flight_cost: Optional[Callable[[Any], int]] = None  # bytes held by the item until it leaves the pipeline
+    memory_cost: Optional[Callable[[Any], int]] = None     # bytes held by the output while it is queued
+
+
+class StageMetrics(NamedTuple):
+    name: str
+    processed: int               # items processed successfully
+    failed: int
+    queue_depth: int             # items waiting in the input queue now
+    max_queue_depth: int
+    busy_seconds: float          # seconds spent by workers on items
+    blocked_seconds: float       # seconds spent by workers on full output queue or byte budgets
+    throughput: float            # items processed per second of elapsed time
+
+
+class PipelineError(NamedTuple):
+    item: Any                    # input of the failed stage
+    stage_name: str
+    error: Exception
+
+
+class PipelineResult(NamedTuple):
+    results: List[Any]           # outputs of the last stage, in order of completion
+    errors: List[PipelineError]
+    metrics: Dict[str, StageMetrics]
+
+
+class _Envelope(NamedTuple):
+    item: Any
+    in_flight_bytes: int
+    memory_bytes: int
+
+
+_END = object()
+
+
+class _StageState:
+
+    def __init__(self, stage: Stage):
+        self.stage = stage
+        self.queue: 'Queue[Any]' = Queue(maxsize=stage.queue_size)
+        self.processed = 0
+        self.failed = 0
+        self.max_queue_depth = 0
+        self.busy_seconds = 0.0
+        self.blocked_seconds = 0.0
+        self.alive_workers = stage.workers
+        self.lock = Lock()
+
+
+class Pipeline:
+    """
+    Run items through stages concurrently
+
+    * each stage has its own workers, and a bounded input queue,
+      a full queue blocks the former stage, so no stage runs far ahead of the next one
+    * bytes in flight and bytes held in queues are bounded globally, refer to Stage
+    * an item failed in any stage is recorded and dropped, the others go on
+    * metrics of each stage tell the bottleneck, which has full input queue and idle successors
+    """
+
+    def __init__(
+        self,
+        stages: Sequence[Stage],
+        max_in_flight_bytes: Optional[int] = None,
+        max_memory_bytes: Optional[int] = None
+    ):
+        """
+        :param stages: stages in order
+        :type stages: Sequence[Stage]
+        :param max_in_flight_bytes: maximum of bytes of the items in flight, e.g. being downloaded
+        :type max_in_flight_bytes: Optional[int]
+        :param max_memory_bytes: maximum of bytes of the outputs in queues
+        :type max_memory_bytes: Optional[int]
+        """
+        if not stages:
+            raise ValueError('No stage in pipeline')
+        for stage in stages:
+            if stage.workers <= 0 or stage.queue_size <= 0:
+                raise ValueError(f'Workers and queue size of stage {stage.name} should be positive')
+        self._stages = list(stages)
+        self._in_flight_budget = ByteBudget(max_in_flight_bytes)
+        self._memory_budget = ByteBudget(max_memory_bytes)
+        self._states: List[_StageState] = []
+        self._results: List[Any] = []
+        self._errors: List[PipelineError] = []
+        self._lock = Lock()
+        self._start_time: Optional[float] = None
+        self._end_time: Optional[float] = None
+
+    @property
+    def in_flight_budget(self) -> ByteBudget:
+        return self._in_flight_budget
+
+    @property
+    def memory_budget(self) -> ByteBudget:
+        return self._memory_budget
+
+    def run(self, items: Iterable[Any]) -> PipelineResult:
+        """
+        run all of items through the stages, and block until they are done
+        :param items: inputs of the first stage, consumed lazily
+        :type items: Iterable[Any]
+        :return: PipelineResult
+        """
+        self._states = [_StageState(stage) for stage in self._stages]
+        self._results = []
+        self._errors = []
+        self._start_time = time.monotonic()
+        self._end_time = None
+
+        threads: List[Thread] = []
+        for idx, state in enumerate(self._states):
+            for worker_idx in range(state.stage.workers):
+                thread = Thread(
+                    target=self._work,
+                    args=(idx, ),
+                    name=f'pipeline-{state.stage.name}-{worker_idx}',
+                    daemon=True
+                )
+                thread.start()
+                threads.append(thread)
+
+        first_state = self._states[0]
+        try:
+            for item in items:
+                self._put(first_state, _Envelope(item=item, in_flight_bytes=0, memory_bytes=0))
+        finally:
+            for _ in range(first_state.stage.workers):
+                first_state.queue.put(_END)
+            for thread in threads:
+                thread.join()
+        self._end_time = time.monotonic()
+        return PipelineResult(results=self._results, errors=self._errors, metrics=self.get_metrics())
+
+    def get_metrics(self) -> Dict[str, StageMetrics]:
+        """
+        snapshot of metrics of each stage, which is available while running as well
+        """
+        if self._start_time is None:
+            elapsed = 0.0
+        else:
+            elapsed = (self._end_time or time.monotonic()) - self._start_time
+        result: Dict[str, StageMetrics] = {}
+        for state in self._states:
+            with state.lock:
+                result[state.stage.name] = StageMetrics(
+                    name=state.stage.name,
+                    processed=state.processed,
+                    failed=state.failed,
+                    queue_depth=state.queue.qsize(),
+                    max_queue_depth=state.max_queue_depth,
+                    busy_seconds=state.busy_seconds,
+                    blocked_seconds=state.blocked_seconds,
+                    throughput=state.processed / elapsed if elapsed else 0.0
+                )
+        return result
+
+    def _put(self, state: _StageState, envelope: _Envelope) -> float:
+        """
+        :return: seconds blocked by the full queue
+        """
+        start_time = time.monotonic()
+        state.queue.put(envelope)
+        blocked_seconds = time.monotonic() - start_time
+        with state.lock:
+            state.max_queue_depth = max(state.max_queue_depth, state.queue.qsize())
+        return blocked_seconds
+
+    def _work(self, idx: int) -> None:
+        state = self._states[idx]
+        stage = state.stage
+        next_state = self._states[idx + 1] if idx + 1 < len(self._states) else None
+        while True:
+            envelope = state.queue.get()
+            if envelope is _END:
+                break
+            self._memory_budget.release(envelope.memory_bytes)
+            in_flight_bytes = envelope.in_flight_bytes
+            # the in-flight bytes go with the first output, and are released once it leaves
+            is_in_flight_passed = False
+            start_time = time.monotonic()
+            blocked_seconds = 0.0
+            error: Optional[Exception] = None
+            try:
+                if stage.in_flight_cost is not None:
+                    cost = stage.in_flight_cost(envelope.item)
+                    blocked_seconds += self._in_flight_budget.acquire(cost)
+                    in_flight_bytes += cost
+                output = stage.func(envelope.item)
+                # expanded outputs are consumed lazily, so a generator is never held in memory as a whole
+                for output in (output if stage.is_expanded else [output]):
+                    if next_state is None:
+                        with self._lock:
+                            self._results.append(output)
+                        continue
+                    memory_bytes = stage.memory_cost(output) if stage.memory_cost is not None else 0
+                    # budget and queue are waited without the stage lock, so metrics are available meanwhile
+                    blocked_seconds += self._memory_budget.acquire(memory_bytes)
+                    blocked_seconds += self._put(
+                        next_state,
+                        _Envelope(
+                            item=output,
+                            in_flight_bytes=0 if is_in_flight_passed else in_flight_bytes,
+                            memory_bytes=memory_bytes
+                        )
+                    )
+                    is_in_flight_passed = True
+            except Exception as e:
+                logger.warning(f'Stage {stage.name} failed: {e}')
+                error = e
+            if not is_in_flight_passed:
+                self._in_flight_budget.release(in_flight_bytes)
+            if error is not None:
+                with self._lock:
+                    self._errors.append(PipelineError(item=envelope.item, stage_name=stage.name, error=error))
+            with state.lock:
+                if error is None:
+                    state.processed += 1
+                else:
+                    state.failed += 1
+                state.busy_seconds += time.monotonic() - start_time - blocked_seconds
+                state.blocked_seconds += blocked_seconds
+
+        with state.lock:
+            state.alive_workers -= 1
+            is_last_worker = state.alive_workers == 0
+        if is_last_worker and next_state is not None:
+            for _ in range(next_state.stage.workers):
+                next_state.queue.put(_END)
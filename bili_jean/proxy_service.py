@@ -1,8 +1,9 @@
 """
 Service component as the proxy of Bilibili official APIs
 """
+from http import HTTPStatus
 import json
-from typing import Dict, Optional
+from typing import Dict, Optional, Tuple
 
 from requests import Response, session
 
@@ -11,6 +12,7 @@ from .constants import (
     HEADERS,
     TIMEOUT,
     URL_WEB_MY_INFO,
+    URL_WEB_NAV,
     URL_WEB_PGC_PLAY,
     URL_WEB_PGC_VIEW,
     URL_WEB_PUGV_PLAY,
@@ -19,9 +21,11 @@ from .constants import (
     URL_WEB_UGC_VIEW,
     URL_WEB_USER_CARD
 )
+from .credential_pool import CredentialPool, CredentialPoolError, SessData
 from .schemes import (
     GetCardResponse,
     GetMyInfoResponse,
+    GetNavResponse,
     GetPGCPlayResponse,
     GetPGCViewResponse,
     GetPUGVPlayResponse,
@@ -29,6 +33,7 @@ from .schemes import (
     GetUGCPlayResponse,
     GetUGCViewResponse
 )
+from .wbi_signer import get_wbi_key, wbi_signer
 
 
 __all__ = ['ProxyService']
@@ -42,17 +47,24 @@ class ProxyService:
         url: str,
         params: Optional[Dict] = None,
         headers: Optional[Dict] = None,
-        sess_data: Optional[str] = None,
+        sess_data: Optional[SessData] = None,
         timeout: int = TIMEOUT,
         allow_redirects: bool = True,
         stream: bool = False
     ) -> Response:
+        if isinstance(sess_data, CredentialPool):
+            credential = sess_data.acquire()
+            if credential is None:
+                raise CredentialPoolError('No SESSDATA in the pool is available')
+        else:
+            credential = sess_data
+
         s = session()
-        if sess_data is not None:
-            s.cookies.set('SESSDATA', sess_data)
+        if credential is not None:
+            s.cookies.set('SESSDATA', credential)
         if headers is None:
             headers = HEADERS
-        return s.get(
+        response = s.get(
             url,
             params=params,
             headers=headers,
@@ -60,6 +72,14 @@ class ProxyService:
             allow_redirects=allow_redirects,
             stream=stream
         )
+        # risk control responds 412
+        if (
+            isinstance(sess_data, CredentialPool)
+            and credential is not None
+            and response.status_code == HTTPStatus.PRECONDITION_FAILED
+        ):
+            sess_data.report_throttled(credential)
+        return response
 
     @classmethod
     def head(
@@ -75,7 +95,7 @@ class ProxyService:
         cls,
         bvid: Optional[str] = None,
         aid: Optional[int] = None,
-        sess_data: Optional[str] = None
+        sess_data: Optional[SessData] = None
     ) -> GetUGCViewResponse:
         """
         get info of the UGC resource which is with '/video' namespace
@@ -95,7 +115,7 @@ class ProxyService:
         cls,
         bvid: Optional[str] = None,
         aid: Optional[int] = None,
-        sess_data: Optional[str] = None
+        sess_data: Optional[SessData] = None
     ) -> Response:
         params: Dict = {}
         if bvid is not None:
@@ -114,7 +134,7 @@ class ProxyService:
         qn: Optional[int] = None,
         fnval: int = FormatNumberValue.DASH.value,
         fourk: int = 1,
-        sess_data: Optional[str] = None
+        sess_data: Optional[SessData] = None
     ) -> GetUGCPlayResponse:
         """
         get UGC stream's info which is with '/video' namespace
@@ -132,7 +152,7 @@ class ProxyService:
         :param fourk: 4K or not
         :type fourk: int
         :param sess_data: cookie of Bilibili user, SESSDATA
-        :type sess_data: str
+        :type sess_data: str or CredentialPool
         :return: GetUGCPlayResponse
         """
         if all([id_val is None for id_val in (bvid, aid)]):
@@ -159,7 +179,7 @@ class ProxyService:
         qn: Optional[int] = None,
         fnval: int = FormatNumberValue.DASH.value,
         fourk: int = 1,
-        sess_data: Optional[str] = None
+        sess_data: Optional[SessData] = None
     ) -> Response:
         params: Dict = {}
         if bvid is not None:
@@ -175,6 +195,7 @@ class ProxyService:
             'fnval': fnval,
             'fourk': fourk
         })
+        params = wbi_signer.sign(params, fetch_keys=cls.get_wbi_keys)
 
         response: Response = cls.get(URL_WEB_UGC_PLAY, params=params, sess_data=sess_data)
         return response
@@ -184,7 +205,7 @@ class ProxyService:
         cls,
         season_id: Optional[int] = None,
         ep_id: Optional[int] = None,
-        sess_data: Optional[str] = None
+        sess_data: Optional[SessData] = None
     ) -> GetPGCViewResponse:
         """
         get info of the PGC resource which is with '/bangumi' namespace
@@ -203,7 +224,7 @@ class ProxyService:
         cls,
         season_id: Optional[int] = None,
         ep_id: Optional[int] = None,
-        sess_data: Optional[str] = None
+        sess_data: Optional[SessData] = None
     ) -> Response:
         params: Dict = {}
         if season_id is not None:
@@ -223,7 +244,7 @@ class ProxyService:
         qn: Optional[int] = None,
         fnval: int = FormatNumberValue.DASH.value,
         fourk: int = 1,
-        sess_data: Optional[str] = None
+        sess_data: Optional[SessData] = None
     ) -> GetPGCPlayResponse:
         """
         get PGC stream's info which is with '/bangumi' namespace
@@ -243,7 +264,7 @@ class ProxyService:
         :param fourk: 4K or not
         :type fourk: int
         :param sess_data: cookie of Bilibili user, SESSDATA
-        :type sess_data: str
+        :type sess_data: str or CredentialPool
         :return: GetPGCPlayResponse
         """
         if all([id_val is None for id_val in (cid, ep_id)]):
@@ -272,7 +293,7 @@ class ProxyService:
         qn: Optional[int] = None,
         fnval: int = FormatNumberValue.DASH.value,
         fourk: int = 1,
-        sess_data: Optional[str] = None
+        sess_data: Optional[SessData] = None
     ) -> Response:
         params: Dict = {}
 
@@ -301,7 +322,7 @@ class ProxyService:
         cls,
         season_id: Optional[int] = None,
         ep_id: Optional[int] = None,
-        sess_data: Optional[str] = None
+        sess_data: Optional[SessData] = None
     ) -> GetPUGVViewResponse:
         """
         get info of the PUGV resource which is with '/cheese' namespace
@@ -320,7 +341,7 @@ class ProxyService:
         cls,
         season_id: Optional[int] = None,
         ep_id: Optional[int] = None,
-        sess_data: Optional[str] = None
+        sess_data: Optional[SessData] = None
     ) -> Response:
         params: Dict = {}
         if season_id is not None:
@@ -337,7 +358,7 @@ class ProxyService:
         qn: Optional[int] = None,
         fnval: int = FormatNumberValue.DASH.value,
         fourk: int = 1,
-        sess_data: Optional[str] = None
+        sess_data: Optional[SessData] = None
     ) -> GetPUGVPlayResponse:
         """
         get PUGV stream's info which is with '/cheese' namespace
@@ -351,7 +372,7 @@ class ProxyService:
         :param fourk: 4K or not
         :type fourk: int
         :param sess_data: cookie of Bilibili user, SESSDATA
-        :type sess_data: str
+        :type sess_data: str or CredentialPool
         :return: GetPUGVPlayResponse
         """
         response = cls._get_pugv_play_response(
@@ -371,7 +392,7 @@ class ProxyService:
         qn: Optional[int] = None,
         fnval: int = FormatNumberValue.DASH.value,
         fourk: int = 1,
-        sess_data: Optional[str] = None
+        sess_data: Optional[SessData] = None
     ) -> Response:
         params: Dict = {}
 
@@ -391,12 +412,12 @@ class ProxyService:
     @classmethod
     def get_my_info(
         cls,
-        sess_data: Optional[str] = None
+        sess_data: Optional[SessData] = None
     ) -> GetMyInfoResponse:
         """
         get the user info by SESS_DATA
         :param sess_data: cookie of Bilibili user, SESSDATA
-        :type sess_data: str
+        :type sess_data: str or CredentialPool
         :return: GetMyInfoResponse
         """
         response = cls._get_my_info_response(
@@ -408,17 +429,43 @@ class ProxyService:
     @classmethod
     def _get_my_info_response(
         cls,
-        sess_data: Optional[str] = None
+        sess_data: Optional[SessData] = None
     ) -> Response:
         response: Response = cls.get(URL_WEB_MY_INFO, sess_data=sess_data)
         return response
 
+    @classmethod
+    def get_nav(cls) -> GetNavResponse:
+        """
+        get the navigation info, which has keys of WBI signature even if not login
+        :return: GetNavResponse
+        """
+        response = cls._get_nav_response()
+        data = json.loads(response.content.decode('utf-8'))
+        return GetNavResponse.model_validate(data)
+
+    @classmethod
+    def _get_nav_response(cls) -> Response:
+        response: Response = cls.get(URL_WEB_NAV)
+        return response
+
+    @classmethod
+    def get_wbi_keys(cls) -> Tuple[str, str]:
+        """
+        fetch keys of WBI signature
+        :return: img_key and sub_key
+        """
+        nav = cls.get_nav()
+        if nav.data is None or nav.data.wbi_img is None:
+            raise ValueError(f'request WBI keys error: {nav.message}')
+        return get_wbi_key(nav.data.wbi_img.img_url), get_wbi_key(nav.data.wbi_img.sub_url)
+
     @classmethod
     def get_card(
         cls,
         mid: int,
         photo: bool = False,
-        sess_data: Optional[str] = None
+        sess_data: Optional[SessData] = None
     ) -> GetCardResponse:
         """
         get the user info by SESS_DATA
@@ -427,7 +474,7 @@ class ProxyService:
         :param photo: whether illustrates URLs of avatar or not
         :type photo: bool
         :param sess_data: cookie of Bilibili user, SESSDATA
-        :type sess_data: str
+        :type sess_data: str or CredentialPool
         :return: GetCardResponse
         """
         response = cls._get_user_card_response(
@@ -443,7 +490,7 @@ class ProxyService:
         cls,
         mid: int,
         photo: bool = False,
-        sess_data: Optional[str] = None
+        sess_data: Optional[SessData] = None
     ) -> Response:
         params = {
             'mid': mid,
@@ -0,0 +1,49 @@
+"""
+Limit the rate of requests to Bilibili official APIs
+"""
+from threading import Lock
+import time
+from typing import Callable, Optional
+
+
+__all__ = ['RateLimiter']
+
+
+class RateLimiter:
+    """
+    Space out acquisitions evenly across threads,
+    each one waits until at least 1 / rate seconds after the former one
+    """
+
+    def __init__(
+        self,
+        rate: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep
+    ):
+        """
+        :param rate: maximum of acquisitions per second, no limit if None
+        :type rate: Optional[float]
+        :param clock: source of monotonic time
+        :type clock: Callable[[], float]
+        :param sleep: function to wait for seconds
+        :type sleep: Callable[[float], None]
+        """
+        if rate is not None and rate <= 0:
+            raise ValueError('The value of \'rate\' should be positive')
+        self._interval = 1 / rate if rate is not None else 0.0
+        self._clock = clock
+        self._sleep = sleep
+        self._next_time: Optional[float] = None
+        self._lock = Lock()
+
+    def acquire(self) -> None:
+        if not self._interval:
+            return
+        with self._lock:
+            now = self._clock()
+            scheduled_time = now if self._next_time is None else max(now, self._next_time)
+            self._next_time = scheduled_time + self._interval
+        wait_seconds = scheduled_time - now
+        if wait_seconds > 0:
+            self._sleep(wait_seconds)
@@ -0,0 +1,33 @@
+"""
+Scheme definition of downloading objects
+"""
+from typing import Optional
+
+from pydantic import BaseModel, model_validator
+
+from ..constants import SYNC_INTERVAL_BYTES, SYNC_INTERVAL_SECONDS
+
+
+class DurabilityPolicy(BaseModel):
+    """
+    how the downloaded bytes reach the disk, refer to PageDownloadService
+
+    the temporary file is fsynced once sync_bytes are written since the last fsync,
+    or sync_seconds passed by the time a chunk is written, either could be None to disable it,
+    and always once more before it is renamed,
+    and the offset to continue from is recorded only after the bytes ahead are fsynced
+
+    the whole remote size is allocated up front if is_preallocated,
+    which avoids fragmentation and fails fast when there is not enough space
+    """
+    sync_bytes: Optional[int] = SYNC_INTERVAL_BYTES
+    sync_seconds: Optional[float] = SYNC_INTERVAL_SECONDS
+    is_preallocated: bool = False
+
+    @model_validator(mode='after')
+    def check_intervals(self) -> 'DurabilityPolicy':
+        if self.sync_bytes is not None and self.sync_bytes <= 0:
+            raise ValueError('sync_bytes should be positive')
+        if self.sync_seconds is not None and self.sync_seconds <= 0:
+            raise ValueError('sync_seconds should be positive')
+        return self
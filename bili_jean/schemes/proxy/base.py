@@ -15,6 +15,14 @@ class BaseResponseModel(BaseModel):
     ttl: Optional[int] = None
 
 
+class DashMediaItemSegmentBase(BaseModel):
+    """
+    byte ranges of the fragmented MP4 resource, e.g. '0-999'
+    """
+    initialization: str  # initialization segment, which is 'ftyp' and 'moov' boxes
+    index_range: str     # segment index, which is 'sidx' box
+
+
 class DashMediaItem(BaseModel):
     """
     Digital media data
@@ -27,4 +35,5 @@ class DashMediaItem(BaseModel):
     height: int                             # 0 for audio
     id_field: int = Field(..., alias='id')
     mime_type: str
+    segment_base: Optional[DashMediaItemSegmentBase] = None
     width: int                              # 0 for audio
@@ -3,17 +3,27 @@ Scheme definition of the response from https://api.bilibili.com/x/space/myinfo
 """
 from typing import Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 from .base import BaseResponseModel
 
 
+class GetMyInfoDataVip(BaseModel):
+    """
+    VIP membership of the user
+    """
+    due_date: int = 0                         # expiry which unit is millisecond
+    status: int = 0                           # 1 is active, 0 is not
+    type_field: int = Field(0, alias='type')  # 0 is none, 1 is monthly, 2 is annual
+
+
 class GetMyInfoData(BaseModel):
 
     mid: int
     name: str
     face: str
     sign: str
+    vip: Optional[GetMyInfoDataVip] = None
 
 
 class GetMyInfoResponse(BaseResponseModel):
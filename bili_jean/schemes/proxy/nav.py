@@ -0,0 +1,32 @@
+"""
+Scheme definition of the response from https://api.bilibili.com/x/web-interface/nav
+"""
+from typing import Optional
+
+from pydantic import BaseModel, Field
+
+from .base import BaseResponseModel
+
+
+class GetNavDataWbiImg(BaseModel):
+    """
+    keys of WBI signature are the file names of the URLs
+    """
+    img_url: str
+    sub_url: str
+
+
+class GetNavData(BaseModel):
+
+    is_login: bool = Field(False, alias='isLogin')
+    wbi_img: Optional[GetNavDataWbiImg] = None
+
+
+class GetNavResponse(BaseResponseModel):
+    """
+    On 'code' field,
+
+    0：success, and has 'data'
+    -101：not login, still has 'data' with 'wbi_img'
+    """
+    data: Optional[GetNavData] = None
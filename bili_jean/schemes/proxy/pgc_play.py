@@ -65,8 +65,10 @@ class GetPGCPlayResult(BaseModel):
     """
     dash: Optional[GetPGCPlayResultDash] = None                # raw resources
     durl: Optional[List[GetPGCPlayResultDUrlItem]] = None      # video-audio combined resources
+    is_preview: Optional[int] = None                           # 1 is trial, which only has clip of the episode
     quality: int
     support_formats: List[GetPGCPlayResultSupportFormatsItem]  # visible supported formats
+    timelength: Optional[int] = None                           # full duration which unit is millisecond
 
 
 class GetPGCPlayResponse(BaseResponseModel):
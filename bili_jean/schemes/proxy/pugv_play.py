@@ -65,8 +65,10 @@ class GetPUGVPlayData(BaseModel):
     """
     dash: Optional[GetPUGVPlayDataDash] = None                # raw resources
     durl: Optional[List[GetPUGVPlayDataDUrlItem]] = None      # video-audio combined resources
+    is_preview: Optional[int] = None                          # 1 is trial, which only has clip of the episode
     quality: int
     support_formats: List[GetPUGVPlayDataSupportFormatsItem]  # visible supported formats
+    timelength: Optional[int] = None                          # full duration which unit is millisecond
 
 
 class GetPUGVPlayResponse(BaseResponseModel):
@@ -65,8 +65,10 @@ class GetUGCPlayData(BaseModel):
     """
     dash: Optional[GetUGCPlayDataDash] = None                # raw resources
     durl: Optional[List[GetUGCPlayDataDUrlItem]] = None      # video-audio combined resources
+    is_preview: Optional[int] = None                         # 1 is trial, which only has clip of the episode
     quality: int
     support_formats: List[GetUGCPlayDataSupportFormatsItem]  # visible supported formats
+    timelength: Optional[int] = None                         # full duration which unit is millisecond
 
 
 class GetUGCPlayResponse(BaseResponseModel):
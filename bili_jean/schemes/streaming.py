@@ -1,14 +1,193 @@
 """
 Scheme definition of streaming objects
 """
-from typing import Optional
+import os
+from typing import Any, ClassVar, Dict, Generic, Iterable, List, Optional, overload, Tuple, Type, TypeVar
 
-from pydantic import BaseModel
+from pydantic import BaseModel, model_serializer, model_validator, SerializationInfo, SerializerFunctionWrapHandler
 
 from ..constants import StreamingCategory
 
 
-class Page(BaseModel):
+_object_new = object.__new__
+_object_setattr = object.__setattr__
+TrustedModelType = TypeVar('TrustedModelType', bound='TrustedModel')
+FlatFieldValue = TypeVar('FlatFieldValue')
+
+
+class TrustedModel(BaseModel):
+    """
+    Model which is commonly built from the fields of response models,
+    the data has been validated once there, so validation is skipped by default
+
+    set environment variable 'BILI_JEAN_TRUSTED_VALIDATION' to '1',
+    or switch on 'is_trusted_validated', to validate it again for debugging
+    """
+    is_trusted_validated: ClassVar[bool] = os.environ.get('BILI_JEAN_TRUSTED_VALIDATION', '0') == '1'
+
+    @classmethod
+    def trusted(cls: Type[TrustedModelType], **kwargs: Any) -> TrustedModelType:
+        """
+        build the model from trusted keyword arguments,
+        bypass 'model_construct' as well, which is even slower than validation,
+        all of fields should be declared without default factory
+        """
+        if cls.is_trusted_validated:
+            return cls(**kwargs)
+        instance = _object_new(cls)
+        _object_setattr(instance, '__dict__', {**cls._get_trusted_defaults(), **kwargs})
+        _object_setattr(instance, '__pydantic_fields_set__', set(kwargs))
+        _object_setattr(instance, '__pydantic_extra__', None)
+        _object_setattr(instance, '__pydantic_private__', None)
+        return instance
+
+    @classmethod
+    def _get_trusted_defaults(cls) -> Dict[str, Any]:
+        defaults = cls.__dict__.get('_trusted_defaults')
+        if defaults is None:
+            defaults = {
+                name: field_info.default
+                for name, field_info in cls.model_fields.items()
+                if not field_info.is_required()
+            }
+            type.__setattr__(cls, '_trusted_defaults', defaults)
+        return defaults
+
+
+class Owner(TrustedModel):
+    """
+    Normalized owner (UP) of a view or a collection
+    """
+    mid: Optional[int] = None
+    name: Optional[str] = None
+    avatar_url: Optional[str] = None
+
+
+class View(TrustedModel):
+    """
+    Normalized view, which is a video, an episode of a bangumi or a cheese,
+    shared by all of its pages
+    """
+    aid: Optional[int] = None
+    bvid: Optional[str] = None
+    ep_id: Optional[int] = None
+    season_id: Optional[int] = None
+
+    title: Optional[str] = None
+    desc: Optional[str] = None
+    cover_url: Optional[str] = None
+    pub_time: Optional[int] = None
+    duration: Optional[int] = None
+    owner: Optional[Owner] = None
+
+
+class Collection(TrustedModel):
+    """
+    Normalized collection which views belong to, shared by all of its pages
+    * UGC: UGC season
+    * PGC: series of the bangumi
+    * PUGV: the cheese
+    """
+    coll_id: Optional[int] = None
+    title: Optional[str] = None
+    desc: Optional[str] = None
+    cover_url: Optional[str] = None
+    owner: Optional[Owner] = None
+
+
+class CollectionSection(TrustedModel):
+    """
+    Normalized section of a collection, shared by all of its pages
+    """
+    sect_id: Optional[int] = None
+    title: Optional[str] = None
+
+
+# flat field name of legacy Page -> path of attributes on normalized one
+PAGE_FLAT_FIELD_PATHS: Dict[str, Tuple[str, ...]] = {
+    'view_aid': ('view', 'aid'),
+    'view_bvid': ('view', 'bvid'),
+    'view_ep_id': ('view', 'ep_id'),
+    'view_season_id': ('view', 'season_id'),
+    'view_title': ('view', 'title'),
+    'view_desc': ('view', 'desc'),
+    'view_cover_url': ('view', 'cover_url'),
+    'view_pub_time': ('view', 'pub_time'),
+    'view_duration': ('view', 'duration'),
+    'view_owner_id': ('view', 'owner', 'mid'),
+    'view_owner_name': ('view', 'owner', 'name'),
+    'view_owner_avatar_url': ('view', 'owner', 'avatar_url'),
+    'coll_id': ('coll', 'coll_id'),
+    'coll_title': ('coll', 'title'),
+    'coll_desc': ('coll', 'desc'),
+    'coll_cover_url': ('coll', 'cover_url'),
+    'coll_owner_id': ('coll', 'owner', 'mid'),
+    'coll_owner_name': ('coll', 'owner', 'name'),
+    'coll_owner_avatar_url': ('coll', 'owner', 'avatar_url'),
+    'coll_sect_id': ('coll_sect', 'sect_id'),
+    'coll_sect_title': ('coll_sect', 'title'),
+}
+PAGE_OBJECT_TYPES: Dict[str, Type[TrustedModel]] = {
+    'view': View,
+    'coll': Collection,
+    'coll_sect': CollectionSection
+}
+
+
+def _replace_path(obj: Optional[TrustedModel], kls: Type[TrustedModel], names: List[str], value: Any) -> TrustedModel:
+    """
+    copy of the object with the attribute on path replaced, the missing objects on path are created
+    """
+    if obj is None:
+        obj = kls.trusted()
+    name, *rest = names
+    if rest:
+        value = _replace_path(getattr(obj, name), Owner, rest, value)
+    return obj.model_copy(update={name: value})
+
+
+class FlatField(property, Generic[FlatFieldValue]):
+    """
+    legacy flat field of Page, which reads and writes the attribute on its path of PAGE_FLAT_FIELD_PATHS,
+    the objects on the path are copied rather than modified in place when it is written,
+    since they are shared by the other pages of the same view or collection
+    """
+
+    def __init__(self) -> None:
+        super().__init__(self._get, self._set)
+        self.path: Tuple[str, ...] = ()
+
+    def __set_name__(self, owner: Type[Any], name: str) -> None:
+        self.path = PAGE_FLAT_FIELD_PATHS[name]
+
+    @overload
+    def __get__(self, obj: None, kls: Optional[Type[Any]] = None) -> 'FlatField[FlatFieldValue]':
+        ...
+
+    @overload
+    def __get__(self, obj: object, kls: Optional[Type[Any]] = None) -> FlatFieldValue:
+        ...
+
+    def __get__(self, obj: Optional[object], kls: Optional[Type[Any]] = None) -> Any:
+        return super().__get__(obj, kls)
+
+    def __set__(self, obj: object, value: FlatFieldValue) -> None:
+        super().__set__(obj, value)
+
+    def _get(self, obj: 'Page') -> Any:
+        value: Any = obj
+        for name in self.path:
+            if value is None:
+                return None
+            value = getattr(value, name)
+        return value
+
+    def _set(self, obj: 'Page', value: Any) -> None:
+        top_name, *names = self.path
+        setattr(obj, top_name, _replace_path(getattr(obj, top_name), PAGE_OBJECT_TYPES[top_name], names, value))
+
+
+class Page(TrustedModel):
     """
     Normalized page model,
     which is the finest granularity of resource
@@ -18,6 +197,12 @@ class Page(BaseModel):
 
     the page could be the requested one,
     or relevant collections' pages
+
+    metadata of view, collection, section and owner are stored once
+    and referenced by every page of them,
+    the legacy flat fields, e.g. 'view_title' or 'coll_owner_name',
+    are still readable and writable as properties, and acceptable when construct a page,
+    and the page is serialized in the legacy flat structure as well
     """
     page_category: str
     page_index: int = 1
@@ -25,32 +210,129 @@ class Page(BaseModel):
     page_title: str                              # Normalized title for display
     page_duration: int                           # Total seconds of the page
 
-    view_aid: Optional[int] = None
-    view_bvid: Optional[str] = None
-    view_ep_id: Optional[int] = None
-    view_season_id: Optional[int] = None
+    view: View
+    coll: Optional[Collection] = None
+    coll_sect: Optional[CollectionSection] = None
 
-    view_title: Optional[str] = None
-    view_desc: Optional[str] = None
-    view_cover_url: Optional[str] = None
-    view_pub_time: Optional[int] = None
-    view_duration: Optional[int] = None
-    view_owner_id: Optional[int] = None
-    view_owner_name: Optional[str] = None
-    view_owner_avatar_url: Optional[str] = None
+    is_selected_page: bool                       # the page is requested one or relevant one
 
-    coll_id: Optional[int] = None
-    coll_title: Optional[str] = None
-    coll_desc: Optional[str] = None
-    coll_cover_url: Optional[str] = None
-    coll_owner_id: Optional[int] = None
-    coll_owner_name: Optional[str] = None
-    coll_owner_avatar_url: Optional[str] = None
+    @model_validator(mode='before')
+    @classmethod
+    def fold_flat_fields(cls, data: Any) -> Any:
+        """
+        accept legacy flat fields, and fold them into normalized objects
+        """
+        if not isinstance(data, dict) or not any(key in PAGE_FLAT_FIELD_PATHS for key in data):
+            return data
+        result: Dict[str, Any] = {}
+        for key, value in data.items():
+            path = PAGE_FLAT_FIELD_PATHS.get(key)
+            if path is None:
+                result[key] = value
+                continue
+            if value is None:
+                continue
+            *parent_names, name = path
+            parent = result
+            for parent_name in parent_names:
+                parent = parent.setdefault(parent_name, {})
+            parent[name] = value
+        result.setdefault('view', {})
+        return result
 
-    coll_sect_id: Optional[int] = None
-    coll_sect_title: Optional[str] = None
+    @model_serializer(mode='wrap')
+    def serialize_flat(self, handler: SerializerFunctionWrapHandler, info: SerializationInfo) -> Dict[str, Any]:
+        """
+        serialize as the legacy flat structure, so model_dump and model_dump_json keep their shape,
+        the normalized one is kept if context has 'is_normalized', refer to dump_normalized_pages
+        """
+        data: Dict[str, Any] = handler(self)
+        if info.context and info.context.get('is_normalized'):
+            return data
+        result: Dict[str, Any] = {}
+        for key, value in data.items():
+            if key not in PAGE_OBJECT_TYPES and key != 'is_selected_page':
+                result[key] = value
+        for field_name, (top_name, *names) in PAGE_FLAT_FIELD_PATHS.items():
+            if top_name not in data:
+                # excluded
+                continue
+            value = data[top_name]
+            for name in names:
+                value = value.get(name) if isinstance(value, dict) else None
+            result[field_name] = value
+        if 'is_selected_page' in data:
+            result['is_selected_page'] = data['is_selected_page']
+        return result
 
-    is_selected_page: bool                       # the page is requested one or relevant one
+    def model_dump_flat(self) -> Dict[str, Any]:
+        """
+        dump the page as the legacy flat structure
+        """
+        return self.model_dump()
+
+    # legacy flat fields, whose paths are defined by PAGE_FLAT_FIELD_PATHS
+    view_aid = FlatField[Optional[int]]()
+    view_bvid = FlatField[Optional[str]]()
+    view_ep_id = FlatField[Optional[int]]()
+    view_season_id = FlatField[Optional[int]]()
+    view_title = FlatField[Optional[str]]()
+    view_desc = FlatField[Optional[str]]()
+    view_cover_url = FlatField[Optional[str]]()
+    view_pub_time = FlatField[Optional[int]]()
+    view_duration = FlatField[Optional[int]]()
+    view_owner_id = FlatField[Optional[int]]()
+    view_owner_name = FlatField[Optional[str]]()
+    view_owner_avatar_url = FlatField[Optional[str]]()
+    coll_id = FlatField[Optional[int]]()
+    coll_title = FlatField[Optional[str]]()
+    coll_desc = FlatField[Optional[str]]()
+    coll_cover_url = FlatField[Optional[str]]()
+    coll_owner_id = FlatField[Optional[int]]()
+    coll_owner_name = FlatField[Optional[str]]()
+    coll_owner_avatar_url = FlatField[Optional[str]]()
+    coll_sect_id = FlatField[Optional[int]]()
+    coll_sect_title = FlatField[Optional[str]]()
+
+
+def dump_normalized_pages(pages: Iterable[Page]) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    dump pages in normalized structure,
+    shared views, collections, sections and owners are dumped once,
+    and referenced by index from the pages
+    """
+    # refer to the object itself as well, keep it alive when pages are generated lazily,
+    # otherwise its id could be reused by a new one
+    refs: Dict[int, Tuple[int, BaseModel]] = {}
+    result: Dict[str, List[Dict[str, Any]]] = {
+        'owners': [],
+        'views': [],
+        'collections': [],
+        'sections': [],
+        'pages': []
+    }
+
+    def _ref(obj: Optional[BaseModel], key: str) -> Optional[int]:
+        if obj is None:
+            return None
+        ref = refs.get(id(obj))
+        if ref is not None:
+            return ref[0]
+        dumped = obj.model_dump(exclude={'owner'})
+        if 'owner' in type(obj).model_fields:
+            dumped['owner'] = _ref(getattr(obj, 'owner'), 'owners')
+        idx = len(result[key])
+        refs[id(obj)] = (idx, obj)
+        result[key].append(dumped)
+        return idx
+
+    for page in pages:
+        dumped_page = page.model_dump(exclude={'view', 'coll', 'coll_sect'}, context={'is_normalized': True})
+        dumped_page['view'] = _ref(page.view, 'views')
+        dumped_page['coll'] = _ref(page.coll, 'collections')
+        dumped_page['coll_sect'] = _ref(page.coll_sect, 'sections')
+        result['pages'].append(dumped_page)
+    return result
 
 
 class StreamingWebViewMeta(BaseModel):
@@ -70,6 +352,21 @@ class AudioStreamingSourceMeta(BaseModel):
     url: str
     mime_type: str
     qn: int
+    duration: Optional[int] = None     # duration of the stream which unit is second
+    is_preview: bool = False           # trial stream which only has clip of the episode
+    index_range: Optional[str] = None  # byte range of segment index, e.g. '1000-1451'
+    bandwidth: Optional[int] = None    # bit per second
+
+
+class DUrlSegmentMeta(BaseModel):
+    """
+    segment of video-audio combined resource, which is legacy MP4 or FLV split in order
+    """
+    order: int
+    url: str
+    backup_urls: List[str] = []
+    size: int    # unit is byte
+    length: int  # duration which unit is millisecond
 
 
 class VideoStreamingSourceMeta(BaseModel):
@@ -78,3 +375,70 @@ class VideoStreamingSourceMeta(BaseModel):
     mime_type: str
     qn: int
     url: str
+    duration: Optional[int] = None     # duration of the stream which unit is second
+    is_preview: bool = False           # trial stream which only has clip of the episode
+    index_range: Optional[str] = None  # byte range of segment index, e.g. '1000-1451'
+    bandwidth: Optional[int] = None    # bit per second
+
+
+class StreamingSourcePolicy(BaseModel):
+    """
+    preference on selecting video and audio sources of pages,
+    same as the arguments of StreamingService.get_page_streaming_src
+
+    the best sources whose size estimated by bandwidth × duration
+    is within byte_budget, and could be downloaded in target_download_seconds
+    under link_speed (byte per second), are selected if any of them is declared
+
+    qualities beyond the entitlement of the account are neither requested nor selected
+    if is_entitlement_capped, which costs one myinfo request per SESSDATA in a while
+
+    trial response, which only has clip of the episode, is rejected unless is_preview_accepted,
+    other accounts of the credential pool are tried before that
+    """
+    is_video_hq_preferred: bool = True
+    video_qn: Optional[int] = None
+    is_video_codec_eff_preferred: bool = True
+    video_codec_number: Optional[int] = None
+    is_audio_hq_preferred: bool = True
+    audio_qn: Optional[int] = None
+    byte_budget: Optional[int] = None
+    target_download_seconds: Optional[float] = None
+    link_speed: Optional[float] = None
+    is_entitlement_capped: bool = False
+    is_preview_accepted: bool = False
+
+    @model_validator(mode='after')
+    def check_link_speed(self) -> 'StreamingSourcePolicy':
+        if self.target_download_seconds is not None and self.link_speed is None:
+            raise ValueError('link_speed is necessary for target_download_seconds')
+        return self
+
+
+class AudioStreamingSourcePolicy(BaseModel):
+    """
+    preference on selecting audio source only, e.g. for lectures and music,
+    same as the arguments of StreamingService.get_page_audio_streaming_src
+
+    no video is selected, and the play request asks for the minimal video variants,
+    Dolby and Hi-Res (FLAC) audio are excluded from selection unless accepted,
+    e.g. for players which only decode AAC
+
+    byte_budget, target_download_seconds and link_speed limit the estimated size of the audio alone,
+    and the rest are the same as StreamingSourcePolicy
+    """
+    is_audio_hq_preferred: bool = True
+    audio_qn: Optional[int] = None
+    is_dolby_accepted: bool = True
+    is_hires_accepted: bool = True
+    byte_budget: Optional[int] = None
+    target_download_seconds: Optional[float] = None
+    link_speed: Optional[float] = None
+    is_entitlement_capped: bool = False
+    is_preview_accepted: bool = False
+
+    @model_validator(mode='after')
+    def check_link_speed(self) -> 'AudioStreamingSourcePolicy':
+        if self.target_download_seconds is not None and self.link_speed is None:
+            raise ValueError('link_speed is necessary for target_download_seconds')
+        return self
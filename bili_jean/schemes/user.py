@@ -0,0 +1,44 @@
+"""
+Scheme definitions of user objects
+"""
+from typing import Optional
+
+from pydantic import BaseModel
+
+from ..constants import AudioBitRateID, QualityNumber
+
+
+class EntitlementProfile(BaseModel):
+    """
+    what the account could play, derived from myinfo response
+
+    | account   | video quality | audio             |
+    |-----------+---------------+-------------------|
+    | anonymous | up to 480P    | up to 192K        |
+    | login     | up to 1080P   | up to 192K        |
+    | VIP       | no limit      | Dolby and Hi-Res  |
+    """
+    is_login: bool = False
+    mid: Optional[int] = None
+    is_vip: bool = False
+    vip_due_time: Optional[int] = None  # unix timestamp which unit is second
+
+    @property
+    def max_video_qn(self) -> Optional[int]:
+        """
+        the highest playable quality number, None if no limit
+        """
+        if self.is_vip:
+            return None
+        if self.is_login:
+            return QualityNumber.P1080.value
+        return QualityNumber.P480.value
+
+    @property
+    def max_audio_qn(self) -> Optional[int]:
+        """
+        the highest playable audio bitrate ID, None if no limit
+        """
+        if self.is_vip:
+            return None
+        return AudioBitRateID.BPS_192K.value.bit_rate_id
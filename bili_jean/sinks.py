@@ -0,0 +1,349 @@
+"""
+Sinks which take the downloaded bytes straight from the socket, rather than a local temporary file
+"""
+from abc import ABC, abstractmethod
+import asyncio
+import inspect
+import io
+import logging
+import os
+from pathlib import Path
+import uuid
+from typing import Any, Callable, IO, List, Optional, Tuple
+
+from .constants import MULTIPART_PART_SIZE
+
+
+__all__ = [
+    'AbstractMultipartUploader',
+    'AbstractSink',
+    'BufferSink',
+    'CallbackSink',
+    'FileObjectSink',
+    'FileSink',
+    'LocalMultipartUploader',
+    'MultipartUploadSink'
+]
+
+
+logger = logging.getLogger(__name__)
+
+
+class AbstractSink(ABC):
+    """
+    Destination of the downloaded bytes, refer to PageDownloadService.download_to
+
+    chunks are written in order, then either close is called once all of them are written,
+    or abort is called once the download fails, which should discard what has been written if possible
+    """
+
+    @abstractmethod
+    def write(self, chunk: bytes) -> int:
+        """
+        :return: size of the chunk
+        """
+
+    def close(self) -> None:
+        pass
+
+    def abort(self) -> None:
+        pass
+
+
+class FileSink(AbstractSink):
+    """
+    write to the local file, which is written as '.part' and renamed once completed
+    """
+
+    def __init__(self, file: str):
+        self._path = Path(file)
+        if self._path.is_dir():
+            raise ValueError('The value of \'file\' should be a file path')
+        self._tmp_path = Path(''.join([str(self._path), '.part']))
+        self._fp: Optional[IO[bytes]] = None
+
+    def write(self, chunk: bytes) -> int:
+        if self._fp is None:
+            self._path.parent.mkdir(parents=True, exist_ok=True)
+            self._fp = open(str(self._tmp_path.resolve()), 'wb')
+        return self._fp.write(chunk)
+
+    def close(self) -> None:
+        if self._fp is None:
+            # empty resource
+            self.write(b'')
+        if self._fp is not None:
+            self._fp.close()
+        self._tmp_path.rename(self._path)
+
+    def abort(self) -> None:
+        if self._fp is not None:
+            self._fp.close()
+            self._tmp_path.unlink(missing_ok=True)
+
+
+class BufferSink(AbstractSink):
+    """
+    keep the bytes in memory, e.g. to fingerprint a short clip
+    """
+
+    def __init__(self, max_size: Optional[int] = None):
+        """
+        :param max_size: maximum of bytes to keep, no limit if None
+        :type max_size: Optional[int]
+        """
+        self._buffer = io.BytesIO()
+        self._max_size = max_size
+
+    @property
+    def size(self) -> int:
+        return self._buffer.tell()
+
+    def write(self, chunk: bytes) -> int:
+        if self._max_size is not None and self.size + len(chunk) > self._max_size:
+            raise ValueError(f'Buffer exceeds {self._max_size} bytes')
+        return self._buffer.write(chunk)
+
+    def getvalue(self) -> bytes:
+        return self._buffer.getvalue()
+
+    def getbuffer(self) -> memoryview:
+        """
+        view of the bytes without copying them
+        """
+        return self._buffer.getbuffer()
+
+
+class FileObjectSink(AbstractSink):
+    """
+    write to a writable file object, e.g. stdin of a subprocess or a socket file,
+    which is owned by the caller and is not closed unless is_closed
+    """
+
+    def __init__(self, fp: IO[bytes], is_closed: bool = False):
+        self._fp = fp
+        self._is_closed = is_closed
+
+    def write(self, chunk: bytes) -> int:
+        self._fp.write(chunk)
+        return len(chunk)
+
+    def close(self) -> None:
+        self._fp.flush()
+        if self._is_closed:
+            self._fp.close()
+
+    def abort(self) -> None:
+        if self._is_closed:
+            self._fp.close()
+
+
+class CallbackSink(AbstractSink):
+    """
+    pass each chunk to a callback, which could be a coroutine function
+
+    coroutine is run on the given event loop, e.g. the one of the application, and waited,
+    so the download is held back by a slow consumer rather than buffering in memory,
+    otherwise it is run on a private event loop of the sink
+    """
+
+    def __init__(
+        self,
+        callback: Callable[[bytes], Any],
+        loop: Optional[asyncio.AbstractEventLoop] = None,
+        on_close: Optional[Callable[[], Any]] = None,
+        on_abort: Optional[Callable[[], Any]] = None
+    ):
+        """
+        :param callback: function or coroutine function called with each chunk
+        :type callback: Callable[[bytes], Any]
+        :param loop: running event loop of another thread to run coroutines on
+        :type loop: Optional[asyncio.AbstractEventLoop]
+        :param on_close: function or coroutine function called once all of chunks are passed
+        :type on_close: Optional[Callable[[], Any]]
+        :param on_abort: function or coroutine function called once the download fails
+        :type on_abort: Optional[Callable[[], Any]]
+        """
+        self._callback = callback
+        self._loop = loop
+        self._private_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._on_close = on_close
+        self._on_abort = on_abort
+
+    def write(self, chunk: bytes) -> int:
+        self._wait(self._callback(chunk))
+        return len(chunk)
+
+    def close(self) -> None:
+        try:
+            if self._on_close is not None:
+                self._wait(self._on_close())
+        finally:
+            self._close_private_loop()
+
+    def abort(self) -> None:
+        try:
+            if self._on_abort is not None:
+                self._wait(self._on_abort())
+        finally:
+            self._close_private_loop()
+
+    def _wait(self, result: Any) -> Any:
+        if not inspect.iscoroutine(result):
+            return result
+        if self._loop is not None:
+            return asyncio.run_coroutine_threadsafe(result, self._loop).result()
+        if self._private_loop is None:
+            self._private_loop = asyncio.new_event_loop()
+        return self._private_loop.run_until_complete(result)
+
+    def _close_private_loop(self) -> None:
+        if self._private_loop is not None:
+            self._private_loop.close()
+            self._private_loop = None
+
+
+class AbstractMultipartUploader(ABC):
+    """
+    Client of the multipart upload of object storage, e.g. S3 compatible ones
+    """
+
+    @abstractmethod
+    def create_upload(self, key: str) -> str:
+        """
+        :return: upload id
+        """
+
+    @abstractmethod
+    def upload_part(self, key: str, upload_id: str, part_number: int, data: bytes) -> str:
+        """
+        :param part_number: number of the part, which starts from 1
+        :type part_number: int
+        :return: ETag of the part
+        """
+
+    @abstractmethod
+    def complete_upload(self, key: str, upload_id: str, parts: List[Tuple[int, str]]) -> None:
+        """
+        :param parts: number and ETag of each part, in order
+        :type parts: List[Tuple[int, str]]
+        """
+
+    @abstractmethod
+    def abort_upload(self, key: str, upload_id: str) -> None:
+        """
+        discard the parts uploaded
+        """
+
+
+class LocalMultipartUploader(AbstractMultipartUploader):
+    """
+    stand-in of object storage on local directory, e.g. for tests,
+    parts are kept as files of the upload until it is completed into the object '{directory}/{key}'
+    """
+
+    def __init__(self, directory: str):
+        self._directory = Path(directory)
+
+    def get_object_path(self, key: str) -> Path:
+        return self._directory / key
+
+    def create_upload(self, key: str) -> str:
+        upload_id = uuid.uuid4().hex
+        self._get_upload_path(upload_id).mkdir(parents=True)
+        return upload_id
+
+    def upload_part(self, key: str, upload_id: str, part_number: int, data: bytes) -> str:
+        if part_number < 1:
+            raise ValueError(f'Invalid part number {part_number}')
+        with open(str(self._get_upload_path(upload_id) / str(part_number)), 'wb') as fp:
+            fp.write(data)
+        return f'"{upload_id}-{part_number}"'
+
+    def complete_upload(self, key: str, upload_id: str, parts: List[Tuple[int, str]]) -> None:
+        upload_path = self._get_upload_path(upload_id)
+        object_path = self.get_object_path(key)
+        object_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(str(object_path), 'wb') as fp:
+            for part_number, etag in parts:
+                if etag != f'"{upload_id}-{part_number}"':
+                    raise ValueError(f'Invalid ETag {etag} of part {part_number}')
+                with open(str(upload_path / str(part_number)), 'rb') as part_fp:
+                    fp.write(part_fp.read())
+        self.abort_upload(key, upload_id)
+
+    def abort_upload(self, key: str, upload_id: str) -> None:
+        upload_path = self._get_upload_path(upload_id)
+        if not upload_path.exists():
+            return
+        for part_path in upload_path.iterdir():
+            part_path.unlink()
+        os.rmdir(str(upload_path))
+
+    def _get_upload_path(self, upload_id: str) -> Path:
+        return self._directory / '.uploads' / upload_id
+
+
+class MultipartUploadSink(AbstractSink):
+    """
+    upload to object storage by multipart upload,
+    chunks are gathered into parts of part_size in memory, and each part is uploaded once it is full,
+    so memory is bounded by one part however large the resource is
+    """
+
+    def __init__(self, uploader: AbstractMultipartUploader, key: str, part_size: int = MULTIPART_PART_SIZE):
+        """
+        :param uploader: client of object storage
+        :type uploader: AbstractMultipartUploader
+        :param key: key of the object
+        :type key: str
+        :param part_size: bytes of each part except the last one, e.g. at least 5 MiB for S3
+        :type part_size: int
+        """
+        if part_size <= 0:
+            raise ValueError('The value of \'part_size\' should be positive')
+        self._uploader = uploader
+        self._key = key
+        self._part_size = part_size
+        self._upload_id: Optional[str] = None
+        self._chunks: List[bytes] = []
+        self._buffered_size = 0
+        self._parts: List[Tuple[int, str]] = []
+
+    @property
+    def parts(self) -> List[Tuple[int, str]]:
+        return list(self._parts)
+
+    def write(self, chunk: bytes) -> int:
+        if self._upload_id is None:
+            self._upload_id = self._uploader.create_upload(self._key)
+        self._chunks.append(chunk)
+        self._buffered_size += len(chunk)
+        if self._buffered_size >= self._part_size:
+            self._upload_part()
+        return len(chunk)
+
+    def close(self) -> None:
+        if self._upload_id is None:
+            self._upload_id = self._uploader.create_upload(self._key)
+        if self._chunks or not self._parts:
+            self._upload_part()
+        self._uploader.complete_upload(self._key, self._upload_id, self._parts)
+
+    def abort(self) -> None:
+        if self._upload_id is None:
+            return
+        try:
+            self._uploader.abort_upload(self._key, self._upload_id)
+        except Exception as e:
+            logger.warning(f'Abort upload {self._upload_id} of {self._key} failed: {e}')
+
+    def _upload_part(self) -> None:
+        if self._upload_id is None:
+            raise ValueError('Upload is not created')
+        data = self._chunks[0] if len(self._chunks) == 1 else b''.join(self._chunks)
+        self._chunks = []
+        self._buffered_size = 0
+        part_number = len(self._parts) + 1
+        etag = self._uploader.upload_part(self._key, self._upload_id, part_number, data)
+        self._parts.append((part_number, etag))
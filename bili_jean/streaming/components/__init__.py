@@ -2,7 +2,7 @@
 Components on streaming resource manipulation
 """
 from ...constants import StreamingCategory
-from .base import AbstractStreamingComponent
+from .base import AbstractStreamingComponent, PreviewStreamError  # NOQA
 from .pgc import PGCComponent  # NOQA
 from .pugv import PUGVComponent  # NOQA
 from .ugc import UGCComponent  # NOQA
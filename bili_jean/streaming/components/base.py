@@ -2,22 +2,53 @@
 Base streaming component
 """
 from abc import ABC, abstractmethod
-from typing import Any, List, Optional, Tuple, Union
+import logging
+from typing import Any, ClassVar, Dict, Iterator, List, Optional, Set, Tuple, Union
 
-from ...constants import AudioBitRateID
+from ...constants import (
+    AudioBitRateID,
+    FormatNumberValue,
+    PREVIEW_DURATION_RATIO,
+    QualityNumber,
+    StreamingCategory,
+    THROTTLED_CODES
+)
+from ...credential_pool import CredentialPool, CredentialPoolError
 from ...schemes import (
     AudioStreamingSourceMeta,
+    AudioStreamingSourcePolicy,
     DashMediaItem,
+    DUrlSegmentMeta,
     GetPGCPlayResponse,
     GetPUGVPlayResponse,
     GetUGCPlayResponse,
+    EntitlementProfile,
     Page,
+    StreamingSourcePolicy,
     VideoStreamingSourceMeta
 )
+from ...user_service import UserService, UserServiceError
+from ..play_url_cache import play_url_cache
+from ..stream_catalog import StreamCatalog
+
+
+logger = logging.getLogger(__name__)
+
+
+class PreviewStreamError(Exception):
+    """
+    only trial streams, which are clips of the episode, are available for the request
+    """
+
+    def __init__(self, message):
+        self.message = message
+        super().__init__(self.message)
 
 
 class AbstractStreamingComponent(ABC):
 
+    streaming_category: ClassVar[Optional[StreamingCategory]] = None
+
     @classmethod
     @abstractmethod
     def get_views(cls, *args: Any, **kwargs: Any) -> Optional[List[Page]]:
@@ -25,6 +56,15 @@ class AbstractStreamingComponent(ABC):
         get normalized views info
         """
 
+    @classmethod
+    @abstractmethod
+    def iter_views(cls, *args: Any, **kwargs: Any) -> Iterator[Page]:
+        """
+        lazily yield normalized views info one page after another
+        :key is_selected_only: only yield the requested pages, type is bool, default is False
+        :key section_ids: only yield pages of these sections, type is Optional[Iterable[int]]
+        """
+
     @classmethod
     def get_page_streaming_src(
         cls,
@@ -32,35 +72,298 @@ class AbstractStreamingComponent(ABC):
         **kwargs: Any
     ) -> Tuple[VideoStreamingSourceMeta, AudioStreamingSourceMeta]:
         """
-        get source URL of streaming, including both video and audio
+        get source URL of streaming, including both video and audio,
+        PreviewStreamError is raised before any download if only trial streams are available,
+        unless is_preview_accepted
+        """
+        catalog = cls.get_stream_catalog(*args, **kwargs)
+        policy = cls.get_streaming_source_policy(**kwargs)
+        if catalog.is_preview and not policy.is_preview_accepted:
+            raise PreviewStreamError(
+                f'Only trial of {catalog.duration} seconds is available, '
+                f'full duration is {catalog.full_duration} seconds'
+            )
+        video_media, audio_media = catalog.select_by_policy(policy)
+        return (
+            cls._to_video_src(video_media, duration=catalog.duration, is_preview=catalog.is_preview),
+            cls._to_audio_src(audio_media, duration=catalog.duration, is_preview=catalog.is_preview)
+        )
+
+    @classmethod
+    def get_page_audio_streaming_src(cls, *args: Any, **kwargs: Any) -> AudioStreamingSourceMeta:
+        """
+        get source URL of audio streaming only, video is neither selected nor necessary,
+        and the play request asks for the minimal video variants,
+        PreviewStreamError is raised as well unless is_preview_accepted
+        """
+        policy = cls.get_audio_streaming_source_policy(**kwargs)
+        request_audio_qn = policy.audio_qn
+        if request_audio_qn is None and not policy.is_dolby_accepted and not policy.is_hires_accepted:
+            request_audio_qn = AudioBitRateID.BPS_192K.value.bit_rate_id
+        catalog = cls.get_stream_catalog(*args, **{
+            **kwargs,
+            'is_video_hq_preferred': False,
+            'video_qn': None,
+            'is_video_codec_eff_preferred': False,
+            'video_codec_number': None,
+            'is_audio_hq_preferred': policy.is_audio_hq_preferred,
+            'audio_qn': request_audio_qn,
+            # the policy is capped already
+            'is_entitlement_capped': False
+        })
+        if catalog.is_preview and not policy.is_preview_accepted:
+            raise PreviewStreamError(
+                f'Only trial of {catalog.duration} seconds is available, '
+                f'full duration is {catalog.full_duration} seconds'
+            )
+        audio_media = catalog.select_audio_by_policy(policy)
+        return cls._to_audio_src(audio_media, duration=catalog.duration, is_preview=catalog.is_preview)
+
+    @classmethod
+    def get_page_durl_segments(cls, *args: Any, **kwargs: Any) -> List[DUrlSegmentMeta]:
+        """
+        get segments of video-audio combined resource in order,
+        which is responded instead of DASH by some legacy resources or format number values,
+        PreviewStreamError is raised as well unless is_preview_accepted
+        :key page_duration: duration of the episode from the view which unit is second, to detect trial
+        """
+        play_dm = cls._get_play_cached(*args, **kwargs)
+        segments = cls._get_play_durl_segments(play_dm=play_dm)
+        if not segments:
+            raise ValueError('No durl segment is responded')
+        if not kwargs.get('is_preview_accepted') and cls._is_play_preview(
+            play_dm,
+            page_duration=kwargs.get('page_duration')
+        ):
+            raise PreviewStreamError(
+                f'Only trial of {cls._get_play_duration(play_dm=play_dm)} seconds is available'
+            )
+        return sorted(segments, key=lambda segment: segment.order)
+
+    @staticmethod
+    def get_audio_streaming_source_policy(**kwargs: Any) -> AudioStreamingSourcePolicy:
+        """
+        collect preference on selecting audio source only from keyword arguments,
+        the missing or None ones are defaults of AudioStreamingSourcePolicy
+        """
+        policy = AudioStreamingSourcePolicy(**{
+            field_name: kwargs[field_name]
+            for field_name in AudioStreamingSourcePolicy.model_fields
+            if kwargs.get(field_name) is not None
+        })
+        if policy.is_entitlement_capped:
+            profile = UserService.get_entitlement_profile(sess_data=kwargs.get('sess_data'))
+            audio_qn = cap_audio_qn(policy.audio_qn, policy.is_audio_hq_preferred, profile)
+            if audio_qn is not None:
+                policy = policy.model_copy(update={'audio_qn': audio_qn})
+        return policy
+
+    @staticmethod
+    def get_streaming_source_policy(**kwargs: Any) -> StreamingSourcePolicy:
+        """
+        collect preference on selecting sources from keyword arguments,
+        the missing or None ones are defaults of StreamingSourcePolicy
+        """
+        policy = StreamingSourcePolicy(**{
+            field_name: kwargs[field_name]
+            for field_name in StreamingSourcePolicy.model_fields
+            if kwargs.get(field_name) is not None
+        })
+        if policy.is_entitlement_capped:
+            profile = UserService.get_entitlement_profile(sess_data=kwargs.get('sess_data'))
+            policy = cap_streaming_source_policy(policy, profile)
+        return policy
+
+    @classmethod
+    def resolve_stream_url(cls, *args: Any, **kwargs: Any) -> str:
+        """
+        resolve URL of the exact stream again, e.g. when the former signed URL expires
+        :key qn: quality number of video, or bitrate ID of audio, type is int
+        :key codec_id: codec ID of video, type is Optional[int]
+        :key is_audio: the stream is audio or not, type is bool, default is False
+        """
+        qn = kwargs['qn']
+        codec_id = kwargs.get('codec_id')
+        # only the stream itself is necessary, which keeps the play request minimal
+        if kwargs.get('is_audio'):
+            catalog = cls.get_stream_catalog(*args, **{**kwargs, 'audio_qn': qn, 'is_video_hq_preferred': False})
+            media = catalog.select_audio(qn=qn)
+        else:
+            catalog = cls.get_stream_catalog(*args, **{
+                **kwargs,
+                'video_qn': qn,
+                'video_codec_number': codec_id,
+                'is_audio_hq_preferred': False
+            })
+            media = catalog.select_video(qn=qn, codec_id=codec_id)
+        if media.id_field != qn or (not kwargs.get('is_audio') and codec_id is not None and media.codecid != codec_id):
+            raise ValueError(f'Stream with quality number {qn} and codec ID {codec_id} is unavailable')
+        return media.base_url
+
+    @classmethod
+    def get_stream_catalog(cls, *args: Any, **kwargs: Any) -> StreamCatalog:
+        """
+        request play data once, and index all of its streams,
+        the catalog could answer selection queries repeatedly, e.g. for fallback
+        :key page_duration: duration of the episode from the view which unit is second,
+                            to detect trial streams, full duration in play data is used if None
+        """
+        play_dm = cls._get_play_cached(*args, **kwargs)
+        return cls._build_stream_catalog(play_dm, page_duration=kwargs.get('page_duration'))
+
+    @classmethod
+    def _get_play_cached(
+        cls,
+        *args: Any,
+        **kwargs: Any
+    ) -> Union[GetPGCPlayResponse, GetPUGVPlayResponse, GetUGCPlayResponse]:
+        """
+        request play data unless a cached one whose URLs are still valid exists
         """
-        play_dm = cls._get_play(*args, **kwargs)
+        format_params = cls._get_format_params(**kwargs)
+        cache_key = play_url_cache.make_key(
+            cls.streaming_category,
+            kwargs.get('cid'),
+            kwargs.get('ep_id'),
+            kwargs.get('sess_data'),
+            format_params['fnval'],
+            format_params['fourk']
+        )
+        cached_play_dm: Optional[Union[GetPGCPlayResponse, GetPUGVPlayResponse, GetUGCPlayResponse]] = (
+            play_url_cache.get(cache_key)
+        )
+        if cached_play_dm is not None:
+            return cached_play_dm
+
+        play_dm = cls._request_play(*args, **kwargs)
         if play_dm.code != 0:
             raise ValueError(f'request play data error: {play_dm.message}')
+        play_url_cache.put(cache_key, play_dm)
+        return play_dm
 
-        is_video_hq_preferred = kwargs.get('is_video_hq_preferred')
-        if is_video_hq_preferred is None:
-            is_video_hq_preferred = True
-        is_video_codec_eff_preferred = kwargs.get('is_video_codec_eff_preferred')
-        if is_video_codec_eff_preferred is None:
-            is_video_codec_eff_preferred = True
-        video_src = cls._get_play_video_src(
-            media_items=cls._get_play_video_pool(play_dm=play_dm),
-            is_hq_preferred=is_video_hq_preferred,
-            qn=kwargs.get('video_qn'),
-            is_codec_eff_preferred=is_video_codec_eff_preferred,
-            codec_id=kwargs.get('video_codec_number')
+    @classmethod
+    def _request_play(
+        cls,
+        *args: Any,
+        **kwargs: Any
+    ) -> Union[GetPGCPlayResponse, GetPUGVPlayResponse, GetUGCPlayResponse]:
+        """
+        request play data, by one credential of the pool if sess_data is CredentialPool
+
+        * VIP qualities are only requested by VIP accounts,
+          and VIP accounts are preferred if the highest quality is preferred
+        * throttled credential is reported, then the next one is tried
+        * the next one is tried as well if trial is responded, which could be entitled,
+          unless trial is accepted
+        """
+        pool = kwargs.get('sess_data')
+        if not isinstance(pool, CredentialPool):
+            return cls._get_play(*args, **kwargs)
+
+        policy = cls.get_streaming_source_policy(**kwargs)
+        is_vip_needed = (
+            (policy.video_qn is not None and QualityNumber.from_value(policy.video_qn).is_vip_needed)
+            or (
+                policy.audio_qn is not None
+                and AudioBitRateID.from_value(policy.audio_qn).value.quality >= AudioBitRateID.BPS_DOLBY.value.quality
+            )
         )
+        is_vip_preferred = is_vip_needed or (policy.video_qn is None and policy.is_video_hq_preferred)
+
+        play_dm = None
+        tried_sess_datas: Set[str] = set()
+        for _ in range(len(pool)):
+            sess_data = None
+            if is_vip_preferred:
+                sess_data = pool.acquire(
+                    predicate=lambda item: item not in tried_sess_datas and cls._is_vip_credential(pool, item)
+                )
+            if sess_data is None and not is_vip_needed:
+                sess_data = pool.acquire(predicate=lambda item: item not in tried_sess_datas)
+            if sess_data is None:
+                break
+            tried_sess_datas.add(sess_data)
+            play_dm = cls._get_play(*args, **{**kwargs, 'sess_data': sess_data})
+            if play_dm.code in THROTTLED_CODES:
+                pool.report_throttled(sess_data)
+                continue
+            if (
+                play_dm.code == 0
+                and not policy.is_preview_accepted
+                and cls._is_play_preview(play_dm, page_duration=kwargs.get('page_duration'))
+            ):
+                continue
+            return play_dm
+        if play_dm is None:
+            raise CredentialPoolError('No SESSDATA in the pool is available for the request')
+        return play_dm
+
+    @staticmethod
+    def _is_vip_credential(pool: CredentialPool, sess_data: str) -> bool:
+        """
+        the account whose entitlement is unknown, e.g. myinfo is throttled, is not VIP,
+        and it is cooled down in the pool rather than failing the request
+        """
+        try:
+            return UserService.is_vip(sess_data)
+        except UserServiceError as e:
+            logger.warning(f'Entitlement of a credential is unknown: {e.message}')
+            pool.report_throttled(sess_data)
+            return False
+
+    @classmethod
+    def _build_stream_catalog(
+        cls,
+        play_dm: Union[GetPGCPlayResponse, GetPUGVPlayResponse, GetUGCPlayResponse],
+        page_duration: Optional[int] = None
+    ) -> StreamCatalog:
+        return StreamCatalog(
+            video_items=cls._get_play_video_pool(play_dm=play_dm),
+            audio_items=cls._get_play_audio_pool(play_dm=play_dm),
+            duration=cls._get_play_duration(play_dm=play_dm),
+            is_preview=cls._is_play_preview(play_dm, page_duration=page_duration),
+            full_duration=page_duration if page_duration is not None else cls._get_play_full_duration(play_dm=play_dm)
+        )
+
+    @classmethod
+    def _is_play_preview(
+        cls,
+        play_dm: Union[GetPGCPlayResponse, GetPUGVPlayResponse, GetUGCPlayResponse],
+        page_duration: Optional[int] = None
+    ) -> bool:
+        """
+        play data is trial if it is flagged,
+        or its streams are obviously shorter than the episode
+        """
+        if cls._is_play_preview_flagged(play_dm=play_dm):
+            return True
+        duration = cls._get_play_duration(play_dm=play_dm)
+        full_duration = page_duration if page_duration is not None else cls._get_play_full_duration(play_dm=play_dm)
+        if duration is None or full_duration is None:
+            return False
+        return duration < full_duration * PREVIEW_DURATION_RATIO
 
-        is_audio_hq_preferred = kwargs.get('is_audio_hq_preferred')
-        if is_audio_hq_preferred is None:
-            is_audio_hq_preferred = True
-        audio_src = cls._get_play_audio_src(
-            media_items=cls._get_play_audio_pool(play_dm=play_dm),
-            is_hq_preferred=is_audio_hq_preferred,
-            qn=kwargs.get('audio_qn')
+    @classmethod
+    def _get_format_params(cls, *args: Any, **kwargs: Any) -> Dict[str, int]:
+        """
+        get the minimal 'fnval' and 'fourk' of play request by the preference on selecting sources,
+        so that variants which would never be selected are not responded
+        """
+        policy = cls.get_streaming_source_policy(**kwargs)
+        if policy.audio_qn is not None:
+            is_dolby_audio = (
+                AudioBitRateID.from_value(policy.audio_qn).value.quality >= AudioBitRateID.BPS_DOLBY.value.quality
+            )
+        else:
+            is_dolby_audio = policy.is_audio_hq_preferred
+        fnval = FormatNumberValue.get_minimal_format_number_value(
+            qn=policy.video_qn,
+            is_hq_preferred=policy.is_video_hq_preferred,
+            codec_id=policy.video_codec_number,
+            is_codec_eff_preferred=policy.is_video_codec_eff_preferred,
+            is_dolby_audio=is_dolby_audio
         )
-        return video_src, audio_src
+        return {'fnval': fnval, 'fourk': FormatNumberValue.get_fourk(fnval)}
 
     @classmethod
     @abstractmethod
@@ -73,64 +376,37 @@ class AbstractStreamingComponent(ABC):
         get play response data model
         """
 
-    @classmethod
-    def _get_play_video_src(
-        cls,
-        media_items: List[DashMediaItem],
-        is_hq_preferred: bool = True,
-        qn: Optional[int] = None,
-        is_codec_eff_preferred: bool = True,
-        codec_id: Optional[int] = None
+    @staticmethod
+    def _to_video_src(
+        media: DashMediaItem,
+        duration: Optional[int] = None,
+        is_preview: bool = False
     ) -> VideoStreamingSourceMeta:
-        avail_hqs: List[int] = list(set([item.id_field for item in media_items]))
-        avail_hqs.sort(reverse=is_hq_preferred)
-        if qn is not None:
-            avail_hqs = [avail_hq for avail_hq in avail_hqs if avail_hq <= qn]
-            if avail_hqs:
-                avail_hqs.sort(reverse=True)
-        qn, *_ = avail_hqs
-        media_items = [item for item in media_items if item.id_field == qn]
-
-        avail_codec_ids: List[int] = list(set([item.codecid for item in media_items]))
-        avail_codec_ids.sort(reverse=is_codec_eff_preferred)
-        if codec_id is not None:
-            avail_codec_ids = [avail_codec_id for avail_codec_id in avail_codec_ids if avail_codec_id <= codec_id]
-            if avail_codec_ids:
-                avail_codec_ids.sort(reverse=True)
-        codec_id, *_ = avail_codec_ids
-        media, *_ = [item for item in media_items if item.codecid == codec_id]
         return VideoStreamingSourceMeta(
             url=media.base_url,
             codec_id=media.codecid,
             qn=media.id_field,
-            mime_type=media.mime_type
+            mime_type=media.mime_type,
+            duration=duration,
+            is_preview=is_preview,
+            index_range=media.segment_base.index_range if media.segment_base is not None else None,
+            bandwidth=media.bandwidth
         )
 
-    @classmethod
-    def _get_play_audio_src(
-        cls,
-        media_items: List[DashMediaItem],
-        is_hq_preferred: bool = True,
-        qn: Optional[int] = None
+    @staticmethod
+    def _to_audio_src(
+        media: DashMediaItem,
+        duration: Optional[int] = None,
+        is_preview: bool = False
     ) -> AudioStreamingSourceMeta:
-        avail_bitrates = list(set([
-            AudioBitRateID.from_value(media_item.id_field)
-            for media_item in media_items
-        ]))
-        avail_bitrates.sort(key=lambda item: item.value.quality, reverse=is_hq_preferred)
-        if qn is not None:
-            avail_bitrates = [
-                avail_bitrate for avail_bitrate in avail_bitrates
-                if avail_bitrate.value.quality <= AudioBitRateID.from_value(qn).value.quality
-            ]
-            if avail_bitrates:
-                avail_bitrates.sort(key=lambda item: item.value.quality, reverse=True)
-        target_bit_rate, *_ = avail_bitrates
-        media, *_ = [item for item in media_items if item.id_field == target_bit_rate.value.bit_rate_id]
         return AudioStreamingSourceMeta(
             url=media.base_url,
             qn=media.id_field,
-            mime_type=media.mime_type
+            mime_type=media.mime_type,
+            duration=duration,
+            is_preview=is_preview,
+            index_range=media.segment_base.index_range if media.segment_base is not None else None,
+            bandwidth=media.bandwidth
         )
 
     @classmethod
@@ -148,3 +424,78 @@ class AbstractStreamingComponent(ABC):
         get list of media items about audio resource
         :key play_dm: data model of the response from Play endpoint
         """
+
+    @classmethod
+    @abstractmethod
+    def _get_play_durl_segments(cls, *args: Any, **kwargs: Any) -> List[DUrlSegmentMeta]:
+        """
+        get segments of video-audio combined resource
+        :key play_dm: data model of the response from Play endpoint
+        """
+
+    @classmethod
+    @abstractmethod
+    def _get_play_duration(cls, *args: Any, **kwargs: Any) -> Optional[int]:
+        """
+        get duration of the streams which unit is second
+        :key play_dm: data model of the response from Play endpoint
+        """
+
+    @classmethod
+    @abstractmethod
+    def _get_play_full_duration(cls, *args: Any, **kwargs: Any) -> Optional[int]:
+        """
+        get full duration of the episode which unit is second, which could be longer than the trial streams
+        :key play_dm: data model of the response from Play endpoint
+        """
+
+    @classmethod
+    @abstractmethod
+    def _is_play_preview_flagged(cls, *args: Any, **kwargs: Any) -> bool:
+        """
+        play data is flagged as trial or not
+        :key play_dm: data model of the response from Play endpoint
+        """
+
+
+def cap_streaming_source_policy(
+    policy: StreamingSourcePolicy,
+    profile: EntitlementProfile
+) -> StreamingSourcePolicy:
+    """
+    bound quality of the policy by the entitlement of the account,
+    the bound is not applied if lower quality is preferred, which never reaches it
+    """
+    update = {}
+    max_video_qn = profile.max_video_qn
+    if max_video_qn is not None:
+        if policy.video_qn is not None:
+            update['video_qn'] = min(policy.video_qn, max_video_qn)
+        elif policy.is_video_hq_preferred:
+            update['video_qn'] = max_video_qn
+    audio_qn = cap_audio_qn(policy.audio_qn, policy.is_audio_hq_preferred, profile)
+    if audio_qn is not None:
+        update['audio_qn'] = audio_qn
+    return policy.model_copy(update=update)
+
+
+def cap_audio_qn(
+    audio_qn: Optional[int],
+    is_audio_hq_preferred: bool,
+    profile: EntitlementProfile
+) -> Optional[int]:
+    """
+    bound audio bitrate ID by the entitlement of the account
+    :return: the bound bitrate ID, None if the preference is kept
+    """
+    max_audio_qn = profile.max_audio_qn
+    if max_audio_qn is None:
+        return None
+    if audio_qn is not None:
+        max_audio_quality = AudioBitRateID.from_value(max_audio_qn).value.quality
+        if AudioBitRateID.from_value(audio_qn).value.quality > max_audio_quality:
+            return max_audio_qn
+        return None
+    if is_audio_hq_preferred:
+        return max_audio_qn
+    return None
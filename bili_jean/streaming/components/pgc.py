@@ -1,17 +1,22 @@
 """
 Manipulate PGC resources
 """
-from typing import Any, List, Optional, Tuple, Union
+from typing import Any, Iterable, Iterator, List, Optional, Tuple, Union
 
-from ...constants import FormatNumberValue, StreamingCategory
+from ...constants import StreamingCategory
 from ...proxy_service import ProxyService
 from ...schemes import (
     AudioStreamingSourceMeta,
+    Collection,
+    CollectionSection,
     DashMediaItem,
+    DUrlSegmentMeta,
     GetPGCPlayResponse,
     GetPGCViewResponse,
+    Owner,
     Page,
-    VideoStreamingSourceMeta
+    VideoStreamingSourceMeta,
+    View
 )
 from ...schemes.proxy.pgc_view import (
     GetPGCViewResultEpisodesItem,
@@ -32,14 +37,38 @@ class PGCComponent(AbstractStreamingComponent):
         :key aid: AV ID of a PGC resource, type is int
         :key sess_data: cookie of Bilibili user which key is SESSDATA, type is str
         """
-        view_response = ProxyService.get_pgc_view(
+        view_response = cls._get_view(**kwargs)
+        req_ep_id = kwargs.get('ep_id')
+        result = cls._parse_raw_view(view_response, req_ep_id)
+        return result
+
+    @classmethod
+    def iter_views(cls, *args: Any, **kwargs: Any) -> Iterator[Page]:  # NOQA
+        """
+        lazily yield normalized views info
+        :key season_id: ssid of a PGC resource, type is int
+        :key ep_id: ep_id of a PGC resource, type is int
+        :key sess_data: cookie of Bilibili user which key is SESSDATA, type is str
+        :key is_selected_only: only yield the requested episode, type is bool, default is False
+        :key section_ids: only yield pages of these sections, type is Optional[Iterable[int]]
+                          main episodes are addressed by season_id,
+                          side stories by the identifier of their own section
+        """
+        view_response = cls._get_view(**kwargs)
+        return cls._iter_raw_view(
+            view_response,
+            kwargs.get('ep_id'),
+            is_selected_only=kwargs.get('is_selected_only') or False,
+            section_ids=kwargs.get('section_ids')
+        )
+
+    @classmethod
+    def _get_view(cls, **kwargs: Any) -> GetPGCViewResponse:
+        return ProxyService.get_pgc_view(
             season_id=kwargs.get('season_id'),
             ep_id=kwargs.get('ep_id'),
             sess_data=kwargs.get('sess_data')
         )
-        req_ep_id = kwargs.get('ep_id')
-        result = cls._parse_raw_view(view_response, req_ep_id)
-        return result
 
     @classmethod
     def _parse_raw_view(
@@ -47,54 +76,87 @@ class PGCComponent(AbstractStreamingComponent):
         view_response: GetPGCViewResponse,
         ep_id: Optional[int] = None
     ) -> Optional[List[Page]]:
+        if view_response.result is None:
+            return None
+        return list(cls._iter_raw_view(view_response, ep_id))
+
+    @classmethod
+    def _iter_raw_view(
+        cls,
+        view_response: GetPGCViewResponse,
+        ep_id: Optional[int] = None,
+        is_selected_only: bool = False,
+        section_ids: Optional[Iterable[int]] = None
+    ) -> Iterator[Page]:
+        """
+        yield normalized pages one by one,
+        filters are checked before a page is built,
+        so skipped pages never cost a Page instance
+        """
         view_data = view_response.result
         if view_data is None:
-            return None
+            return
+
+        target_section_ids = set(section_ids) if section_ids is not None else None
 
-        view_owner_id, view_owner_name, view_owner_avatar_url = None, None, None
+        owner: Optional[Owner] = None
         if view_data.up_info is not None:
-            view_owner_id = view_data.up_info.mid
-            view_owner_name = view_data.up_info.uname
-            view_owner_avatar_url = view_data.up_info.avatar
-
-        series_id = view_data.series.series_id if view_data.series.series_id != 0 else None
-        series_title = view_data.series.series_title if view_data.series.series_title else None
-
-        result = []
-        for idx, episode in enumerate(view_data.episodes):
-            normalized_page = Page(
-                page_category=StreamingCategory.PGC.value,
-                page_cid=episode.cid,
-                page_title=cls._process_title(episode),
-                page_duration=cls._process_duration(episode),
-                view_aid=episode.aid,
-                view_bvid=episode.bvid,
-                view_ep_id=episode.ep_id,
-                view_season_id=view_data.season_id,
-                view_title=cls._process_title(episode),
-                view_desc='',
-                view_cover_url=episode.cover,
-                view_pub_time=episode.pub_time,
-                view_duration=cls._process_duration(episode),
-                view_owner_id=view_owner_id,
-                view_owner_name=view_owner_name,
-                view_owner_avatar_url=view_owner_avatar_url,
-                coll_id=series_id,
-                coll_title=series_title,
-                coll_owner_id=view_owner_id,
-                coll_owner_name=view_owner_name,
-                coll_owner_avatar_url=view_owner_avatar_url,
-                coll_sect_id=view_data.season_id,
-                coll_sect_title=view_data.season_title,
-                is_selected_page=False
+            owner = Owner.trusted(
+                mid=view_data.up_info.mid,
+                name=view_data.up_info.uname,
+                avatar_url=view_data.up_info.avatar
             )
-            # 1. if request by season_id, choose first one as default selected episode
-            # 2. if request by ep_id, choose the corresponding one
-            if (ep_id is None and idx == 0) or (ep_id is not None and ep_id == normalized_page.view_ep_id):
-                normalized_page.is_selected_page = True
-            result.append(normalized_page)
+        coll = Collection.trusted(
+            coll_id=view_data.series.series_id if view_data.series.series_id != 0 else None,
+            title=view_data.series.series_title if view_data.series.series_title else None,
+            owner=owner
+        )
+        coll_sect = CollectionSection.trusted(
+            sect_id=view_data.season_id,
+            title=view_data.season_title
+        )
+        page_category = StreamingCategory.PGC.value
+
+        if target_section_ids is None or view_data.season_id in target_section_ids:
+            for idx, episode in enumerate(view_data.episodes):
+                # 1. if request by season_id, choose first one as default selected episode
+                # 2. if request by ep_id, choose the corresponding one
+                is_selected_page = (ep_id is None and idx == 0) or (ep_id is not None and ep_id == episode.ep_id)
+                if is_selected_only and not is_selected_page:
+                    continue
+                title = cls._process_title(episode)
+                duration = cls._process_duration(episode)
+                yield Page.trusted(
+                    page_category=page_category,
+                    page_cid=episode.cid,
+                    page_title=title,
+                    page_duration=duration,
+                    view=View.trusted(
+                        aid=episode.aid,
+                        bvid=episode.bvid,
+                        ep_id=episode.ep_id,
+                        season_id=view_data.season_id,
+                        title=title,
+                        desc='',
+                        cover_url=episode.cover,
+                        pub_time=episode.pub_time,
+                        duration=duration,
+                        owner=owner
+                    ),
+                    coll=coll,
+                    coll_sect=coll_sect,
+                    is_selected_page=is_selected_page
+                )
+                if is_selected_only:
+                    return
+
+        # the default selected episode is always in main episodes
+        if is_selected_only and ep_id is None:
+            return
 
         for section in (view_data.section or []):
+            if target_section_ids is not None and section.id_field not in target_section_ids:
+                continue
             for episode_in_sect in section.episodes:
                 # There could be UGC resources as sidelights
                 # ignore them since it is just a pointer, not located here actually
@@ -102,36 +164,34 @@ class PGCComponent(AbstractStreamingComponent):
                 if not is_pgc:
                     continue
 
-                normalized_page = Page(
-                    page_category=StreamingCategory.PGC.value,
+                # if request by ep_id, choose the corresponding one
+                is_selected_page = ep_id is not None and ep_id == episode_in_sect.ep_id
+                if is_selected_only and not is_selected_page:
+                    continue
+                title = cls._process_title(episode_in_sect)
+                duration = cls._process_duration(episode_in_sect)
+                yield Page.trusted(
+                    page_category=page_category,
                     page_cid=episode_in_sect.cid,
-                    page_title=cls._process_title(episode_in_sect),
-                    page_duration=cls._process_duration(episode_in_sect),
-                    view_aid=episode_in_sect.aid,
-                    view_bvid=episode_in_sect.bvid,
-                    view_ep_id=episode_in_sect.ep_id,
-                    view_season_id=view_data.season_id,
-                    view_title=cls._process_title(episode_in_sect),
-                    view_desc='',
-                    view_pub_time=episode_in_sect.pub_time,
-                    view_duration=cls._process_duration(episode_in_sect),
-                    view_owner_id=view_owner_id,
-                    view_owner_name=view_owner_name,
-                    view_owner_avatar_url=view_owner_avatar_url,
-                    coll_id=series_id,
-                    coll_title=series_title,
-                    coll_owner_id=view_owner_id,
-                    coll_owner_name=view_owner_name,
-                    coll_owner_avatar_url=view_owner_avatar_url,
-                    coll_sect_id=view_data.season_id,
-                    coll_sect_title=view_data.season_title,
-                    is_selected_page=False
+                    page_title=title,
+                    page_duration=duration,
+                    view=View.trusted(
+                        aid=episode_in_sect.aid,
+                        bvid=episode_in_sect.bvid,
+                        ep_id=episode_in_sect.ep_id,
+                        season_id=view_data.season_id,
+                        title=title,
+                        desc='',
+                        pub_time=episode_in_sect.pub_time,
+                        duration=duration,
+                        owner=owner
+                    ),
+                    coll=coll,
+                    coll_sect=coll_sect,
+                    is_selected_page=is_selected_page
                 )
-                # if request by ep_id, choose the corresponding one
-                if ep_id is not None and ep_id == normalized_page.view_ep_id:
-                    normalized_page.is_selected_page = True
-                result.append(normalized_page)
-        return result
+                if is_selected_only:
+                    return
 
     @staticmethod
     def _process_duration(
@@ -188,9 +248,8 @@ class PGCComponent(AbstractStreamingComponent):
         else:
             params.update({'ep_id': ep_id})
         params.update({
-            'fnval': FormatNumberValue.full_format(),
-            'fourk': 1,
-            'sess_data': kwargs.get('sess_data')
+            'sess_data': kwargs.get('sess_data'),
+            **cls._get_format_params(**kwargs)
         })
 
         pgc_play = ProxyService.get_pgc_play(**params)
@@ -199,13 +258,19 @@ class PGCComponent(AbstractStreamingComponent):
     @classmethod
     def _get_play_video_pool(cls, *args: Any, **kwargs: Any) -> List[DashMediaItem]:  # NOQA
         play_dm: GetPGCPlayResponse = kwargs['play_dm']
-        return play_dm.result.dash.video
+        dash = play_dm.result.dash
+        # trial could only have video-audio combined resources
+        if dash is None:
+            return []
+        return dash.video
 
     @classmethod
     def _get_play_audio_pool(cls, *args: Any, **kwargs: Any) -> List[DashMediaItem]:  # NOQA
         play_dm: GetPGCPlayResponse = kwargs['play_dm']
         dash = play_dm.result.dash
         source_pool: List[DashMediaItem] = []
+        if dash is None:
+            return source_pool
         if dash.dolby.audio is not None and len(dash.dolby.audio) > 0:
             source_pool.extend(dash.dolby.audio)
         if dash.flac is not None and dash.flac.audio is not None:
@@ -213,3 +278,42 @@ class PGCComponent(AbstractStreamingComponent):
         if dash.audio is not None:
             source_pool.extend(dash.audio)
         return source_pool
+
+    @classmethod
+    def _get_play_durl_segments(cls, *args: Any, **kwargs: Any) -> List[DUrlSegmentMeta]:  # NOQA
+        play_dm: GetPGCPlayResponse = kwargs['play_dm']
+        durl = play_dm.result.durl or []
+        return [
+            DUrlSegmentMeta(
+                order=item.order,
+                url=item.url,
+                backup_urls=item.backup_url,
+                size=item.size,
+                length=item.length
+            )
+            for item in durl
+        ]
+
+    @classmethod
+    def _get_play_duration(cls, *args: Any, **kwargs: Any) -> Optional[int]:  # NOQA
+        play_dm: GetPGCPlayResponse = kwargs['play_dm']
+        play_data = play_dm.result
+        if play_data.dash is not None:
+            return play_data.dash.duration
+        if play_data.durl:
+            length_ms = 0
+            for item in play_data.durl:
+                length_ms += item.length
+            return int(round(length_ms / 1000))
+        return None
+
+    @classmethod
+    def _get_play_full_duration(cls, *args: Any, **kwargs: Any) -> Optional[int]:  # NOQA
+        play_dm: GetPGCPlayResponse = kwargs['play_dm']
+        timelength = play_dm.result.timelength
+        return int(round(timelength / 1000)) if timelength is not None else None
+
+    @classmethod
+    def _is_play_preview_flagged(cls, *args: Any, **kwargs: Any) -> bool:  # NOQA
+        play_dm: GetPGCPlayResponse = kwargs['play_dm']
+        return play_dm.result.is_preview == 1
@@ -1,17 +1,22 @@
 """
 Manipulate PUGV resources
 """
-from typing import Any, List, Optional, Tuple
+from typing import Any, Iterable, Iterator, List, Optional, Tuple
 
-from ...constants import FormatNumberValue, StreamingCategory
+from ...constants import StreamingCategory
 from ...proxy_service import ProxyService
 from ...schemes import (
     AudioStreamingSourceMeta,
+    Collection,
+    CollectionSection,
     DashMediaItem,
+    DUrlSegmentMeta,
     GetPUGVPlayResponse,
     GetPUGVViewResponse,
+    Owner,
     Page,
-    VideoStreamingSourceMeta
+    VideoStreamingSourceMeta,
+    View
 )
 from .base import AbstractStreamingComponent
 from .wrapper import register_component
@@ -28,14 +33,37 @@ class PUGVComponent(AbstractStreamingComponent):
         :key ep_id: ep_id of a PUGV resource, type is int
         :key sess_data: cookie of Bilibili user which key is SESSDATA, type is str
         """
-        view_response = ProxyService.get_pugv_view(
+        view_response = cls._get_view(**kwargs)
+        req_ep_id = kwargs.get('ep_id')
+        result = cls._parse_raw_view(view_response, req_ep_id)
+        return result
+
+    @classmethod
+    def iter_views(cls, *args: Any, **kwargs: Any) -> Iterator[Page]:  # NOQA
+        """
+        lazily yield normalized views info
+        :key season_id: ssid of a PUGV resource, type is str
+        :key ep_id: ep_id of a PUGV resource, type is int
+        :key sess_data: cookie of Bilibili user which key is SESSDATA, type is str
+        :key is_selected_only: only yield the requested episode, type is bool, default is False
+        :key section_ids: only yield pages of these sections, type is Optional[Iterable[int]]
+                          the only section of a course is addressed by season_id
+        """
+        view_response = cls._get_view(**kwargs)
+        return cls._iter_raw_view(
+            view_response,
+            kwargs.get('ep_id'),
+            is_selected_only=kwargs.get('is_selected_only') or False,
+            section_ids=kwargs.get('section_ids')
+        )
+
+    @classmethod
+    def _get_view(cls, **kwargs: Any) -> GetPUGVViewResponse:
+        return ProxyService.get_pugv_view(
             season_id=kwargs.get('season_id'),
             ep_id=kwargs.get('ep_id'),
             sess_data=kwargs.get('sess_data')
         )
-        req_ep_id = kwargs.get('ep_id')
-        result = cls._parse_raw_view(view_response, req_ep_id)
-        return result
 
     @classmethod
     def _parse_raw_view(
@@ -43,41 +71,61 @@ class PUGVComponent(AbstractStreamingComponent):
         view_response: GetPUGVViewResponse,
         ep_id: Optional[int] = None
     ) -> Optional[List[Page]]:
+        if view_response.data is None:
+            return None
+        return list(cls._iter_raw_view(view_response, ep_id))
+
+    @classmethod
+    def _iter_raw_view(
+        cls,
+        view_response: GetPUGVViewResponse,
+        ep_id: Optional[int] = None,
+        is_selected_only: bool = False,
+        section_ids: Optional[Iterable[int]] = None
+    ) -> Iterator[Page]:
         view_data = view_response.data
         if view_data is None:
-            return None
+            return
+        if section_ids is not None and view_data.season_id not in set(section_ids):
+            return
+
+        owner = Owner.trusted(
+            mid=view_data.up_info.mid,
+            name=view_data.up_info.uname,
+            avatar_url=view_data.up_info.avatar
+        )
+        coll = Collection.trusted(owner=owner)
+        coll_sect = CollectionSection.trusted(sect_id=view_data.season_id, title=view_data.title)
+        page_category = StreamingCategory.PUGV.value
 
-        result = []
         for idx, episode in enumerate(view_data.episodes):
-            normalized_page = Page(
-                page_category=StreamingCategory.PUGV.value,
+            # 1. if request by season_id, choose first one as default selected episode
+            # 2. if request by ep_id, choose the corresponding one
+            is_selected_page = (ep_id is None and idx == 0) or (ep_id is not None and ep_id == episode.id_field)
+            if is_selected_only and not is_selected_page:
+                continue
+            yield Page.trusted(
+                page_category=page_category,
                 page_cid=episode.cid,
                 page_title=episode.title,
                 page_duration=episode.duration,
-                view_aid=episode.aid,
-                view_ep_id=episode.id_field,
-                view_season_id=view_data.season_id,
-                view_title=episode.title,
-                view_desc='',
-                view_cover_url=episode.cover,
-                view_pub_time=episode.release_date,
-                view_duration=episode.duration,
-                view_owner_id=view_data.up_info.mid,
-                view_owner_name=view_data.up_info.uname,
-                view_owner_avatar_url=view_data.up_info.avatar,
-                coll_owner_id=view_data.up_info.mid,
-                coll_owner_name=view_data.up_info.uname,
-                coll_owner_avatar_url=view_data.up_info.avatar,
-                coll_sect_id=view_data.season_id,
-                coll_sect_title=view_data.title,
-                is_selected_page=False
+                view=View.trusted(
+                    aid=episode.aid,
+                    ep_id=episode.id_field,
+                    season_id=view_data.season_id,
+                    title=episode.title,
+                    desc='',
+                    cover_url=episode.cover,
+                    pub_time=episode.release_date,
+                    duration=episode.duration,
+                    owner=owner
+                ),
+                coll=coll,
+                coll_sect=coll_sect,
+                is_selected_page=is_selected_page
             )
-            # 1. if request by season_id, choose first one as default selected episode
-            # 2. if request by ep_id, choose the corresponding one
-            if (ep_id is None and idx == 0) or (ep_id is not None and ep_id == normalized_page.view_ep_id):
-                normalized_page.is_selected_page = True
-            result.append(normalized_page)
-        return result
+            if is_selected_only:
+                return
 
     @classmethod
     def get_page_streaming_src(
@@ -112,9 +160,8 @@ class PUGVComponent(AbstractStreamingComponent):
         params = {}
         params.update({
             'ep_id': ep_id,
-            'fnval': FormatNumberValue.full_format(),
-            'fourk': 1,
-            'sess_data': kwargs.get('sess_data')
+            'sess_data': kwargs.get('sess_data'),
+            **cls._get_format_params(**kwargs)
         })
 
         pugv_play = ProxyService.get_pugv_play(**params)
@@ -123,13 +170,19 @@ class PUGVComponent(AbstractStreamingComponent):
     @classmethod
     def _get_play_video_pool(cls, *args: Any, **kwargs: Any) -> List[DashMediaItem]:  # NOQA
         play_dm: GetPUGVPlayResponse = kwargs['play_dm']
-        return play_dm.data.dash.video
+        dash = play_dm.data.dash
+        # trial could only have video-audio combined resources
+        if dash is None:
+            return []
+        return dash.video
 
     @classmethod
     def _get_play_audio_pool(cls, *args: Any, **kwargs: Any) -> List[DashMediaItem]:  # NOQA
         play_dm: GetPUGVPlayResponse = kwargs['play_dm']
         dash = play_dm.data.dash
         source_pool: List[DashMediaItem] = []
+        if dash is None:
+            return source_pool
         if dash.dolby.audio is not None and len(dash.dolby.audio) > 0:
             source_pool.extend(dash.dolby.audio)
         if dash.flac is not None and dash.flac.audio is not None:
@@ -137,3 +190,42 @@ class PUGVComponent(AbstractStreamingComponent):
         if dash.audio is not None:
             source_pool.extend(dash.audio)
         return source_pool
+
+    @classmethod
+    def _get_play_durl_segments(cls, *args: Any, **kwargs: Any) -> List[DUrlSegmentMeta]:  # NOQA
+        play_dm: GetPUGVPlayResponse = kwargs['play_dm']
+        durl = play_dm.data.durl or []
+        return [
+            DUrlSegmentMeta(
+                order=item.order,
+                url=item.url,
+                backup_urls=item.backup_url,
+                size=item.size,
+                length=item.length
+            )
+            for item in durl
+        ]
+
+    @classmethod
+    def _get_play_duration(cls, *args: Any, **kwargs: Any) -> Optional[int]:  # NOQA
+        play_dm: GetPUGVPlayResponse = kwargs['play_dm']
+        play_data = play_dm.data
+        if play_data.dash is not None:
+            return play_data.dash.duration
+        if play_data.durl:
+            length_ms = 0
+            for item in play_data.durl:
+                length_ms += item.length
+            return int(round(length_ms / 1000))
+        return None
+
+    @classmethod
+    def _get_play_full_duration(cls, *args: Any, **kwargs: Any) -> Optional[int]:  # NOQA
+        play_dm: GetPUGVPlayResponse = kwargs['play_dm']
+        timelength = play_dm.data.timelength
+        return int(round(timelength / 1000)) if timelength is not None else None
+
+    @classmethod
+    def _is_play_preview_flagged(cls, *args: Any, **kwargs: Any) -> bool:  # NOQA
+        play_dm: GetPUGVPlayResponse = kwargs['play_dm']
+        return play_dm.data.is_preview == 1
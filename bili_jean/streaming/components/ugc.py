@@ -3,17 +3,22 @@ Manipulate UGC resources
 """
 from collections import OrderedDict
 import logging
-from typing import Any, List, Optional, Tuple
+from typing import Any, Iterable, Iterator, List, Optional, Tuple
 
-from ...constants import FormatNumberValue, StreamingCategory
+from ...constants import StreamingCategory
 from ...proxy_service import ProxyService
 from ...schemes import (
     AudioStreamingSourceMeta,
+    Collection,
+    CollectionSection,
     DashMediaItem,
+    DUrlSegmentMeta,
     GetUGCPlayResponse,
     GetUGCViewResponse,
+    Owner,
     Page,
-    VideoStreamingSourceMeta
+    VideoStreamingSourceMeta,
+    View
 )
 from ...schemes.proxy.card import GetCardDataCard
 from .base import AbstractStreamingComponent
@@ -34,94 +39,151 @@ class UGCComponent(AbstractStreamingComponent):
         :key aid: AV ID of a UGC resource, type is int
         :key sess_data: cookie of Bilibili user which key is SESSDATA, type is str
         """
-        view_response = ProxyService.get_ugc_view(
+        view_response = cls._get_view(**kwargs)
+        result = cls._parse_raw_view(view_response)
+        return result
+
+    @classmethod
+    def iter_views(cls, *args: Any, **kwargs: Any) -> Iterator[Page]:  # NOQA
+        """
+        lazily yield normalized views info
+        :key bvid: BV ID of a UGC resource, type is str
+        :key aid: AV ID of a UGC resource, type is int
+        :key sess_data: cookie of Bilibili user which key is SESSDATA, type is str
+        :key is_selected_only: only yield the pages of requested video, type is bool, default is False
+        :key section_ids: only yield pages of these collection sections, type is Optional[Iterable[int]]
+        """
+        view_response = cls._get_view(**kwargs)
+        return cls._iter_raw_view(
+            view_response,
+            is_selected_only=kwargs.get('is_selected_only') or False,
+            section_ids=kwargs.get('section_ids')
+        )
+
+    @classmethod
+    def _get_view(cls, **kwargs: Any) -> GetUGCViewResponse:
+        return ProxyService.get_ugc_view(
             bvid=kwargs.get('bvid'),
             aid=kwargs.get('aid'),
             sess_data=kwargs.get('sess_data')
         )
-        result = cls._parse_raw_view(view_response)
-        return result
 
     @classmethod
     def _parse_raw_view(cls, view_response: GetUGCViewResponse) -> Optional[List[Page]]:
+        if view_response.data is None:
+            return None
+        return list(cls._iter_raw_view(view_response))
+
+    @classmethod
+    def _iter_raw_view(
+        cls,
+        view_response: GetUGCViewResponse,
+        is_selected_only: bool = False,
+        section_ids: Optional[Iterable[int]] = None
+    ) -> Iterator[Page]:
+        """
+        yield normalized pages one by one,
+        filters are checked before a page is built,
+        so skipped pages never cost a Page instance
+        """
         view_data = view_response.data
         if view_data is None:
-            return None
+            return
+
+        target_section_ids = set(section_ids) if section_ids is not None else None
 
+        page_category = StreamingCategory.UGC.value
+        selected_view = View.trusted(
+            aid=view_data.aid,
+            bvid=view_data.bvid,
+            title=view_data.title,
+            desc=view_data.desc,
+            cover_url=view_data.pic,
+            pub_time=view_data.pubdate,
+            duration=view_data.duration,
+            owner=Owner.trusted(
+                mid=view_data.owner.mid,
+                name=view_data.owner.name,
+                avatar_url=view_data.owner.face
+            )
+        )
         selected_pages = OrderedDict()
         for page in view_data.pages:
-            normalized_page = Page(
-                page_category=StreamingCategory.UGC.value,
+            normalized_page = Page.trusted(
+                page_category=page_category,
                 page_index=page.page,
                 page_cid=page.cid,
                 page_title=page.part,
                 page_duration=page.duration,
-                view_aid=view_data.aid,
-                view_bvid=view_data.bvid,
-                view_title=view_data.title,
-                view_desc=view_data.desc,
-                view_cover_url=view_data.pic,
-                view_pub_time=view_data.pubdate,
-                view_duration=view_data.duration,
-                view_owner_id=view_data.owner.mid,
-                view_owner_name=view_data.owner.name,
-                view_owner_avatar_url=view_data.owner.face,
+                view=selected_view,
                 is_selected_page=True
             )
             selected_pages[page.cid] = normalized_page
 
         if not view_data.is_season_display:
-            return [page for _, page in selected_pages.items()]
+            # pages out of collection belong to no section
+            if target_section_ids is None:
+                yield from selected_pages.values()
+            return
 
         coll_owner_data: Optional[GetCardDataCard] = None
         try:
             coll_owner_data = ProxyService.get_card(mid=view_data.ugc_season.mid).data.card
         except Exception as e:
             logger.exception(e)
-        coll_owner_name = coll_owner_data.name if coll_owner_data is not None else None
-        coll_owner_avatar_url = coll_owner_data.face if coll_owner_data is not None else None
+        coll = Collection.trusted(
+            coll_id=view_data.ugc_season.id_field,
+            title=view_data.ugc_season.title,
+            desc=view_data.ugc_season.intro,
+            cover_url=view_data.ugc_season.cover,
+            owner=Owner.trusted(
+                mid=view_data.ugc_season.mid,
+                name=coll_owner_data.name if coll_owner_data is not None else None,
+                avatar_url=coll_owner_data.face if coll_owner_data is not None else None
+            )
+        )
 
-        result = []
+        remaining_selected_cnt = len(selected_pages)
         for section in view_data.ugc_season.sections:
+            if target_section_ids is not None and section.id_field not in target_section_ids:
+                continue
+            coll_sect = CollectionSection.trusted(sect_id=section.id_field, title=section.title)
             for episode in section.episodes:
+                # built once the first page of the episode is necessary
+                episode_view: Optional[View] = None
                 for page in episode.pages:
-                    normalized_page = Page(
-                        page_category=StreamingCategory.UGC.value,
+                    selected_page = selected_pages.get(page.cid)
+                    if is_selected_only and selected_page is None:
+                        continue
+                    if selected_page is not None:
+                        # the requested video has richer metadata, e.g. owner
+                        view = selected_page.view
+                        remaining_selected_cnt -= 1
+                    else:
+                        if episode_view is None:
+                            episode_view = View.trusted(
+                                aid=episode.aid,
+                                bvid=episode.bvid,
+                                title=episode.arc.title,
+                                desc=episode.arc.desc,
+                                cover_url=episode.arc.pic,
+                                pub_time=episode.arc.pubdate,
+                                duration=episode.arc.duration
+                            )
+                        view = episode_view
+                    yield Page.trusted(
+                        page_category=page_category,
                         page_index=page.page,
                         page_cid=page.cid,
                         page_title=page.part,
                         page_duration=page.duration,
-                        view_aid=episode.aid,
-                        view_bvid=episode.bvid,
-                        view_title=episode.arc.title,
-                        view_desc=episode.arc.desc,
-                        view_cover_url=episode.arc.pic,
-                        view_pub_time=episode.arc.pubdate,
-                        view_duration=episode.arc.duration,
-                        coll_id=view_data.ugc_season.id_field,
-                        coll_title=view_data.ugc_season.title,
-                        coll_desc=view_data.ugc_season.intro,
-                        coll_cover_url=view_data.ugc_season.cover,
-                        coll_owner_id=view_data.ugc_season.mid,
-                        coll_owner_name=coll_owner_name,
-                        coll_owner_avatar_url=coll_owner_avatar_url,
-                        coll_sect_id=section.id_field,
-                        coll_sect_title=section.title,
-                        is_selected_page=False
+                        view=view,
+                        coll=coll,
+                        coll_sect=coll_sect,
+                        is_selected_page=selected_page is not None
                     )
-                    selected_page = selected_pages.get(normalized_page.page_cid)
-                    if selected_page is not None:
-                        normalized_page.view_title = selected_page.view_title
-                        normalized_page.view_desc = selected_page.view_desc
-                        normalized_page.view_cover_url = selected_page.view_cover_url
-                        normalized_page.view_pub_time = selected_page.view_pub_time
-                        normalized_page.view_duration = selected_page.view_duration
-                        normalized_page.view_owner_id = selected_page.view_owner_id
-                        normalized_page.view_owner_name = selected_page.view_owner_name
-                        normalized_page.view_owner_avatar_url = selected_page.view_owner_avatar_url
-                        normalized_page.is_selected_page = True
-                    result.append(normalized_page)
-        return result
+                    if is_selected_only and remaining_selected_cnt <= 0:
+                        return
 
     @classmethod
     def get_page_streaming_src(
@@ -166,9 +228,8 @@ class UGCComponent(AbstractStreamingComponent):
             params.update({'aid': aid})
         params.update({
             'cid': cid,
-            'fnval': FormatNumberValue.full_format(),
-            'fourk': 1,
-            'sess_data': kwargs.get('sess_data')
+            'sess_data': kwargs.get('sess_data'),
+            **cls._get_format_params(**kwargs)
         })
 
         ugc_play = ProxyService.get_ugc_play(**params)
@@ -177,13 +238,19 @@ class UGCComponent(AbstractStreamingComponent):
     @classmethod
     def _get_play_video_pool(cls, *args: Any, **kwargs: Any) -> List[DashMediaItem]:  # NOQA
         play_dm: GetUGCPlayResponse = kwargs['play_dm']
-        return play_dm.data.dash.video
+        dash = play_dm.data.dash
+        # trial could only have video-audio combined resources
+        if dash is None:
+            return []
+        return dash.video
 
     @classmethod
     def _get_play_audio_pool(cls, *args: Any, **kwargs: Any) -> List[DashMediaItem]:  # NOQA
         play_dm: GetUGCPlayResponse = kwargs['play_dm']
         dash = play_dm.data.dash
         source_pool: List[DashMediaItem] = []
+        if dash is None:
+            return source_pool
         if dash.dolby.audio is not None and len(dash.dolby.audio) > 0:
             source_pool.extend(dash.dolby.audio)
         if dash.flac is not None and dash.flac.audio is not None:
@@ -191,3 +258,42 @@ class UGCComponent(AbstractStreamingComponent):
         if dash.audio is not None:
             source_pool.extend(dash.audio)
         return source_pool
+
+    @classmethod
+    def _get_play_durl_segments(cls, *args: Any, **kwargs: Any) -> List[DUrlSegmentMeta]:  # NOQA
+        play_dm: GetUGCPlayResponse = kwargs['play_dm']
+        durl = play_dm.data.durl or []
+        return [
+            DUrlSegmentMeta(
+                order=item.order,
+                url=item.url,
+                backup_urls=item.backup_url,
+                size=item.size,
+                length=item.length
+            )
+            for item in durl
+        ]
+
+    @classmethod
+    def _get_play_duration(cls, *args: Any, **kwargs: Any) -> Optional[int]:  # NOQA
+        play_dm: GetUGCPlayResponse = kwargs['play_dm']
+        play_data = play_dm.data
+        if play_data.dash is not None:
+            return play_data.dash.duration
+        if play_data.durl:
+            length_ms = 0
+            for item in play_data.durl:
+                length_ms += item.length
+            return int(round(length_ms / 1000))
+        return None
+
+    @classmethod
+    def _get_play_full_duration(cls, *args: Any, **kwargs: Any) -> Optional[int]:  # NOQA
+        play_dm: GetUGCPlayResponse = kwargs['play_dm']
+        timelength = play_dm.data.timelength
+        return int(round(timelength / 1000)) if timelength is not None else None
+
+    @classmethod
+    def _is_play_preview_flagged(cls, *args: Any, **kwargs: Any) -> bool:  # NOQA
+        play_dm: GetUGCPlayResponse = kwargs['play_dm']
+        return play_dm.data.is_preview == 1
@@ -15,6 +15,7 @@ def register_component(streaming_category: StreamingCategory) -> Callable:
     def wrapper(klass: AbstractStreamingComponent) -> AbstractStreamingComponent:
         if streaming_category in COMPONENTS_MAPPING:
             raise ValueError(f'Category {streaming_category} has been registered')
+        setattr(klass, 'streaming_category', streaming_category)
         COMPONENTS_MAPPING[streaming_category] = klass
         return klass
 
@@ -0,0 +1,141 @@
+"""
+Estimate bytes and time of downloading before it starts
+"""
+from http import HTTPStatus
+from typing import Dict, Iterable, List, Mapping, NamedTuple, Optional, Tuple
+
+from ..proxy_service import ProxyService
+from ..schemes import DashMediaItem, Page, StreamingSourcePolicy
+from .stream_catalog import StreamCatalog
+
+
+__all__ = ['DownloadEstimate', 'DownloadEstimator']
+
+
+class DownloadEstimate(NamedTuple):
+    """
+    expected bytes of pages keyed by page_cid, and in total
+    """
+    bytes_by_cid: Dict[int, int]
+    total_bytes: int
+    throughput: Optional[float] = None
+
+    @property
+    def seconds(self) -> Optional[float]:
+        """
+        expected seconds to download all of pages under the throughput
+        """
+        if not self.throughput:
+            return None
+        return self.total_bytes / self.throughput
+
+
+class DownloadEstimator:
+    """
+    Estimate size of streams by bandwidth × duration rather than HEAD request of each stream
+
+    * catalogs, built from play responses, give estimate of the selected streams
+    * pages only have duration, their estimate is duration × byte rate,
+      which could be derived from a sampled catalog of the same season
+    * sampled HEAD requests calibrate the ratio of actual size to the estimated one
+    """
+
+    def __init__(
+        self,
+        policy: Optional[StreamingSourcePolicy] = None,
+        throughput: Optional[float] = None,
+        calibration_ratio: float = 1.0
+    ):
+        """
+        :param policy: preference on selecting sources, default one if None
+        :type policy: Optional[StreamingSourcePolicy]
+        :param throughput: download throughput which unit is byte per second
+        :type throughput: Optional[float]
+        :param calibration_ratio: ratio of actual size to the estimated one
+        :type calibration_ratio: float
+        """
+        self.policy = policy if policy is not None else StreamingSourcePolicy()
+        self.throughput = throughput
+        self.calibration_ratio = calibration_ratio
+
+    def select(self, catalog: StreamCatalog) -> Tuple[DashMediaItem, DashMediaItem]:
+        return catalog.select_by_policy(self.policy)
+
+    def get_byte_rate(self, catalog: StreamCatalog) -> float:
+        """
+        bytes per second of the selected video and audio, calibrated
+        """
+        video_item, audio_item = self.select(catalog)
+        return (video_item.bandwidth + audio_item.bandwidth) / 8 * self.calibration_ratio
+
+    def estimate_catalog(self, catalog: StreamCatalog) -> int:
+        """
+        expected bytes of the selected video and audio, calibrated
+        """
+        video_item, audio_item = self.select(catalog)
+        estimated_size = catalog.estimate_size(video_item) + catalog.estimate_size(audio_item)
+        return int(estimated_size * self.calibration_ratio)
+
+    def estimate_catalogs(self, catalogs: Mapping[int, StreamCatalog]) -> DownloadEstimate:
+        """
+        :param catalogs: catalogs keyed by page_cid
+        :type catalogs: Mapping[int, StreamCatalog]
+        :return: DownloadEstimate
+        """
+        bytes_by_cid = {cid: self.estimate_catalog(catalog) for cid, catalog in catalogs.items()}
+        return DownloadEstimate(
+            bytes_by_cid=bytes_by_cid,
+            total_bytes=sum(bytes_by_cid.values()),
+            throughput=self.throughput
+        )
+
+    def estimate_pages(self, pages: Iterable[Page], byte_rate: float) -> DownloadEstimate:
+        """
+        estimate pages without any request, page with duplicated page_cid is counted once
+        :param pages: pages from get_views
+        :type pages: Iterable[Page]
+        :param byte_rate: bytes per second of streams, refer to get_byte_rate
+        :type byte_rate: float
+        :return: DownloadEstimate
+        """
+        bytes_by_cid: Dict[int, int] = {}
+        for page in pages:
+            if page.page_cid not in bytes_by_cid:
+                bytes_by_cid[page.page_cid] = int(page.page_duration * byte_rate)
+        return DownloadEstimate(
+            bytes_by_cid=bytes_by_cid,
+            total_bytes=sum(bytes_by_cid.values()),
+            throughput=self.throughput
+        )
+
+    def calibrate(self, catalogs: Iterable[StreamCatalog], sample_size: int = 2) -> float:
+        """
+        request HEAD of the selected streams of sampled catalogs,
+        and update calibration ratio by their actual size
+        :param catalogs: catalogs to sample from, evenly spaced
+        :type catalogs: Iterable[StreamCatalog]
+        :param sample_size: number of sampled catalogs
+        :type sample_size: int
+        :return: calibration ratio, unchanged if none of sampled streams responds its size
+        """
+        catalogs = list(catalogs)
+        if not catalogs or sample_size <= 0:
+            return self.calibration_ratio
+        step = max(len(catalogs) // sample_size, 1)
+        sampled_catalogs: List[StreamCatalog] = catalogs[::step][:sample_size]
+
+        estimated_size = 0
+        actual_size = 0
+        for catalog in sampled_catalogs:
+            for item in self.select(catalog):
+                response = ProxyService.head(url=item.base_url)
+                if response.status_code not in (HTTPStatus.OK, HTTPStatus.PARTIAL_CONTENT):
+                    continue
+                content_length = int(response.headers.get('Content-Length', 0))
+                if not content_length:
+                    continue
+                estimated_size += catalog.estimate_size(item)
+                actual_size += content_length
+        if estimated_size:
+            self.calibration_ratio = actual_size / estimated_size
+        return self.calibration_ratio
@@ -0,0 +1,176 @@
+"""
+Columnar container of normalized pages
+"""
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+
+from ..schemes import Page
+from ..schemes.streaming import PAGE_FLAT_FIELD_PATHS
+
+
+__all__ = ['PageTable']
+
+
+class PageTable:
+    """
+    Store pages column by column rather than page objects,
+    which is built once and serves repeated lookups
+
+    * integer columns are backed by arrays
+    * view, collection and section columns keep references of the shared objects
+    * hash indexes on 'page_cid', 'view_ep_id', 'view_bvid' and 'view_aid'
+      make lookup O(1) instead of scanning the whole list
+    * selected mask is computed once as well
+    """
+    INDEXED_FIELDS = ('page_cid', 'view_ep_id', 'view_bvid', 'view_aid')
+    PAGE_FIELDS = ('page_category', 'page_index', 'page_cid', 'page_title', 'page_duration')
+
+    def __init__(self, pages: Iterable[Page]):
+        self._page_category: List[str] = []
+        self._page_index = array('q')
+        self._page_cid = array('q')
+        self._page_title: List[str] = []
+        self._page_duration = array('q')
+        self._view: List[Any] = []
+        self._coll: List[Any] = []
+        self._coll_sect: List[Any] = []
+        self._selected_mask = array('B')
+        self._indexes: Dict[str, Dict[Any, List[int]]] = {
+            field_name: {} for field_name in self.INDEXED_FIELDS
+        }
+
+        for idx, page in enumerate(pages):
+            self._page_category.append(page.page_category)
+            self._page_index.append(page.page_index)
+            self._page_cid.append(page.page_cid)
+            self._page_title.append(page.page_title)
+            self._page_duration.append(page.page_duration)
+            self._view.append(page.view)
+            self._coll.append(page.coll)
+            self._coll_sect.append(page.coll_sect)
+            self._selected_mask.append(page.is_selected_page)
+
+            for field_name, index in self._indexes.items():
+                value = getattr(page, field_name)
+                if value is not None:
+                    index.setdefault(value, []).append(idx)
+
+    def __len__(self) -> int:
+        return len(self._page_cid)
+
+    def __iter__(self) -> Iterator[Page]:
+        for idx in range(len(self)):
+            yield self.row(idx)
+
+    @property
+    def selected_mask(self) -> Sequence[int]:
+        return memoryview(self._selected_mask).toreadonly()
+
+    def row(self, idx: int) -> Page:
+        """
+        convert the row to page object,
+        cheap since view, collection and section are shared rather than copied
+        """
+        return Page.trusted(
+            page_category=self._page_category[idx],
+            page_index=self._page_index[idx],
+            page_cid=self._page_cid[idx],
+            page_title=self._page_title[idx],
+            page_duration=self._page_duration[idx],
+            view=self._view[idx],
+            coll=self._coll[idx],
+            coll_sect=self._coll_sect[idx],
+            is_selected_page=bool(self._selected_mask[idx])
+        )
+
+    def positions(self, field_name: str, value: Any) -> List[int]:
+        """
+        get row positions by the value of an indexed field
+        :param field_name: one of INDEXED_FIELDS
+        :type field_name: str
+        :param value: value of the field
+        :type value: Any
+        :return: list of row positions, which is a copy
+        """
+        return list(self._get_positions(field_name, value))
+
+    def lookup(self, field_name: str, value: Any) -> List[Page]:
+        return [self.row(idx) for idx in self._get_positions(field_name, value)]
+
+    def get_by_cid(self, cid: int) -> Optional[Page]:
+        positions = self._get_positions('page_cid', cid)
+        return self.row(positions[0]) if positions else None
+
+    def get_by_ep_id(self, ep_id: int) -> Optional[Page]:
+        positions = self._get_positions('view_ep_id', ep_id)
+        return self.row(positions[0]) if positions else None
+
+    def get_by_bvid(self, bvid: str) -> List[Page]:
+        return self.lookup('view_bvid', bvid)
+
+    def get_by_aid(self, aid: int) -> List[Page]:
+        return self.lookup('view_aid', aid)
+
+    def selected_pages(self) -> List[Page]:
+        return [self.row(idx) for idx, is_selected in enumerate(self._selected_mask) if is_selected]
+
+    def column(self, field_name: str) -> Sequence[Any]:
+        """
+        get values of a field of all rows,
+        integer page fields are read-only views of their arrays without copy, the other page fields are tuples
+        :param field_name: page field, or legacy flat field, e.g. 'view_title'
+        :type field_name: str
+        :return: sequence of values
+        """
+        if field_name in self.PAGE_FIELDS:
+            page_column = getattr(self, f'_{field_name}')
+            if isinstance(page_column, array):
+                return memoryview(page_column).toreadonly()
+            return tuple(page_column)
+        if field_name == 'is_selected_page':
+            return [bool(is_selected) for is_selected in self._selected_mask]
+        path = PAGE_FLAT_FIELD_PATHS.get(field_name)
+        if path is None:
+            raise ValueError(f'Unknown field {field_name}')
+
+        ref_name, *attr_names = path
+        # resolve once per shared object rather than once per row
+        resolved: Dict[int, Any] = {}
+        result = []
+        for ref in getattr(self, f'_{ref_name}'):
+            key = id(ref)
+            if key not in resolved:
+                value = ref
+                for attr_name in attr_names:
+                    value = getattr(value, attr_name) if value is not None else None
+                resolved[key] = value
+            result.append(resolved[key])
+        return result
+
+    def to_columns(self, field_names: Optional[Iterable[str]] = None) -> Dict[str, List[Any]]:
+        """
+        bulk export as flat columns, e.g. to build a data frame
+        :param field_names: fields to export, all of flat fields by default
+        :type field_names: Optional[Iterable[str]]
+        :return: mapping from field name to list of values
+        """
+        if field_names is None:
+            field_names = (*self.PAGE_FIELDS, *PAGE_FLAT_FIELD_PATHS, 'is_selected_page')
+        return {field_name: list(self.column(field_name)) for field_name in field_names}
+
+    def to_records(self) -> List[Dict[str, Any]]:
+        """
+        bulk export as flat records, same as Page.model_dump_flat of each row
+        """
+        columns = self.to_columns()
+        field_names = list(columns)
+        return [
+            {field_name: columns[field_name][idx] for field_name in field_names}
+            for idx in range(len(self))
+        ]
+
+    def _get_positions(self, field_name: str, value: Any) -> Sequence[int]:
+        index = self._indexes.get(field_name)
+        if index is None:
+            raise ValueError(f'Field {field_name} is not indexed')
+        return index.get(value, ())
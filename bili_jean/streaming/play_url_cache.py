@@ -0,0 +1,201 @@
+"""
+Expiry-aware cache of play responses, whose resource URLs are signed with a deadline
+"""
+from collections import OrderedDict
+import re
+from threading import Lock
+import time
+from typing import Any, Callable, Dict, Hashable, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+from pydantic import BaseModel
+
+from ..credential_pool import get_sess_data_identity, SessData
+
+
+__all__ = [
+    'PlayURLCache',
+    'get_url_deadline',
+    'iter_signed_urls',
+    'play_url_cache'
+]
+
+
+# the signed URL could be escaped, e.g. '...&deadline=1728826357&...'
+DEADLINE_PATTERN = re.compile(r'deadline=(\d+)')
+SIGNED_URL_FIELDS = ('base_url', 'backup_url', 'url')
+
+DEFAULT_SAFETY_MARGIN = 60
+DEFAULT_MAX_SIZE = 256
+
+
+def get_url_deadline(url: str) -> Optional[int]:
+    """
+    parse expiry deadline from signed resource URL
+    :param url: resource URL
+    :type url: str
+    :return: unix timestamp, None if the URL is not signed with deadline
+    """
+    matched = DEADLINE_PATTERN.search(url)
+    if matched is None:
+        return None
+    return int(matched.group(1))
+
+
+def iter_signed_urls(model: Any) -> Iterator[str]:
+    """
+    iterate resource URLs of a play response, both primary and backup ones
+    """
+    if isinstance(model, BaseModel):
+        for field_name in type(model).model_fields:
+            value = getattr(model, field_name)
+            if field_name in SIGNED_URL_FIELDS:
+                if isinstance(value, str):
+                    yield value
+                elif isinstance(value, list):
+                    yield from (item for item in value if isinstance(item, str))
+            else:
+                yield from iter_signed_urls(value)
+    elif isinstance(model, list):
+        for item in model:
+            yield from iter_signed_urls(item)
+
+
+class PlayURLCacheEntry(NamedTuple):
+    value: Any
+    expires_at: float
+    urls: Tuple[str, ...]
+
+
+class PlayURLCache:
+    """
+    Cache play responses until their signed URLs expire,
+    so retrying or restarting download of a page needs no more play request
+
+    * key is (category, cid, ep_id, SESSDATA identity),
+      SESSDATA is hashed rather than kept in plain text
+    * entry expires at the earliest deadline of its URLs, minus a safety margin
+    * entry is invalidated once any of its URLs is rejected by CDN, e.g. 403
+    """
+
+    def __init__(
+        self,
+        safety_margin: int = DEFAULT_SAFETY_MARGIN,
+        max_size: int = DEFAULT_MAX_SIZE,
+        clock: Callable[[], float] = time.time
+    ):
+        """
+        :param safety_margin: seconds before the deadline when entry is considered expired
+        :type safety_margin: int
+        :param max_size: maximum number of entries, the least recently used one is evicted
+        :type max_size: int
+        :param clock: source of current unix timestamp
+        :type clock: Callable[[], float]
+        """
+        self._safety_margin = safety_margin
+        self._max_size = max_size
+        self._clock = clock
+        self._entries: 'OrderedDict[Hashable, PlayURLCacheEntry]' = OrderedDict()
+        self._url_keys: Dict[str, Set[Hashable]] = {}
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    get_sess_data_identity = staticmethod(get_sess_data_identity)
+
+    @classmethod
+    def make_key(
+        cls,
+        category: Any,
+        cid: Optional[int] = None,
+        ep_id: Optional[int] = None,
+        sess_data: Optional[SessData] = None,
+        *extra: Hashable
+    ) -> Tuple[Hashable, ...]:
+        return (category, cid, ep_id, get_sess_data_identity(sess_data), *extra)
+
+    def get(self, key: Hashable) -> Any:
+        """
+        get cached value, None if it is missing or expired
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires_at <= self._clock():
+                self._pop(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry.value
+
+    def put(self, key: Hashable, value: Any, urls: Optional[List[str]] = None) -> bool:
+        """
+        cache the play response until its URLs expire
+        :param key: cache key, refer to make_key
+        :type key: Hashable
+        :param value: play response
+        :type value: Any
+        :param urls: signed URLs of the play response, parsed from the value by default
+        :type urls: Optional[List[str]]
+        :return: cached or not, uncacheable if any URL is without deadline or already expired
+        """
+        if urls is None:
+            urls = list(iter_signed_urls(value))
+        if not urls:
+            return False
+        deadlines: List[int] = []
+        for url in urls:
+            deadline = get_url_deadline(url)
+            if deadline is None:
+                return False
+            deadlines.append(deadline)
+        expires_at = min(deadlines) - self._safety_margin
+        if expires_at <= self._clock():
+            return False
+
+        with self._lock:
+            self._pop(key)
+            self._entries[key] = PlayURLCacheEntry(value=value, expires_at=expires_at, urls=tuple(urls))
+            for url in urls:
+                self._url_keys.setdefault(url, set()).add(key)
+            while len(self._entries) > self._max_size:
+                oldest_key = next(iter(self._entries))
+                self._pop(oldest_key)
+        return True
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._pop(key)
+
+    def invalidate_url(self, url: str) -> bool:
+        """
+        invalidate all entries which contain the URL, e.g. when CDN responds 403
+        :return: any entry is invalidated or not
+        """
+        with self._lock:
+            keys = self._url_keys.get(url)
+            if not keys:
+                return False
+            for key in list(keys):
+                self._pop(key)
+            return True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._url_keys.clear()
+
+    def _pop(self, key: Hashable) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for url in entry.urls:
+            keys = self._url_keys.get(url)
+            if keys is None:
+                continue
+            keys.discard(key)
+            if not keys:
+                del self._url_keys[url]
+
+
+play_url_cache = PlayURLCache()
@@ -0,0 +1,338 @@
+"""
+Catalog of the streams from one play response
+"""
+from typing import Dict, List, Optional, Tuple
+
+from ..constants import AudioBitRateID
+from ..schemes import AudioStreamingSourcePolicy, DashMediaItem, StreamingSourcePolicy
+
+
+__all__ = ['StreamCatalog']
+
+
+class StreamCatalog:
+    """
+    Index DASH media items of a play response once,
+    then answer any number of selection queries without request or re-sort
+
+    * video items are indexed by quality number, then codec ID
+    * audio items are indexed by audio quality, refer to AudioBitRateID
+    * both are indexed by bandwidth as well
+    * size of stream is estimated as bandwidth × duration,
+      which makes selection under byte budget or target download time possible
+    * trial streams are flagged as preview, whose duration is shorter than full duration
+    """
+
+    def __init__(
+        self,
+        video_items: List[DashMediaItem],
+        audio_items: List[DashMediaItem],
+        duration: Optional[int] = None,
+        is_preview: bool = False,
+        full_duration: Optional[int] = None
+    ):
+        """
+        :param video_items: media items of video pool
+        :type video_items: List[DashMediaItem]
+        :param audio_items: media items of audio pool
+        :type audio_items: List[DashMediaItem]
+        :param duration: duration of the streams which unit is second
+        :type duration: Optional[int]
+        :param is_preview: the streams are trial ones which only have clip of the episode or not
+        :type is_preview: bool
+        :param full_duration: duration of the episode which unit is second
+        :type full_duration: Optional[int]
+        """
+        self.duration = duration
+        self.is_preview = is_preview
+        self.full_duration = full_duration
+
+        self._video_index: Dict[int, Dict[int, List[DashMediaItem]]] = {}
+        for item in video_items:
+            self._video_index.setdefault(item.id_field, {}).setdefault(item.codecid, []).append(item)
+        self._video_qns: List[int] = sorted(self._video_index)
+        self._video_codec_ids: Dict[int, List[int]] = {
+            qn: sorted(codec_index) for qn, codec_index in self._video_index.items()
+        }
+        self._videos_by_bandwidth = sorted(video_items, key=lambda item: item.bandwidth)
+
+        self._audio_index: Dict[int, List[DashMediaItem]] = {}
+        for item in audio_items:
+            quality = AudioBitRateID.from_value(item.id_field).value.quality
+            self._audio_index.setdefault(quality, []).append(item)
+        self._audio_qualities: List[int] = sorted(self._audio_index)
+        self._audios_by_bandwidth = sorted(audio_items, key=lambda item: item.bandwidth)
+
+    @property
+    def video_qns(self) -> List[int]:
+        """
+        available quality numbers of video, ascending
+        """
+        return list(self._video_qns)
+
+    def get_video_codec_ids(self, qn: int) -> List[int]:
+        """
+        available codec IDs of the video quality, ascending
+        """
+        return list(self._video_codec_ids.get(qn, []))
+
+    @property
+    def audio_qns(self) -> List[int]:
+        """
+        available bitrate IDs of audio, ascending by quality
+        """
+        return [
+            self._audio_index[quality][0].id_field
+            for quality in self._audio_qualities
+        ]
+
+    @property
+    def videos_by_bandwidth(self) -> List[DashMediaItem]:
+        return list(self._videos_by_bandwidth)
+
+    @property
+    def audios_by_bandwidth(self) -> List[DashMediaItem]:
+        return list(self._audios_by_bandwidth)
+
+    def rank_videos(
+        self,
+        is_hq_preferred: bool = True,
+        qn: Optional[int] = None,
+        is_codec_eff_preferred: bool = True,
+        codec_id: Optional[int] = None
+    ) -> List[DashMediaItem]:
+        """
+        rank all of acceptable video items, the first one is the best choice,
+        and the rest are fallbacks in order
+        :param is_hq_preferred: prefer high quality or not
+        :type is_hq_preferred: bool
+        :param qn: quality number, prior to is_hq_preferred if declared,
+                   items with higher quality are not acceptable
+        :type qn: Optional[int]
+        :param is_codec_eff_preferred: prefer higher efficiency codec or not
+        :type is_codec_eff_preferred: bool
+        :param codec_id: codec ID, prior to is_codec_eff_preferred if declared,
+                         items with higher codec ID are not acceptable
+        :type codec_id: Optional[int]
+        :return: list of DashMediaItem
+        """
+        result: List[DashMediaItem] = []
+        for avail_qn in self._order(self._video_qns, is_hq_preferred, qn):
+            codec_index = self._video_index[avail_qn]
+            for avail_codec_id in self._order(self._video_codec_ids[avail_qn], is_codec_eff_preferred, codec_id):
+                result.extend(codec_index[avail_codec_id])
+        return result
+
+    def select_video(
+        self,
+        is_hq_preferred: bool = True,
+        qn: Optional[int] = None,
+        is_codec_eff_preferred: bool = True,
+        codec_id: Optional[int] = None
+    ) -> DashMediaItem:
+        """
+        select the best video item, arguments are the same as rank_videos
+        """
+        ranked_items = self.rank_videos(
+            is_hq_preferred=is_hq_preferred,
+            qn=qn,
+            is_codec_eff_preferred=is_codec_eff_preferred,
+            codec_id=codec_id
+        )
+        if not ranked_items:
+            raise ValueError(f'No video stream meets quality number {qn} and codec ID {codec_id}')
+        return ranked_items[0]
+
+    def rank_audios(
+        self,
+        is_hq_preferred: bool = True,
+        qn: Optional[int] = None,
+        is_dolby_accepted: bool = True,
+        is_hires_accepted: bool = True
+    ) -> List[DashMediaItem]:
+        """
+        rank all of acceptable audio items, the first one is the best choice,
+        and the rest are fallbacks in order
+        :param is_hq_preferred: prefer high quality or not
+        :type is_hq_preferred: bool
+        :param qn: audio bitrate ID, prior to is_hq_preferred if declared,
+                   items with higher quality are not acceptable
+        :type qn: Optional[int]
+        :param is_dolby_accepted: Dolby audio is acceptable or not
+        :type is_dolby_accepted: bool
+        :param is_hires_accepted: Hi-Res (FLAC) audio is acceptable or not
+        :type is_hires_accepted: bool
+        :return: list of DashMediaItem
+        """
+        quality = AudioBitRateID.from_value(qn).value.quality if qn is not None else None
+        excluded_qualities = set()
+        if not is_dolby_accepted:
+            excluded_qualities.add(AudioBitRateID.BPS_DOLBY.value.quality)
+        if not is_hires_accepted:
+            excluded_qualities.add(AudioBitRateID.BPS_HIRES.value.quality)
+        result: List[DashMediaItem] = []
+        for avail_quality in self._order(self._audio_qualities, is_hq_preferred, quality):
+            if avail_quality in excluded_qualities:
+                continue
+            result.extend(self._audio_index[avail_quality])
+        return result
+
+    def select_audio(
+        self,
+        is_hq_preferred: bool = True,
+        qn: Optional[int] = None,
+        is_dolby_accepted: bool = True,
+        is_hires_accepted: bool = True
+    ) -> DashMediaItem:
+        """
+        select the best audio item, arguments are the same as rank_audios
+        """
+        ranked_items = self.rank_audios(
+            is_hq_preferred=is_hq_preferred,
+            qn=qn,
+            is_dolby_accepted=is_dolby_accepted,
+            is_hires_accepted=is_hires_accepted
+        )
+        if not ranked_items:
+            raise ValueError(f'No audio stream meets bitrate ID {qn}')
+        return ranked_items[0]
+
+    def estimate_size(self, item: DashMediaItem) -> int:
+        """
+        estimate size of the stream which unit is byte, by bandwidth × duration
+        """
+        if self.duration is None:
+            raise ValueError('Duration is necessary to estimate size of stream')
+        return item.bandwidth * self.duration // 8
+
+    @staticmethod
+    def get_byte_budget(
+        byte_budget: Optional[int] = None,
+        target_download_seconds: Optional[float] = None,
+        link_speed: Optional[float] = None
+    ) -> Optional[int]:
+        """
+        get the tighter one of byte budget and the bytes downloadable in target time
+        :param byte_budget: maximum of bytes
+        :type byte_budget: Optional[int]
+        :param target_download_seconds: target time to finish downloading, link_speed is necessary
+        :type target_download_seconds: Optional[float]
+        :param link_speed: speed of link which unit is byte per second
+        :type link_speed: Optional[float]
+        :return: byte budget, None if no limit
+        """
+        budgets: List[int] = []
+        if byte_budget is not None:
+            budgets.append(byte_budget)
+        if target_download_seconds is not None:
+            if link_speed is None:
+                raise ValueError('link_speed is necessary for target_download_seconds')
+            budgets.append(int(target_download_seconds * link_speed))
+        return min(budgets) if budgets else None
+
+    def select_within_budget(
+        self,
+        byte_budget: int,
+        is_video_hq_preferred: bool = True,
+        video_qn: Optional[int] = None,
+        is_video_codec_eff_preferred: bool = True,
+        video_codec_id: Optional[int] = None,
+        is_audio_hq_preferred: bool = True,
+        audio_qn: Optional[int] = None
+    ) -> Tuple[DashMediaItem, DashMediaItem]:
+        """
+        select the best pair of video and audio items whose estimated size is within the budget,
+        video is prior to audio, so the best acceptable video goes with the best audio that still fits
+        :param byte_budget: maximum of bytes of both video and audio
+        :type byte_budget: int
+        :return: video item and audio item
+        """
+        ranked_videos = self.rank_videos(
+            is_hq_preferred=is_video_hq_preferred,
+            qn=video_qn,
+            is_codec_eff_preferred=is_video_codec_eff_preferred,
+            codec_id=video_codec_id
+        )
+        ranked_audios = self.rank_audios(is_hq_preferred=is_audio_hq_preferred, qn=audio_qn)
+        if not ranked_videos or not ranked_audios:
+            raise ValueError('No stream meets quality number and codec ID')
+
+        min_audio_size = min(self.estimate_size(item) for item in ranked_audios)
+        for video_item in ranked_videos:
+            video_size = self.estimate_size(video_item)
+            if video_size + min_audio_size > byte_budget:
+                continue
+            for audio_item in ranked_audios:
+                if video_size + self.estimate_size(audio_item) <= byte_budget:
+                    return video_item, audio_item
+        raise ValueError(f'No stream fits the budget of {byte_budget} bytes')
+
+    def select_by_policy(self, policy: StreamingSourcePolicy) -> Tuple[DashMediaItem, DashMediaItem]:
+        """
+        select video and audio items by the policy, within budget if any is declared
+        :param policy: preference on selecting sources
+        :type policy: StreamingSourcePolicy
+        :return: video item and audio item
+        """
+        byte_budget = self.get_byte_budget(
+            byte_budget=policy.byte_budget,
+            target_download_seconds=policy.target_download_seconds,
+            link_speed=policy.link_speed
+        )
+        if byte_budget is not None:
+            return self.select_within_budget(
+                byte_budget=byte_budget,
+                is_video_hq_preferred=policy.is_video_hq_preferred,
+                video_qn=policy.video_qn,
+                is_video_codec_eff_preferred=policy.is_video_codec_eff_preferred,
+                video_codec_id=policy.video_codec_number,
+                is_audio_hq_preferred=policy.is_audio_hq_preferred,
+                audio_qn=policy.audio_qn
+            )
+        video_item = self.select_video(
+            is_hq_preferred=policy.is_video_hq_preferred,
+            qn=policy.video_qn,
+            is_codec_eff_preferred=policy.is_video_codec_eff_preferred,
+            codec_id=policy.video_codec_number
+        )
+        audio_item = self.select_audio(is_hq_preferred=policy.is_audio_hq_preferred, qn=policy.audio_qn)
+        return video_item, audio_item
+
+    def select_audio_by_policy(self, policy: AudioStreamingSourcePolicy) -> DashMediaItem:
+        """
+        select audio item only by the policy, the best one within budget if any is declared
+        :param policy: preference on selecting audio source
+        :type policy: AudioStreamingSourcePolicy
+        :return: audio item
+        """
+        ranked_items = self.rank_audios(
+            is_hq_preferred=policy.is_audio_hq_preferred,
+            qn=policy.audio_qn,
+            is_dolby_accepted=policy.is_dolby_accepted,
+            is_hires_accepted=policy.is_hires_accepted
+        )
+        if not ranked_items:
+            raise ValueError(f'No audio stream meets bitrate ID {policy.audio_qn}')
+        byte_budget = self.get_byte_budget(
+            byte_budget=policy.byte_budget,
+            target_download_seconds=policy.target_download_seconds,
+            link_speed=policy.link_speed
+        )
+        if byte_budget is None:
+            return ranked_items[0]
+        for item in ranked_items:
+            if self.estimate_size(item) <= byte_budget:
+                return item
+        raise ValueError(f'No audio stream fits the budget of {byte_budget} bytes')
+
+    @staticmethod
+    def _order(ascending_keys: List[int], is_high_preferred: bool, upper_bound: Optional[int]) -> List[int]:
+        """
+        order the ascending keys by preference,
+        the upper bound is prior to the preference, the nearest one to it is the best
+        """
+        if upper_bound is not None:
+            return [key for key in reversed(ascending_keys) if key <= upper_bound]
+        if is_high_preferred:
+            return ascending_keys[::-1]
+        return ascending_keys
@@ -1,20 +1,32 @@
 """
 Service component to process Bilibili streaming resource
 """
+from concurrent.futures import ThreadPoolExecutor
+import functools
 import logging
-from typing import List, Optional, Tuple
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
 from urllib.parse import urlparse
 
 from .components import get_streaming_component_kls
+from .page_table import PageTable
+from .stream_catalog import StreamCatalog
 from ..constants import (
+    CONCURRENCY,
+    RATE_LIMIT,
     StreamingCategory,
     WEB_VIEW_URL_ID_TYPE_MAPPING,
     WEB_VIEW_URL_CATEGORY_MAPPING
 )
+from ..credential_pool import SessData
+from ..page_download_service import PageDownloadService
 from ..proxy_service import ProxyService
+from ..rate_limiter import RateLimiter
 from ..schemes import (
     AudioStreamingSourceMeta,
+    AudioStreamingSourcePolicy,
+    DUrlSegmentMeta,
     Page,
+    StreamingSourcePolicy,
     StreamingWebViewMeta,
     VideoStreamingSourceMeta
 )
@@ -23,6 +35,14 @@ from ..schemes import (
 logger = logging.getLogger(__name__)
 
 
+class SeasonStreamingSrcs(NamedTuple):
+    """
+    streaming sources of pages, both are keyed by page_cid
+    """
+    srcs: Dict[int, Tuple[VideoStreamingSourceMeta, AudioStreamingSourceMeta]]
+    errors: Dict[int, Exception]
+
+
 class StreamingService:
 
     @classmethod
@@ -65,13 +85,13 @@ class StreamingService:
         return None
 
     @classmethod
-    def get_views(cls, url: str, sess_data: Optional[str] = None) -> Optional[List[Page]]:
+    def get_views(cls, url: str, sess_data: Optional[SessData] = None) -> Optional[List[Page]]:
         """
         get normalized views pages with primary information
         :param url: Web URL of a Bilibili streaming resource
         :type url: str
         :param sess_data: cookie of Bilibili user, SESSDATA
-        :type sess_data: str
+        :type sess_data: str or CredentialPool
         :return: list of normalized pages
         """
         web_view_meta = cls.parse_web_view_url(url)
@@ -86,6 +106,69 @@ class StreamingService:
             sess_data=sess_data
         )
 
+    @classmethod
+    def iter_views(
+        cls,
+        url: str,
+        sess_data: Optional[SessData] = None,
+        is_selected_only: bool = False,
+        section_ids: Optional[Iterable[int]] = None
+    ) -> Iterator[Page]:
+        """
+        lazily yield normalized views pages,
+        which keeps memory bounded on huge collections
+        :param url: Web URL of a Bilibili streaming resource
+        :type url: str
+        :param sess_data: cookie of Bilibili user, SESSDATA
+        :type sess_data: str or CredentialPool
+        :param is_selected_only: only yield the requested pages
+        :type is_selected_only: bool
+        :param section_ids: only yield pages of these sections
+        :type section_ids: Optional[Iterable[int]]
+        :return: iterator of normalized pages
+        """
+        web_view_meta = cls.parse_web_view_url(url)
+        if web_view_meta is None:
+            raise ValueError(f'URL {url} is invalid')
+        component_kls = get_streaming_component_kls(web_view_meta.streaming_category)
+        return component_kls.iter_views(
+            aid=web_view_meta.aid,
+            bvid=web_view_meta.bvid,
+            season_id=web_view_meta.season_id,
+            ep_id=web_view_meta.ep_id,
+            sess_data=sess_data,
+            is_selected_only=is_selected_only,
+            section_ids=section_ids
+        )
+
+    @classmethod
+    def get_view_table(
+        cls,
+        url: str,
+        sess_data: Optional[SessData] = None,
+        is_selected_only: bool = False,
+        section_ids: Optional[Iterable[int]] = None
+    ) -> PageTable:
+        """
+        get normalized views pages as a columnar table,
+        which is indexed by cid, ep_id, BV ID and AV ID
+        :param url: Web URL of a Bilibili streaming resource
+        :type url: str
+        :param sess_data: cookie of Bilibili user, SESSDATA
+        :type sess_data: str or CredentialPool
+        :param is_selected_only: only contain the requested pages
+        :type is_selected_only: bool
+        :param section_ids: only contain pages of these sections
+        :type section_ids: Optional[Iterable[int]]
+        :return: PageTable
+        """
+        return PageTable(cls.iter_views(
+            url,
+            sess_data=sess_data,
+            is_selected_only=is_selected_only,
+            section_ids=section_ids
+        ))
+
     @classmethod
     def get_page_streaming_src(
         cls,
@@ -100,7 +183,13 @@ class StreamingService:
         video_codec_number: Optional[int] = None,
         is_audio_hq_preferred: bool = True,
         audio_qn: Optional[int] = None,
-        sess_data: Optional[str] = None
+        sess_data: Optional[SessData] = None,
+        byte_budget: Optional[int] = None,
+        target_download_seconds: Optional[float] = None,
+        link_speed: Optional[float] = None,
+        is_entitlement_capped: bool = False,
+        is_preview_accepted: bool = False,
+        page_duration: Optional[int] = None
     ) -> Tuple[VideoStreamingSourceMeta, AudioStreamingSourceMeta]:
         streaming_category = StreamingCategory.from_value(category)
         component_kls = get_streaming_component_kls(streaming_category)
@@ -115,5 +204,299 @@ class StreamingService:
             video_codec_number=video_codec_number,
             is_audio_hq_preferred=is_audio_hq_preferred,
             audio_qn=audio_qn,
+            sess_data=sess_data,
+            byte_budget=byte_budget,
+            target_download_seconds=target_download_seconds,
+            link_speed=link_speed,
+            is_entitlement_capped=is_entitlement_capped,
+            is_preview_accepted=is_preview_accepted,
+            page_duration=page_duration
+        )
+
+    @classmethod
+    def get_page_audio_streaming_src(
+        cls,
+        category: str,
+        cid: Optional[int] = None,
+        ep_id: Optional[int] = None,
+        bvid: Optional[str] = None,
+        aid: Optional[int] = None,
+        is_audio_hq_preferred: bool = True,
+        audio_qn: Optional[int] = None,
+        is_dolby_accepted: bool = True,
+        is_hires_accepted: bool = True,
+        sess_data: Optional[SessData] = None,
+        byte_budget: Optional[int] = None,
+        target_download_seconds: Optional[float] = None,
+        link_speed: Optional[float] = None,
+        is_entitlement_capped: bool = False,
+        is_preview_accepted: bool = False,
+        page_duration: Optional[int] = None
+    ) -> AudioStreamingSourceMeta:
+        """
+        get source URL of audio streaming only, e.g. for lectures and music,
+        arguments of preference are the same as AudioStreamingSourcePolicy
+        """
+        streaming_category = StreamingCategory.from_value(category)
+        component_kls = get_streaming_component_kls(streaming_category)
+        return component_kls.get_page_audio_streaming_src(
+            cid=cid,
+            ep_id=ep_id,
+            bvid=bvid,
+            aid=aid,
+            is_audio_hq_preferred=is_audio_hq_preferred,
+            audio_qn=audio_qn,
+            is_dolby_accepted=is_dolby_accepted,
+            is_hires_accepted=is_hires_accepted,
+            sess_data=sess_data,
+            byte_budget=byte_budget,
+            target_download_seconds=target_download_seconds,
+            link_speed=link_speed,
+            is_entitlement_capped=is_entitlement_capped,
+            is_preview_accepted=is_preview_accepted,
+            page_duration=page_duration
+        )
+
+    @classmethod
+    def get_page_durl_segments(
+        cls,
+        category: str,
+        cid: Optional[int] = None,
+        ep_id: Optional[int] = None,
+        bvid: Optional[str] = None,
+        aid: Optional[int] = None,
+        video_qn: Optional[int] = None,
+        sess_data: Optional[SessData] = None,
+        is_preview_accepted: bool = False,
+        page_duration: Optional[int] = None
+    ) -> List[DUrlSegmentMeta]:
+        """
+        get segments of video-audio combined resource in order, which is for DUrlDownloadService,
+        ValueError is raised if only DASH resources are responded
+        :param category: streaming category, refer to StreamingCategory
+        :type category: str
+        :param cid: cid of the page
+        :type cid: Optional[int]
+        :param ep_id: ep_id of the page
+        :type ep_id: Optional[int]
+        :param bvid: BV ID of the page
+        :type bvid: Optional[str]
+        :param aid: AV ID of the page
+        :type aid: Optional[int]
+        :param video_qn: quality number
+        :type video_qn: Optional[int]
+        :param sess_data: cookie of Bilibili user, SESSDATA
+        :type sess_data: str or CredentialPool
+        :param is_preview_accepted: accept trial segments or not
+        :type is_preview_accepted: bool
+        :param page_duration: duration of the page from the view which unit is second, to detect trial
+        :type page_duration: Optional[int]
+        :return: list of DUrlSegmentMeta
+        """
+        streaming_category = StreamingCategory.from_value(category)
+        component_kls = get_streaming_component_kls(streaming_category)
+        return component_kls.get_page_durl_segments(
+            cid=cid,
+            ep_id=ep_id,
+            bvid=bvid,
+            aid=aid,
+            video_qn=video_qn,
+            sess_data=sess_data,
+            is_preview_accepted=is_preview_accepted,
+            page_duration=page_duration
+        )
+
+    @classmethod
+    def download_page_audio(
+        cls,
+        page: Page,
+        file: str,
+        policy: Optional[AudioStreamingSourcePolicy] = None,
+        sess_data: Optional[SessData] = None
+    ) -> AudioStreamingSourceMeta:
+        """
+        download audio of the page only, its URL is resolved again once the signed one expires
+        :param page: page from get_views
+        :type page: Page
+        :param file: path of the local file
+        :type file: str
+        :param policy: preference on selecting audio source, default one if None
+        :type policy: Optional[AudioStreamingSourcePolicy]
+        :param sess_data: cookie of Bilibili user, SESSDATA
+        :type sess_data: str or CredentialPool
+        :return: the downloaded audio source
+        """
+        if policy is None:
+            policy = AudioStreamingSourcePolicy()
+        audio_src = cls.get_page_audio_streaming_src(
+            category=page.page_category,
+            cid=page.page_cid,
+            ep_id=page.view_ep_id,
+            bvid=page.view_bvid,
+            aid=page.view_aid,
+            sess_data=sess_data,
+            page_duration=page.page_duration,
+            **policy.model_dump()
+        )
+        resolver = cls.get_stream_url_resolver(
+            category=page.page_category,
+            qn=audio_src.qn,
+            cid=page.page_cid,
+            ep_id=page.view_ep_id,
+            bvid=page.view_bvid,
+            aid=page.view_aid,
+            is_audio=True,
             sess_data=sess_data
         )
+        PageDownloadService(audio_src.url, file, resolver=resolver).download()
+        return audio_src
+
+    @classmethod
+    def get_stream_catalog(
+        cls,
+        category: str,
+        cid: Optional[int] = None,
+        ep_id: Optional[int] = None,
+        bvid: Optional[str] = None,
+        aid: Optional[int] = None,
+        sess_data: Optional[SessData] = None,
+        page_duration: Optional[int] = None
+    ) -> StreamCatalog:
+        """
+        get catalog of all streams of the page by one play request,
+        which answers selection queries repeatedly without further request
+        :param category: streaming category, refer to StreamingCategory
+        :type category: str
+        :param cid: cid of the page
+        :type cid: Optional[int]
+        :param ep_id: ep_id of the page
+        :type ep_id: Optional[int]
+        :param bvid: BV ID of the page
+        :type bvid: Optional[str]
+        :param aid: AV ID of the page
+        :type aid: Optional[int]
+        :param sess_data: cookie of Bilibili user, SESSDATA
+        :type sess_data: str or CredentialPool
+        :param page_duration: duration of the page from the view which unit is second, to detect trial streams
+        :type page_duration: Optional[int]
+        :return: StreamCatalog
+        """
+        streaming_category = StreamingCategory.from_value(category)
+        component_kls = get_streaming_component_kls(streaming_category)
+        return component_kls.get_stream_catalog(
+            cid=cid,
+            ep_id=ep_id,
+            bvid=bvid,
+            aid=aid,
+            sess_data=sess_data,
+            page_duration=page_duration
+        )
+
+    @classmethod
+    def get_stream_url_resolver(
+        cls,
+        category: str,
+        qn: int,
+        cid: Optional[int] = None,
+        ep_id: Optional[int] = None,
+        bvid: Optional[str] = None,
+        aid: Optional[int] = None,
+        codec_id: Optional[int] = None,
+        is_audio: bool = False,
+        sess_data: Optional[SessData] = None
+    ) -> Callable[[], str]:
+        """
+        get resolver of the stream's URL, which is for PageDownloadService
+        to fetch a fresh URL of the same stream when the former one expires
+        :param category: streaming category, refer to StreamingCategory
+        :type category: str
+        :param qn: quality number of video, or bitrate ID of audio
+        :type qn: int
+        :param cid: cid of the page
+        :type cid: Optional[int]
+        :param ep_id: ep_id of the page
+        :type ep_id: Optional[int]
+        :param bvid: BV ID of the page
+        :type bvid: Optional[str]
+        :param aid: AV ID of the page
+        :type aid: Optional[int]
+        :param codec_id: codec ID of video
+        :type codec_id: Optional[int]
+        :param is_audio: the stream is audio or not
+        :type is_audio: bool
+        :param sess_data: cookie of Bilibili user, SESSDATA
+        :type sess_data: str or CredentialPool
+        :return: callable without argument, which returns URL of the stream
+        """
+        streaming_category = StreamingCategory.from_value(category)
+        component_kls = get_streaming_component_kls(streaming_category)
+        return functools.partial(
+            component_kls.resolve_stream_url,
+            cid=cid,
+            ep_id=ep_id,
+            bvid=bvid,
+            aid=aid,
+            qn=qn,
+            codec_id=codec_id,
+            is_audio=is_audio,
+            sess_data=sess_data
+        )
+
+    @classmethod
+    def get_season_streaming_srcs(
+        cls,
+        pages: Iterable[Page],
+        policy: Optional[StreamingSourcePolicy] = None,
+        concurrency: int = CONCURRENCY,
+        rate_limit: Optional[float] = RATE_LIMIT,
+        sess_data: Optional[SessData] = None
+    ) -> SeasonStreamingSrcs:
+        """
+        get source URL of streaming of pages concurrently, e.g. all of pages of a season
+        :param pages: pages from get_views, page with duplicated page_cid is resolved once
+        :type pages: Iterable[Page]
+        :param policy: preference on selecting sources, default one if None
+        :type policy: Optional[StreamingSourcePolicy]
+        :param concurrency: maximum of concurrent play requests
+        :type concurrency: int
+        :param rate_limit: maximum of play requests per second, no limit if None
+        :type rate_limit: Optional[float]
+        :param sess_data: cookie of Bilibili user, SESSDATA
+        :type sess_data: str or CredentialPool
+        :return: SeasonStreamingSrcs, error of a page doesn't interrupt the others,
+                 e.g. PreviewStreamError of the page which only has trial
+        """
+        if policy is None:
+            policy = StreamingSourcePolicy()
+        rate_limiter = RateLimiter(rate_limit)
+
+        pages_by_cid: Dict[int, Page] = {}
+        for page in pages:
+            pages_by_cid.setdefault(page.page_cid, page)
+
+        def _get_page_streaming_src(page: Page) -> Tuple[VideoStreamingSourceMeta, AudioStreamingSourceMeta]:
+            rate_limiter.acquire()
+            return cls.get_page_streaming_src(
+                category=page.page_category,
+                cid=page.page_cid,
+                ep_id=page.view_ep_id,
+                bvid=page.view_bvid,
+                aid=page.view_aid,
+                sess_data=sess_data,
+                page_duration=page.page_duration,
+                **policy.model_dump()
+            )
+
+        result = SeasonStreamingSrcs(srcs={}, errors={})
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = {
+                cid: executor.submit(_get_page_streaming_src, page)
+                for cid, page in pages_by_cid.items()
+            }
+            for cid, future in futures.items():
+                try:
+                    result.srcs[cid] = future.result()
+                except Exception as e:
+                    logger.warning(f'Failed to get streaming source of page {cid}: {e}')
+                    result.errors[cid] = e
+        return result
@@ -2,26 +2,166 @@
 Service component on user
 """
 import logging
-from typing import Optional
+from threading import Lock
+import time
+from typing import Dict, List, Optional, Tuple, Union
 
+from .constants import ENTITLEMENT_ERROR_TTL, ENTITLEMENT_PROFILE_TTL, NOT_LOGIN_CODE, THROTTLED_CODES
+from .credential_pool import CredentialPool, get_sess_data_identity, SessData
 from .proxy_service import ProxyService
+from .schemes import EntitlementProfile, GetMyInfoResponse
 
 
 logger = logging.getLogger(__name__)
 
 
+class UserServiceError(Exception):
+    """
+    myinfo request failed for reasons other than not login, e.g. risk control,
+    so what the account could play is unknown
+    """
+
+    def __init__(self, message, code: Optional[int] = None):
+        self.message = message
+        self.code = code
+        super().__init__(self.message)
+
+
 class UserService:
 
+    _entitlement_profiles: Dict[str, Tuple[float, Union[EntitlementProfile, UserServiceError]]] = {}
+    _entitlement_profiles_lock = Lock()
+
     @classmethod
     def validate(cls, sess_data: Optional[str] = None) -> bool:
         """
-        check sess_data validity
+        check sess_data validity,
+        by the cached entitlement profile, so it is cheap to call repeatedly during batches
         :param sess_data: cookie of Bilibili user, SESSDATA
         :type sess_data: str, optional
-        :return: bool
+        :return: bool, False as well if validity is unknown, e.g. the request is throttled
         """
-        data = ProxyService.get_my_info(sess_data=sess_data)
-        if data.code == 0:
+        try:
+            profile = cls.get_entitlement_profile(sess_data=sess_data)
+        except UserServiceError as e:
+            logger.error(f'User validation failed: {e.message}')
+            return False
+        if profile.is_login:
             return True
-        logger.error(f'User validation failed: {data.message}')
+        logger.error('User validation failed: not login')
         return False
+
+    @classmethod
+    def validate_credential_pool(cls, pool: CredentialPool) -> List[str]:
+        """
+        check validity of each SESSDATA of the pool,
+        the invalid ones are taken out of rotation,
+        the ones whose validity is unknown are kept, and cooled down if throttled
+        :param pool: pool of SESSDATA
+        :type pool: CredentialPool
+        :return: valid SESSDATA
+        """
+        result = []
+        for sess_data in pool.sess_datas:
+            try:
+                profile = cls.get_entitlement_profile(sess_data=sess_data)
+            except UserServiceError as e:
+                logger.warning(f'User validation is unknown: {e.message}')
+                if e.code in THROTTLED_CODES:
+                    pool.report_throttled(sess_data)
+                continue
+            if profile.is_login:
+                result.append(sess_data)
+            else:
+                pool.report_invalid(sess_data)
+        return result
+
+    @classmethod
+    def is_vip(cls, sess_data: str) -> bool:
+        return cls.get_entitlement_profile(sess_data=sess_data).is_vip
+
+    @classmethod
+    def get_entitlement_profile(
+        cls,
+        sess_data: Optional[SessData] = None,
+        ttl: int = ENTITLEMENT_PROFILE_TTL
+    ) -> EntitlementProfile:
+        """
+        get what the account could play, cached per SESSDATA
+        :param sess_data: cookie of Bilibili user, SESSDATA,
+                          the best profile of its available accounts if it is CredentialPool
+        :type sess_data: str or CredentialPool, optional
+        :param ttl: seconds to cache the profile, which is shortened by VIP expiry
+        :type ttl: int
+        :return: EntitlementProfile
+        :raise UserServiceError: the profile is unknown, which is cached for a short while only,
+                                 the accounts of CredentialPool failed are skipped unless all of them fail
+        """
+        if isinstance(sess_data, CredentialPool):
+            profiles = []
+            error: Optional[UserServiceError] = None
+            for item in sess_data.healthy_sess_datas:
+                try:
+                    profiles.append(cls.get_entitlement_profile(sess_data=item, ttl=ttl))
+                except UserServiceError as e:
+                    error = e
+            if not profiles and error is not None:
+                raise error
+            return max(
+                profiles,
+                key=lambda profile: (profile.is_vip, profile.is_login),
+                default=EntitlementProfile()
+            )
+        if not sess_data:
+            return EntitlementProfile()
+
+        identity = get_sess_data_identity(sess_data)
+        now = time.time()
+        with cls._entitlement_profiles_lock:
+            cached = cls._entitlement_profiles.get(identity)
+        if cached is not None and cached[0] > now:
+            if isinstance(cached[1], UserServiceError):
+                raise cached[1]
+            return cached[1]
+
+        try:
+            profile = cls._parse_my_info(ProxyService.get_my_info(sess_data=sess_data), now)
+        except UserServiceError as e:
+            with cls._entitlement_profiles_lock:
+                cls._entitlement_profiles[identity] = (now + min(ttl, ENTITLEMENT_ERROR_TTL), e)
+            raise
+        expires_at = now + ttl
+        if profile.vip_due_time is not None and profile.is_vip:
+            expires_at = min(expires_at, profile.vip_due_time)
+        with cls._entitlement_profiles_lock:
+            cls._entitlement_profiles[identity] = (expires_at, profile)
+        return profile
+
+    @classmethod
+    def clear_entitlement_profiles(cls) -> None:
+        with cls._entitlement_profiles_lock:
+            cls._entitlement_profiles.clear()
+
+    @staticmethod
+    def _parse_my_info(my_info: GetMyInfoResponse, now: float) -> EntitlementProfile:
+        """
+        only the response of not login is an anonymous profile,
+        the others failed, e.g. risk control, are errors rather than a capped profile
+        """
+        if my_info.code == NOT_LOGIN_CODE:
+            return EntitlementProfile()
+        if my_info.code != 0 or my_info.data is None:
+            raise UserServiceError(f'Request my info failed: {my_info.code} {my_info.message}', my_info.code)
+        vip = my_info.data.vip
+        vip_due_time = vip.due_date // 1000 if vip is not None and vip.due_date else None
+        is_vip = (
+            vip is not None
+            and vip.status == 1
+            and (vip_due_time is None or vip_due_time > now)
+        )
+        return EntitlementProfile(
+            is_login=True,
+            mid=my_info.data.mid,
+            is_vip=is_vip,
+            vip_due_time=vip_due_time
+        )
@@ -0,0 +1,234 @@
+"""
+WBI signature of the requests to Bilibili official APIs with '/wbi' in path
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+from threading import Lock
+import time
+from typing import Any, Callable, Dict, Mapping, NamedTuple, Optional, Tuple
+from urllib.parse import urlencode
+
+from .constants import WBI_KEYS_REFRESH_INTERVAL, WBI_KEYS_RETRY_INTERVAL
+
+
+__all__ = [
+    'get_mixin_key',
+    'get_wbi_key',
+    'sign_params',
+    'WbiSigner',
+    'wbi_signer'
+]
+
+
+logger = logging.getLogger(__name__)
+
+
+# permutation to shuffle the concatenation of img_key and sub_key
+MIXIN_KEY_ENC_TAB = [
+    46, 47, 18, 2, 53, 8, 23, 32, 15, 50, 10, 31, 58, 3, 45, 35, 27, 43, 5, 49,
+    33, 9, 42, 19, 29, 28, 14, 39, 12, 38, 41, 13, 37, 48, 7, 16, 24, 55, 40,
+    61, 26, 17, 0, 1, 60, 51, 30, 4, 22, 25, 54, 21, 56, 59, 6, 63, 57, 62, 11,
+    36, 20, 34, 44, 52
+]
+MIXIN_KEY_LENGTH = 32
+WBI_FILTERED_CHARS_PATTERN = re.compile(r"[!'()*]")
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'bili_jean', 'wbi_keys.json')
+
+
+def get_wbi_key(url: str) -> str:
+    """
+    key is the file name of img_url or sub_url without extension,
+    e.g. '7cd084941338484aae1ad9425b84077c' of 'https://i0.hdslb.com/bfs/wbi/7cd084941338484aae1ad9425b84077c.png'
+    """
+    file_name = url.rsplit('/', 1)[-1]
+    return file_name.split('.', 1)[0]
+
+
+def get_mixin_key(img_key: str, sub_key: str) -> str:
+    origin = img_key + sub_key
+    return ''.join(origin[idx] for idx in MIXIN_KEY_ENC_TAB if idx < len(origin))[:MIXIN_KEY_LENGTH]
+
+
+def sign_params(params: Mapping[str, Any], mixin_key: str, wts: int) -> Dict[str, Any]:
+    """
+    sign the query parameters with 'wts' and 'w_rid'
+    :param params: query parameters
+    :type params: Mapping[str, Any]
+    :param mixin_key: key derived from img_key and sub_key, refer to get_mixin_key
+    :type mixin_key: str
+    :param wts: current unix timestamp
+    :type wts: int
+    :return: signed query parameters
+    """
+    result: Dict[str, Any] = {}
+    for key, value in params.items():
+        if isinstance(value, str):
+            value = WBI_FILTERED_CHARS_PATTERN.sub('', value)
+        result[key] = value
+    result['wts'] = wts
+    query = urlencode(sorted((key, str(value)) for key, value in result.items()))
+    result['w_rid'] = hashlib.md5((query + mixin_key).encode('utf-8')).hexdigest()
+    return result
+
+
+class WbiKeys(NamedTuple):
+    img_key: str
+    sub_key: str
+    fetched_at: float
+
+
+class WbiSigner:
+    """
+    Sign requests with keys fetched once and cached,
+    so signing is a pure computation rather than an extra request each time
+
+    * keys are cached in process, and on disk to be reused across processes
+    * keys are refreshed after refresh interval, the stale ones are still used if refreshing fails,
+      or while another thread is refreshing them, which is requested without holding the lock
+    * failed fetching is not retried until retry interval passes,
+      requests are unsigned if there is no key at all
+    """
+
+    def __init__(
+        self,
+        refresh_interval: float = WBI_KEYS_REFRESH_INTERVAL,
+        retry_interval: float = WBI_KEYS_RETRY_INTERVAL,
+        cache_path: Optional[str] = DEFAULT_CACHE_PATH,
+        clock: Callable[[], float] = time.time
+    ):
+        """
+        :param refresh_interval: seconds before the keys are considered stale
+        :type refresh_interval: float
+        :param retry_interval: seconds to wait before fetching keys again once it fails
+        :type retry_interval: float
+        :param cache_path: path of the file to cache keys, no disk cache if None
+        :type cache_path: Optional[str]
+        :param clock: source of current unix timestamp
+        :type clock: Callable[[], float]
+        """
+        self._refresh_interval = refresh_interval
+        self._retry_interval = retry_interval
+        self._cache_path = cache_path
+        self._clock = clock
+        self._keys: Optional[WbiKeys] = None
+        self._mixin_key: Optional[str] = None
+        self._is_disk_loaded = False
+        self._retry_after = 0.0
+        self._is_fetching = False
+        self._lock = Lock()
+
+    @property
+    def keys(self) -> Optional[WbiKeys]:
+        return self._keys
+
+    def set_keys(self, img_key: str, sub_key: str, fetched_at: Optional[float] = None) -> str:
+        """
+        cache keys in process, and precompute the mixin key
+        :return: mixin key
+        """
+        with self._lock:
+            return self._set_keys(img_key, sub_key, fetched_at)
+
+    def get_mixin_key(self, fetch_keys: Callable[[], Tuple[str, str]]) -> Optional[str]:
+        """
+        get the mixin key, keys are fetched only if cache is missing or stale
+        :param fetch_keys: function to fetch img_key and sub_key
+        :type fetch_keys: Callable[[], Tuple[str, str]]
+        :return: mixin key, None if no key is available
+        """
+        with self._lock:
+            now = self._clock()
+            if not self._is_disk_loaded:
+                self._is_disk_loaded = True
+                if self._keys is None:
+                    self._load()
+            if self._keys is not None and now - self._keys.fetched_at < self._refresh_interval:
+                return self._mixin_key
+            if now < self._retry_after:
+                return self._mixin_key
+            # stale keys are used meanwhile another thread is refreshing them
+            if self._is_fetching and self._mixin_key is not None:
+                return self._mixin_key
+            self._is_fetching = True
+
+        # fetched without the lock, so the other signing threads aren't held by the request
+        try:
+            img_key, sub_key = fetch_keys()
+        except Exception as e:
+            logger.warning(f'Fetch WBI keys failed: {e}')
+            with self._lock:
+                self._is_fetching = False
+                self._retry_after = now + self._retry_interval
+                return self._mixin_key
+
+        with self._lock:
+            self._is_fetching = False
+            if self._keys is not None and self._keys.fetched_at >= now:
+                # refreshed by another thread meanwhile
+                return self._mixin_key
+            mixin_key = self._set_keys(img_key, sub_key, now)
+            self._dump()
+            return mixin_key
+
+    def sign(self, params: Mapping[str, Any], fetch_keys: Callable[[], Tuple[str, str]]) -> Dict[str, Any]:
+        """
+        sign the query parameters, which are returned unsigned if no key is available
+        :param params: query parameters
+        :type params: Mapping[str, Any]
+        :param fetch_keys: function to fetch img_key and sub_key
+        :type fetch_keys: Callable[[], Tuple[str, str]]
+        :return: query parameters
+        """
+        mixin_key = self.get_mixin_key(fetch_keys)
+        if mixin_key is None:
+            return dict(params)
+        return sign_params(params, mixin_key, int(self._clock()))
+
+    def clear(self) -> None:
+        """
+        clear keys cached in process, the disk cache is kept
+        """
+        with self._lock:
+            self._keys = None
+            self._mixin_key = None
+            self._is_disk_loaded = False
+            self._retry_after = 0.0
+
+    def _set_keys(self, img_key: str, sub_key: str, fetched_at: Optional[float] = None) -> str:
+        if fetched_at is None:
+            fetched_at = self._clock()
+        self._keys = WbiKeys(img_key=img_key, sub_key=sub_key, fetched_at=fetched_at)
+        self._mixin_key = get_mixin_key(img_key, sub_key)
+        self._retry_after = 0.0
+        return self._mixin_key
+
+    def _load(self) -> None:
+        if self._cache_path is None:
+            return
+        try:
+            with open(self._cache_path, 'r') as fp:
+                data = json.load(fp)
+            self._set_keys(data['img_key'], data['sub_key'], float(data['fetched_at']))
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f'Load WBI keys from {self._cache_path} failed: {e}')
+
+    def _dump(self) -> None:
+        if self._cache_path is None or self._keys is None:
+            return
+        tmp_path = f'{self._cache_path}.tmp'
+        try:
+            os.makedirs(os.path.dirname(self._cache_path) or '.', exist_ok=True)
+            with open(tmp_path, 'w') as fp:
+                json.dump(self._keys._asdict(), fp)
+            os.replace(tmp_path, self._cache_path)
+        except OSError as e:
+            logger.warning(f'Dump WBI keys to {self._cache_path} failed: {e}')
+
+
+wbi_signer = WbiSigner()
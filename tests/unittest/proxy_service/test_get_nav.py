@@ -0,0 +1,52 @@
+"""
+Unit test for get_nav of ProxyService
+"""
+from http import HTTPStatus
+import json
+from unittest import TestCase
+from unittest.mock import patch
+
+from bili_jean.proxy_service import ProxyService
+from tests.utils import get_mocked_response
+
+
+with open('tests/mock_data/proxy/nav/nav_not_login.json', 'r') as fp:
+    DATA_NAV_NOT_LOGIN = json.load(fp)
+with open('tests/mock_data/proxy/my_info/my_info_not_login.json', 'r') as fp:
+    DATA_MY_INFO_NOT_LOGIN = json.load(fp)
+
+
+class ProxyServiceGetNavTestCase(TestCase):
+
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    def test_get_nav_not_login(self, mocked_request):
+        mocked_request.return_value = get_mocked_response(
+            HTTPStatus.OK.value,
+            json.dumps(DATA_NAV_NOT_LOGIN).encode('utf-8')
+        )
+        actual_dm = ProxyService.get_nav()
+
+        self.assertEqual(actual_dm.code, DATA_NAV_NOT_LOGIN['code'])
+        self.assertFalse(actual_dm.data.is_login)
+        self.assertEqual(actual_dm.data.wbi_img.img_url, DATA_NAV_NOT_LOGIN['data']['wbi_img']['img_url'])
+        self.assertEqual(actual_dm.data.wbi_img.sub_url, DATA_NAV_NOT_LOGIN['data']['wbi_img']['sub_url'])
+
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    def test_get_wbi_keys(self, mocked_request):
+        mocked_request.return_value = get_mocked_response(
+            HTTPStatus.OK.value,
+            json.dumps(DATA_NAV_NOT_LOGIN).encode('utf-8')
+        )
+        self.assertEqual(
+            ProxyService.get_wbi_keys(),
+            ('7cd084941338484aae1ad9425b84077c', '4932caff0ff746eab6f01bf08b70ac45')
+        )
+
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    def test_get_wbi_keys_missing(self, mocked_request):
+        mocked_request.return_value = get_mocked_response(
+            HTTPStatus.OK.value,
+            json.dumps(DATA_MY_INFO_NOT_LOGIN).encode('utf-8')
+        )
+        with self.assertRaises(ValueError):
+            ProxyService.get_wbi_keys()
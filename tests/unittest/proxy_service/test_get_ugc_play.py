@@ -8,7 +8,8 @@ from unittest.mock import patch
 
 from bili_jean.constants import FormatNumberValue, QualityNumber
 from bili_jean.proxy_service import ProxyService
-from tests.utils import get_mocked_response
+from bili_jean.wbi_signer import wbi_signer
+from tests.utils import get_mocked_response, set_mocked_wbi_keys
 
 
 with open('tests/mock_data/proxy/ugc_play/ugc_play_BV1X54y1C74U.json', 'r') as fp:
@@ -23,6 +24,14 @@ with open('tests/mock_data/proxy/ugc_play/ugc_play_BV13ht2ejE1S.json', 'r') as f
     DATA_PLAY_WITH_HIRES = json.load(fp)
 
 
+def setUpModule():
+    set_mocked_wbi_keys()
+
+
+def tearDownModule():
+    wbi_signer.clear()
+
+
 class ProxyServiceGetUGCPlayTestCase(TestCase):
 
     @patch('bili_jean.proxy_service.ProxyService.get')
@@ -370,3 +379,16 @@ class ProxyServiceGetUGCPlayTestCase(TestCase):
                 fnval=FormatNumberValue.DASH.value,
                 fourk=1
             )
+
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    def test_ugc_play_signed(self, mocked_request):
+        mocked_request.return_value = get_mocked_response(
+            HTTPStatus.OK.value,
+            json.dumps(DATA_PLAY).encode('utf-8')
+        )
+        ProxyService.get_ugc_play(cid=239927346, bvid='BV1X54y1C74U')
+        params = mocked_request.call_args.kwargs['params']
+        self.assertEqual(params['bvid'], 'BV1X54y1C74U')
+        self.assertIn('wts', params)
+        self.assertEqual(len(params['w_rid']), 32)
+        self.assertEqual(mocked_request.call_count, 1)
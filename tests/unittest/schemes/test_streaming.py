@@ -0,0 +1,171 @@
+"""
+Unit test for schemes of streaming objects
+"""
+import json
+from unittest import TestCase
+
+from pydantic import ValidationError
+
+from bili_jean.schemes import (
+    Collection,
+    CollectionSection,
+    dump_normalized_pages,
+    GetPGCViewResponse,
+    Owner,
+    Page,
+    StreamingSourcePolicy,
+    View
+)
+from bili_jean.streaming.components import PGCComponent
+
+
+with open('tests/mock_data/proxy/pgc_view/pgc_view_ss12548.json', 'r') as fp:
+    DATA_VIEW = json.load(fp)
+
+
+class PageTestCase(TestCase):
+
+    def test_flat_fields_construction(self):
+        page = Page(
+            page_category='pgc',
+            page_cid=34568185,
+            page_title='普通话',
+            page_duration=7598,
+            view_aid=21071819,
+            view_ep_id=199612,
+            view_title='普通话',
+            view_owner_id=15773384,
+            view_owner_name='哔哩哔哩电影',
+            coll_id=4971,
+            coll_owner_id=15773384,
+            coll_sect_id=12548,
+            coll_sect_title='民国三部曲',
+            is_selected_page=True
+        )
+        self.assertIsInstance(page.view, View)
+        self.assertIsInstance(page.view.owner, Owner)
+        self.assertIsInstance(page.coll, Collection)
+        self.assertIsInstance(page.coll_sect, CollectionSection)
+        self.assertEqual(page.view_aid, 21071819)
+        self.assertIsNone(page.view_bvid)
+        self.assertEqual(page.view_owner_name, '哔哩哔哩电影')
+        self.assertIsNone(page.view_owner_avatar_url)
+        self.assertEqual(page.coll_id, 4971)
+        self.assertEqual(page.coll_owner_id, 15773384)
+        self.assertIsNone(page.coll_owner_name)
+        self.assertEqual(page.coll_sect_title, '民国三部曲')
+
+    def test_flat_fields_without_collection(self):
+        page = Page(
+            page_category='ugc',
+            page_cid=239927346,
+            page_title='呼兰：社保',
+            page_duration=177,
+            view_bvid='BV1X54y1C74U',
+            is_selected_page=True
+        )
+        self.assertIsNone(page.coll)
+        self.assertIsNone(page.coll_sect)
+        self.assertIsNone(page.view.owner)
+        self.assertIsNone(page.coll_title)
+        self.assertIsNone(page.coll_owner_id)
+        self.assertIsNone(page.coll_sect_id)
+
+    def test_model_dump_flat(self):
+        page = Page(
+            page_category='ugc',
+            page_cid=239927346,
+            page_title='呼兰：社保',
+            page_duration=177,
+            view_bvid='BV1X54y1C74U',
+            is_selected_page=True
+        )
+        dumped = page.model_dump_flat()
+        self.assertEqual(dumped['page_cid'], 239927346)
+        self.assertEqual(dumped['view_bvid'], 'BV1X54y1C74U')
+        self.assertIsNone(dumped['coll_title'])
+        self.assertTrue(dumped['is_selected_page'])
+        self.assertEqual(Page(**dumped), page)
+
+    def test_model_dump_legacy_shape(self):
+        page = Page(
+            page_category='ugc',
+            page_cid=239927346,
+            page_title='呼兰：社保',
+            page_duration=177,
+            view_bvid='BV1X54y1C74U',
+            view_owner_name='呼兰',
+            is_selected_page=True
+        )
+        self.assertEqual(page.model_dump(), page.model_dump_flat())
+        self.assertNotIn('view', page.model_dump())
+        self.assertEqual(page.model_dump()['view_owner_name'], '呼兰')
+        self.assertEqual(Page.model_validate_json(page.model_dump_json()), page)
+        self.assertEqual(
+            set(page.model_dump(exclude={'coll', 'coll_sect'})) & {'coll_id', 'coll_sect_id', 'view_bvid'},
+            {'view_bvid'}
+        )
+
+    def test_set_flat_fields(self):
+        view = View(bvid='BV1X54y1C74U', title='x', owner=Owner(mid=1, name='foo'))
+        page = Page(
+            page_category='ugc', page_cid=1, page_title='P1', page_duration=177, view=view, is_selected_page=True
+        )
+        another_page = Page(
+            page_category='ugc', page_cid=2, page_title='P2', page_duration=177, view=view, is_selected_page=False
+        )
+        page.view_title = 'y'
+        page.view_owner_name = 'bar'
+        page.coll_owner_id = 2
+        page.coll_sect_title = 'S1'
+
+        self.assertEqual(page.view_title, 'y')
+        self.assertEqual(page.view_owner_name, 'bar')
+        self.assertEqual(page.view_owner_id, 1)
+        self.assertEqual(page.coll_owner_id, 2)
+        self.assertEqual(page.coll_sect_title, 'S1')
+        self.assertEqual(page.model_dump()['view_title'], 'y')
+        # objects shared by other pages are kept
+        self.assertEqual(another_page.view_title, 'x')
+        self.assertEqual(another_page.view_owner_name, 'foo')
+        self.assertIsNone(another_page.coll)
+
+
+class DumpNormalizedPagesTestCase(TestCase):
+
+    def test_dump_normalized_pages(self):
+        pages = PGCComponent._parse_raw_view(GetPGCViewResponse.model_validate(DATA_VIEW))
+        dumped = dump_normalized_pages(pages)
+
+        self.assertEqual(len(dumped['pages']), len(pages))
+        self.assertEqual(len(dumped['views']), len(pages))
+        self.assertEqual(len(dumped['owners']), 1)
+        self.assertEqual(len(dumped['collections']), 1)
+        self.assertEqual(len(dumped['sections']), 1)
+
+        sample_page, *_ = pages
+        sample_dumped_page, *_ = dumped['pages']
+        self.assertEqual(sample_dumped_page['page_cid'], sample_page.page_cid)
+        sample_dumped_view = dumped['views'][sample_dumped_page['view']]
+        self.assertEqual(sample_dumped_view['ep_id'], sample_page.view_ep_id)
+        self.assertEqual(dumped['owners'][sample_dumped_view['owner']]['name'], sample_page.view_owner_name)
+
+        flat_size = len(json.dumps([page.model_dump_flat() for page in pages]))
+        normalized_size = len(json.dumps(dumped))
+        self.assertLess(normalized_size, flat_size)
+
+    def test_dump_normalized_lazy_pages(self):
+        pages = PGCComponent._iter_raw_view(GetPGCViewResponse.model_validate(DATA_VIEW))
+        dumped = dump_normalized_pages(pages)
+        self.assertEqual(len(dumped['owners']), 1)
+        self.assertEqual(len(dumped['views']), len(dumped['pages']))
+
+
+class StreamingSourcePolicyTestCase(TestCase):
+
+    def test_target_download_seconds_without_link_speed(self):
+        with self.assertRaises(ValidationError):
+            StreamingSourcePolicy(target_download_seconds=300)
+
+        policy = StreamingSourcePolicy(target_download_seconds=300, link_speed=1_000_000)
+        self.assertEqual(policy.target_download_seconds, 300)
@@ -6,6 +6,7 @@ import json
 from unittest import TestCase
 from unittest.mock import patch
 
+from pydantic import ValidationError
 from requests.exceptions import ReadTimeout, Timeout
 
 from bili_jean.constants import (
@@ -14,7 +15,8 @@ from bili_jean.constants import (
     StreamingCategory,
     VideoCodecID
 )
-from bili_jean.streaming.components import PGCComponent
+from bili_jean.schemes import GetPGCViewResponse, Page
+from bili_jean.streaming.components import PGCComponent, PreviewStreamError
 from tests.utils import get_mocked_response
 
 
@@ -207,6 +209,95 @@ class PGCComponentGetViewsTestCase(TestCase):
             PGCComponent.get_views()
 
 
+class PGCComponentIterViewsTestCase(TestCase):
+
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    def test_iter_views_by_not_exist_ep_id(self, mocked_request):
+        mocked_request.return_value = get_mocked_response(
+            HTTPStatus.OK.value,
+            json.dumps(DATA_VIEW_NOT_EXIST).encode('utf-8')
+        )
+        actual_pages = list(PGCComponent.iter_views(ep_id=1))
+        self.assertEqual(actual_pages, [])
+
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    def test_iter_views_equals_get_views(self, mocked_request):
+        mocked_request.return_value = get_mocked_response(
+            HTTPStatus.OK.value,
+            json.dumps(DATA_VIEW_WITH_UP_INFO).encode('utf-8')
+        )
+        expected_pages = PGCComponent.get_views(season_id=12548)
+        actual_pages = list(PGCComponent.iter_views(season_id=12548))
+        self.assertEqual(actual_pages, expected_pages)
+
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    def test_iter_views_selected_only_by_season_id(self, mocked_request):
+        mocked_request.return_value = get_mocked_response(
+            HTTPStatus.OK.value,
+            json.dumps(DATA_VIEW_WITH_UP_INFO).encode('utf-8')
+        )
+        actual_pages = list(PGCComponent.iter_views(season_id=12548, is_selected_only=True))
+        self.assertEqual(len(actual_pages), 1)
+
+        sample_actual_page, *_ = actual_pages
+        self.assertEqual(sample_actual_page.view_ep_id, 199612)
+        self.assertTrue(sample_actual_page.is_selected_page)
+
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    def test_iter_views_selected_only_in_section(self, mocked_request):
+        mocked_request.return_value = get_mocked_response(
+            HTTPStatus.OK.value,
+            json.dumps(DATA_VIEW_WITH_UP_INFO).encode('utf-8')
+        )
+        actual_pages = list(PGCComponent.iter_views(ep_id=687271, is_selected_only=True))
+        self.assertEqual(len(actual_pages), 1)
+
+        sample_actual_page, *_ = actual_pages
+        self.assertEqual(sample_actual_page.view_ep_id, 687271)
+        self.assertTrue(sample_actual_page.is_selected_page)
+
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    def test_iter_views_with_section_ids(self, mocked_request):
+        mocked_request.return_value = get_mocked_response(
+            HTTPStatus.OK.value,
+            json.dumps(DATA_VIEW_WITH_UP_INFO).encode('utf-8')
+        )
+        main_pages = list(PGCComponent.iter_views(season_id=12548, section_ids=[12548]))
+        self.assertEqual(
+            [page.view_ep_id for page in main_pages],
+            [episode['ep_id'] for episode in DATA_VIEW_WITH_UP_INFO['result']['episodes']]
+        )
+
+        side_section, *_ = DATA_VIEW_WITH_UP_INFO['result']['section']
+        side_pages = list(PGCComponent.iter_views(season_id=12548, section_ids=[side_section['id']]))
+        self.assertEqual(
+            [page.view_ep_id for page in side_pages],
+            [episode['ep_id'] for episode in side_section['episodes']]
+        )
+
+
+class PGCComponentTrustedPageTestCase(TestCase):
+
+    def test_trusted_pages_equal_validated_ones(self):
+        view_response = GetPGCViewResponse.model_validate(DATA_VIEW)
+        trusted_pages = PGCComponent._parse_raw_view(view_response)
+        with patch.object(Page, 'is_trusted_validated', True):
+            validated_pages = PGCComponent._parse_raw_view(view_response)
+        self.assertEqual(trusted_pages, validated_pages)
+        self.assertEqual(
+            [page.model_dump() for page in trusted_pages],
+            [page.model_dump() for page in validated_pages]
+        )
+
+    def test_trusted_page_with_validation(self):
+        page = Page.trusted(page_category='pgc', page_cid='invalid', is_selected_page=False)
+        self.assertEqual(page.page_cid, 'invalid')
+        self.assertEqual(page.page_index, 1)
+        with patch.object(Page, 'is_trusted_validated', True):
+            with self.assertRaises(ValidationError):
+                Page.trusted(page_category='pgc', page_cid='invalid', is_selected_page=False)
+
+
 class PGCComponentGetPageStreamingSrcTestCase(TestCase):
 
     @patch('bili_jean.proxy_service.ProxyService.get')
@@ -518,3 +609,48 @@ class PGCComponentGetPageStreamingSrcTestCase(TestCase):
     def test_get_page_streaming_src_without_identifier(self):
         with self.assertRaises(ValueError):
             PGCComponent.get_page_streaming_src()
+
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    def test_get_page_streaming_src_duration(self, mocked_request):
+        mocked_request.return_value = get_mocked_response(
+            HTTPStatus.OK.value,
+            json.dumps(DATA_PLAY).encode('utf-8')
+        )
+        actual_video_src, actual_audio_src = PGCComponent.get_page_streaming_src(cid=34568185)
+        self.assertEqual(actual_video_src.duration, DATA_PLAY['result']['dash']['duration'])
+        self.assertFalse(actual_video_src.is_preview)
+        self.assertEqual(actual_audio_src.duration, DATA_PLAY['result']['dash']['duration'])
+        self.assertFalse(actual_audio_src.is_preview)
+
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    def test_get_page_streaming_src_trial(self, mocked_request):
+        mocked_request.return_value = get_mocked_response(
+            HTTPStatus.OK.value,
+            json.dumps(DATA_PLAY_TRIAL).encode('utf-8')
+        )
+        with self.assertRaises(PreviewStreamError):
+            PGCComponent.get_page_streaming_src(cid=34568185)
+
+        catalog = PGCComponent.get_stream_catalog(cid=34568185)
+        self.assertTrue(catalog.is_preview)
+        self.assertEqual(catalog.duration, 360)
+        self.assertEqual(catalog.full_duration, 7598)
+        self.assertEqual(catalog.video_qns, [])
+
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    def test_get_page_streaming_src_shorter_than_page(self, mocked_request):
+        mocked_request.return_value = get_mocked_response(
+            HTTPStatus.OK.value,
+            json.dumps(DATA_PLAY).encode('utf-8')
+        )
+        with self.assertRaises(PreviewStreamError):
+            PGCComponent.get_page_streaming_src(cid=34568185, page_duration=86400)
+
+        actual_video_src, actual_audio_src = PGCComponent.get_page_streaming_src(
+            cid=34568185,
+            page_duration=86400,
+            is_preview_accepted=True
+        )
+        self.assertTrue(actual_video_src.is_preview)
+        self.assertTrue(actual_audio_src.is_preview)
+        self.assertEqual(actual_video_src.qn, QualityNumber.FOUR_K.value)
@@ -15,7 +15,8 @@ from bili_jean.constants import (
     VideoCodecID
 )
 from bili_jean.streaming.components import UGCComponent
-from tests.utils import get_mocked_response
+from bili_jean.wbi_signer import wbi_signer
+from tests.utils import get_mocked_response, set_mocked_wbi_keys
 
 
 with open('tests/mock_data/proxy/ugc_play/ugc_play_BV1X54y1C74U.json', 'r') as fp:
@@ -34,6 +35,14 @@ with open('tests/mock_data/proxy/card/card_642389251.json', 'r') as fp:
     DATA_CARD = json.load(fp)
 
 
+def setUpModule():
+    set_mocked_wbi_keys()
+
+
+def tearDownModule():
+    wbi_signer.clear()
+
+
 class UGCComponentGetViewsTestCase(TestCase):
 
     @patch('bili_jean.proxy_service.ProxyService.get')
@@ -245,6 +254,23 @@ class UGCComponentGetViewsTestCase(TestCase):
         self.assertEqual(sample_actual_page.coll_sect_title, '正片')
         self.assertFalse(sample_actual_page.is_selected_page)
 
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    def test_get_views_share_collection_metadata(self, mocked_get_request):
+        mocked_get_request.side_effect = [
+            get_mocked_response(
+                HTTPStatus.OK.value,
+                json.dumps(DATA_VIEW_WITH_SEASON).encode('utf-8')
+            ),
+            get_mocked_response(
+                HTTPStatus.OK.value,
+                json.dumps(DATA_CARD).encode('utf-8')
+            )
+        ]
+        first_page, last_page = UGCComponent.get_views(bvid='BV1tN4y1F79k')
+        self.assertIs(first_page.coll, last_page.coll)
+        self.assertIs(first_page.coll_sect, last_page.coll_sect)
+        self.assertIsNot(first_page.view, last_page.view)
+
     @patch('bili_jean.proxy_service.ProxyService.get')
     def test_get_views_with_connection_error(self, mocked_request):
         mocked_request.side_effect = ConnectionError(
@@ -266,6 +292,96 @@ class UGCComponentGetViewsTestCase(TestCase):
             UGCComponent.get_views()
 
 
+class UGCComponentIterViewsTestCase(TestCase):
+
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    def test_iter_views_by_not_exist_bvid(self, mocked_request):
+        mocked_request.return_value = get_mocked_response(
+            HTTPStatus.OK.value,
+            json.dumps(DATA_VIEW_NOT_EXIST).encode('utf-8')
+        )
+        actual_pages = list(UGCComponent.iter_views(bvid='notexistbvid'))
+        self.assertEqual(actual_pages, [])
+
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    def test_iter_views_with_season(self, mocked_get_request):
+        mocked_get_request.side_effect = [
+            get_mocked_response(
+                HTTPStatus.OK.value,
+                json.dumps(DATA_VIEW_WITH_SEASON).encode('utf-8')
+            ),
+            get_mocked_response(
+                HTTPStatus.OK.value,
+                json.dumps(DATA_CARD).encode('utf-8')
+            )
+        ]
+        actual_pages = UGCComponent.iter_views(bvid='BV1tN4y1F79k')
+        self.assertEqual(
+            [page.page_cid for page in actual_pages],
+            [808240617, 808242611]
+        )
+
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    def test_iter_views_selected_only(self, mocked_get_request):
+        mocked_get_request.side_effect = [
+            get_mocked_response(
+                HTTPStatus.OK.value,
+                json.dumps(DATA_VIEW_WITH_SEASON).encode('utf-8')
+            ),
+            get_mocked_response(
+                HTTPStatus.OK.value,
+                json.dumps(DATA_CARD).encode('utf-8')
+            )
+        ]
+        actual_pages = list(UGCComponent.iter_views(bvid='BV1tN4y1F79k', is_selected_only=True))
+        self.assertEqual(len(actual_pages), 1)
+
+        sample_actual_page, *_ = actual_pages
+        self.assertEqual(sample_actual_page.page_cid, 808240617)
+        self.assertEqual(sample_actual_page.view_owner_id, 642389251)
+        self.assertEqual(sample_actual_page.coll_sect_id, 752877)
+        self.assertTrue(sample_actual_page.is_selected_page)
+
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    def test_iter_views_with_section_ids(self, mocked_get_request):
+        mocked_get_request.side_effect = [
+            get_mocked_response(
+                HTTPStatus.OK.value,
+                json.dumps(DATA_VIEW_WITH_SEASON).encode('utf-8')
+            ),
+            get_mocked_response(
+                HTTPStatus.OK.value,
+                json.dumps(DATA_CARD).encode('utf-8')
+            )
+        ]
+        actual_pages = list(UGCComponent.iter_views(bvid='BV1tN4y1F79k', section_ids=[1]))
+        self.assertEqual(actual_pages, [])
+
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    def test_iter_views_is_lazy(self, mocked_get_request):
+        mocked_get_request.side_effect = [
+            get_mocked_response(
+                HTTPStatus.OK.value,
+                json.dumps(DATA_VIEW_WITH_SEASON).encode('utf-8')
+            ),
+            get_mocked_response(
+                HTTPStatus.OK.value,
+                json.dumps(DATA_CARD).encode('utf-8')
+            )
+        ]
+        actual_pages = UGCComponent.iter_views(bvid='BV1tN4y1F79k')
+        # only the view is requested before the first page is consumed
+        self.assertEqual(mocked_get_request.call_count, 1)
+
+        sample_actual_page = next(actual_pages)
+        self.assertEqual(sample_actual_page.page_cid, 808240617)
+        self.assertEqual(mocked_get_request.call_count, 2)
+
+    def test_iter_views_without_params(self):
+        with self.assertRaises(ValueError):
+            UGCComponent.iter_views()
+
+
 class UGCComponentGetPageStreamingSrcTestCase(TestCase):
 
     @patch('bili_jean.proxy_service.ProxyService.get')
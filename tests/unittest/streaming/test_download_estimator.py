@@ -0,0 +1,78 @@
+"""
+Unit test for DownloadEstimator
+"""
+from http import HTTPStatus
+import json
+from unittest import TestCase
+from unittest.mock import patch
+
+from requests.structures import CaseInsensitiveDict
+
+from bili_jean.schemes import GetPGCViewResponse, GetUGCPlayResponse, StreamingSourcePolicy
+from bili_jean.streaming.components import PGCComponent, UGCComponent
+from bili_jean.streaming.download_estimator import DownloadEstimate, DownloadEstimator
+from tests.utils import get_mocked_response
+
+
+with open('tests/mock_data/proxy/ugc_play/ugc_play_BV1X54y1C74U.json', 'r') as fp:
+    DATA_PLAY = json.load(fp)
+with open('tests/mock_data/proxy/pgc_view/pgc_view_ss12548.json', 'r') as fp:
+    DATA_VIEW = json.load(fp)
+
+
+class DownloadEstimatorTestCase(TestCase):
+
+    def setUp(self):
+        self.catalog = UGCComponent._build_stream_catalog(GetUGCPlayResponse.model_validate(DATA_PLAY))
+
+    def test_estimate_catalogs(self):
+        estimator = DownloadEstimator(throughput=1_000_000)
+        estimate = estimator.estimate_catalogs({239927346: self.catalog})
+        # 480P HEVC video and 192K audio, (311908 + 319181) bps × 177 s
+        self.assertEqual(estimate.bytes_by_cid, {239927346: 6900964 + 7061879})
+        self.assertEqual(estimate.total_bytes, 6900964 + 7061879)
+        self.assertAlmostEqual(estimate.seconds, 13.962843)
+
+    def test_estimate_catalogs_with_policy(self):
+        estimator = DownloadEstimator(policy=StreamingSourcePolicy(byte_budget=7_000_000))
+        estimate = estimator.estimate_catalogs({239927346: self.catalog})
+        self.assertLessEqual(estimate.total_bytes, 7_000_000)
+        self.assertIsNone(estimate.seconds)
+
+    def test_estimate_pages(self):
+        pages = PGCComponent._parse_raw_view(GetPGCViewResponse.model_validate(DATA_VIEW), None)
+        estimator = DownloadEstimator(throughput=2_000_000)
+        byte_rate = estimator.get_byte_rate(self.catalog)
+        self.assertAlmostEqual(byte_rate, (311908 + 319181) / 8)
+
+        estimate = estimator.estimate_pages(pages + pages, byte_rate)
+        self.assertEqual(len(estimate.bytes_by_cid), len({page.page_cid for page in pages}))
+        sample_page, *_ = pages
+        self.assertEqual(estimate.bytes_by_cid[sample_page.page_cid], int(sample_page.page_duration * byte_rate))
+        self.assertEqual(estimate.total_bytes, sum(estimate.bytes_by_cid.values()))
+
+    @patch('bili_jean.proxy_service.ProxyService.head')
+    def test_calibrate(self, mocked_request):
+        def mocked_head(url, **kwargs):
+            item = next(item for item in self.catalog.videos_by_bandwidth + self.catalog.audios_by_bandwidth
+                        if item.base_url == url)
+            return get_mocked_response(
+                HTTPStatus.OK.value,
+                b'',
+                CaseInsensitiveDict({'Content-Length': str(self.catalog.estimate_size(item) * 2)})
+            )
+
+        mocked_request.side_effect = mocked_head
+        estimator = DownloadEstimator()
+        self.assertEqual(estimator.calibrate([self.catalog] * 4, sample_size=2), 2)
+        self.assertEqual(mocked_request.call_count, 4)
+        self.assertEqual(estimator.estimate_catalog(self.catalog), (6900964 + 7061879) * 2)
+
+    @patch('bili_jean.proxy_service.ProxyService.head')
+    def test_calibrate_with_forbidden_source(self, mocked_request):
+        mocked_request.return_value = get_mocked_response(HTTPStatus.FORBIDDEN.value, b'')
+        estimator = DownloadEstimator(calibration_ratio=1.1)
+        self.assertEqual(estimator.calibrate([self.catalog]), 1.1)
+
+    def test_seconds_without_throughput(self):
+        self.assertIsNone(DownloadEstimate(bytes_by_cid={}, total_bytes=0).seconds)
@@ -0,0 +1,89 @@
+"""
+Unit test for PageTable
+"""
+import json
+from unittest import TestCase
+
+from bili_jean.schemes import GetPGCViewResponse, Page
+from bili_jean.streaming.components import PGCComponent
+from bili_jean.streaming.page_table import PageTable
+
+
+with open('tests/mock_data/proxy/pgc_view/pgc_view_ss12548.json', 'r') as fp:
+    DATA_VIEW = json.load(fp)
+
+
+class PageTableTestCase(TestCase):
+
+    def setUp(self):
+        view_response = GetPGCViewResponse.model_validate(DATA_VIEW)
+        self.pages = PGCComponent._parse_raw_view(view_response, ep_id=328482)
+        self.table = PageTable(self.pages)
+
+    def test_len_and_rows(self):
+        self.assertEqual(len(self.table), len(self.pages))
+        self.assertEqual(list(self.table), self.pages)
+        self.assertIsInstance(self.table.row(0), Page)
+        self.assertIs(self.table.row(0).view, self.pages[0].view)
+
+    def test_get_by_cid(self):
+        expected_page = self.pages[-1]
+        self.assertEqual(self.table.get_by_cid(expected_page.page_cid), expected_page)
+        self.assertIsNone(self.table.get_by_cid(0))
+
+    def test_get_by_ep_id(self):
+        actual_page = self.table.get_by_ep_id(328482)
+        self.assertEqual(actual_page.view_ep_id, 328482)
+        self.assertIsNone(self.table.get_by_ep_id(0))
+
+    def test_get_by_bvid_and_aid(self):
+        expected_page, *_ = self.pages
+        self.assertEqual(self.table.get_by_bvid(expected_page.view_bvid), [expected_page])
+        self.assertEqual(self.table.get_by_aid(expected_page.view_aid), [expected_page])
+
+    def test_positions_with_not_indexed_field(self):
+        with self.assertRaises(ValueError):
+            self.table.positions('page_title', '普通话')
+
+    def test_selected_pages(self):
+        self.assertEqual(
+            list(self.table.selected_mask),
+            [int(page.is_selected_page) for page in self.pages]
+        )
+        selected_page, = self.table.selected_pages()
+        self.assertEqual(selected_page.view_ep_id, 328482)
+
+    def test_column(self):
+        self.assertEqual(list(self.table.column('page_cid')), [page.page_cid for page in self.pages])
+        self.assertEqual(self.table.column('view_title'), [page.view_title for page in self.pages])
+        self.assertEqual(self.table.column('coll_owner_name'), [page.coll_owner_name for page in self.pages])
+        with self.assertRaises(ValueError):
+            self.table.column('not_exist_field')
+
+    def test_results_are_not_internal_storage(self):
+        page = self.pages[0]
+        positions = self.table.positions('page_cid', page.page_cid)
+        positions.append(1)
+        self.assertEqual(self.table.positions('page_cid', page.page_cid), [0])
+
+        with self.assertRaises(TypeError):
+            self.table.column('page_cid')[0] = 0
+        with self.assertRaises(TypeError):
+            self.table.column('page_title')[0] = 'foo'
+        with self.assertRaises(TypeError):
+            self.table.selected_mask[0] = 0
+        self.assertEqual(self.table.row(0), page)
+
+    def test_to_records(self):
+        self.assertEqual(self.table.to_records(), [page.model_dump_flat() for page in self.pages])
+
+    def test_to_columns(self):
+        columns = self.table.to_columns(['page_cid', 'view_ep_id'])
+        self.assertEqual(list(columns), ['page_cid', 'view_ep_id'])
+        self.assertEqual(columns['view_ep_id'], [page.view_ep_id for page in self.pages])
+
+    def test_empty_table(self):
+        table = PageTable([])
+        self.assertEqual(len(table), 0)
+        self.assertEqual(table.selected_pages(), [])
+        self.assertEqual(table.to_records(), [])
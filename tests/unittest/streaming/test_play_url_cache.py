@@ -0,0 +1,117 @@
+"""
+Unit test for PlayURLCache
+"""
+from http import HTTPStatus
+import json
+from unittest import TestCase
+from unittest.mock import patch
+
+from bili_jean.constants import StreamingCategory
+from bili_jean.schemes import GetUGCPlayResponse
+from bili_jean.streaming.components import UGCComponent
+from bili_jean.streaming.play_url_cache import PlayURLCache, get_url_deadline, iter_signed_urls
+from bili_jean.wbi_signer import wbi_signer
+from tests.utils import get_mocked_response, set_mocked_wbi_keys
+
+
+with open('tests/mock_data/proxy/ugc_play/ugc_play_BV1X54y1C74U.json', 'r') as fp:
+    DATA_UGC_PLAY = json.load(fp)
+
+# deadline of URLs in the mock data
+MOCK_DEADLINE = 1728826357
+
+
+def setUpModule():
+    set_mocked_wbi_keys()
+
+
+def tearDownModule():
+    wbi_signer.clear()
+
+
+class GetURLDeadlineTestCase(TestCase):
+
+    def test_get_url_deadline(self):
+        self.assertEqual(
+            get_url_deadline('https://example.com/file.m4s?e=abc&uipk=5&deadline=1728826357&gen=playurlv2'),
+            1728826357
+        )
+        self.assertEqual(
+            get_url_deadline('https://example.com/file.m4s?e=abc\\u0026deadline=1728826357\\u0026gen=playurlv2'),
+            1728826357
+        )
+        self.assertIsNone(get_url_deadline('https://example.com/file.m4s'))
+
+    def test_iter_signed_urls(self):
+        play_dm = GetUGCPlayResponse.model_validate(DATA_UGC_PLAY)
+        urls = list(iter_signed_urls(play_dm))
+        dash = play_dm.data.dash
+        self.assertIn(dash.video[0].base_url, urls)
+        self.assertIn(dash.audio[0].backup_url[0], urls)
+        self.assertTrue(all(get_url_deadline(url) == MOCK_DEADLINE for url in urls))
+
+
+class PlayURLCacheTestCase(TestCase):
+
+    def setUp(self):
+        self.now = MOCK_DEADLINE - 3600
+        self.cache = PlayURLCache(safety_margin=60, max_size=2, clock=lambda: self.now)
+        self.url = f'https://example.com/file.m4s?deadline={MOCK_DEADLINE}'
+
+    def test_get_before_deadline(self):
+        key = PlayURLCache.make_key(StreamingCategory.UGC, 1, None, 'sess_data')
+        self.assertTrue(self.cache.put(key, 'play', [self.url]))
+        self.assertEqual(self.cache.get(key), 'play')
+        self.assertIsNone(self.cache.get(PlayURLCache.make_key(StreamingCategory.UGC, 1, None, 'other')))
+
+        self.now = MOCK_DEADLINE - 60
+        self.assertIsNone(self.cache.get(key))
+        self.assertEqual(len(self.cache), 0)
+
+    def test_put_uncacheable(self):
+        self.assertFalse(self.cache.put('key', 'play', ['https://example.com/file.m4s']))
+        self.assertFalse(self.cache.put('key', 'play', []))
+        self.now = MOCK_DEADLINE
+        self.assertFalse(self.cache.put('key', 'play', [self.url]))
+        self.assertIsNone(self.cache.get('key'))
+
+    def test_invalidate_url(self):
+        self.cache.put('key', 'play', [self.url])
+        self.assertFalse(self.cache.invalidate_url('https://example.com/other.m4s'))
+        self.assertTrue(self.cache.invalidate_url(self.url))
+        self.assertIsNone(self.cache.get('key'))
+        self.assertFalse(self.cache.invalidate_url(self.url))
+
+    def test_evict_least_recently_used(self):
+        self.cache.put('key_0', 'play_0', [self.url])
+        self.cache.put('key_1', 'play_1', [self.url])
+        self.cache.get('key_0')
+        self.cache.put('key_2', 'play_2', [self.url])
+        self.assertIsNone(self.cache.get('key_1'))
+        self.assertEqual(self.cache.get('key_0'), 'play_0')
+        self.assertEqual(self.cache.get('key_2'), 'play_2')
+
+    def test_sess_data_identity(self):
+        identity = PlayURLCache.get_sess_data_identity('sess_data')
+        self.assertNotIn('sess_data', identity)
+        self.assertEqual(identity, PlayURLCache.get_sess_data_identity('sess_data'))
+        self.assertEqual(PlayURLCache.get_sess_data_identity(None), '')
+
+
+class ComponentPlayURLCacheTestCase(TestCase):
+
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    def test_reuse_play_until_invalidated(self, mocked_request):
+        mocked_request.return_value = get_mocked_response(
+            HTTPStatus.OK.value,
+            json.dumps(DATA_UGC_PLAY).encode('utf-8')
+        )
+        cache = PlayURLCache(clock=lambda: MOCK_DEADLINE - 3600)
+        with patch('bili_jean.streaming.components.base.play_url_cache', cache):
+            video_src, _ = UGCComponent.get_page_streaming_src(cid=239927346, bvid='BV1X54y1C74U')
+            UGCComponent.get_page_streaming_src(cid=239927346, bvid='BV1X54y1C74U')
+            self.assertEqual(mocked_request.call_count, 1)
+
+            cache.invalidate_url(video_src.url)
+            UGCComponent.get_page_streaming_src(cid=239927346, bvid='BV1X54y1C74U')
+            self.assertEqual(mocked_request.call_count, 2)
@@ -0,0 +1,194 @@
+"""
+Unit test for StreamCatalog
+"""
+import json
+from unittest import TestCase
+
+from bili_jean.constants import AudioBitRateID, QualityNumber, VideoCodecID
+from bili_jean.schemes import AudioStreamingSourcePolicy, GetUGCPlayResponse
+from bili_jean.streaming.components import UGCComponent
+from bili_jean.streaming.stream_catalog import StreamCatalog
+
+
+with open('tests/mock_data/proxy/ugc_play/ugc_play_BV1X54y1C74U.json', 'r') as fp:
+    DATA_PLAY = json.load(fp)
+with open('tests/mock_data/proxy/ugc_play/ugc_play_BV13L4y1K7th.json', 'r') as fp:
+    DATA_PLAY_WITH_DOLBY_AUDIO = json.load(fp)
+
+
+class StreamCatalogTestCase(TestCase):
+
+    def setUp(self):
+        play_dm = GetUGCPlayResponse.model_validate(DATA_PLAY_WITH_DOLBY_AUDIO)
+        self.catalog = UGCComponent._build_stream_catalog(play_dm)
+
+    def test_indexes(self):
+        self.assertEqual(
+            self.catalog.video_qns,
+            [
+                QualityNumber.P360.value,
+                QualityNumber.P480.value,
+                QualityNumber.P720.value,
+                QualityNumber.P1080.value,
+                QualityNumber.P1080_60.value,
+                QualityNumber.FOUR_K.value,
+                QualityNumber.DOLBY.value
+            ]
+        )
+        self.assertEqual(
+            self.catalog.get_video_codec_ids(QualityNumber.FOUR_K.value),
+            [VideoCodecID.AVC.value, VideoCodecID.HEVC.value, VideoCodecID.AV1.value]
+        )
+        self.assertEqual(self.catalog.get_video_codec_ids(0), [])
+        self.assertEqual(
+            self.catalog.audio_qns,
+            [
+                AudioBitRateID.BPS_64K.value.bit_rate_id,
+                AudioBitRateID.BPS_132K.value.bit_rate_id,
+                AudioBitRateID.BPS_192K.value.bit_rate_id,
+                AudioBitRateID.BPS_DOLBY.value.bit_rate_id
+            ]
+        )
+        bandwidths = [item.bandwidth for item in self.catalog.videos_by_bandwidth]
+        self.assertEqual(bandwidths, sorted(bandwidths))
+
+    def test_select_video(self):
+        media = self.catalog.select_video()
+        self.assertEqual(media.id_field, QualityNumber.DOLBY.value)
+        self.assertEqual(media.codecid, VideoCodecID.HEVC.value)
+
+        media = self.catalog.select_video(is_hq_preferred=False, is_codec_eff_preferred=False)
+        self.assertEqual(media.id_field, QualityNumber.P360.value)
+        self.assertEqual(media.codecid, VideoCodecID.AVC.value)
+
+        media = self.catalog.select_video(qn=QualityNumber.P1080.value + 1, codec_id=VideoCodecID.HEVC.value)
+        self.assertEqual(media.id_field, QualityNumber.P1080.value)
+        self.assertEqual(media.codecid, VideoCodecID.HEVC.value)
+
+    def test_select_video_fallback_to_quality_with_acceptable_codec(self):
+        # Dolby vision is only in HEVC, fallback to 4K in AVC
+        media = self.catalog.select_video(codec_id=VideoCodecID.AVC.value)
+        self.assertEqual(media.id_field, QualityNumber.FOUR_K.value)
+        self.assertEqual(media.codecid, VideoCodecID.AVC.value)
+
+    def test_select_video_without_acceptable_stream(self):
+        with self.assertRaises(ValueError):
+            self.catalog.select_video(qn=QualityNumber.P240.value)
+
+    def test_rank_videos(self):
+        ranked_items = self.catalog.rank_videos(qn=QualityNumber.P720.value)
+        self.assertEqual(
+            [(item.id_field, item.codecid) for item in ranked_items],
+            [
+                (QualityNumber.P720.value, VideoCodecID.AV1.value),
+                (QualityNumber.P720.value, VideoCodecID.HEVC.value),
+                (QualityNumber.P720.value, VideoCodecID.AVC.value),
+                (QualityNumber.P480.value, VideoCodecID.AV1.value),
+                (QualityNumber.P480.value, VideoCodecID.HEVC.value),
+                (QualityNumber.P480.value, VideoCodecID.AVC.value),
+                (QualityNumber.P360.value, VideoCodecID.AV1.value),
+                (QualityNumber.P360.value, VideoCodecID.HEVC.value),
+                (QualityNumber.P360.value, VideoCodecID.AVC.value)
+            ]
+        )
+
+    def test_select_audio(self):
+        media = self.catalog.select_audio()
+        self.assertEqual(media.id_field, AudioBitRateID.BPS_DOLBY.value.bit_rate_id)
+
+        media = self.catalog.select_audio(is_hq_preferred=False)
+        self.assertEqual(media.id_field, AudioBitRateID.BPS_64K.value.bit_rate_id)
+
+        media = self.catalog.select_audio(qn=AudioBitRateID.BPS_HIRES.value.bit_rate_id)
+        self.assertEqual(media.id_field, AudioBitRateID.BPS_DOLBY.value.bit_rate_id)
+
+    def test_rank_audios(self):
+        ranked_items = self.catalog.rank_audios(qn=AudioBitRateID.BPS_132K.value.bit_rate_id)
+        self.assertEqual(
+            [item.id_field for item in ranked_items],
+            [AudioBitRateID.BPS_132K.value.bit_rate_id, AudioBitRateID.BPS_64K.value.bit_rate_id]
+        )
+
+    def test_rank_audios_without_dolby(self):
+        ranked_items = self.catalog.rank_audios(is_dolby_accepted=False)
+        self.assertEqual(
+            [item.id_field for item in ranked_items],
+            [
+                AudioBitRateID.BPS_192K.value.bit_rate_id,
+                AudioBitRateID.BPS_132K.value.bit_rate_id,
+                AudioBitRateID.BPS_64K.value.bit_rate_id
+            ]
+        )
+
+    def test_select_audio_by_policy(self):
+        media = self.catalog.select_audio_by_policy(AudioStreamingSourcePolicy())
+        self.assertEqual(media.id_field, AudioBitRateID.BPS_DOLBY.value.bit_rate_id)
+
+        media = self.catalog.select_audio_by_policy(AudioStreamingSourcePolicy(is_dolby_accepted=False))
+        self.assertEqual(media.id_field, AudioBitRateID.BPS_192K.value.bit_rate_id)
+
+        audio_sizes = [self.catalog.estimate_size(item) for item in self.catalog.audios_by_bandwidth]
+        byte_budget = sorted(audio_sizes)[1]
+        media = self.catalog.select_audio_by_policy(AudioStreamingSourcePolicy(byte_budget=byte_budget))
+        self.assertLessEqual(self.catalog.estimate_size(media), byte_budget)
+        self.assertEqual(media.id_field, self.catalog.audios_by_bandwidth[1].id_field)
+
+        with self.assertRaises(ValueError):
+            self.catalog.select_audio_by_policy(AudioStreamingSourcePolicy(byte_budget=1))
+
+    def test_empty_catalog(self):
+        catalog = StreamCatalog(video_items=[], audio_items=[])
+        self.assertEqual(catalog.rank_videos(), [])
+        with self.assertRaises(ValueError):
+            catalog.select_audio()
+
+
+class StreamCatalogBudgetTestCase(TestCase):
+
+    def setUp(self):
+        play_dm = GetUGCPlayResponse.model_validate(DATA_PLAY)
+        self.catalog = UGCComponent._build_stream_catalog(play_dm)
+
+    def test_estimate_size(self):
+        self.assertEqual(self.catalog.duration, 177)
+        video_media = self.catalog.select_video()
+        self.assertEqual(self.catalog.estimate_size(video_media), video_media.bandwidth * 177 // 8)
+
+        catalog = StreamCatalog(video_items=[video_media], audio_items=[])
+        with self.assertRaises(ValueError):
+            catalog.estimate_size(video_media)
+
+    def test_get_byte_budget(self):
+        self.assertIsNone(StreamCatalog.get_byte_budget())
+        self.assertEqual(StreamCatalog.get_byte_budget(byte_budget=1024), 1024)
+        self.assertEqual(
+            StreamCatalog.get_byte_budget(byte_budget=1024, target_download_seconds=2, link_speed=256),
+            512
+        )
+        with self.assertRaises(ValueError):
+            StreamCatalog.get_byte_budget(target_download_seconds=2)
+
+    def test_select_within_budget(self):
+        for byte_budget, expected in (
+            (14_000_000, (QualityNumber.P480, VideoCodecID.HEVC, AudioBitRateID.BPS_192K)),
+            (10_000_000, (QualityNumber.P480, VideoCodecID.HEVC, AudioBitRateID.BPS_132K)),
+            (7_000_000, (QualityNumber.P360, VideoCodecID.HEVC, AudioBitRateID.BPS_64K))
+        ):
+            video_media, audio_media = self.catalog.select_within_budget(byte_budget)
+            expected_qn, expected_codec_id, expected_bit_rate_id = expected
+            self.assertEqual(video_media.id_field, expected_qn.value)
+            self.assertEqual(video_media.codecid, expected_codec_id.value)
+            self.assertEqual(audio_media.id_field, expected_bit_rate_id.value.bit_rate_id)
+            self.assertLessEqual(
+                self.catalog.estimate_size(video_media) + self.catalog.estimate_size(audio_media),
+                byte_budget
+            )
+
+    def test_select_within_budget_with_codec(self):
+        video_media, _ = self.catalog.select_within_budget(20_000_000, video_codec_id=VideoCodecID.AVC.value)
+        self.assertEqual(video_media.id_field, QualityNumber.P480.value)
+        self.assertEqual(video_media.codecid, VideoCodecID.AVC.value)
+
+    def test_select_within_insufficient_budget(self):
+        with self.assertRaises(ValueError):
+            self.catalog.select_within_budget(5_000_000)
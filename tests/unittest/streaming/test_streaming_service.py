@@ -1,23 +1,30 @@
 """
 Unit test for StreamingService
 """
+import copy
 from http import HTTPStatus
 import json
+import time
 from unittest import TestCase
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
 
 from requests.exceptions import InvalidSchema, MissingSchema, ReadTimeout
 from requests.structures import CaseInsensitiveDict
 
 from bili_jean.constants import (
     AudioBitRateID,
+    FormatNumberValue,
     QualityNumber,
     StreamingCategory,
     VideoCodecID
 )
-from bili_jean.schemes import Page
+from bili_jean.credential_pool import CredentialPool, CredentialPoolError
+from bili_jean.schemes import AudioStreamingSourcePolicy, Page, StreamingSourcePolicy
+from bili_jean.streaming.components import PreviewStreamError
 from bili_jean.streaming.streaming_service import StreamingService
-from tests.utils import get_mocked_response
+from bili_jean.user_service import UserService
+from bili_jean.wbi_signer import wbi_signer
+from tests.utils import get_mocked_response, set_mocked_wbi_keys
 
 
 DATA_HTML = '<!DOCTYPE html><html lang="zh-Hans"></html>'
@@ -25,12 +32,20 @@ DATA_HTML = '<!DOCTYPE html><html lang="zh-Hans"></html>'
 
 with open('tests/mock_data/proxy/pgc_play/pgc_play_ep199612.json', 'r') as fp:
     DATA_PGC_PLAY = json.load(fp)
+with open('tests/mock_data/proxy/pgc_play/pgc_play_ep199612_trial.json', 'r') as fp:
+    DATA_PGC_PLAY_TRIAL = json.load(fp)
 with open('tests/mock_data/proxy/pugv_play/pugv_play_ep482484.json', 'r') as fp:
     DATA_PUGV_PLAY = json.load(fp)
 with open('tests/mock_data/proxy/pugv_play/pugv_play_ep482535_unpurchased.json', 'r') as fp:
     DATA_PUGV_PLAY_UNPURCHASED = json.load(fp)
 with open('tests/mock_data/proxy/ugc_play/ugc_play_BV1X54y1C74U.json', 'r') as fp:
     DATA_UGC_PLAY = json.load(fp)
+with open('tests/mock_data/proxy/ugc_play/ugc_play_BV13L4y1K7th.json', 'r') as fp:
+    DATA_UGC_PLAY_WITH_DOLBY = json.load(fp)
+with open('tests/mock_data/proxy/ugc_play/ugc_play_BV1Ys421M7YM.json', 'r') as fp:
+    DATA_UGC_PLAY_DURL = json.load(fp)
+with open('tests/mock_data/proxy/my_info/my_info_1532165.json', 'r') as fp:
+    DATA_MY_INFO = json.load(fp)
 with open('tests/mock_data/proxy/pgc_view/pgc_view_ss12548.json', 'r') as fp:
     DATA_PGC_VIEW = json.load(fp)
 with open('tests/mock_data/proxy/pugv_view/pugv_view_ep482484.json', 'r') as fp:
@@ -39,6 +54,14 @@ with open('tests/mock_data/proxy/ugc_view/ugc_view_BV1X54y1C74U.json', 'r') as f
     DATA_UGC_VIEW = json.load(fp)
 
 
+def setUpModule():
+    set_mocked_wbi_keys()
+
+
+def tearDownModule():
+    wbi_signer.clear()
+
+
 class StreamingServiceParseWebViewURLTestCase(TestCase):
 
     @patch('bili_jean.proxy_service.ProxyService.get')
@@ -339,6 +362,312 @@ class StreamingServiceGetViewsTestCase(TestCase):
             StreamingService.get_views(sample_url)
 
 
+class StreamingServiceIterViewsTestCase(TestCase):
+
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    def test_iter_pgc_views_selected_only(self, mocked_request):
+        sample_url = (
+            'https://www.bilibili.com/bangumi/play/ep199612'
+        )
+        mocked_request.side_effect = [
+            get_mocked_response(
+                HTTPStatus.OK.value,
+                DATA_HTML.encode('utf-8'),
+                CaseInsensitiveDict()
+            ),
+            get_mocked_response(
+                HTTPStatus.OK.value,
+                json.dumps(DATA_PGC_VIEW).encode('utf-8')
+            )
+        ]
+
+        actual_pages = list(StreamingService.iter_views(sample_url, is_selected_only=True))
+        self.assertEqual(len(actual_pages), 1)
+
+        sample_actual_page, *_ = actual_pages
+        self.assertIsInstance(sample_actual_page, Page)
+        self.assertEqual(sample_actual_page.view_ep_id, 199612)
+
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    def test_invalid_url(self, mocked_request):
+        sample_url = 'ftp://mock_string'
+        mocked_request.side_effect = InvalidSchema(
+            'No connection adapters were found for \'ftp://mock_string\''
+        )
+
+        with self.assertRaises(ValueError):
+            StreamingService.iter_views(sample_url)
+
+
+class StreamingServiceGetViewTableTestCase(TestCase):
+
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    def test_get_pgc_view_table(self, mocked_request):
+        sample_url = (
+            'https://www.bilibili.com/bangumi/play/ss12548'
+        )
+        mocked_request.side_effect = [
+            get_mocked_response(
+                HTTPStatus.OK.value,
+                DATA_HTML.encode('utf-8'),
+                CaseInsensitiveDict()
+            ),
+            get_mocked_response(
+                HTTPStatus.OK.value,
+                json.dumps(DATA_PGC_VIEW).encode('utf-8')
+            )
+        ]
+
+        table = StreamingService.get_view_table(sample_url)
+        self.assertEqual(len(table), 9)
+        selected_page, = table.selected_pages()
+        self.assertEqual(selected_page.view_ep_id, 199612)
+        self.assertEqual(table.get_by_cid(selected_page.page_cid), selected_page)
+
+
+class StreamingServiceGetStreamCatalogTestCase(TestCase):
+
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    def test_get_ugc_stream_catalog(self, mocked_request):
+        mocked_request.return_value = get_mocked_response(
+            HTTPStatus.OK.value,
+            json.dumps(DATA_UGC_PLAY).encode('utf-8')
+        )
+        catalog = StreamingService.get_stream_catalog(
+            category='ugc',
+            cid=239927346,
+            bvid='BV1X54y1C74U'
+        )
+        self.assertEqual(catalog.video_qns, [QualityNumber.P360.value, QualityNumber.P480.value])
+
+        video_media = catalog.select_video(codec_id=VideoCodecID.HEVC.value)
+        self.assertEqual(video_media.id_field, QualityNumber.P480.value)
+        self.assertEqual(video_media.codecid, VideoCodecID.HEVC.value)
+        audio_media = catalog.select_audio(qn=AudioBitRateID.BPS_132K.value.bit_rate_id)
+        self.assertEqual(audio_media.id_field, AudioBitRateID.BPS_132K.value.bit_rate_id)
+        self.assertEqual(mocked_request.call_count, 1)
+
+
+class StreamingServiceGetPageAudioStreamingSrcTestCase(TestCase):
+
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    def test_get_ugc_page_audio_streaming_src(self, mocked_request):
+        mocked_request.return_value = get_mocked_response(
+            HTTPStatus.OK.value,
+            json.dumps(DATA_UGC_PLAY_WITH_DOLBY).encode('utf-8')
+        )
+        audio_src = StreamingService.get_page_audio_streaming_src(category='ugc', cid=1, bvid='BV13L4y1K7th')
+        self.assertEqual(audio_src.qn, AudioBitRateID.BPS_DOLBY.value.bit_rate_id)
+        params = mocked_request.call_args.kwargs['params']
+        self.assertEqual(params['fnval'], FormatNumberValue.DASH.value | FormatNumberValue.DOLBY_AUDIO.value)
+        self.assertEqual(params['fourk'], 0)
+
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    def test_get_ugc_page_audio_streaming_src_without_dolby(self, mocked_request):
+        mocked_request.return_value = get_mocked_response(
+            HTTPStatus.OK.value,
+            json.dumps(DATA_UGC_PLAY_WITH_DOLBY).encode('utf-8')
+        )
+        audio_src = StreamingService.get_page_audio_streaming_src(
+            category='ugc',
+            cid=2,
+            bvid='BV13L4y1K7th',
+            is_dolby_accepted=False,
+            is_hires_accepted=False
+        )
+        self.assertEqual(audio_src.qn, AudioBitRateID.BPS_192K.value.bit_rate_id)
+        self.assertEqual(audio_src.mime_type, 'audio/mp4')
+        params = mocked_request.call_args.kwargs['params']
+        self.assertEqual(params['fnval'], FormatNumberValue.DASH.value)
+
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    def test_get_ugc_page_audio_streaming_src_without_video(self, mocked_request):
+        data = copy.deepcopy(DATA_UGC_PLAY)
+        data['data']['dash']['video'] = []
+        mocked_request.return_value = get_mocked_response(HTTPStatus.OK.value, json.dumps(data).encode('utf-8'))
+        with self.assertRaises(ValueError):
+            StreamingService.get_page_streaming_src(category='ugc', cid=3, bvid='BV1X54y1C74U')
+
+        audio_src = StreamingService.get_page_audio_streaming_src(
+            category='ugc',
+            cid=3,
+            bvid='BV1X54y1C74U',
+            is_audio_hq_preferred=False
+        )
+        self.assertEqual(audio_src.qn, AudioBitRateID.BPS_64K.value.bit_rate_id)
+        self.assertEqual(audio_src.duration, 177)
+
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    def test_get_pgc_page_audio_streaming_src_only_trial(self, mocked_request):
+        mocked_request.return_value = get_mocked_response(
+            HTTPStatus.OK.value,
+            json.dumps(DATA_PGC_PLAY_TRIAL).encode('utf-8')
+        )
+        with self.assertRaises(PreviewStreamError):
+            StreamingService.get_page_audio_streaming_src(category='pgc', cid=4, ep_id=199612)
+
+    @patch('bili_jean.streaming.streaming_service.PageDownloadService')
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    def test_download_page_audio(self, mocked_request, mocked_download_service_kls):
+        mocked_request.return_value = get_mocked_response(
+            HTTPStatus.OK.value,
+            json.dumps(DATA_UGC_PLAY).encode('utf-8')
+        )
+        mocked_download_service_kls.return_value = MagicMock()
+        page = Page(
+            page_category='ugc',
+            page_cid=239927346,
+            page_title='sample',
+            page_duration=177,
+            view_bvid='BV1X54y1C74U',
+            is_selected_page=True
+        )
+        audio_src = StreamingService.download_page_audio(
+            page,
+            '/tmp/239927346.m4a',
+            policy=AudioStreamingSourcePolicy(audio_qn=AudioBitRateID.BPS_132K.value.bit_rate_id)
+        )
+        self.assertEqual(audio_src.qn, AudioBitRateID.BPS_132K.value.bit_rate_id)
+        args, kwargs = mocked_download_service_kls.call_args
+        self.assertEqual(args, (audio_src.url, '/tmp/239927346.m4a'))
+        self.assertEqual(kwargs['resolver'](), audio_src.url)
+        mocked_download_service_kls.return_value.download.assert_called_once()
+
+
+class StreamingServiceGetPageDUrlSegmentsTestCase(TestCase):
+
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    def test_get_ugc_page_durl_segments(self, mocked_request):
+        mocked_request.return_value = get_mocked_response(
+            HTTPStatus.OK.value,
+            json.dumps(DATA_UGC_PLAY_DURL).encode('utf-8')
+        )
+        # trial which only has the first 1050 seconds
+        with self.assertRaises(PreviewStreamError):
+            StreamingService.get_page_durl_segments(category='ugc', cid=1566548814, bvid='BV1Ys421M7YM')
+
+        segments = StreamingService.get_page_durl_segments(
+            category='ugc',
+            cid=1566548814,
+            bvid='BV1Ys421M7YM',
+            is_preview_accepted=True
+        )
+        self.assertEqual(len(segments), 1)
+        self.assertEqual((segments[0].order, segments[0].size, segments[0].length), (1, 60154454, 1050160))
+        self.assertEqual(len(segments[0].backup_urls), 2)
+
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    def test_get_ugc_page_durl_segments_of_dash(self, mocked_request):
+        mocked_request.return_value = get_mocked_response(
+            HTTPStatus.OK.value,
+            json.dumps(DATA_UGC_PLAY).encode('utf-8')
+        )
+        with self.assertRaises(ValueError):
+            StreamingService.get_page_durl_segments(category='ugc', cid=239927346, bvid='BV1X54y1C74U')
+
+
+class StreamingServiceGetStreamURLResolverTestCase(TestCase):
+
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    def test_resolve_ugc_stream_url(self, mocked_request):
+        mocked_request.return_value = get_mocked_response(
+            HTTPStatus.OK.value,
+            json.dumps(DATA_UGC_PLAY).encode('utf-8')
+        )
+        video_src, audio_src = StreamingService.get_page_streaming_src(
+            category='ugc',
+            cid=239927346,
+            bvid='BV1X54y1C74U',
+            video_qn=QualityNumber.P480.value,
+            video_codec_number=VideoCodecID.HEVC.value,
+            audio_qn=AudioBitRateID.BPS_132K.value.bit_rate_id
+        )
+        video_resolver = StreamingService.get_stream_url_resolver(
+            category='ugc',
+            qn=QualityNumber.P480.value,
+            cid=239927346,
+            bvid='BV1X54y1C74U',
+            codec_id=VideoCodecID.HEVC.value
+        )
+        self.assertEqual(video_resolver(), video_src.url)
+        audio_resolver = StreamingService.get_stream_url_resolver(
+            category='ugc',
+            qn=AudioBitRateID.BPS_132K.value.bit_rate_id,
+            cid=239927346,
+            bvid='BV1X54y1C74U',
+            is_audio=True
+        )
+        self.assertEqual(audio_resolver(), audio_src.url)
+
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    def test_resolve_unavailable_stream_url(self, mocked_request):
+        mocked_request.return_value = get_mocked_response(
+            HTTPStatus.OK.value,
+            json.dumps(DATA_UGC_PLAY).encode('utf-8')
+        )
+        resolver = StreamingService.get_stream_url_resolver(
+            category='ugc',
+            qn=QualityNumber.P1080.value,
+            cid=239927346,
+            bvid='BV1X54y1C74U',
+            codec_id=VideoCodecID.HEVC.value
+        )
+        with self.assertRaises(ValueError):
+            resolver()
+
+
+class StreamingServiceGetSeasonStreamingSrcsTestCase(TestCase):
+
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    def test_get_pgc_season_streaming_srcs(self, mocked_request):
+        mocked_request.side_effect = [
+            get_mocked_response(
+                HTTPStatus.OK.value,
+                DATA_HTML.encode('utf-8'),
+                CaseInsensitiveDict()
+            ),
+            get_mocked_response(
+                HTTPStatus.OK.value,
+                json.dumps(DATA_PGC_VIEW).encode('utf-8')
+            )
+        ]
+        pages = StreamingService.get_views('https://www.bilibili.com/bangumi/play/ss12548')
+        failed_cid = pages[-1].page_cid
+
+        def mocked_get(url, params=None, **kwargs):
+            if params['cid'] == failed_cid:
+                return get_mocked_response(
+                    HTTPStatus.OK.value,
+                    json.dumps({'code': -404, 'message': '啥都木有'}).encode('utf-8')
+                )
+            return get_mocked_response(
+                HTTPStatus.OK.value,
+                json.dumps(DATA_PGC_PLAY).encode('utf-8')
+            )
+
+        mocked_request.reset_mock()
+        mocked_request.side_effect = mocked_get
+        result = StreamingService.get_season_streaming_srcs(
+            pages + pages[:1],
+            policy=StreamingSourcePolicy(
+                video_qn=QualityNumber.PPLUS_1080.value,
+                video_codec_number=VideoCodecID.AVC.value,
+                audio_qn=AudioBitRateID.BPS_192K.value.bit_rate_id
+            ),
+            concurrency=2,
+            rate_limit=None
+        )
+
+        self.assertEqual(mocked_request.call_count, len(pages))
+        self.assertEqual(set(result.srcs), {page.page_cid for page in pages[:-1]})
+        video_src, audio_src = result.srcs[pages[0].page_cid]
+        self.assertEqual(video_src.qn, QualityNumber.PPLUS_1080.value)
+        self.assertEqual(video_src.codec_id, VideoCodecID.AVC.value)
+        self.assertEqual(audio_src.qn, AudioBitRateID.BPS_192K.value.bit_rate_id)
+        self.assertEqual(list(result.errors), [failed_cid])
+        self.assertIsInstance(result.errors[failed_cid], ValueError)
+
+
 class StreamingServiceGetPageStreamingSrcTestCase(TestCase):
 
     @patch('bili_jean.proxy_service.ProxyService.get')
@@ -388,6 +717,234 @@ class StreamingServiceGetPageStreamingSrcTestCase(TestCase):
         self.assertEqual(audio_src.qn, AudioBitRateID.BPS_132K.value.bit_rate_id)
         self.assertEqual(audio_src.mime_type, 'audio/mp4')
 
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    def test_get_ugc_page_streaming_src_within_target_download_time(self, mocked_request):
+        mocked_request.return_value = get_mocked_response(
+            HTTPStatus.OK.value,
+            json.dumps(DATA_UGC_PLAY).encode('utf-8')
+        )
+        video_src, audio_src = StreamingService.get_page_streaming_src(
+            category='ugc',
+            cid=239927346,
+            bvid='BV1X54y1C74U',
+            target_download_seconds=60,
+            link_speed=125_000
+        )
+        self.assertEqual(video_src.qn, QualityNumber.P360.value)
+        self.assertEqual(video_src.codec_id, VideoCodecID.HEVC.value)
+        self.assertEqual(audio_src.qn, AudioBitRateID.BPS_64K.value.bit_rate_id)
+
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    def test_get_ugc_page_streaming_src_with_minimal_format(self, mocked_request):
+        mocked_request.return_value = get_mocked_response(
+            HTTPStatus.OK.value,
+            json.dumps(DATA_UGC_PLAY).encode('utf-8')
+        )
+        StreamingService.get_page_streaming_src(
+            category='ugc',
+            cid=239927346,
+            bvid='BV1X54y1C74U',
+            video_qn=QualityNumber.P720.value,
+            video_codec_number=VideoCodecID.AVC.value,
+            audio_qn=AudioBitRateID.BPS_192K.value.bit_rate_id
+        )
+        params = mocked_request.call_args.kwargs['params']
+        self.assertEqual(params['fnval'], FormatNumberValue.DASH.value)
+        self.assertEqual(params['fourk'], 0)
+
+        StreamingService.get_page_streaming_src(category='ugc', cid=239927346, bvid='BV1X54y1C74U')
+        params = mocked_request.call_args.kwargs['params']
+        self.assertEqual(params['fnval'], FormatNumberValue.full_format())
+        self.assertEqual(params['fourk'], 1)
+
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    def test_get_ugc_page_streaming_src_capped_by_entitlement(self, mocked_request):
+        UserService.clear_entitlement_profiles()
+        mocked_request.side_effect = [
+            get_mocked_response(
+                HTTPStatus.OK.value,
+                json.dumps(DATA_MY_INFO).encode('utf-8')
+            ),
+            get_mocked_response(
+                HTTPStatus.OK.value,
+                json.dumps(DATA_UGC_PLAY_WITH_DOLBY).encode('utf-8')
+            )
+        ]
+        # VIP of the account has expired
+        video_src, audio_src = StreamingService.get_page_streaming_src(
+            category='ugc',
+            cid=1,
+            bvid='BV13L4y1K7th',
+            sess_data='mock-sess-data',
+            is_entitlement_capped=True
+        )
+        self.assertEqual(video_src.qn, QualityNumber.P1080.value)
+        self.assertEqual(audio_src.qn, AudioBitRateID.BPS_192K.value.bit_rate_id)
+        params = mocked_request.call_args.kwargs['params']
+        self.assertEqual(params['fnval'], FormatNumberValue.DASH.value | FormatNumberValue.AV1_ENCODE.value)
+        self.assertEqual(params['fourk'], 0)
+        self.assertEqual(mocked_request.call_count, 2)
+        UserService.clear_entitlement_profiles()
+
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    def test_get_ugc_page_streaming_src_with_credential_pool(self, mocked_request):
+        mocked_request.side_effect = [
+            get_mocked_response(
+                HTTPStatus.OK.value,
+                json.dumps({'code': -412, 'message': '请求被拦截', 'ttl': 1}).encode('utf-8')
+            ),
+            get_mocked_response(
+                HTTPStatus.OK.value,
+                json.dumps(DATA_UGC_PLAY).encode('utf-8')
+            )
+        ]
+        pool = CredentialPool(['mock-sess-data-0', 'mock-sess-data-1'])
+        video_src, _ = StreamingService.get_page_streaming_src(
+            category='ugc',
+            cid=239927346,
+            bvid='BV1X54y1C74U',
+            video_qn=QualityNumber.P480.value,
+            audio_qn=AudioBitRateID.BPS_132K.value.bit_rate_id,
+            sess_data=pool
+        )
+        self.assertEqual(video_src.qn, QualityNumber.P480.value)
+        self.assertEqual(
+            [call.kwargs['sess_data'] for call in mocked_request.call_args_list],
+            ['mock-sess-data-0', 'mock-sess-data-1']
+        )
+        self.assertEqual(pool.healthy_sess_datas, ['mock-sess-data-1'])
+
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    def test_get_pgc_page_streaming_src_with_credential_pool_for_trial(self, mocked_request):
+        mocked_request.side_effect = [
+            get_mocked_response(
+                HTTPStatus.OK.value,
+                json.dumps(DATA_PGC_PLAY_TRIAL).encode('utf-8')
+            ),
+            get_mocked_response(
+                HTTPStatus.OK.value,
+                json.dumps(DATA_PGC_PLAY).encode('utf-8')
+            )
+        ]
+        pool = CredentialPool(['mock-sess-data-0', 'mock-sess-data-1'])
+        video_src, _ = StreamingService.get_page_streaming_src(
+            category='pgc',
+            cid=34568185,
+            video_qn=QualityNumber.P480.value,
+            audio_qn=AudioBitRateID.BPS_132K.value.bit_rate_id,
+            sess_data=pool
+        )
+        self.assertFalse(video_src.is_preview)
+        self.assertEqual(
+            [call.kwargs['sess_data'] for call in mocked_request.call_args_list],
+            ['mock-sess-data-0', 'mock-sess-data-1']
+        )
+        # trial doesn't take the credential out of rotation
+        self.assertEqual(pool.healthy_sess_datas, ['mock-sess-data-0', 'mock-sess-data-1'])
+
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    def test_get_pgc_page_streaming_src_with_credential_pool_only_trial(self, mocked_request):
+        mocked_request.return_value = get_mocked_response(
+            HTTPStatus.OK.value,
+            json.dumps(DATA_PGC_PLAY_TRIAL).encode('utf-8')
+        )
+        pool = CredentialPool(['mock-sess-data-0', 'mock-sess-data-1'])
+        with self.assertRaises(PreviewStreamError):
+            StreamingService.get_page_streaming_src(
+                category='pgc',
+                cid=34568185,
+                video_qn=QualityNumber.P480.value,
+                audio_qn=AudioBitRateID.BPS_132K.value.bit_rate_id,
+                sess_data=pool
+            )
+        self.assertEqual(mocked_request.call_count, 2)
+
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    def test_get_ugc_page_streaming_src_with_credential_pool_for_vip_quality(self, mocked_request):
+        UserService.clear_entitlement_profiles()
+        data_vip_info = copy.deepcopy(DATA_MY_INFO)
+        data_vip_info['data']['vip']['due_date'] = int(time.time() + 86400) * 1000
+        mocked_request.side_effect = [
+            get_mocked_response(
+                HTTPStatus.OK.value,
+                json.dumps(DATA_MY_INFO).encode('utf-8')
+            ),
+            get_mocked_response(
+                HTTPStatus.OK.value,
+                json.dumps(data_vip_info).encode('utf-8')
+            ),
+            get_mocked_response(
+                HTTPStatus.OK.value,
+                json.dumps(DATA_UGC_PLAY_WITH_DOLBY).encode('utf-8')
+            )
+        ]
+        pool = CredentialPool(['mock-sess-data-0', 'mock-sess-data-1'])
+        video_src, _ = StreamingService.get_page_streaming_src(
+            category='ugc',
+            cid=1,
+            bvid='BV13L4y1K7th',
+            video_qn=QualityNumber.FOUR_K.value,
+            sess_data=pool
+        )
+        self.assertEqual(video_src.qn, QualityNumber.FOUR_K.value)
+        self.assertEqual(mocked_request.call_args.kwargs['sess_data'], 'mock-sess-data-1')
+
+        # none of accounts is VIP since then
+        UserService.clear_entitlement_profiles()
+        mocked_request.side_effect = [
+            get_mocked_response(
+                HTTPStatus.OK.value,
+                json.dumps(DATA_MY_INFO).encode('utf-8')
+            ),
+            get_mocked_response(
+                HTTPStatus.OK.value,
+                json.dumps(DATA_MY_INFO).encode('utf-8')
+            )
+        ]
+        with self.assertRaises(CredentialPoolError):
+            StreamingService.get_page_streaming_src(
+                category='ugc',
+                cid=2,
+                bvid='BV13L4y1K7th',
+                video_qn=QualityNumber.FOUR_K.value,
+                sess_data=pool
+            )
+        UserService.clear_entitlement_profiles()
+
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    def test_get_ugc_page_streaming_src_with_credential_pool_for_vip_quality_throttled(self, mocked_request):
+        UserService.clear_entitlement_profiles()
+        data_vip_info = copy.deepcopy(DATA_MY_INFO)
+        data_vip_info['data']['vip']['due_date'] = int(time.time() + 86400) * 1000
+        mocked_request.side_effect = [
+            get_mocked_response(
+                HTTPStatus.OK.value,
+                json.dumps({'code': -412, 'message': '请求被拦截', 'ttl': 1}).encode('utf-8')
+            ),
+            get_mocked_response(
+                HTTPStatus.OK.value,
+                json.dumps(data_vip_info).encode('utf-8')
+            ),
+            get_mocked_response(
+                HTTPStatus.OK.value,
+                json.dumps(DATA_UGC_PLAY_WITH_DOLBY).encode('utf-8')
+            )
+        ]
+        pool = CredentialPool(['mock-sess-data-0', 'mock-sess-data-1'])
+        video_src, _ = StreamingService.get_page_streaming_src(
+            category='ugc',
+            cid=1,
+            bvid='BV13L4y1K7th',
+            video_qn=QualityNumber.FOUR_K.value,
+            sess_data=pool
+        )
+        self.assertEqual(video_src.qn, QualityNumber.FOUR_K.value)
+        self.assertEqual(mocked_request.call_args.kwargs['sess_data'], 'mock-sess-data-1')
+        # account whose entitlement is unknown is cooled down rather than failing the request
+        self.assertEqual(pool.healthy_sess_datas, ['mock-sess-data-1'])
+        self.assertEqual(mocked_request.call_count, 3)
+        UserService.clear_entitlement_profiles()
+
     @patch('bili_jean.proxy_service.ProxyService.get')
     def test_get_ugc_page_streaming_src_with_http_error(self, mocked_request):
         mocked_request.side_effect = ReadTimeout(
@@ -69,6 +69,52 @@ class FormatNumberValueTestCase(TestCase):
         )
 
 
+    def test_get_minimal_format_number_value(self):
+        self.assertEqual(
+            FormatNumberValue.get_minimal_format_number_value(),
+            FormatNumberValue.full_format()
+        )
+
+    def test_get_minimal_format_number_value_with_upper_bound(self):
+        self.assertEqual(
+            FormatNumberValue.get_minimal_format_number_value(
+                qn=QualityNumber.P720.value,
+                codec_id=VideoCodecID.AVC.value,
+                is_dolby_audio=False
+            ),
+            16,  # 000000010000
+        )
+        self.assertEqual(
+            FormatNumberValue.get_minimal_format_number_value(
+                qn=QualityNumber.FOUR_K.value,
+                codec_id=VideoCodecID.HEVC.value,
+                is_dolby_audio=False
+            ),
+            144,  # 000010010000
+        )
+        self.assertEqual(
+            FormatNumberValue.get_minimal_format_number_value(
+                qn=QualityNumber.DOLBY.value,
+                codec_id=VideoCodecID.AV1.value
+            ),
+            3024,  # 101111010000
+        )
+
+    def test_get_minimal_format_number_value_with_low_quality_preferred(self):
+        self.assertEqual(
+            FormatNumberValue.get_minimal_format_number_value(
+                is_hq_preferred=False,
+                is_codec_eff_preferred=False,
+                is_dolby_audio=False
+            ),
+            16,  # 000000010000
+        )
+
+    def test_get_fourk(self):
+        self.assertEqual(FormatNumberValue.get_fourk(144), 1)
+        self.assertEqual(FormatNumberValue.get_fourk(16), 0)
+
+
 class AudioBitRateIDTestCase(TestCase):
 
     def test_from_value(self):
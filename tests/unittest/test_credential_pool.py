@@ -0,0 +1,125 @@
+"""
+Unit test for CredentialPool
+"""
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from unittest import TestCase
+from unittest.mock import patch
+
+from bili_jean.credential_pool import (
+    CredentialPool,
+    CredentialPoolError,
+    CredentialPoolStrategy,
+    get_sess_data_identity
+)
+from bili_jean.proxy_service import ProxyService
+from tests.utils import get_mocked_response
+
+
+class CredentialPoolTestCase(TestCase):
+
+    def setUp(self):
+        self.now = 0.0
+
+    def test_acquire_round_robin(self):
+        pool = CredentialPool(['a', 'b', 'c', 'a'])
+        self.assertEqual(len(pool), 3)
+        self.assertEqual([pool.acquire() for _ in range(4)], ['a', 'b', 'c', 'a'])
+
+    def test_acquire_round_robin_across_throttled(self):
+        pool = CredentialPool(['a', 'b', 'c'], cooldown=300, clock=lambda: self.now)
+        self.assertEqual(pool.acquire(), 'a')
+        pool.report_throttled('b')
+        self.assertEqual(pool.acquire(), 'c')
+
+        # rotation goes on from where it was rather than jumping back by the shrunk candidates
+        self.now += 300
+        self.assertEqual([pool.acquire() for _ in range(3)], ['a', 'b', 'c'])
+
+    def test_acquire_concurrently(self):
+        pool = CredentialPool(['a', 'b', 'c', 'd'])
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            result = list(executor.map(lambda _: pool.acquire(), range(400)))
+        self.assertEqual(Counter(result), {'a': 100, 'b': 100, 'c': 100, 'd': 100})
+
+    def test_acquire_remaining_budget(self):
+        pool = CredentialPool(
+            ['a', 'b'],
+            strategy=CredentialPoolStrategy.REMAINING_BUDGET,
+            budget=2,
+            window=60,
+            clock=lambda: self.now
+        )
+        self.assertEqual([pool.acquire() for _ in range(4)], ['a', 'b', 'a', 'b'])
+        self.assertIsNone(pool.acquire())
+
+        self.now += 60
+        self.assertEqual(pool.acquire(), 'a')
+
+    def test_report_throttled(self):
+        pool = CredentialPool(['a', 'b'], cooldown=300, clock=lambda: self.now)
+        pool.report_throttled('a')
+        self.assertEqual(pool.healthy_sess_datas, ['b'])
+        self.assertEqual([pool.acquire() for _ in range(2)], ['b', 'b'])
+
+        self.now += 300
+        self.assertEqual(pool.healthy_sess_datas, ['a', 'b'])
+
+    def test_report_invalid(self):
+        pool = CredentialPool(['a', 'b'], clock=lambda: self.now)
+        pool.report_invalid('a')
+        pool.report_invalid('b')
+        self.now += 3600
+        self.assertIsNone(pool.acquire())
+
+    def test_acquire_with_predicate_on_healthy_only(self):
+        pool = CredentialPool(['a', 'b', 'c'], clock=lambda: self.now)
+        pool.report_throttled('a')
+        pool.report_invalid('b')
+        checked = []
+
+        def predicate(sess_data):
+            checked.append(sess_data)
+            return True
+
+        self.assertEqual(pool.acquire(predicate=predicate), 'c')
+        self.assertEqual(checked, ['c'])
+
+    def test_acquire_with_predicate(self):
+        pool = CredentialPool(['a', 'b'])
+        self.assertEqual(pool.acquire(predicate=lambda sess_data: sess_data == 'b'), 'b')
+        self.assertIsNone(pool.acquire(predicate=lambda sess_data: False))
+
+    def test_identity(self):
+        self.assertEqual(CredentialPool(['a', 'b']).identity, CredentialPool(['b', 'a']).identity)
+        self.assertNotIn('a', CredentialPool(['a']).identity.split('\n'))
+
+    def test_get_sess_data_identity(self):
+        identity = get_sess_data_identity('sess_data')
+        self.assertNotIn('sess_data', identity)
+        self.assertEqual(get_sess_data_identity(None), '')
+        pool = CredentialPool(['foo', 'bar'])
+        self.assertEqual(get_sess_data_identity(pool), pool.identity)
+
+    def test_init_without_sess_data(self):
+        with self.assertRaises(ValueError):
+            CredentialPool([])
+
+
+class ProxyServiceWithCredentialPoolTestCase(TestCase):
+
+    @patch('bili_jean.proxy_service.session')
+    def test_get_throttled(self, mocked_session):
+        mocked_session.return_value.get.return_value = get_mocked_response(
+            HTTPStatus.PRECONDITION_FAILED.value,
+            b''
+        )
+        pool = CredentialPool(['a', 'b'])
+        ProxyService.get('https://api.bilibili.com/x/web-interface/view', sess_data=pool)
+        mocked_session.return_value.cookies.set.assert_called_once_with('SESSDATA', 'a')
+        self.assertEqual(pool.healthy_sess_datas, ['b'])
+
+        ProxyService.get('https://api.bilibili.com/x/web-interface/view', sess_data=pool)
+        with self.assertRaises(CredentialPoolError):
+            ProxyService.get('https://api.bilibili.com/x/web-interface/view', sess_data=pool)
@@ -0,0 +1,163 @@
+"""
+Unit test for remuxing DASH video and audio streams
+"""
+from http import HTTPStatus
+import io
+import os
+import struct
+import tempfile
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+from bili_jean.dash_remuxer import DashRemuxer, remux_downloads, remux_streams, RemuxError
+from bili_jean.isobmff import find_box, iter_boxes, parse_moov
+from bili_jean.page_download_service import PageDownloadService
+from tests.utils import build_box, build_dash_stream, build_fragment
+
+
+VIDEO_PAYLOADS = [b'\x01' * 40, b'\x02' * 56, b'\x03' * 24]
+AUDIO_PAYLOADS = [b'\xa1' * 16, b'\xa2' * 12, b'\xa3' * 20, b'\xa4' * 8]
+
+
+def split(data, size):
+    return [data[idx:idx + size] for idx in range(0, len(data), size)]
+
+
+class DashRemuxerTestCase(TestCase):
+
+    def setUp(self):
+        self.video = build_dash_stream(7, 'vide', 16000, VIDEO_PAYLOADS, 852, 480)
+        self.audio = build_dash_stream(3, 'soun', 44100, AUDIO_PAYLOADS, codec='mp4a')
+
+    def _assert_remuxed(self, data):
+        box_types = [box.box_type for box in iter_boxes(data)]
+        self.assertEqual(box_types[:2], ['ftyp', 'moov'])
+        self.assertEqual(box_types[2:].count('moof'), len(VIDEO_PAYLOADS) + len(AUDIO_PAYLOADS))
+        self.assertNotIn('sidx', box_types)
+
+        moov = find_box(data, 'moov')
+        movie = parse_moov(data, moov)
+        self.assertEqual(
+            [(track.track_id, track.handler_type, track.timescale, track.codec) for track in movie.tracks],
+            [(1, 'vide', 16000, 'avc1'), (2, 'soun', 44100, 'mp4a')]
+        )
+        mvhd = find_box(data, 'moov/mvhd')
+        self.assertEqual(struct.unpack_from('>I', data, mvhd.end - 4)[0], 3)
+        mvex = find_box(data, 'moov/mvex')
+        self.assertEqual(
+            [struct.unpack_from('>I', data, box.payload_offset + 4)[0] for box in iter_boxes(
+                data, mvex.payload_offset, mvex.end
+            )],
+            [1, 2]
+        )
+
+        payloads = {1: [], 2: []}
+        sequence_numbers = []
+        for box in iter_boxes(data):
+            if box.box_type == 'moof':
+                mfhd = find_box(data, 'mfhd', box.payload_offset, box.end)
+                sequence_numbers.append(struct.unpack_from('>I', data, mfhd.payload_offset + 4)[0])
+                tfhd = find_box(data, 'traf/tfhd', box.payload_offset, box.end)
+                track_id = struct.unpack_from('>I', data, tfhd.payload_offset + 4)[0]
+                trun = find_box(data, 'traf/trun', box.payload_offset, box.end)
+                data_offset, sample_size = struct.unpack_from('>iI', data, trun.payload_offset + 8)
+                start = box.offset + data_offset
+                payloads[track_id].append(data[start:start + sample_size])
+        self.assertEqual(sequence_numbers, list(range(1, len(sequence_numbers) + 1)))
+        self.assertEqual(payloads[1], VIDEO_PAYLOADS)
+        self.assertEqual(payloads[2], AUDIO_PAYLOADS)
+
+    def test_remux_interleaved_chunks(self):
+        output = io.BytesIO()
+        remuxer = DashRemuxer(output)
+        video_chunks, audio_chunks = split(self.video, 7), split(self.audio, 5)
+        for idx in range(max(len(video_chunks), len(audio_chunks))):
+            if idx < len(video_chunks):
+                remuxer.feed_video(video_chunks[idx])
+            if idx < len(audio_chunks):
+                remuxer.feed_audio(audio_chunks[idx])
+        remuxer.close()
+        self._assert_remuxed(output.getvalue())
+        self.assertEqual(remuxer.output_size, len(output.getvalue()))
+
+    def test_remux_one_after_another(self):
+        output = io.BytesIO()
+        remuxer = DashRemuxer(output)
+        remuxer.feed_audio(self.audio)
+        self.assertEqual(output.getvalue(), b'')
+        remuxer.feed_video(self.video)
+        remuxer.close()
+        self._assert_remuxed(output.getvalue())
+
+    def test_remux_streams(self):
+        output = io.BytesIO()
+        remux_streams(split(self.video, 3), split(self.audio, 11), output)
+        self._assert_remuxed(output.getvalue())
+
+    def test_remux_base_data_offset(self):
+        moov_end = find_box(self.video, 'moov').end
+        fragment = build_fragment(1, 7, VIDEO_PAYLOADS[0], base_data_offset=moov_end)
+        video = self.video[:moov_end] + fragment
+        output = io.BytesIO()
+        remuxer = DashRemuxer(output)
+        remuxer.feed_audio(self.audio)
+        remuxer.feed_video(video)
+        remuxer.close()
+
+        data = output.getvalue()
+        moof = [box for box in iter_boxes(data) if box.box_type == 'moof'][0]
+        tfhd = find_box(data, 'traf/tfhd', moof.payload_offset, moof.end)
+        track_id, base_data_offset = struct.unpack_from('>IQ', data, tfhd.payload_offset + 4)
+        self.assertEqual((track_id, base_data_offset), (1, moof.offset))
+        trun = find_box(data, 'traf/trun', moof.payload_offset, moof.end)
+        data_offset, sample_size = struct.unpack_from('>iI', data, trun.payload_offset + 8)
+        start = base_data_offset + data_offset
+        self.assertEqual(data[start:start + sample_size], VIDEO_PAYLOADS[0])
+
+    def test_remux_incomplete_stream(self):
+        remuxer = DashRemuxer(io.BytesIO())
+        remuxer.feed_video(self.video)
+        remuxer.feed_audio(self.audio[:-4])
+        with self.assertRaises(RemuxError):
+            remuxer.close()
+
+        remuxer = DashRemuxer(io.BytesIO())
+        remuxer.feed_video(self.video)
+        with self.assertRaises(RemuxError):
+            remuxer.close()
+
+    def test_remux_unknown_track(self):
+        moov_end = find_box(self.video, 'moov').end
+        video = self.video[:moov_end] + build_fragment(1, 8, VIDEO_PAYLOADS[0])
+        remuxer = DashRemuxer(io.BytesIO())
+        remuxer.feed_audio(self.audio)
+        with self.assertRaises(RemuxError):
+            remuxer.feed_video(video)
+        with self.assertRaises(RemuxError):
+            remuxer.feed_audio(b'')
+
+    def test_remux_mdat_without_moof(self):
+        remuxer = DashRemuxer(io.BytesIO())
+        with self.assertRaises(RemuxError):
+            remuxer.feed_video(build_box('ftyp', b'iso5') + build_box('mdat', b'\x00' * 8))
+
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    def test_remux_downloads(self, mocked_get_request):
+        def mocked_get(url, headers=None, stream=False, **kwargs):
+            data = self.video if url.endswith('video.m4s') else self.audio
+            response = MagicMock()
+            response.status_code = HTTPStatus.OK.value
+            response.iter_content = MagicMock(return_value=split(data, 9))
+            return response
+
+        mocked_get_request.side_effect = mocked_get
+        with tempfile.TemporaryDirectory() as directory:
+            file = os.path.join(directory, 'merged.mp4')
+            remux_downloads(
+                PageDownloadService('https://foo.bar/video.m4s', os.path.join(directory, 'video.m4s')),
+                PageDownloadService('https://foo.bar/audio.m4s', os.path.join(directory, 'audio.m4s')),
+                file
+            )
+            with open(file, 'rb') as f:
+                self._assert_remuxed(f.read())
+            self.assertEqual(os.listdir(directory), ['merged.mp4'])
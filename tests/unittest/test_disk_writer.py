@@ -0,0 +1,125 @@
+"""
+Unit test for background disk writer
+"""
+import os
+import tempfile
+from threading import Event, Thread
+import time
+from unittest import TestCase
+
+from bili_jean.disk_writer import DiskWriter, WriteTarget
+
+
+class StalledFile:
+    """
+    file whose writes are blocked until released, like a stalled disk
+    """
+
+    def __init__(self):
+        self.chunks = []
+        self.released = Event()
+        self.is_closed = False
+
+    def write(self, chunk):
+        self.released.wait()
+        self.chunks.append(chunk)
+        return len(chunk)
+
+    def close(self):
+        self.is_closed = True
+
+
+class BrokenFile:
+
+    def write(self, chunk):
+        raise OSError(28, 'No space left on device')
+
+    def close(self):
+        pass
+
+
+class DiskWriterTestCase(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_write_targets_in_order(self):
+        files = [os.path.join(self.tmp_dir.name, f'{idx}.m4s') for idx in range(2)]
+        with DiskWriter(max_buffer_bytes=8) as writer:
+            targets = [writer.open(file, 'wb') for file in files]
+            for idx in range(10):
+                for target_idx, target in enumerate(targets):
+                    target.write(f'{target_idx}{idx}'.encode('utf-8'))
+            for target in targets:
+                target.close()
+            metrics = writer.get_metrics()
+
+        for target_idx, file in enumerate(files):
+            with open(file, 'rb') as f:
+                self.assertEqual(f.read(), ''.join(f'{target_idx}{idx}' for idx in range(10)).encode('utf-8'))
+        self.assertEqual(metrics.written_bytes, 40)
+        self.assertEqual(metrics.write_count, 20)
+        self.assertEqual(metrics.buffered_bytes, 0)
+        self.assertLessEqual(metrics.max_buffered_bytes, 8)
+
+    def test_backpressure(self):
+        stalled_file = StalledFile()
+        with DiskWriter(max_buffer_bytes=4) as writer:
+            target = WriteTarget(writer, stalled_file)
+            target.write(b'ab')
+            target.write(b'cd')
+
+            is_written = Event()
+
+            def write():
+                target.write(b'ef')
+                is_written.set()
+
+            thread = Thread(target=write)
+            thread.start()
+            # reader is blocked by the full buffer until the disk catches up
+            self.assertFalse(is_written.wait(0.1))
+            self.assertEqual(writer.get_metrics().buffered_bytes, 4)
+            stalled_file.released.set()
+            thread.join()
+            target.close()
+            metrics = writer.get_metrics()
+
+        self.assertTrue(stalled_file.is_closed)
+        self.assertEqual(stalled_file.chunks, [b'ab', b'cd', b'ef'])
+        self.assertGreaterEqual(metrics.blocked_seconds, 0.1)
+        self.assertGreaterEqual(metrics.write_seconds, 0.1)
+
+    def test_write_error(self):
+        with DiskWriter() as writer:
+            target = WriteTarget(writer, BrokenFile())
+            target.write(b'ab')
+            while target.error is None:
+                time.sleep(0.01)
+            # the following writes fail fast
+            with self.assertRaises(OSError):
+                target.write(b'cd')
+            with self.assertRaises(OSError):
+                target.close()
+            self.assertEqual(writer.get_metrics().written_bytes, 0)
+
+    def test_write_to_closed_writer(self):
+        writer = DiskWriter()
+        with writer:
+            target = writer.open(os.path.join(self.tmp_dir.name, 'sample.m4s'), 'wb')
+        with self.assertRaises(ValueError):
+            target.write(b'ab')
+        target._fp.close()
+
+    def test_close_is_idempotent(self):
+        with DiskWriter() as writer:
+            target = writer.open(os.path.join(self.tmp_dir.name, 'sample.m4s'), 'wb')
+            start_time = time.monotonic()
+            target.close()
+            target.close()
+            self.assertLess(time.monotonic() - start_time, 1)
+            with self.assertRaises(ValueError):
+                target.write(b'ab')
@@ -0,0 +1,98 @@
+"""
+Unit test for durable file
+"""
+import errno
+import json
+import os
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+
+from bili_jean.durable_file import DurableFile, load_journal, preallocate
+from bili_jean.schemes import DurabilityPolicy
+
+
+class DurableFileTestCase(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.file = os.path.join(self.tmp_dir.name, 'sample.m4s.part')
+        self.journal_path = f'{self.file}.journal'
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    @patch('bili_jean.durable_file.os.fsync')
+    def test_sync_by_bytes(self, mocked_fsync):
+        policy = DurabilityPolicy(sync_bytes=4, sync_seconds=None)
+        with DurableFile(open(self.file, 'wb'), policy, journal_path=self.journal_path, journal={'size': 10}) as f:
+            f.write(b'abc')
+            self.assertEqual(mocked_fsync.call_count, 0)
+            self.assertIsNone(load_journal(self.journal_path))
+            f.write(b'def')
+            self.assertEqual(mocked_fsync.call_count, 1)
+            self.assertEqual(load_journal(self.journal_path), {'size': 10, 'progress': 6})
+            f.write(b'g')
+            self.assertEqual(f.offset, 7)
+            self.assertEqual(f.synced_offset, 6)
+        # the rest is fsynced before closed
+        self.assertEqual(mocked_fsync.call_count, 2)
+        self.assertEqual(load_journal(self.journal_path), {'size': 10, 'progress': 7})
+
+    @patch('bili_jean.durable_file.os.fsync')
+    def test_sync_by_seconds(self, mocked_fsync):
+        now = [0.0]
+        policy = DurabilityPolicy(sync_bytes=None, sync_seconds=5)
+        f = DurableFile(open(self.file, 'wb'), policy, clock=lambda: now[0])
+        f.write(b'abc')
+        now[0] = 5.0
+        f.write(b'def')
+        self.assertEqual(f.sync_count, 1)
+        f.write(b'g')
+        self.assertEqual(f.sync_count, 1)
+        f.close()
+        self.assertEqual(f.sync_count, 2)
+        self.assertFalse(os.path.exists(self.journal_path))
+
+    def test_sync_on_close_only_once(self):
+        policy = DurabilityPolicy(sync_bytes=2, sync_seconds=None)
+        f = DurableFile(open(self.file, 'wb'), policy, journal_path=self.journal_path)
+        f.write(b'ab')
+        f.close()
+        self.assertEqual(f.sync_count, 1)
+        with open(self.file, 'rb') as fp:
+            self.assertEqual(fp.read(), b'ab')
+
+    def test_load_broken_journal(self):
+        with open(self.journal_path, 'w') as fp:
+            fp.write('{"progress": ')
+        self.assertIsNone(load_journal(self.journal_path))
+        with open(self.journal_path, 'w') as fp:
+            json.dump([1], fp)
+        self.assertIsNone(load_journal(self.journal_path))
+
+    def test_preallocate(self):
+        with open(self.file, 'wb') as fp:
+            preallocate(fp, 4096)
+        self.assertEqual(os.path.getsize(self.file), 4096)
+
+    @patch('bili_jean.durable_file.os.posix_fallocate', create=True)
+    def test_preallocate_unsupported(self, mocked_fallocate):
+        mocked_fallocate.side_effect = OSError(errno.EOPNOTSUPP, 'Operation not supported')
+        with open(self.file, 'wb') as fp:
+            preallocate(fp, 4096)
+        self.assertEqual(os.path.getsize(self.file), 4096)
+
+    @patch('bili_jean.durable_file.os.posix_fallocate', create=True)
+    def test_preallocate_without_space(self, mocked_fallocate):
+        mocked_fallocate.side_effect = OSError(errno.ENOSPC, 'No space left on device')
+        with open(self.file, 'wb') as fp:
+            with self.assertRaises(OSError) as cm:
+                preallocate(fp, 4096)
+        self.assertEqual(cm.exception.errno, errno.ENOSPC)
+
+    def test_invalid_policy(self):
+        with self.assertRaises(ValueError):
+            DurabilityPolicy(sync_bytes=0)
+        with self.assertRaises(ValueError):
+            DurabilityPolicy(sync_seconds=-1)
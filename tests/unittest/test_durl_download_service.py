@@ -0,0 +1,169 @@
+"""
+Unit test for downloading segments of durl
+"""
+import json
+import os
+import tempfile
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+from bili_jean.durl_download_service import DUrlDownloadService
+from bili_jean.page_download_service import DownloadError
+from bili_jean.schemes import DUrlSegmentMeta
+from tests.utils import get_mocked_range_request
+
+
+SEGMENT_DATAS = [bytes([idx]) * (100 + idx * 10) for idx in range(1, 4)]
+
+
+def get_segments():
+    return [
+        DUrlSegmentMeta(
+            order=idx + 1,
+            url=f'https://foo.bar/{idx + 1}.flv',
+            backup_urls=[f'https://backup.foo.bar/{idx + 1}.flv'],
+            size=len(data),
+            length=1000
+        )
+        for idx, data in enumerate(SEGMENT_DATAS)
+    ]
+
+
+def get_mocked_segment_request(failed_urls=(), broken_urls=()):
+    mocked_gets = {
+        f'https://{host}/{idx + 1}.flv': get_mocked_range_request(data)
+        for idx, data in enumerate(SEGMENT_DATAS)
+        for host in ('foo.bar', 'backup.foo.bar')
+    }
+
+    def mocked_get(url, headers=None, stream=False, **kwargs):
+        if url in failed_urls:
+            response = MagicMock()
+            response.status_code = 404
+            return response
+        response = mocked_gets[url](url, headers=headers, stream=stream)
+        if url in broken_urls:
+            content = response.content
+
+            def iter_content(chunk_size=1024):
+                yield content[:len(content) // 2]
+                raise ConnectionError('Connection reset by peer')
+
+            response.iter_content = iter_content
+        return response
+
+    return mocked_get
+
+
+class DUrlDownloadServiceTestCase(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.file = os.path.join(self.tmp_dir.name, 'page', 'sample.flv')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _read(self):
+        with open(self.file, 'rb') as f:
+            return f.read()
+
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    def test_download(self, mocked_get_request):
+        mocked_get_request.side_effect = get_mocked_segment_request()
+        segments = get_segments()
+        download_service = DUrlDownloadService(segments[::-1], self.file, concurrency=2)
+        self.assertEqual(download_service.size, sum(map(len, SEGMENT_DATAS)))
+        download_service.download()
+
+        self.assertEqual(self._read(), b''.join(SEGMENT_DATAS))
+        self.assertEqual(download_service.progress, [len(data) for data in SEGMENT_DATAS])
+        self.assertEqual(os.listdir(os.path.dirname(self.file)), ['sample.flv'])
+        self.assertEqual(mocked_get_request.call_count, 3)
+
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    def test_download_from_backup_url(self, mocked_get_request):
+        mocked_get_request.side_effect = get_mocked_segment_request(failed_urls=('https://foo.bar/2.flv', ))
+        DUrlDownloadService(get_segments(), self.file).download()
+        self.assertEqual(self._read(), b''.join(SEGMENT_DATAS))
+        requested_urls = [call.kwargs['url'] for call in mocked_get_request.call_args_list]
+        self.assertIn('https://backup.foo.bar/2.flv', requested_urls)
+
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    def test_download_resume(self, mocked_get_request):
+        mocked_get_request.side_effect = get_mocked_segment_request(
+            broken_urls=('https://foo.bar/3.flv', 'https://backup.foo.bar/3.flv')
+        )
+        with self.assertRaises(DownloadError):
+            DUrlDownloadService(get_segments(), self.file, journal_interval=1).download()
+        self.assertFalse(os.path.exists(self.file))
+        with open(f'{self.file}.part.journal', 'r') as fp:
+            journal = json.load(fp)
+        # the backup URL continues from the half written by the broken one
+        third_size = len(SEGMENT_DATAS[2])
+        self.assertEqual(
+            journal['progress'],
+            [len(SEGMENT_DATAS[0]), len(SEGMENT_DATAS[1]), third_size // 2 + (third_size - third_size // 2) // 2]
+        )
+
+        mocked_get_request.reset_mock()
+        mocked_get_request.side_effect = get_mocked_segment_request()
+        DUrlDownloadService(get_segments(), self.file).download()
+        self.assertEqual(self._read(), b''.join(SEGMENT_DATAS))
+        self.assertEqual(mocked_get_request.call_count, 1)
+        self.assertEqual(
+            mocked_get_request.call_args.kwargs['headers']['Range'],
+            f"bytes={journal['progress'][2]}-{third_size - 1}"
+        )
+        self.assertFalse(os.path.exists(f'{self.file}.part.journal'))
+
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    def test_journal_without_unflushed_bytes(self, mocked_get_request):
+        download_service = DUrlDownloadService(get_segments()[:1], self.file, concurrency=1)
+        journals = []
+
+        def iter_content(chunk_size=1024):
+            yield SEGMENT_DATAS[0][:10]
+            # journal dumped by the thread of another segment meanwhile
+            download_service._dump_journal()
+            with open(f'{self.file}.part.journal', 'r') as fp:
+                journals.append(json.load(fp))
+            yield SEGMENT_DATAS[0][10:]
+
+        response = MagicMock()
+        response.status_code = 200
+        response.iter_content = iter_content
+        mocked_get_request.return_value = response
+        download_service.download()
+
+        self.assertEqual(self._read(), SEGMENT_DATAS[0])
+        self.assertEqual(journals[0]['progress'], [0])
+
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    def test_download_with_mismatched_journal(self, mocked_get_request):
+        os.makedirs(os.path.dirname(self.file))
+        with open(f'{self.file}.part', 'wb') as f:
+            f.write(b'\x00' * sum(map(len, SEGMENT_DATAS)))
+        with open(f'{self.file}.part.journal', 'w') as fp:
+            json.dump({'sizes': [1, 2, 3], 'progress': [1, 2, 3]}, fp)
+
+        mocked_get_request.side_effect = get_mocked_segment_request()
+        DUrlDownloadService(get_segments(), self.file).download()
+        self.assertEqual(self._read(), b''.join(SEGMENT_DATAS))
+        self.assertEqual(mocked_get_request.call_count, 3)
+
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    def test_download_larger_segment(self, mocked_get_request):
+        # range is ignored, and the whole resource is responded
+        response = MagicMock()
+        response.status_code = 200
+        response.iter_content = MagicMock(return_value=[SEGMENT_DATAS[0]])
+        mocked_get_request.return_value = response
+        segments = get_segments()[:1]
+        segments[0] = segments[0].model_copy(update={'size': 50})
+        with self.assertRaises(DownloadError):
+            DUrlDownloadService(segments, self.file).download()
+
+    def test_without_segment(self):
+        with self.assertRaises(ValueError):
+            DUrlDownloadService([], self.file)
@@ -0,0 +1,163 @@
+"""
+Unit test for advisory file lock
+"""
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from threading import Timer
+from unittest import TestCase
+from unittest.mock import patch
+
+from bili_jean.file_lock import fcntl, FileLock, LockHolder
+
+
+HOLDER_SCRIPT = '''
+import sys, time
+from bili_jean.file_lock import FileLock
+lock = FileLock(sys.argv[1])
+lock.acquire()
+print('locked', flush=True)
+time.sleep(60)
+'''
+
+
+def get_dead_pid():
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+
+class FileLockTestCase(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.file = os.path.join(self.tmp_dir.name, 'sample.m4s.part.lock')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_acquire_and_release(self):
+        lock = FileLock(self.file)
+        self.assertTrue(lock.acquire(is_blocking=False))
+        self.assertTrue(lock.is_locked)
+        holder = lock.holder
+        self.assertEqual((holder.pid, holder.hostname), (os.getpid(), socket.gethostname()))
+        with self.assertRaises(ValueError):
+            lock.acquire()
+
+        another_lock = FileLock(self.file, poll_interval=0.01)
+        self.assertFalse(another_lock.acquire(is_blocking=False))
+        self.assertFalse(another_lock.acquire(timeout=0.05))
+
+        lock.release()
+        self.assertFalse(os.path.exists(self.file))
+        with another_lock:
+            self.assertTrue(another_lock.is_locked)
+        self.assertFalse(another_lock.is_locked)
+
+    def test_wait_for_holder(self):
+        lock = FileLock(self.file)
+        lock.acquire()
+        timer = Timer(0.1, lock.release)
+        timer.start()
+        try:
+            another_lock = FileLock(self.file, poll_interval=0.01)
+            self.assertTrue(another_lock.acquire(timeout=5))
+            another_lock.release()
+        finally:
+            timer.join()
+
+    def test_lock_across_processes(self):
+        process = subprocess.Popen(
+            [sys.executable, '-c', HOLDER_SCRIPT, self.file],
+            stdout=subprocess.PIPE,
+            cwd=os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        )
+        try:
+            self.assertEqual(process.stdout.readline().strip(), b'locked')
+            lock = FileLock(self.file, poll_interval=0.01)
+            self.assertFalse(lock.acquire(is_blocking=False))
+            self.assertEqual(lock.holder.pid, process.pid)
+        finally:
+            process.kill()
+            process.wait()
+            process.stdout.close()
+        # lock of the killed process is either released by the kernel or broken as stale
+        self.assertTrue(lock.acquire(timeout=5))
+        lock.release()
+
+    @patch('bili_jean.file_lock.fcntl', None)
+    def test_break_stale_lock(self):
+        dead_holder = LockHolder(pid=get_dead_pid(), hostname=socket.gethostname(), acquired_at=0)
+        with open(self.file, 'w') as f:
+            json.dump(dead_holder._asdict(), f)
+
+        lock = FileLock(self.file)
+        self.assertTrue(lock.acquire(is_blocking=False))
+        self.assertEqual(lock.holder.pid, os.getpid())
+        lock.release()
+
+    @patch('bili_jean.file_lock.fcntl', None)
+    def test_keep_lock_of_other_host(self):
+        holder = LockHolder(pid=get_dead_pid(), hostname=f'{socket.gethostname()}-other', acquired_at=0)
+        with open(self.file, 'w') as f:
+            json.dump(holder._asdict(), f)
+
+        lock = FileLock(self.file)
+        self.assertFalse(lock.acquire(is_blocking=False))
+        self.assertEqual(lock.holder, holder)
+        self.assertTrue(holder.is_alive)
+
+    @patch('bili_jean.file_lock.fcntl', None)
+    def test_break_expired_lock(self):
+        holder = LockHolder(pid=os.getpid(), hostname=f'{socket.gethostname()}-other', acquired_at=time.time() - 60)
+        with open(self.file, 'w') as f:
+            json.dump(holder._asdict(), f)
+
+        self.assertFalse(FileLock(self.file, max_age=120).acquire(is_blocking=False))
+        lock = FileLock(self.file, max_age=30)
+        self.assertTrue(lock.acquire(is_blocking=False))
+        self.assertEqual(lock.holder.pid, os.getpid())
+        lock.release()
+
+    def test_keep_flock_of_recorded_dead_process(self):
+        if fcntl is None:
+            self.skipTest('flock is unavailable')
+        lock = FileLock(self.file)
+        lock.acquire()
+        try:
+            # a held flock proves the holder alive, whatever is recorded, e.g. not re-recorded yet
+            dead_holder = LockHolder(pid=get_dead_pid(), hostname=socket.gethostname(), acquired_at=0)
+            os.pwrite(lock._fd, json.dumps(dead_holder._asdict()).encode('utf-8').ljust(200), 0)
+            another_lock = FileLock(self.file, max_age=1)
+            self.assertFalse(another_lock.acquire(is_blocking=False))
+            self.assertTrue(os.path.exists(self.file))
+        finally:
+            lock.release()
+
+    def test_retry_on_replaced_file(self):
+        if fcntl is None:
+            self.skipTest('flock is unavailable')
+        stat = os.stat
+        replaced = []
+
+        def mocked_stat(path, *args, **kwargs):
+            result = stat(path, *args, **kwargs)
+            if path == self.file and not replaced:
+                # the former holder removed the file in between opening and locking, then it is recreated
+                replaced.append(path)
+                os.unlink(self.file)
+                open(self.file, 'w').close()
+                return stat(path, *args, **kwargs)
+            return result
+
+        lock = FileLock(self.file)
+        with patch('bili_jean.file_lock.os.stat', side_effect=mocked_stat):
+            self.assertTrue(lock.acquire(is_blocking=False))
+        self.assertEqual(replaced, [self.file])
+        self.assertEqual(os.fstat(lock._fd).st_ino, os.stat(self.file).st_ino)
+        lock.release()
@@ -0,0 +1,121 @@
+"""
+Unit test for parsing ISO-BMFF boxes
+"""
+import struct
+from unittest import TestCase
+
+from bili_jean.isobmff import find_box, iter_boxes, parse_box_header, parse_moov, parse_sidx
+from tests.utils import build_box, build_moov, build_sidx, build_trak
+
+
+class ISOBMFFBoxTestCase(TestCase):
+
+    def test_parse_box_header(self):
+        data = build_box('ftyp', b'iso5') + build_box('free')
+        box = parse_box_header(data)
+        self.assertEqual((box.box_type, box.offset, box.size, box.header_size), ('ftyp', 0, 12, 8))
+        self.assertEqual(box.end, 12)
+        self.assertEqual(box.payload_offset, 8)
+
+        box = parse_box_header(data, 12, base_offset=100)
+        self.assertEqual((box.box_type, box.offset, box.size), ('free', 112, 8))
+
+    def test_parse_large_box_header(self):
+        data = struct.pack('>I4sQ', 1, b'mdat', 1 << 33)
+        box = parse_box_header(data)
+        self.assertEqual((box.box_type, box.size, box.header_size), ('mdat', 1 << 33, 16))
+
+    def test_parse_box_header_extends_to_end(self):
+        data = struct.pack('>I4s', 0, b'mdat') + b'\x00' * 8
+        self.assertEqual(parse_box_header(data).size, 16)
+
+    def test_parse_incomplete_box_header(self):
+        self.assertIsNone(parse_box_header(b'\x00\x00\x00'))
+        self.assertIsNone(parse_box_header(struct.pack('>I4s', 1, b'mdat')))
+
+    def test_parse_invalid_box_header(self):
+        with self.assertRaises(ValueError):
+            parse_box_header(struct.pack('>I4s', 4, b'free'))
+
+    def test_iter_boxes(self):
+        data = build_box('ftyp', b'iso5') + build_box('moov', build_box('mvhd')) + b'\x00\x00'
+        self.assertEqual([box.box_type for box in iter_boxes(data)], ['ftyp', 'moov'])
+        self.assertEqual([box.box_type for box in iter_boxes(data, 20, 28)], ['mvhd'])
+
+
+class MovieTestCase(TestCase):
+
+    def test_find_box(self):
+        data = build_box('ftyp', b'iso5') + build_moov([build_trak(1, 'vide', 16000, 852, 480)])
+        box = find_box(data, 'moov/trak/mdia/mdhd')
+        self.assertEqual(box.box_type, 'mdhd')
+        self.assertIsNone(find_box(data, 'moov/trak/mdia/elst'))
+        self.assertIsNone(find_box(data[:20], 'moov/trak'))
+
+    def test_parse_moov(self):
+        data = build_moov(
+            [build_trak(1, 'vide', 16000, 852, 480, 'hev1'), build_trak(2, 'soun', 44100, codec='mp4a')],
+            timescale=1000,
+            duration=120000
+        )
+        movie = parse_moov(data, parse_box_header(data))
+        self.assertEqual((movie.timescale, movie.duration), (1000, 120000))
+        video, audio = movie.tracks
+        self.assertEqual(
+            (video.track_id, video.handler_type, video.timescale, video.width, video.height, video.codec),
+            (1, 'vide', 16000, 852, 480, 'hev1')
+        )
+        self.assertEqual(
+            (audio.track_id, audio.handler_type, audio.timescale, audio.width, audio.height, audio.codec),
+            (2, 'soun', 44100, 0, 0, 'mp4a')
+        )
+
+    def test_parse_not_moov(self):
+        data = build_box('free')
+        with self.assertRaises(ValueError):
+            parse_moov(data, parse_box_header(data))
+
+    def test_parse_incomplete_moov(self):
+        data = build_moov([build_trak(1, 'vide', 16000, 852, 480)])
+        with self.assertRaises(ValueError):
+            parse_moov(data[:-8], parse_box_header(data))
+
+
+class SegmentIndexTestCase(TestCase):
+
+    def test_parse_sidx(self):
+        data = build_box('ftyp') + build_sidx(1000, 0, 0, [(100, 2000), (200, 2000), (300, 1500)])
+        box = parse_box_header(data, 8)
+        segment_index = parse_sidx(data, box)
+
+        self.assertEqual(segment_index.timescale, 1000)
+        self.assertEqual(segment_index.duration, 5.5)
+        self.assertEqual(
+            [(reference.offset, reference.size) for reference in segment_index.references],
+            [(box.end, 100), (box.end + 100, 200), (box.end + 300, 300)]
+        )
+        self.assertEqual([reference.start_time for reference in segment_index.references], [0, 2, 4])
+        self.assertFalse(any(reference.is_index for reference in segment_index.references))
+
+    def test_parse_sidx_version_1(self):
+        data = build_sidx(90000, 90000, 16, [(100, 180000)], version=1)
+        segment_index = parse_sidx(data, parse_box_header(data))
+
+        reference, = segment_index.references
+        self.assertEqual(reference.offset, len(data) + 16)
+        self.assertEqual(reference.start_time, 1)
+        self.assertEqual(reference.duration, 2)
+
+    def test_parse_incomplete_sidx(self):
+        data = build_sidx(1000, 0, 0, [(100, 2000)])
+        with self.assertRaises(ValueError):
+            parse_sidx(data[:-1], parse_box_header(data))
+
+    def test_get_references(self):
+        data = build_sidx(1000, 0, 0, [(100, 2000), (200, 2000), (300, 1500)])
+        segment_index = parse_sidx(data, parse_box_header(data))
+
+        self.assertEqual([reference.size for reference in segment_index.get_references(2.5, 3)], [200])
+        self.assertEqual([reference.size for reference in segment_index.get_references(1, 4.5)], [100, 200, 300])
+        self.assertEqual([reference.size for reference in segment_index.get_references(2, 4)], [200])
+        self.assertEqual(segment_index.get_references(6, 7), [])
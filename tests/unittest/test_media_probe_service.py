@@ -0,0 +1,92 @@
+"""
+Unit test for probing remote DASH stream
+"""
+from http import HTTPStatus
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+from bili_jean.media_probe_service import MediaProbeService
+from bili_jean.page_download_service import DownloadError
+from tests.utils import build_box, build_fragmented_mp4, build_moov, build_trak, get_mocked_range_request
+
+
+class MediaProbeServiceTestCase(TestCase):
+
+    def setUp(self):
+        self.init_data, self.data, self.fragments = build_fragmented_mp4()
+        self.index_range = f'{len(self.init_data)}-{len(self.data) - sum(map(len, self.fragments)) - 1}'
+
+    def _assert_probe(self, probe):
+        self.assertEqual(probe.duration, 8)
+        self.assertEqual(probe.timescale, 16000)
+        self.assertEqual((probe.width, probe.height), (852, 480))
+        self.assertEqual(probe.codec, 'avc1')
+        self.assertEqual(probe.fragment_count, 4)
+        self.assertEqual(probe.size, len(self.data))
+        self.assertEqual(probe.bitrate, sum(map(len, self.fragments)) * 8 / 8)
+
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    def test_probe_with_index_range(self, mock_get):
+        mock_get.side_effect = get_mocked_range_request(self.data)
+        probe = MediaProbeService.probe('https://foo.bar/video.m4s', self.index_range)
+        self._assert_probe(probe)
+        self.assertEqual(probe.probed_size, len(self.data) - sum(map(len, self.fragments)))
+        self.assertEqual(mock_get.call_count, 1)
+
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    def test_probe_by_leading_bytes(self, mock_get):
+        mock_get.side_effect = get_mocked_range_request(self.data)
+        probe = MediaProbeService.probe('https://foo.bar/video.m4s')
+        self._assert_probe(probe)
+        self.assertEqual(mock_get.call_count, 1)
+
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    def test_probe_without_moov(self, mock_get):
+        _, data, _ = build_fragmented_mp4(build_box('free', b'\x00' * 8))
+        mock_get.side_effect = get_mocked_range_request(data)
+        with self.assertRaises(DownloadError):
+            MediaProbeService.probe('https://foo.bar/video.m4s')
+
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    def test_probe_without_track(self, mock_get):
+        _, data, _ = build_fragmented_mp4(build_moov([]))
+        mock_get.side_effect = get_mocked_range_request(data)
+        with self.assertRaises(DownloadError):
+            MediaProbeService.probe('https://foo.bar/video.m4s')
+
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    def test_probe_without_range_support(self, mock_get):
+        mock_response = MagicMock()
+        mock_response.status_code = HTTPStatus.OK.value
+        mock_response.content = b''
+        mock_get.return_value = mock_response
+        with self.assertRaises(DownloadError):
+            MediaProbeService.probe('https://foo.bar/video.m4s')
+
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    def test_probe_many(self, mock_get):
+        _, audio_data, _ = build_fragmented_mp4(build_moov([build_trak(1, 'soun', 44100, codec='mp4a')]))
+        mocked_video_get = get_mocked_range_request(self.data)
+        mocked_audio_get = get_mocked_range_request(audio_data)
+
+        def mocked_get(url, headers=None, **kwargs):
+            if url.endswith('video.m4s'):
+                return mocked_video_get(url, headers, **kwargs)
+            if url.endswith('audio.m4s'):
+                return mocked_audio_get(url, headers, **kwargs)
+            raise ConnectionError('Connection refused')
+
+        mock_get.side_effect = mocked_get
+        urls = [
+            'https://foo.bar/video.m4s',
+            'https://foo.bar/audio.m4s',
+            'https://foo.bar/video.m4s',
+            'https://foo.bar/broken.m4s'
+        ]
+        result = MediaProbeService.probe_many(urls, concurrency=2)
+        self.assertEqual(set(result.probes), {'https://foo.bar/video.m4s', 'https://foo.bar/audio.m4s'})
+        self._assert_probe(result.probes['https://foo.bar/video.m4s'])
+        self.assertEqual(result.probes['https://foo.bar/audio.m4s'].codec, 'mp4a')
+        self.assertEqual((result.probes['https://foo.bar/audio.m4s'].width, ), (0, ))
+        self.assertEqual(list(result.errors), ['https://foo.bar/broken.m4s'])
+        self.assertIsInstance(result.errors['https://foo.bar/broken.m4s'], ConnectionError)
@@ -0,0 +1,153 @@
+"""
+Unit test for pipeline to download pages
+"""
+import os
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+from bili_jean.constants import DownloadStatus
+from bili_jean.page_download_pipeline import build_page_download_pipeline, get_memory_cost
+from bili_jean.schemes import AudioStreamingSourceMeta, Page, VideoStreamingSourceMeta
+
+
+def get_page(cid):
+    return Page(
+        page_category='ugc',
+        page_index=cid,
+        page_cid=cid,
+        page_title=f'P{cid}',
+        page_duration=100,
+        view_bvid='BV1X54y1C74U',
+        is_selected_page=cid == 1
+    )
+
+
+def get_page_streaming_src(**kwargs):
+    cid = kwargs['cid']
+    if cid == 3:
+        raise ValueError('request play data error: 啥都木有')
+    return (
+        VideoStreamingSourceMeta(
+            codec_id=12,
+            mime_type='video/mp4',
+            qn=32,
+            url=f'https://foo.bar/{cid}-video.m4s',
+            duration=100,
+            bandwidth=80_000
+        ),
+        AudioStreamingSourceMeta(
+            mime_type='audio/mp4',
+            qn=30216,
+            url=f'https://foo.bar/{cid}-audio.m4s',
+            duration=100,
+            bandwidth=8_000
+        )
+    )
+
+
+class PageDownloadPipelineTestCase(TestCase):
+
+    @patch('bili_jean.page_download_pipeline.remux_files')
+    @patch('bili_jean.page_download_pipeline.os.remove')
+    @patch('bili_jean.page_download_pipeline.PageDownloadService')
+    @patch('bili_jean.streaming.streaming_service.StreamingService.get_stream_url_resolver')
+    @patch('bili_jean.streaming.streaming_service.StreamingService.get_page_streaming_src')
+    @patch('bili_jean.streaming.streaming_service.StreamingService.iter_views')
+    def test_run(
+        self,
+        mocked_iter_views,
+        mocked_get_page_streaming_src,
+        mocked_get_stream_url_resolver,
+        mocked_download_service_kls,
+        mocked_remove,
+        mocked_remux_files
+    ):
+        mocked_iter_views.return_value = iter([get_page(cid) for cid in range(1, 5)])
+        mocked_get_page_streaming_src.side_effect = get_page_streaming_src
+        mocked_download_service_kls.return_value = MagicMock()
+
+        pipeline = build_page_download_pipeline(
+            '/tmp/bili_jean',
+            resolve_workers=2,
+            download_workers=2,
+            max_in_flight_bytes=1_000_000,
+            rate_limit=None
+        )
+        result = pipeline.run(['https://www.bilibili.com/video/BV1X54y1C74U'])
+
+        self.assertEqual(sorted(task.page.page_cid for task in result.results), [1, 2, 4])
+        task = sorted(result.results, key=lambda item: item.page.page_cid)[0]
+        self.assertEqual(task.video_file, os.path.join('/tmp/bili_jean', '1.video.m4s'))
+        self.assertEqual(task.audio_file, os.path.join('/tmp/bili_jean', '1.audio.m4s'))
+        self.assertEqual(task.file, os.path.join('/tmp/bili_jean', '1.mp4'))
+        self.assertEqual(task.estimated_size, 1_100_000)
+
+        self.assertEqual([(error.item.page_cid, error.stage_name) for error in result.errors], [(3, 'resolve')])
+        self.assertEqual(list(result.metrics), ['views', 'resolve', 'download', 'remux'])
+        self.assertEqual(result.metrics['download'].processed, 3)
+        self.assertEqual(mocked_download_service_kls.call_count, 6)
+        self.assertEqual(mocked_remux_files.call_count, 3)
+        self.assertEqual(mocked_remove.call_count, 6)
+        # estimated bytes of only 1 page are allowed in flight
+        self.assertEqual(pipeline.in_flight_budget.max_used, 1_100_000)
+
+    @patch('bili_jean.page_download_pipeline.PageDownloadService')
+    @patch('bili_jean.streaming.streaming_service.StreamingService.get_stream_url_resolver')
+    @patch('bili_jean.streaming.streaming_service.StreamingService.get_page_streaming_src')
+    @patch('bili_jean.streaming.streaming_service.StreamingService.iter_views')
+    def test_run_without_remux(
+        self,
+        mocked_iter_views,
+        mocked_get_page_streaming_src,
+        mocked_get_stream_url_resolver,
+        mocked_download_service_kls
+    ):
+        mocked_iter_views.return_value = iter([get_page(1)])
+        mocked_get_page_streaming_src.side_effect = get_page_streaming_src
+        pipeline = build_page_download_pipeline('/tmp/bili_jean', is_remuxed=False, rate_limit=None)
+        result = pipeline.run(['https://www.bilibili.com/video/BV1X54y1C74U'])
+        self.assertEqual(len(result.results), 1)
+        self.assertEqual(list(result.metrics), ['views', 'resolve', 'download'])
+        self.assertEqual(
+            mocked_get_stream_url_resolver.call_args_list[0].kwargs['codec_id'],
+            12
+        )
+        self.assertTrue(mocked_get_stream_url_resolver.call_args_list[1].kwargs['is_audio'])
+
+    @patch('bili_jean.page_download_pipeline.remux_files')
+    @patch('bili_jean.page_download_pipeline.os.remove')
+    @patch('bili_jean.page_download_pipeline.PageDownloadService')
+    @patch('bili_jean.streaming.streaming_service.StreamingService.get_stream_url_resolver')
+    @patch('bili_jean.streaming.streaming_service.StreamingService.get_page_streaming_src')
+    @patch('bili_jean.streaming.streaming_service.StreamingService.iter_views')
+    def test_run_with_skipped_download(
+        self,
+        mocked_iter_views,
+        mocked_get_page_streaming_src,
+        mocked_get_stream_url_resolver,
+        mocked_download_service_kls,
+        mocked_remove,
+        mocked_remux_files
+    ):
+        def get_download_service(url, file, **kwargs):
+            service = MagicMock()
+            service.download.return_value = (
+                DownloadStatus.SKIPPED if file.endswith('2.video.m4s') else DownloadStatus.DOWNLOADED
+            )
+            return service
+
+        mocked_iter_views.return_value = iter([get_page(cid) for cid in (1, 2)])
+        mocked_get_page_streaming_src.side_effect = get_page_streaming_src
+        mocked_download_service_kls.side_effect = get_download_service
+
+        pipeline = build_page_download_pipeline('/tmp/bili_jean', rate_limit=None, max_memory_bytes=100_000)
+        result = pipeline.run(['https://www.bilibili.com/video/BV1X54y1C74U'])
+        self.assertEqual([task.page.page_cid for task in result.results], [1])
+        self.assertEqual([(error.item.page.page_cid, error.stage_name) for error in result.errors], [(2, 'download')])
+        self.assertEqual(mocked_remux_files.call_count, 1)
+        self.assertGreater(pipeline.memory_budget.max_used, 0)
+        self.assertEqual(pipeline.memory_budget.used, 0)
+
+    def test_get_memory_cost(self):
+        page = get_page(1)
+        self.assertEqual(get_memory_cost(page), len(page.model_dump_json()))
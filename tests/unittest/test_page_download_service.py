@@ -2,16 +2,31 @@
 Unit test for PageDownloadService
 """
 import copy
+import errno
+from functools import partial
 from http import HTTPStatus
+import json
+import os
 from pathlib import Path
+import tempfile
+from threading import Timer
 from unittest import TestCase
 from unittest.mock import patch, MagicMock
 
 from requests.structures import CaseInsensitiveDict
 
-from bili_jean.constants import HEADERS
+from bili_jean.constants import DownloadStatus, HEADERS
+from bili_jean.disk_writer import DiskWriter
+from bili_jean.file_lock import FileLock
 from bili_jean.page_download_service import DownloadError, PageDownloadService
-from tests.utils import get_mocked_response
+from bili_jean.schemes import DurabilityPolicy
+from bili_jean.sinks import BufferSink, LocalMultipartUploader, MultipartUploadSink
+from tests.utils import (
+    build_box,
+    build_fragmented_mp4,
+    get_mocked_range_request,
+    get_mocked_response
+)
 
 
 class PageDownloadServiceTestCase(TestCase):
@@ -151,6 +166,206 @@ class PageDownloadServiceTestCase(TestCase):
         with self.assertRaises(DownloadError):
             download_service.download()
 
+    @patch('bili_jean.page_download_service.play_url_cache')
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    @patch('bili_jean.proxy_service.ProxyService.head')
+    def test_download_with_source_403_invalidate_play_url_cache(
+        self,
+        mocked_head_request,
+        mocked_get_request,
+        mocked_play_url_cache
+    ):
+        mocked_head_request.return_value = MagicMock()
+        mocked_head_request.return_value.status_code = HTTPStatus.FORBIDDEN.value
+
+        mocked_source_url = 'https://example.com/file.m4s'
+        download_service = PageDownloadService(
+            url=mocked_source_url,
+            file='/tmp/test_file.mp4'
+        )
+        with self.assertRaises(DownloadError):
+            download_service.download()
+        mocked_play_url_cache.invalidate_url.assert_called_once_with(mocked_source_url)
+        mocked_get_request.assert_not_called()
+
+    @patch('builtins.open', new_callable=MagicMock)
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    @patch('bili_jean.proxy_service.ProxyService.head')
+    def test_download_with_source_403_resolve_url(self, mocked_head_request, mocked_get_request, mocked_open):
+        mocked_head_request.return_value = MagicMock()
+        mocked_head_request.return_value.status_code = HTTPStatus.OK.value
+        mocked_head_request.return_value.headers = CaseInsensitiveDict({
+            'Content-Length': '1024',
+            'ETag': '"DA04738AEA59B29C92547378E6ED54CF"'
+        })
+
+        mocked_forbidden_response = MagicMock()
+        mocked_forbidden_response.status_code = HTTPStatus.FORBIDDEN.value
+        mocked_partial_response = MagicMock()
+        mocked_partial_response.status_code = HTTPStatus.PARTIAL_CONTENT.value
+        mocked_partial_response.iter_content = MagicMock(return_value=[b'chunk_0'])
+        mocked_get_request.side_effect = [mocked_forbidden_response, mocked_partial_response]
+
+        mocked_source_url = 'https://example.com/file.m4s?deadline=1'
+        mocked_resolved_url = 'https://example.com/file.m4s?deadline=2'
+        download_service = PageDownloadService(
+            url=mocked_source_url,
+            file='/tmp/test_file.mp4',
+            resolver=lambda: mocked_resolved_url
+        )
+        mocked_path = MagicMock(spec=Path)
+        mocked_tmp_path = MagicMock(spec=Path)
+        mocked_tmp_path.exists.return_value = True
+        mocked_tmp_path.stat.return_value.st_size = 512
+        download_service._path = mocked_path
+        download_service._tmp_path = mocked_tmp_path
+
+        download_service.download()
+
+        headers = copy.deepcopy(HEADERS)
+        headers.update({'Range': 'bytes=512-'})
+        self.assertEqual(download_service.url, mocked_resolved_url)
+        mocked_get_request.assert_called_with(url=mocked_resolved_url, headers=headers, stream=True)
+        mocked_head_request.assert_called_with(url=mocked_resolved_url)
+        mocked_tmp_path.rename.assert_called_once_with(mocked_path)
+
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    @patch('bili_jean.proxy_service.ProxyService.head')
+    def test_download_with_source_403_resolve_changed_resource(self, mocked_head_request, mocked_get_request):
+        mocked_original_head_response = MagicMock()
+        mocked_original_head_response.status_code = HTTPStatus.OK.value
+        mocked_original_head_response.headers = CaseInsensitiveDict({'Content-Length': '1024', 'ETag': '"A"'})
+        mocked_resolved_head_response = MagicMock()
+        mocked_resolved_head_response.status_code = HTTPStatus.OK.value
+        mocked_resolved_head_response.headers = CaseInsensitiveDict({'Content-Length': '1024', 'ETag': '"B"'})
+        mocked_head_request.side_effect = [mocked_original_head_response, mocked_resolved_head_response]
+
+        mocked_get_request.return_value = MagicMock()
+        mocked_get_request.return_value.status_code = HTTPStatus.FORBIDDEN.value
+
+        download_service = PageDownloadService(
+            url='https://example.com/file.m4s?deadline=1',
+            file='/tmp/test_file.mp4',
+            resolver=lambda: 'https://example.com/file.m4s?deadline=2'
+        )
+        download_service._path = MagicMock(spec=Path)
+        mocked_tmp_path = MagicMock(spec=Path)
+        mocked_tmp_path.exists.return_value = False
+        download_service._tmp_path = mocked_tmp_path
+
+        with self.assertRaises(DownloadError):
+            download_service.download()
+        self.assertEqual(mocked_get_request.call_count, 1)
+        mocked_tmp_path.rename.assert_not_called()
+
+    @patch('bili_jean.proxy_service.ProxyService.head')
+    def test_remote_file_size_403_resolve_url(self, mocked_head_request):
+        mocked_forbidden_response = MagicMock()
+        mocked_forbidden_response.status_code = HTTPStatus.FORBIDDEN.value
+        mocked_ok_response = MagicMock()
+        mocked_ok_response.status_code = HTTPStatus.OK.value
+        mocked_ok_response.headers = CaseInsensitiveDict({'Content-Length': '1024'})
+        mocked_head_request.side_effect = [mocked_forbidden_response, mocked_ok_response]
+
+        resolver = MagicMock(return_value='https://example.com/file.m4s?deadline=2')
+        download_service = PageDownloadService(
+            url='https://example.com/file.m4s?deadline=1',
+            file='/tmp/test_file.mp4',
+            resolver=resolver,
+            max_resolve_times=1
+        )
+        self.assertEqual(download_service.remote_file_size, 1024)
+        resolver.assert_called_once_with()
+
+    @patch('bili_jean.proxy_service.ProxyService.head')
+    def test_remote_file_size_403_exceed_max_resolve_times(self, mocked_head_request):
+        mocked_head_request.return_value = MagicMock()
+        mocked_head_request.return_value.status_code = HTTPStatus.FORBIDDEN.value
+
+        resolver = MagicMock(return_value='https://example.com/file.m4s?deadline=2')
+        download_service = PageDownloadService(
+            url='https://example.com/file.m4s?deadline=1',
+            file='/tmp/test_file.mp4',
+            resolver=resolver,
+            max_resolve_times=0
+        )
+        with self.assertRaises(DownloadError):
+            download_service.remote_file_size
+        resolver.assert_not_called()
+
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    @patch('bili_jean.proxy_service.ProxyService.head')
+    def test_download_with_writer(self, mocked_head_request, mocked_get_request):
+        chunks = [bytes([idx]) * 1024 for idx in range(8)]
+        mocked_head_request.return_value = get_mocked_response(
+            HTTPStatus.OK.value, b'', {'Content-Length': str(len(chunks) * 1024)}
+        )
+        mocked_get_request.return_value = MagicMock()
+        mocked_get_request.return_value.status_code = HTTPStatus.PARTIAL_CONTENT.value
+        mocked_get_request.return_value.iter_content = MagicMock(return_value=chunks)
+
+        with tempfile.TemporaryDirectory() as tmp_dir, DiskWriter(max_buffer_bytes=2048) as writer:
+            file = os.path.join(tmp_dir, 'sample.m4s')
+            PageDownloadService(url='https://example.com/file.m4s', file=file, writer=writer).download()
+            with open(file, 'rb') as f:
+                self.assertEqual(f.read(), b''.join(chunks))
+            self.assertFalse(os.path.exists(f'{file}.part'))
+            metrics = writer.get_metrics()
+        self.assertEqual(metrics.written_bytes, len(chunks) * 1024)
+        self.assertLessEqual(metrics.max_buffered_bytes, 2048)
+
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    def test_download_to_sink(self, mocked_get_request):
+        chunks = [bytes([idx]) * 1024 for idx in range(8)]
+        mocked_get_request.return_value = MagicMock()
+        mocked_get_request.return_value.status_code = HTTPStatus.OK.value
+        mocked_get_request.return_value.iter_content = MagicMock(return_value=chunks)
+
+        sink = BufferSink()
+        size = PageDownloadService(url='https://example.com/file.m4s', file='/tmp/sample.m4s').download_to(sink)
+        self.assertEqual(size, 8192)
+        self.assertEqual(sink.getvalue(), b''.join(chunks))
+        self.assertFalse(os.path.exists('/tmp/sample.m4s.part'))
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            uploader = LocalMultipartUploader(tmp_dir)
+            sink = MultipartUploadSink(uploader, 'sample.m4s', part_size=3000)
+            PageDownloadService(url='https://example.com/file.m4s', file='/tmp/sample.m4s').download_to(sink)
+            self.assertEqual(len(sink.parts), 3)
+            with open(str(uploader.get_object_path('sample.m4s')), 'rb') as f:
+                self.assertEqual(f.read(), b''.join(chunks))
+
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    def test_download_to_sink_failed(self, mocked_get_request):
+        def iter_content(chunk_size):
+            yield b'chunk_0'
+            raise ConnectionError('Connection reset by peer')
+
+        mocked_get_request.return_value = MagicMock()
+        mocked_get_request.return_value.status_code = HTTPStatus.OK.value
+        mocked_get_request.return_value.iter_content = iter_content
+
+        sink = MagicMock()
+        with self.assertRaises(ConnectionError):
+            PageDownloadService(url='https://example.com/file.m4s', file='/tmp/sample.m4s').download_to(sink)
+        sink.write.assert_called_once_with(b'chunk_0')
+        sink.abort.assert_called_once_with()
+        sink.close.assert_not_called()
+
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    def test_download_to_sink_close_failed(self, mocked_get_request):
+        mocked_get_request.return_value = MagicMock()
+        mocked_get_request.return_value.status_code = HTTPStatus.OK.value
+        mocked_get_request.return_value.iter_content = MagicMock(return_value=[b'chunk_0'])
+
+        uploader = MagicMock()
+        uploader.create_upload.return_value = 'mock-upload-id'
+        uploader.complete_upload.side_effect = ConnectionError('Connection reset by peer')
+        sink = MultipartUploadSink(uploader, 'sample.m4s')
+        with self.assertRaises(ConnectionError):
+            PageDownloadService(url='https://example.com/file.m4s', file='/tmp/sample.m4s').download_to(sink)
+        uploader.abort_upload.assert_called_once_with('sample.m4s', 'mock-upload-id')
+
     def test_init_with_directory_path(self):
         mocked_source_url = 'https://example.com/file.m4s'
         mocked_file_path = './'
@@ -159,3 +374,358 @@ class PageDownloadServiceTestCase(TestCase):
                 url=mocked_source_url,
                 file=mocked_file_path
             )
+
+
+class PageDownloadServiceDurabilityTestCase(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.file = os.path.join(self.tmp_dir.name, 'sample.m4s')
+        self.tmp_file = f'{self.file}.part'
+        self.journal_file = f'{self.file}.part.journal'
+        self.data = bytes(range(256)) * 16
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def get_mocked_request(self, url, headers, stream):
+        start = int(headers['Range'][len('bytes='):-1])
+        response = MagicMock()
+        response.status_code = HTTPStatus.PARTIAL_CONTENT.value
+        response.iter_content = MagicMock(
+            return_value=[self.data[idx:idx + 1024] for idx in range(start, len(self.data), 1024)]
+        )
+        return response
+
+    def get_mocked_head_response(self):
+        return get_mocked_response(
+            HTTPStatus.OK.value, b'', {'Content-Length': str(len(self.data)), 'ETag': '"foo"'}
+        )
+
+    @patch('bili_jean.durable_file.os.fsync')
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    @patch('bili_jean.proxy_service.ProxyService.head')
+    def test_download_preallocated(self, mocked_head_request, mocked_get_request, mocked_fsync):
+        mocked_head_request.return_value = self.get_mocked_head_response()
+        mocked_get_request.side_effect = self.get_mocked_request
+
+        download_service = PageDownloadService(
+            url='https://example.com/file.m4s',
+            file=self.file,
+            durability=DurabilityPolicy(sync_bytes=2048, is_preallocated=True)
+        )
+        download_service.download()
+
+        with open(self.file, 'rb') as f:
+            self.assertEqual(f.read(), self.data)
+        self.assertFalse(os.path.exists(self.tmp_file))
+        self.assertFalse(os.path.exists(self.journal_file))
+        self.assertEqual(mocked_get_request.call_args.kwargs['headers']['Range'], 'bytes=0-')
+        # fsync by bytes twice, and the final one is skipped since nothing is left
+        self.assertEqual(mocked_fsync.call_count, 2)
+
+    @patch('bili_jean.durable_file.os.fsync')
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    @patch('bili_jean.proxy_service.ProxyService.head')
+    def test_download_preallocated_cut_short(self, mocked_head_request, mocked_get_request, mocked_fsync):
+        mocked_head_request.return_value = self.get_mocked_head_response()
+
+        def get_cut_short_request(url, headers, stream):
+            response = self.get_mocked_request(url, headers, stream)
+            response.iter_content = MagicMock(return_value=response.iter_content.return_value[:2])
+            return response
+
+        mocked_get_request.side_effect = get_cut_short_request
+        download_service = PageDownloadService(
+            url='https://example.com/file.m4s',
+            file=self.file,
+            durability=DurabilityPolicy(is_preallocated=True)
+        )
+        with self.assertRaises(DownloadError):
+            download_service.download()
+        # the preallocated file is as large as the remote one, but never taken as downloaded
+        self.assertFalse(os.path.exists(self.file))
+        self.assertEqual(os.path.getsize(self.tmp_file), len(self.data))
+        with open(self.journal_file, 'r') as f:
+            self.assertEqual(json.load(f)['progress'], 2048)
+
+        mocked_get_request.side_effect = self.get_mocked_request
+        self.assertEqual(download_service.download(), DownloadStatus.DOWNLOADED)
+        self.assertEqual(mocked_get_request.call_args.kwargs['headers']['Range'], 'bytes=2048-')
+        with open(self.file, 'rb') as f:
+            self.assertEqual(f.read(), self.data)
+
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    @patch('bili_jean.proxy_service.ProxyService.head')
+    def test_download_continue_from_journal(self, mocked_head_request, mocked_get_request):
+        mocked_head_request.return_value = self.get_mocked_head_response()
+        mocked_get_request.side_effect = self.get_mocked_request
+        # the file looks complete, but only the first 1024 bytes are fsynced
+        with open(self.tmp_file, 'wb') as f:
+            f.write(self.data[:2048])
+            f.write(b'\x00' * (len(self.data) - 2048))
+        with open(self.journal_file, 'w') as f:
+            json.dump({'size': len(self.data), 'etag': '"foo"', 'progress': 1024}, f)
+
+        download_service = PageDownloadService(
+            url='https://example.com/file.m4s',
+            file=self.file,
+            durability=DurabilityPolicy(is_preallocated=True)
+        )
+        download_service.download()
+
+        with open(self.file, 'rb') as f:
+            self.assertEqual(f.read(), self.data)
+        self.assertEqual(mocked_get_request.call_args.kwargs['headers']['Range'], 'bytes=1024-')
+
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    @patch('bili_jean.proxy_service.ProxyService.head')
+    def test_download_truncate_beyond_journal(self, mocked_head_request, mocked_get_request):
+        mocked_head_request.return_value = self.get_mocked_head_response()
+        mocked_get_request.side_effect = self.get_mocked_request
+        with open(self.tmp_file, 'wb') as f:
+            f.write(self.data[:1024] + b'\x00' * 100)
+        with open(self.journal_file, 'w') as f:
+            json.dump({'size': len(self.data), 'etag': '"foo"', 'progress': 1024}, f)
+
+        download_service = PageDownloadService(
+            url='https://example.com/file.m4s',
+            file=self.file,
+            durability=DurabilityPolicy()
+        )
+        download_service.download()
+
+        with open(self.file, 'rb') as f:
+            self.assertEqual(f.read(), self.data)
+
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    @patch('bili_jean.proxy_service.ProxyService.head')
+    def test_download_with_mismatched_journal(self, mocked_head_request, mocked_get_request):
+        mocked_head_request.return_value = self.get_mocked_head_response()
+        mocked_get_request.side_effect = self.get_mocked_request
+        with open(self.tmp_file, 'wb') as f:
+            f.write(b'\x01' * 2048)
+        with open(self.journal_file, 'w') as f:
+            json.dump({'size': len(self.data), 'etag': '"bar"', 'progress': 2048}, f)
+
+        download_service = PageDownloadService(
+            url='https://example.com/file.m4s',
+            file=self.file,
+            durability=DurabilityPolicy()
+        )
+        download_service.download()
+
+        with open(self.file, 'rb') as f:
+            self.assertEqual(f.read(), self.data)
+        self.assertEqual(mocked_get_request.call_args.kwargs['headers']['Range'], 'bytes=0-')
+
+    @patch('bili_jean.durable_file.os.posix_fallocate', create=True)
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    @patch('bili_jean.proxy_service.ProxyService.head')
+    def test_download_without_space(self, mocked_head_request, mocked_get_request, mocked_fallocate):
+        mocked_head_request.return_value = self.get_mocked_head_response()
+        mocked_fallocate.side_effect = OSError(errno.ENOSPC, 'No space left on device')
+
+        download_service = PageDownloadService(
+            url='https://example.com/file.m4s',
+            file=self.file,
+            durability=DurabilityPolicy(is_preallocated=True)
+        )
+        with self.assertRaises(DownloadError):
+            download_service.download()
+        mocked_get_request.assert_not_called()
+        self.assertFalse(os.path.exists(self.file))
+
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    @patch('bili_jean.proxy_service.ProxyService.head')
+    def test_download_with_writer(self, mocked_head_request, mocked_get_request):
+        mocked_head_request.return_value = self.get_mocked_head_response()
+        mocked_get_request.side_effect = self.get_mocked_request
+
+        with DiskWriter() as writer:
+            download_service = PageDownloadService(
+                url='https://example.com/file.m4s',
+                file=self.file,
+                writer=writer,
+                durability=DurabilityPolicy(sync_bytes=1024, is_preallocated=True)
+            )
+            download_service.download()
+
+        with open(self.file, 'rb') as f:
+            self.assertEqual(f.read(), self.data)
+        self.assertFalse(os.path.exists(self.journal_file))
+
+
+class PageDownloadServiceLockTestCase(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.file = os.path.join(self.tmp_dir.name, 'sample.m4s')
+        self.lock_file = f'{self.file}.part.lock'
+        self.data = b'chunk_0chunk_1'
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def mock_requests(self, mocked_head_request, mocked_get_request):
+        mocked_head_request.return_value = get_mocked_response(
+            HTTPStatus.OK.value, b'', {'Content-Length': str(len(self.data))}
+        )
+        mocked_get_request.return_value = MagicMock()
+        mocked_get_request.return_value.status_code = HTTPStatus.PARTIAL_CONTENT.value
+        mocked_get_request.return_value.iter_content = MagicMock(return_value=[b'chunk_0', b'chunk_1'])
+
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    @patch('bili_jean.proxy_service.ProxyService.head')
+    def test_download(self, mocked_head_request, mocked_get_request):
+        self.mock_requests(mocked_head_request, mocked_get_request)
+        status = PageDownloadService(url='https://example.com/file.m4s', file=self.file).download()
+        self.assertEqual(status, DownloadStatus.DOWNLOADED)
+        with open(self.file, 'rb') as f:
+            self.assertEqual(f.read(), self.data)
+        self.assertFalse(os.path.exists(self.lock_file))
+
+        # the finished file is reused
+        status = PageDownloadService(url='https://example.com/file.m4s', file=self.file).download()
+        self.assertEqual(status, DownloadStatus.REUSED)
+        mocked_get_request.assert_called_once()
+
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    @patch('bili_jean.proxy_service.ProxyService.head')
+    def test_download_skipped(self, mocked_head_request, mocked_get_request):
+        self.mock_requests(mocked_head_request, mocked_get_request)
+        with FileLock(self.lock_file):
+            download_service = PageDownloadService(url='https://example.com/file.m4s', file=self.file)
+            self.assertEqual(download_service.download(is_waited=False), DownloadStatus.SKIPPED)
+        mocked_get_request.assert_not_called()
+        self.assertFalse(os.path.exists(self.file))
+
+    @patch('bili_jean.page_download_service.FileLock', partial(FileLock, poll_interval=0.01))
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    @patch('bili_jean.proxy_service.ProxyService.head')
+    def test_download_wait_timeout(self, mocked_head_request, mocked_get_request):
+        self.mock_requests(mocked_head_request, mocked_get_request)
+        with FileLock(self.lock_file):
+            download_service = PageDownloadService(url='https://example.com/file.m4s', file=self.file)
+            self.assertEqual(download_service.download(timeout=0.05), DownloadStatus.SKIPPED)
+        mocked_get_request.assert_not_called()
+
+    @patch('bili_jean.page_download_service.FileLock', partial(FileLock, poll_interval=0.01))
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    @patch('bili_jean.proxy_service.ProxyService.head')
+    def test_download_wait_and_reuse(self, mocked_head_request, mocked_get_request):
+        self.mock_requests(mocked_head_request, mocked_get_request)
+        lock = FileLock(self.lock_file)
+        lock.acquire()
+
+        def finish():
+            with open(self.file, 'wb') as f:
+                f.write(self.data)
+            lock.release()
+
+        timer = Timer(0.1, finish)
+        timer.start()
+        try:
+            download_service = PageDownloadService(url='https://example.com/file.m4s', file=self.file)
+            self.assertEqual(download_service.download(timeout=5), DownloadStatus.REUSED)
+        finally:
+            timer.join()
+        mocked_get_request.assert_not_called()
+
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    @patch('bili_jean.proxy_service.ProxyService.head')
+    def test_download_without_lock(self, mocked_head_request, mocked_get_request):
+        self.mock_requests(mocked_head_request, mocked_get_request)
+        with FileLock(self.lock_file):
+            download_service = PageDownloadService(url='https://example.com/file.m4s', file=self.file, is_locked=False)
+            self.assertEqual(download_service.download(is_waited=False), DownloadStatus.DOWNLOADED)
+        with open(self.file, 'rb') as f:
+            self.assertEqual(f.read(), self.data)
+
+
+class PageDownloadServiceClipTestCase(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.file = os.path.join(self.tmp_dir.name, 'clip', 'sample.m4s')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    def test_download_clip_with_index_range(self, mocked_get_request):
+        init_data, data, fragments = build_fragmented_mp4()
+        mocked_get_request.side_effect = get_mocked_range_request(data)
+        sidx_size = len(data) - len(init_data) - sum(len(fragment) for fragment in fragments)
+
+        download_service = PageDownloadService(url='https://example.com/file.m4s', file=self.file)
+        download_service.download_clip(2.5, 5, index_range=f'{len(init_data)}-{len(init_data) + sidx_size - 1}')
+
+        with open(self.file, 'rb') as f:
+            self.assertEqual(f.read(), init_data + fragments[1] + fragments[2])
+        self.assertEqual(
+            [call.kwargs['headers']['Range'] for call in mocked_get_request.call_args_list],
+            [
+                f'bytes=0-{len(init_data) + sidx_size - 1}',
+                f'bytes={len(init_data) + sidx_size + len(fragments[0])}-'
+                f'{len(init_data) + sidx_size + len(fragments[0]) * 3 - 1}'
+            ]
+        )
+
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    def test_download_clip_by_probe(self, mocked_get_request):
+        init_data, data, fragments = build_fragmented_mp4()
+        mocked_get_request.side_effect = get_mocked_range_request(data)
+
+        download_service = PageDownloadService(url='https://example.com/file.m4s', file=self.file)
+        download_service.download_clip(0, 1)
+
+        with open(self.file, 'rb') as f:
+            self.assertEqual(f.read(), init_data + fragments[0])
+        self.assertEqual(mocked_get_request.call_count, 2)
+
+    @patch('bili_jean.page_download_service.PROBE_SIZE', 16)
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    def test_get_segment_index_beyond_probe(self, mocked_get_request):
+        init_data, data, _ = build_fragmented_mp4()
+        mocked_get_request.side_effect = get_mocked_range_request(data)
+
+        download_service = PageDownloadService(url='https://example.com/file.m4s', file=self.file)
+        actual_init_data, segment_index = download_service.get_segment_index()
+
+        self.assertEqual(actual_init_data, init_data)
+        self.assertEqual(len(segment_index.references), 4)
+        self.assertEqual(segment_index.duration, 8)
+
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    def test_get_segment_index_without_sidx(self, mocked_get_request):
+        data = build_box('ftyp') + build_box('moov') + build_box('moof') + build_box('mdat', b'\x00' * 32)
+        mocked_get_request.side_effect = get_mocked_range_request(data)
+
+        download_service = PageDownloadService(url='https://example.com/file.m4s', file=self.file)
+        with self.assertRaises(DownloadError):
+            download_service.get_segment_index()
+        with self.assertRaises(DownloadError):
+            download_service.get_segment_index(index_range='16-31')
+
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    def test_download_clip_out_of_range(self, mocked_get_request):
+        _, data, _ = build_fragmented_mp4()
+        mocked_get_request.side_effect = get_mocked_range_request(data)
+
+        download_service = PageDownloadService(url='https://example.com/file.m4s', file=self.file)
+        with self.assertRaises(DownloadError):
+            download_service.download_clip(10, 12)
+        with self.assertRaises(ValueError):
+            download_service.download_clip(2, 1)
+        self.assertFalse(os.path.exists(self.file))
+
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    def test_download_clip_without_range_support(self, mocked_get_request):
+        mocked_get_request.return_value = MagicMock()
+        mocked_get_request.return_value.status_code = HTTPStatus.OK.value
+        mocked_get_request.return_value.content = b''
+
+        download_service = PageDownloadService(url='https://example.com/file.m4s', file=self.file)
+        with self.assertRaises(DownloadError):
+            download_service.download_clip(0, 1)
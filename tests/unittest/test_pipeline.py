@@ -0,0 +1,217 @@
+"""
+Unit test for staged pipeline
+"""
+from threading import Event, Lock, Thread
+import time
+from unittest import TestCase
+
+from bili_jean.pipeline import ByteBudget, Pipeline, Stage
+
+
+class ByteBudgetTestCase(TestCase):
+
+    def test_acquire(self):
+        budget = ByteBudget(100)
+        budget.acquire(60)
+        budget.acquire(40)
+        self.assertEqual(budget.used, 100)
+        budget.release(100)
+        # larger than the limit, but nothing else is held
+        budget.acquire(150)
+        self.assertEqual((budget.used, budget.max_used), (150, 150))
+
+    def test_invalid_limit(self):
+        with self.assertRaises(ValueError):
+            ByteBudget(0)
+
+
+class PipelineTestCase(TestCase):
+
+    def test_run(self):
+        pipeline = Pipeline([
+            Stage(name='expand', func=lambda item: [item * 10, item * 10 + 1], is_expanded=True),
+            Stage(name='double', func=lambda item: item * 2, workers=3, queue_size=2),
+            Stage(name='format', func=str, workers=2)
+        ])
+        result = pipeline.run(range(5))
+        self.assertEqual(
+            sorted(result.results, key=int),
+            [str(value * 2) for item in range(5) for value in (item * 10, item * 10 + 1)]
+        )
+        self.assertEqual(result.errors, [])
+        self.assertEqual(list(result.metrics), ['expand', 'double', 'format'])
+        self.assertEqual(result.metrics['expand'].processed, 5)
+        self.assertEqual(result.metrics['double'].processed, 10)
+        self.assertEqual(result.metrics['format'].processed, 10)
+        self.assertEqual(result.metrics['format'].queue_depth, 0)
+        self.assertGreater(result.metrics['format'].throughput, 0)
+
+    def test_run_with_error(self):
+        def check(item):
+            if item == 3:
+                raise ValueError('Invalid item 3')
+            return item
+
+        pipeline = Pipeline([
+            Stage(name='check', func=check, workers=2),
+            Stage(name='square', func=lambda item: item * item)
+        ], max_in_flight_bytes=10)
+        result = pipeline.run(range(5))
+        self.assertEqual(sorted(result.results), [0, 1, 4, 16])
+        self.assertEqual(len(result.errors), 1)
+        self.assertEqual((result.errors[0].item, result.errors[0].stage_name), (3, 'check'))
+        self.assertEqual(result.metrics['check'].failed, 1)
+        self.assertEqual(pipeline.in_flight_budget.used, 0)
+
+    def test_backpressure(self):
+        lock = Lock()
+        produced = []
+        consumed = []
+        max_ahead = []
+
+        def produce(item):
+            with lock:
+                produced.append(item)
+                max_ahead.append(len(produced) - len(consumed))
+            return item
+
+        def consume(item):
+            time.sleep(0.005)
+            with lock:
+                consumed.append(item)
+            return item
+
+        pipeline = Pipeline([
+            Stage(name='produce', func=produce, workers=2),
+            Stage(name='consume', func=consume, queue_size=1)
+        ])
+        result = pipeline.run(range(20))
+        self.assertEqual(len(result.results), 20)
+        # items in the queue, in the consumer, and in the producers blocked on the full queue
+        self.assertLessEqual(max(max_ahead), 1 + 1 + 2)
+        self.assertGreater(result.metrics['produce'].blocked_seconds, 0)
+        self.assertEqual(result.metrics['consume'].max_queue_depth, 1)
+
+    def test_in_flight_bytes(self):
+        lock = Lock()
+        in_flight = []
+        max_in_flight = []
+
+        def download(item):
+            with lock:
+                in_flight.append(item)
+                max_in_flight.append(len(in_flight))
+            time.sleep(0.002)
+            return item
+
+        def finish(item):
+            with lock:
+                in_flight.remove(item)
+            return item
+
+        pipeline = Pipeline(
+            [
+                Stage(name='download', func=download, workers=4, in_flight_cost=lambda item: 10),
+                Stage(name='finish', func=finish, workers=2)
+            ],
+            max_in_flight_bytes=20
+        )
+        result = pipeline.run(range(12))
+        self.assertEqual(sorted(result.results), list(range(12)))
+        self.assertLessEqual(max(max_in_flight), 2)
+        self.assertEqual(pipeline.in_flight_budget.max_used, 20)
+        self.assertEqual(pipeline.in_flight_budget.used, 0)
+
+    def test_memory_bytes(self):
+        pipeline = Pipeline(
+            [
+                Stage(name='load', func=lambda item: b'\x00' * 8, memory_cost=len, workers=2),
+                Stage(name='save', func=len, queue_size=4)
+            ],
+            max_memory_bytes=16
+        )
+        result = pipeline.run(range(10))
+        self.assertEqual(result.results, [8] * 10)
+        self.assertLessEqual(pipeline.memory_budget.max_used, 16)
+        self.assertEqual(pipeline.memory_budget.used, 0)
+
+    def test_memory_cost_error(self):
+        def cost(item):
+            if item == 3:
+                raise ValueError('Invalid item 3')
+            return 1
+
+        pipeline = Pipeline(
+            [
+                Stage(name='load', func=lambda item: item, memory_cost=cost, in_flight_cost=lambda item: 1),
+                Stage(name='save', func=lambda item: item)
+            ],
+            max_in_flight_bytes=10,
+            max_memory_bytes=10
+        )
+        result = pipeline.run(range(5))
+        self.assertEqual(sorted(result.results), [0, 1, 2, 4])
+        self.assertEqual((result.errors[0].item, result.errors[0].stage_name), (3, 'load'))
+        self.assertEqual(pipeline.in_flight_budget.used, 0)
+        self.assertEqual(pipeline.memory_budget.used, 0)
+
+    def test_expanded_lazily(self):
+        lock = Lock()
+        produced = []
+        consumed = []
+        max_ahead = []
+
+        def expand(item):
+            for idx in range(20):
+                with lock:
+                    produced.append(idx)
+                    max_ahead.append(len(produced) - len(consumed))
+                yield idx
+
+        def consume(item):
+            time.sleep(0.002)
+            with lock:
+                consumed.append(item)
+            return item
+
+        pipeline = Pipeline([
+            Stage(name='expand', func=expand, is_expanded=True),
+            Stage(name='consume', func=consume, queue_size=1)
+        ])
+        result = pipeline.run([0])
+        self.assertEqual(sorted(result.results), list(range(20)))
+        # generator is never run ahead of the bounded queue
+        self.assertLessEqual(max(max_ahead), 1 + 1 + 1)
+
+    def test_get_metrics_while_backpressured(self):
+        is_released = Event()
+
+        def hold(item):
+            is_released.wait()
+            return item
+
+        pipeline = Pipeline(
+            [
+                Stage(name='load', func=lambda item: item, memory_cost=lambda item: 10),
+                Stage(name='hold', func=hold, queue_size=4)
+            ],
+            max_memory_bytes=10
+        )
+        thread = Thread(target=pipeline.run, args=(range(3), ))
+        thread.start()
+        try:
+            time.sleep(0.05)
+            metrics = []
+            metrics_thread = Thread(target=lambda: metrics.append(pipeline.get_metrics()), daemon=True)
+            metrics_thread.start()
+            metrics_thread.join(timeout=1)
+            self.assertEqual(len(metrics), 1)
+        finally:
+            is_released.set()
+            thread.join()
+
+    def test_invalid_stages(self):
+        with self.assertRaises(ValueError):
+            Pipeline([])
+        with self.assertRaises(ValueError):
+            Pipeline([Stage(name='idle', func=str, workers=0)])
@@ -0,0 +1,37 @@
+"""
+Unit test for RateLimiter
+"""
+from unittest import TestCase
+
+from bili_jean.rate_limiter import RateLimiter
+
+
+class RateLimiterTestCase(TestCase):
+
+    def setUp(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def _sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+    def test_acquire(self):
+        rate_limiter = RateLimiter(rate=4, clock=lambda: self.now, sleep=self._sleep)
+        for _ in range(3):
+            rate_limiter.acquire()
+        self.assertEqual(self.sleeps, [0.25, 0.25])
+
+        self.now += 1
+        rate_limiter.acquire()
+        self.assertEqual(self.sleeps, [0.25, 0.25])
+
+    def test_acquire_without_limit(self):
+        rate_limiter = RateLimiter(clock=lambda: self.now, sleep=self._sleep)
+        for _ in range(3):
+            rate_limiter.acquire()
+        self.assertEqual(self.sleeps, [])
+
+    def test_invalid_rate(self):
+        with self.assertRaises(ValueError):
+            RateLimiter(rate=0)
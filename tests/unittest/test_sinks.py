@@ -0,0 +1,185 @@
+"""
+Unit test for sinks of downloaded bytes
+"""
+import asyncio
+import io
+import os
+import tempfile
+from threading import Thread
+from unittest import TestCase
+
+from bili_jean.sinks import (
+    BufferSink,
+    CallbackSink,
+    FileObjectSink,
+    FileSink,
+    LocalMultipartUploader,
+    MultipartUploadSink
+)
+
+
+class FileSinkTestCase(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.file = os.path.join(self.tmp_dir.name, 'media', 'sample.m4s')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_close(self):
+        sink = FileSink(self.file)
+        sink.write(b'ab')
+        self.assertTrue(os.path.exists(f'{self.file}.part'))
+        sink.write(b'cd')
+        sink.close()
+        with open(self.file, 'rb') as f:
+            self.assertEqual(f.read(), b'abcd')
+        self.assertFalse(os.path.exists(f'{self.file}.part'))
+
+    def test_close_empty(self):
+        sink = FileSink(self.file)
+        sink.close()
+        self.assertEqual(os.path.getsize(self.file), 0)
+
+    def test_abort(self):
+        sink = FileSink(self.file)
+        sink.write(b'ab')
+        sink.abort()
+        self.assertFalse(os.path.exists(f'{self.file}.part'))
+        self.assertFalse(os.path.exists(self.file))
+
+    def test_init_with_directory_path(self):
+        with self.assertRaises(ValueError):
+            FileSink(self.tmp_dir.name)
+
+
+class BufferSinkTestCase(TestCase):
+
+    def test_write(self):
+        sink = BufferSink()
+        sink.write(b'ab')
+        sink.write(b'cd')
+        sink.close()
+        self.assertEqual(sink.size, 4)
+        self.assertEqual(sink.getvalue(), b'abcd')
+        self.assertEqual(bytes(sink.getbuffer()), b'abcd')
+
+    def test_write_beyond_max_size(self):
+        sink = BufferSink(max_size=3)
+        sink.write(b'ab')
+        with self.assertRaises(ValueError):
+            sink.write(b'cd')
+
+
+class FileObjectSinkTestCase(TestCase):
+
+    def test_write(self):
+        fp = io.BytesIO()
+        sink = FileObjectSink(fp)
+        sink.write(b'ab')
+        sink.close()
+        self.assertFalse(fp.closed)
+        self.assertEqual(fp.getvalue(), b'ab')
+
+    def test_close_file(self):
+        fp = io.BytesIO()
+        sink = FileObjectSink(fp, is_closed=True)
+        sink.write(b'ab')
+        sink.abort()
+        self.assertTrue(fp.closed)
+
+
+class CallbackSinkTestCase(TestCase):
+
+    def test_function(self):
+        chunks = []
+        events = []
+        sink = CallbackSink(chunks.append, on_close=lambda: events.append('close'))
+        sink.write(b'ab')
+        sink.write(b'cd')
+        sink.close()
+        self.assertEqual(chunks, [b'ab', b'cd'])
+        self.assertEqual(events, ['close'])
+
+    def test_coroutine_function_on_private_loop(self):
+        chunks = []
+        events = []
+
+        async def consume(chunk):
+            await asyncio.sleep(0)
+            chunks.append(chunk)
+
+        async def on_abort():
+            events.append('abort')
+
+        sink = CallbackSink(consume, on_abort=on_abort)
+        sink.write(b'ab')
+        sink.abort()
+        self.assertEqual(chunks, [b'ab'])
+        self.assertEqual(events, ['abort'])
+
+    def test_coroutine_function_on_running_loop(self):
+        loop = asyncio.new_event_loop()
+        thread = Thread(target=loop.run_forever)
+        thread.start()
+        queue = []
+
+        async def consume(chunk):
+            # runs in the thread of the loop
+            queue.append((chunk, asyncio.get_running_loop() is loop))
+
+        try:
+            sink = CallbackSink(consume, loop=loop)
+            sink.write(b'ab')
+            sink.write(b'cd')
+            sink.close()
+        finally:
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join()
+            loop.close()
+        self.assertEqual(queue, [(b'ab', True), (b'cd', True)])
+
+
+class MultipartUploadSinkTestCase(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.uploader = LocalMultipartUploader(self.tmp_dir.name)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_upload(self):
+        sink = MultipartUploadSink(self.uploader, 'media/sample.m4s', part_size=4)
+        for chunk in (b'ab', b'cd', b'efg', b'h', b'ij'):
+            sink.write(chunk)
+        sink.close()
+
+        with open(str(self.uploader.get_object_path('media/sample.m4s')), 'rb') as f:
+            self.assertEqual(f.read(), b'abcdefghij')
+        self.assertEqual([part_number for part_number, _ in sink.parts], [1, 2, 3])
+        # parts are removed once completed
+        self.assertEqual(os.listdir(os.path.join(self.tmp_dir.name, '.uploads')), [])
+
+    def test_upload_empty(self):
+        sink = MultipartUploadSink(self.uploader, 'sample.m4s', part_size=4)
+        sink.close()
+        self.assertEqual(os.path.getsize(str(self.uploader.get_object_path('sample.m4s'))), 0)
+
+    def test_abort(self):
+        sink = MultipartUploadSink(self.uploader, 'sample.m4s', part_size=4)
+        sink.write(b'abcdef')
+        sink.abort()
+        self.assertFalse(self.uploader.get_object_path('sample.m4s').exists())
+        self.assertEqual(os.listdir(os.path.join(self.tmp_dir.name, '.uploads')), [])
+
+    def test_complete_with_invalid_etag(self):
+        upload_id = self.uploader.create_upload('sample.m4s')
+        self.uploader.upload_part('sample.m4s', upload_id, 1, b'ab')
+        with self.assertRaises(ValueError):
+            self.uploader.complete_upload('sample.m4s', upload_id, [(1, '"foo"')])
+
+    def test_invalid_part_size(self):
+        with self.assertRaises(ValueError):
+            MultipartUploadSink(self.uploader, 'sample.m4s', part_size=0)
@@ -2,11 +2,15 @@
 Unit test for UserService
 """
 from http import HTTPStatus
+import copy
 import json
+import time
 from unittest import TestCase
 from unittest.mock import patch
 
-from bili_jean.user_service import UserService
+from bili_jean.constants import AudioBitRateID, QualityNumber
+from bili_jean.credential_pool import CredentialPool
+from bili_jean.user_service import UserService, UserServiceError
 from tests.utils import get_mocked_response
 
 
@@ -14,10 +18,14 @@ with open('tests/mock_data/proxy/my_info/my_info_1532165.json', 'r') as fp:
     DATA_MY_INFO = json.load(fp)
 with open('tests/mock_data/proxy/my_info/my_info_not_login.json', 'r') as fp:
     DATA_MY_INFO_NOT_LOGIN = json.load(fp)
+DATA_MY_INFO_THROTTLED = {'code': -412, 'message': '请求被拦截', 'ttl': 1, 'data': None}
 
 
 class UserServiceTestCase(TestCase):
 
+    def setUp(self):
+        UserService.clear_entitlement_profiles()
+
     @patch('bili_jean.proxy_service.ProxyService.get')
     def test_validate(self, mocked_request):
         mocked_request.return_value = get_mocked_response(
@@ -37,3 +45,161 @@ class UserServiceTestCase(TestCase):
         )
         result = UserService.validate()
         self.assertFalse(result)
+
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    def test_validate_expired_sess_data(self, mocked_request):
+        mocked_request.return_value = get_mocked_response(
+            HTTPStatus.OK.value,
+            json.dumps(DATA_MY_INFO_NOT_LOGIN).encode('utf-8')
+        )
+        self.assertFalse(UserService.validate(sess_data='mock-sess-data'))
+        self.assertFalse(UserService.validate(sess_data='mock-sess-data'))
+        self.assertEqual(mocked_request.call_count, 1)
+
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    def test_validate_throttled(self, mocked_request):
+        mocked_request.return_value = get_mocked_response(
+            HTTPStatus.OK.value,
+            json.dumps(DATA_MY_INFO_THROTTLED).encode('utf-8')
+        )
+        self.assertFalse(UserService.validate(sess_data='mock-sess-data'))
+
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    def test_validate_credential_pool(self, mocked_request):
+        mocked_request.side_effect = [
+            get_mocked_response(
+                HTTPStatus.OK.value,
+                json.dumps(DATA_MY_INFO_NOT_LOGIN).encode('utf-8')
+            ),
+            get_mocked_response(
+                HTTPStatus.OK.value,
+                json.dumps(DATA_MY_INFO).encode('utf-8')
+            )
+        ]
+        pool = CredentialPool(['expired-mock-sess-data', 'mock-sess-data'])
+        self.assertEqual(UserService.validate_credential_pool(pool), ['mock-sess-data'])
+        self.assertEqual(pool.healthy_sess_datas, ['mock-sess-data'])
+
+        profile = UserService.get_entitlement_profile(sess_data=pool)
+        self.assertTrue(profile.is_login)
+        self.assertEqual(mocked_request.call_count, 2)
+
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    def test_validate_credential_pool_throttled(self, mocked_request):
+        mocked_request.side_effect = [
+            get_mocked_response(
+                HTTPStatus.OK.value,
+                json.dumps(DATA_MY_INFO_THROTTLED).encode('utf-8')
+            ),
+            get_mocked_response(
+                HTTPStatus.OK.value,
+                json.dumps(DATA_MY_INFO).encode('utf-8')
+            )
+        ]
+        clock = [0.0]
+        pool = CredentialPool(['throttled-mock-sess-data', 'mock-sess-data'], cooldown=60, clock=lambda: clock[0])
+        self.assertEqual(UserService.validate_credential_pool(pool), ['mock-sess-data'])
+        self.assertEqual(pool.healthy_sess_datas, ['mock-sess-data'])
+
+        # cooled down rather than taken out permanently
+        clock[0] = 61.0
+        self.assertEqual(pool.healthy_sess_datas, ['throttled-mock-sess-data', 'mock-sess-data'])
+
+
+class UserServiceGetEntitlementProfileTestCase(TestCase):
+
+    def setUp(self):
+        UserService.clear_entitlement_profiles()
+
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    def test_get_entitlement_profile_of_expired_vip(self, mocked_request):
+        mocked_request.return_value = get_mocked_response(
+            HTTPStatus.OK.value,
+            json.dumps(DATA_MY_INFO).encode('utf-8')
+        )
+        profile = UserService.get_entitlement_profile(sess_data='mock-sess-data')
+        self.assertTrue(profile.is_login)
+        self.assertEqual(profile.mid, 1532165)
+        self.assertFalse(profile.is_vip)
+        self.assertEqual(profile.vip_due_time, 1744905600)
+        self.assertEqual(profile.max_video_qn, QualityNumber.P1080.value)
+        self.assertEqual(profile.max_audio_qn, AudioBitRateID.BPS_192K.value.bit_rate_id)
+
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    def test_get_entitlement_profile_of_vip(self, mocked_request):
+        data = copy.deepcopy(DATA_MY_INFO)
+        data['data']['vip']['due_date'] = int(time.time() + 86400) * 1000
+        mocked_request.return_value = get_mocked_response(
+            HTTPStatus.OK.value,
+            json.dumps(data).encode('utf-8')
+        )
+        profile = UserService.get_entitlement_profile(sess_data='mock-sess-data')
+        self.assertTrue(profile.is_vip)
+        self.assertIsNone(profile.max_video_qn)
+        self.assertIsNone(profile.max_audio_qn)
+
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    def test_get_entitlement_profile_cached(self, mocked_request):
+        mocked_request.return_value = get_mocked_response(
+            HTTPStatus.OK.value,
+            json.dumps(DATA_MY_INFO).encode('utf-8')
+        )
+        profile = UserService.get_entitlement_profile(sess_data='mock-sess-data')
+        self.assertIs(UserService.get_entitlement_profile(sess_data='mock-sess-data'), profile)
+        self.assertEqual(mocked_request.call_count, 1)
+
+        UserService.get_entitlement_profile(sess_data='another-mock-sess-data')
+        self.assertEqual(mocked_request.call_count, 2)
+
+        UserService.get_entitlement_profile(sess_data='short-lived-mock-sess-data', ttl=0)
+        UserService.get_entitlement_profile(sess_data='short-lived-mock-sess-data')
+        self.assertEqual(mocked_request.call_count, 4)
+
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    def test_get_entitlement_profile_of_anonymous(self, mocked_request):
+        profile = UserService.get_entitlement_profile()
+        self.assertFalse(profile.is_login)
+        self.assertEqual(profile.max_video_qn, QualityNumber.P480.value)
+        mocked_request.assert_not_called()
+
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    def test_get_entitlement_profile_throttled(self, mocked_request):
+        mocked_request.side_effect = [
+            get_mocked_response(
+                HTTPStatus.OK.value,
+                json.dumps(DATA_MY_INFO_THROTTLED).encode('utf-8')
+            ),
+            get_mocked_response(
+                HTTPStatus.OK.value,
+                json.dumps(DATA_MY_INFO).encode('utf-8')
+            )
+        ]
+        with self.assertRaises(UserServiceError) as cm:
+            UserService.get_entitlement_profile(sess_data='mock-sess-data')
+        self.assertEqual(cm.exception.code, -412)
+
+        # failure is reused for a short while only, rather than as an anonymous profile
+        with self.assertRaises(UserServiceError):
+            UserService.get_entitlement_profile(sess_data='mock-sess-data')
+        self.assertEqual(mocked_request.call_count, 1)
+        with patch('bili_jean.user_service.time.time', return_value=time.time() + 31):
+            self.assertTrue(UserService.validate(sess_data='mock-sess-data'))
+        self.assertEqual(mocked_request.call_count, 2)
+
+    @patch('bili_jean.proxy_service.ProxyService.get')
+    def test_get_entitlement_profile_of_credential_pool_throttled(self, mocked_request):
+        mocked_request.side_effect = [
+            get_mocked_response(
+                HTTPStatus.OK.value,
+                json.dumps(DATA_MY_INFO_THROTTLED).encode('utf-8')
+            ),
+            get_mocked_response(
+                HTTPStatus.OK.value,
+                json.dumps(DATA_MY_INFO).encode('utf-8')
+            )
+        ]
+        pool = CredentialPool(['throttled-mock-sess-data', 'mock-sess-data'])
+        self.assertTrue(UserService.get_entitlement_profile(sess_data=pool).is_login)
+
+        with self.assertRaises(UserServiceError):
+            UserService.get_entitlement_profile(sess_data=CredentialPool(['throttled-mock-sess-data']))
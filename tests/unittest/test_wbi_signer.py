@@ -0,0 +1,148 @@
+"""
+Unit test for WbiSigner
+"""
+import json
+import os
+import tempfile
+from threading import Event, Thread
+from unittest import TestCase
+
+from bili_jean.wbi_signer import get_mixin_key, get_wbi_key, sign_params, WbiSigner
+
+
+IMG_KEY = '7cd084941338484aae1ad9425b84077c'
+SUB_KEY = '4932caff0ff746eab6f01bf08b70ac45'
+MIXIN_KEY = 'ea1db124af3c7062474693fa704f4ff8'
+
+
+class WbiSignatureTestCase(TestCase):
+
+    def test_get_wbi_key(self):
+        self.assertEqual(get_wbi_key(f'https://i0.hdslb.com/bfs/wbi/{IMG_KEY}.png'), IMG_KEY)
+
+    def test_get_mixin_key(self):
+        self.assertEqual(get_mixin_key(IMG_KEY, SUB_KEY), MIXIN_KEY)
+
+    def test_sign_params(self):
+        params = {'foo': '114', 'bar': '514', 'zab': 1919810}
+        signed_params = sign_params(params, MIXIN_KEY, 1702204169)
+        self.assertEqual(signed_params['wts'], 1702204169)
+        self.assertEqual(signed_params['w_rid'], '8f6f2b5b3d485fe1886cec6a0be8c5d4')
+        self.assertEqual(signed_params['zab'], 1919810)
+        self.assertNotIn('wts', params)
+
+    def test_sign_params_filtered_chars(self):
+        signed_params = sign_params({'foo': "one!'(two)*"}, MIXIN_KEY, 1702204169)
+        self.assertEqual(signed_params['foo'], 'onetwo')
+        self.assertEqual(
+            signed_params['w_rid'],
+            sign_params({'foo': 'onetwo'}, MIXIN_KEY, 1702204169)['w_rid']
+        )
+
+
+class WbiSignerTestCase(TestCase):
+
+    def setUp(self):
+        self.now = 1702204169.0
+        self.fetched_times = 0
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache_path = os.path.join(self.tmp_dir.name, 'wbi', 'wbi_keys.json')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _fetch_keys(self):
+        self.fetched_times += 1
+        return IMG_KEY, SUB_KEY
+
+    def _fetch_keys_failed(self):
+        self.fetched_times += 1
+        raise ValueError('request WBI keys error')
+
+    def _get_signer(self, **kwargs):
+        return WbiSigner(cache_path=self.cache_path, clock=lambda: self.now, **kwargs)
+
+    def test_sign(self):
+        signer = self._get_signer()
+        signed_params = signer.sign({'foo': '114', 'bar': '514', 'zab': 1919810}, fetch_keys=self._fetch_keys)
+        self.assertEqual(signed_params['w_rid'], '8f6f2b5b3d485fe1886cec6a0be8c5d4')
+
+        signer.sign({'foo': '114'}, fetch_keys=self._fetch_keys)
+        self.assertEqual(self.fetched_times, 1)
+
+    def test_refresh(self):
+        signer = self._get_signer(refresh_interval=100)
+        signer.get_mixin_key(self._fetch_keys)
+        self.now += 99
+        signer.get_mixin_key(self._fetch_keys)
+        self.assertEqual(self.fetched_times, 1)
+
+        self.now += 1
+        signer.get_mixin_key(self._fetch_keys)
+        self.assertEqual(self.fetched_times, 2)
+        self.assertEqual(signer.keys.fetched_at, self.now)
+
+    def test_disk_cache(self):
+        self._get_signer().get_mixin_key(self._fetch_keys)
+        with open(self.cache_path, 'r') as fp:
+            self.assertEqual(json.load(fp)['img_key'], IMG_KEY)
+
+        signer = self._get_signer()
+        self.assertEqual(signer.get_mixin_key(self._fetch_keys), MIXIN_KEY)
+        self.assertEqual(self.fetched_times, 1)
+
+    def test_corrupted_disk_cache(self):
+        os.makedirs(os.path.dirname(self.cache_path))
+        with open(self.cache_path, 'w') as fp:
+            fp.write('{')
+        self.assertEqual(self._get_signer().get_mixin_key(self._fetch_keys), MIXIN_KEY)
+        self.assertEqual(self.fetched_times, 1)
+
+    def test_unsigned_if_fetching_failed(self):
+        signer = self._get_signer(retry_interval=60)
+        params = {'foo': '114'}
+        self.assertEqual(signer.sign(params, fetch_keys=self._fetch_keys_failed), params)
+        signer.sign(params, fetch_keys=self._fetch_keys_failed)
+        self.assertEqual(self.fetched_times, 1)
+
+        self.now += 60
+        self.assertIn('w_rid', signer.sign(params, fetch_keys=self._fetch_keys))
+        self.assertEqual(self.fetched_times, 2)
+
+    def test_stale_keys_if_refreshing_failed(self):
+        signer = self._get_signer(refresh_interval=100)
+        signer.set_keys(IMG_KEY, SUB_KEY, fetched_at=self.now - 100)
+        self.assertEqual(signer.get_mixin_key(self._fetch_keys_failed), MIXIN_KEY)
+        self.assertEqual(self.fetched_times, 1)
+
+    def test_fetch_without_lock(self):
+        signer = self._get_signer(refresh_interval=100)
+        signer.set_keys(IMG_KEY, SUB_KEY, fetched_at=self.now - 100)
+        is_fetching = Event()
+        is_released = Event()
+
+        def fetch_keys_slowly():
+            is_fetching.set()
+            is_released.wait(timeout=5)
+            return self._fetch_keys()
+
+        thread = Thread(target=signer.get_mixin_key, args=(fetch_keys_slowly, ))
+        thread.start()
+        try:
+            self.assertTrue(is_fetching.wait(timeout=5))
+            # the other signing threads use the stale keys rather than waiting for the request
+            self.assertEqual(signer.get_mixin_key(self._fetch_keys), MIXIN_KEY)
+            self.assertEqual(self.fetched_times, 0)
+        finally:
+            is_released.set()
+            thread.join()
+        self.assertEqual(self.fetched_times, 1)
+        self.assertEqual(signer.keys.fetched_at, self.now)
+
+    def test_clear(self):
+        signer = WbiSigner(cache_path=None, clock=lambda: self.now)
+        signer.set_keys(IMG_KEY, SUB_KEY)
+        signer.clear()
+        self.assertIsNone(signer.keys)
+        signer.get_mixin_key(self._fetch_keys)
+        self.assertEqual(self.fetched_times, 1)
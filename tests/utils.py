@@ -1,13 +1,33 @@
 """
 Utilities for test case
 """
-from typing import cast, Optional
+from http import HTTPStatus
+import struct
+from typing import Callable, cast, List, Optional, Tuple
+from unittest.mock import MagicMock
 
 from requests import Response
 from requests.structures import CaseInsensitiveDict
 
+from bili_jean.wbi_signer import wbi_signer
 
-__all__ = ['get_mocked_response']
+
+__all__ = [
+    'build_box',
+    'build_dash_stream',
+    'build_fragment',
+    'build_fragmented_mp4',
+    'build_moov',
+    'build_sidx',
+    'build_trak',
+    'get_mocked_range_request',
+    'get_mocked_response',
+    'set_mocked_wbi_keys'
+]
+
+
+MOCK_WBI_IMG_KEY = '7cd084941338484aae1ad9425b84077c'
+MOCK_WBI_SUB_KEY = '4932caff0ff746eab6f01bf08b70ac45'
 
 
 class MockResponse(object):
@@ -37,3 +57,148 @@ def get_mocked_response(
 ) -> Response:
     mock_resp = cast(Response, MockResponse(status_code, content, headers))
     return mock_resp
+
+
+def set_mocked_wbi_keys() -> None:
+    """
+    cache WBI keys in process, so signing requests needs no more request to be mocked
+    """
+    wbi_signer.set_keys(MOCK_WBI_IMG_KEY, MOCK_WBI_SUB_KEY)
+
+
+def build_box(box_type: str, payload: bytes = b'') -> bytes:
+    return struct.pack('>I4s', 8 + len(payload), box_type.encode('latin-1')) + payload
+
+
+def build_sidx(
+    timescale: int,
+    earliest_presentation_time: int,
+    first_offset: int,
+    references: List[Tuple[int, int]],
+    version: int = 0
+) -> bytes:
+    """
+    build 'sidx' box, references are pairs of size and duration of media fragments
+    """
+    payload = struct.pack('>B3xII', version, 1, timescale)
+    if version == 0:
+        payload += struct.pack('>II', earliest_presentation_time, first_offset)
+    else:
+        payload += struct.pack('>QQ', earliest_presentation_time, first_offset)
+    payload += struct.pack('>HH', 0, len(references))
+    for size, duration in references:
+        payload += struct.pack('>III', size, duration, 0x90000000)
+    return build_box('sidx', payload)
+
+
+def build_full_box(box_type: str, version: int, payload: bytes) -> bytes:
+    return build_box(box_type, struct.pack('>B3x', version) + payload)
+
+
+def build_trak(
+    track_id: int,
+    handler_type: str,
+    timescale: int,
+    width: int = 0,
+    height: int = 0,
+    codec: str = 'avc1'
+) -> bytes:
+    tkhd = build_full_box(
+        'tkhd',
+        0,
+        struct.pack('>IIIII', 0, 0, track_id, 0, 0) + b'\x00' * 52 + struct.pack('>II', width << 16, height << 16)
+    )
+    mdhd = build_full_box('mdhd', 0, struct.pack('>IIIIHH', 0, 0, timescale, 0, 0x55c4, 0))
+    hdlr = build_full_box('hdlr', 0, struct.pack('>I4s12x', 0, handler_type.encode('latin-1')) + b'\x00')
+    stsd = build_full_box('stsd', 0, struct.pack('>I', 1) + build_box(codec, b'\x00' * 8))
+    minf = build_box('minf', build_box('stbl', stsd))
+    return build_box('trak', tkhd + build_box('mdia', mdhd + hdlr + minf))
+
+
+def build_moov(
+    tracks: List[bytes],
+    timescale: int = 1000,
+    duration: int = 0
+) -> bytes:
+    """
+    build 'moov' box of tracks, refer to build_trak
+    """
+    mvhd = build_full_box('mvhd', 0, struct.pack('>IIII', 0, 0, timescale, duration) + b'\x00' * 80)
+    return build_box('moov', mvhd + b''.join(tracks))
+
+
+def build_fragment(
+    sequence_number: int,
+    track_id: int,
+    payload: bytes,
+    base_data_offset: Optional[int] = None
+) -> bytes:
+    """
+    build a fragment of one sample, which is 'moof' and the following 'mdat',
+    data offset in 'trun' is relative to 'moof', the base data offset is expected to be offset of 'moof' if given
+    """
+    mfhd = build_full_box('mfhd', 0, struct.pack('>I', sequence_number))
+    if base_data_offset is None:
+        tfhd = build_box('tfhd', struct.pack('>II', 0x020000, track_id))
+    else:
+        tfhd = build_box('tfhd', struct.pack('>IIQ', 0x000001, track_id, base_data_offset))
+    tfdt = build_full_box('tfdt', 0, struct.pack('>I', sequence_number * 1000))
+    trun_size = 8 + 4 + 8 + 4
+    moof_size = 8 + len(mfhd) + 8 + len(tfhd) + len(tfdt) + trun_size
+    trun = build_box('trun', struct.pack('>IIiI', 0x000201, 1, moof_size + 8, len(payload)))
+    return build_box('moof', mfhd + build_box('traf', tfhd + tfdt + trun)) + build_box('mdat', payload)
+
+
+def build_dash_stream(
+    track_id: int,
+    handler_type: str,
+    timescale: int,
+    payloads: List[bytes],
+    width: int = 0,
+    height: int = 0,
+    codec: str = 'avc1'
+) -> bytes:
+    """
+    build DASH stream of one track, which has a fragment for each payload
+    """
+    trex = build_full_box('trex', 0, struct.pack('>IIIII', track_id, 1, 0, 0, 0))
+    moov = build_moov(
+        [build_trak(track_id, handler_type, timescale, width, height, codec), build_box('mvex', trex)]
+    )
+    fragments = [build_fragment(idx + 1, track_id, payload) for idx, payload in enumerate(payloads)]
+    sidx = build_sidx(timescale, 0, 0, [(len(fragment), timescale) for fragment in fragments])
+    return build_box('ftyp', b'iso5') + moov + sidx + b''.join(fragments)
+
+
+def build_fragmented_mp4(moov: Optional[bytes] = None) -> Tuple[bytes, bytes, List[bytes]]:
+    """
+    build DASH stream of initialization segment,
+    then segment index of 4 fragments which are 2 seconds each, then the fragments
+    :return: initialization segment, the whole stream, and the fragments
+    """
+    if moov is None:
+        moov = build_moov([build_trak(1, 'vide', 16000, 852, 480)])
+    init_data = build_box('ftyp', b'iso5') + moov
+    fragments = [build_box('moof', bytes([idx]) * 8) + build_box('mdat', bytes([idx]) * 32) for idx in range(4)]
+    sidx = build_sidx(1000, 0, 0, [(len(fragment), 2000) for fragment in fragments])
+    return init_data, init_data + sidx + b''.join(fragments), fragments
+
+
+def get_mocked_range_request(data: bytes) -> Callable[..., MagicMock]:
+    """
+    mock ProxyService.get which responds the byte range of data by 'Range' header
+    """
+
+    def mocked_get(url, headers=None, stream=False, **kwargs):
+        start, end = headers['Range'][len('bytes='):].split('-')
+        content = data[int(start):int(end) + 1]
+        response = MagicMock()
+        if content:
+            response.status_code = HTTPStatus.PARTIAL_CONTENT.value
+        else:
+            response.status_code = HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE.value
+        response.content = content
+        response.iter_content = MagicMock(return_value=[content])
+        return response
+
+    return mocked_get